@@ -0,0 +1,95 @@
+# Esse arquivo contém os comandos de manutenção da aplicação, executados a partir da pasta 'backend':
+#   python -m app.cli <comando>
+#
+# Comandos disponíveis:
+# - init-db: cria o esquema da base de dados (tabelas e contadores). Executado uma vez, antes de arrancar a API,
+#   e depois de cada atualização que acrescente tabelas.
+# - atualizar-esquema: atualiza uma base de dados criada por uma versão anterior da API (tabelas em falta,
+#   catálogos e colunas, índices e sequência em falta na tabela 'empresas').
+# - reconstruir-facetas: recalcula os contadores das facetas (cidade e ramo de atuação) a partir da tabela de empresas.
+# - migrar-catalogos: converte as colunas de texto 'cidade' e 'ramo_atuacao' de uma base de dados antiga
+#   nos catálogos ('cidades' e 'ramos_atuacao') e nos IDs correspondentes (faz parte do 'atualizar-esquema').
+
+# --- Importações de Módulos ---
+import argparse
+import sys
+from dotenv import load_dotenv
+
+# Carrega as variáveis do ficheiro '.env' (como a DATABASE_URL) antes de importar os módulos da aplicação.
+load_dotenv()
+
+from .db.database import SessionLocal, engine
+from .models.faceta import ContagemFaceta
+from .services import esquema_service, faceta_service
+
+
+# --- Comandos ---
+
+def init_db(args):
+    """
+    Cria as tabelas que ainda não existem (e a extensão pg_trgm, em PostgreSQL) e o contador do total de empresas.
+    """
+    esquema_service.inicializar()
+    print("Esquema da base de dados criado.")
+
+
+def atualizar_esquema(args):
+    """
+    Atualiza uma base de dados criada por uma versão anterior da API: cria as tabelas em falta (como a
+    'empresas_removidas'), acrescenta as colunas em falta na tabela 'empresas' (a 'versao', preenchida com o ID
+    de cada empresa, e a 'data_atualizacao', com a data de registo), converte as colunas de texto 'cidade'
+    e 'ramo_atuacao' nos catálogos (reconstruindo as facetas), acrescenta a 'cidade_nome' (preenchida a partir
+    do catálogo), cria os índices e, em PostgreSQL, a sequência
+    'empresas_versao_seq', que continua a partir da maior versão. A aplicação deve estar parada.
+    """
+    alteracoes = esquema_service.atualizar()
+    if alteracoes["colunas"]:
+        print(f"Colunas acrescentadas: {', '.join(alteracoes['colunas'])}.")
+    entradas = alteracoes["catalogos"]
+    if entradas is not None:
+        print(f"Catálogos preenchidos: {entradas['cidade']} cidades e {entradas['ramo_atuacao']} ramos de atuação.")
+    print("Esquema da base de dados atualizado.")
+
+
+def reconstruir_facetas(args):
+    """
+    Recalcula os contadores das facetas. Usado para recuperar contadores incorretos
+    (por exemplo, depois de alterar empresas diretamente na base de dados) ou para os preencher
+    numa base de dados criada antes da tabela 'facetas_empresas'.
+    """
+    ContagemFaceta.__table__.create(bind=engine, checkfirst=True)
+    with SessionLocal() as db:
+        valores = faceta_service.reconstruir(db)
+    print(f"Facetas reconstruídas: {valores} valores distintos.")
+
+
+def migrar_catalogos(args):
+    """
+    Converte uma tabela 'empresas' criada antes dos catálogos: cria as tabelas 'cidades' e 'ramos_atuacao',
+    preenche-as com os valores distintos (os que só diferem nos acentos ou nas maiúsculas ficam numa única entrada)
+    e substitui as colunas de texto pelos IDs. No fim, reconstrói as facetas, que passam a contar as variantes juntas.
+    Faz a atualização completa do esquema (como 'atualizar-esquema'), já que uma tabela tão antiga também não tem
+    as colunas acrescentadas depois. A aplicação deve estar parada durante a migração.
+    """
+    atualizar_esquema(args)
+
+
+# Nome de cada comando e a função que o executa.
+COMANDOS = {
+    "init-db": init_db,
+    "atualizar-esquema": atualizar_esquema,
+    "reconstruir-facetas": reconstruir_facetas,
+    "migrar-catalogos": migrar_catalogos,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Comandos de manutenção da API.")
+    parser.add_argument("comando", choices=sorted(COMANDOS), help="Comando a executar")
+    args = parser.parse_args(argv)
+    COMANDOS[args.comando](args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,20 @@
 # Importa as bibliotecas necessárias para a configuração.
 import os
+from contextlib import asynccontextmanager
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
+from sqlalchemy.pool import QueuePool
+from starlette.concurrency import run_in_threadpool
 
-# --- Carregamento das Variáveis de Ambiente ---
-# A função 'load_dotenv()' lê o ficheiro '.env' na pasta 'backend'
-# e carrega as variáveis definidas nele (como a DATABASE_URL) para o ambiente do sistema.
-# Isto permite-nos manter as senhas e outras informações sensíveis fora do código-fonte.
-load_dotenv()
+from .monitor_pool import EstatisticasPool, classe_pool
 
 # --- Configuração da Conexão com a Base de Dados ---
+# As configurações são lidas das variáveis de ambiente. O ficheiro '.env' é carregado pelos pontos de entrada
+# ('main.py', 'cli.py'), antes de importarem este módulo. Criar os engines não abre nenhuma conexão:
+# a primeira só é aberta no primeiro acesso à base de dados.
 
 # Lê a string de conexão da base de dados a partir da variável de ambiente "DATABASE_URL".
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -22,14 +25,106 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL is None:
     raise ValueError("A variável de ambiente DATABASE_URL não foi definida. Crie um ficheiro .env.")
 
+# URL opcional de uma réplica de leitura. Quando definida, as rotas só de leitura (listagem, detalhe, exportação,
+# facetas e consulta em lote) usam a réplica, e as escritas continuam a usar a base de dados principal.
+# Assim, o tráfego de leitura pode ser distribuído por mais servidores.
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+
+# --- Configuração do Pool de Conexões ---
+# Número de conexões mantidas abertas e número de conexões extra abertas em picos de carga.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+# Tempo máximo (em segundos) de espera por uma conexão livre, antes de o pedido falhar.
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+# Idade máxima (em segundos) de uma conexão: as mais antigas são substituídas, antes que o servidor
+# (ou uma firewall) as feche por inatividade. Com -1, as conexões nunca são substituídas.
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+# Testa cada conexão antes de a entregar ao pedido, descartando as que o servidor já fechou.
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Estatísticas do pool de cada engine, por nome (consultadas em 'GET /diagnostico/pool').
+estatisticas_pools = {}
+# Todos os engines criados (a versão síncrona, no caso dos assíncronos), onde são registados os eventos
+# de monitorização das consultas ('services/metricas_service.py').
+engines = []
+
+
+def criar_engine(url, nome, assincrono=False):
+    """
+    Cria um engine com o pool configurado pelas variáveis 'DB_POOL_*' e monitorizado ('db/monitor_pool.py').
+    """
+    estatisticas = estatisticas_pools[nome] = EstatisticasPool(nome)
+    poolclass = classe_pool(url, estatisticas)
+    opcoes = {"poolclass": poolclass, "pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    # O tamanho, o overflow e o tempo de espera só se aplicam aos pools com fila (o SQLite em memória
+    # usa uma única conexão, partilhada ou por thread).
+    if issubclass(poolclass, QueuePool):
+        opcoes.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    if assincrono:
+        motor = create_async_engine(url, **opcoes)
+        engines.append(motor.sync_engine)
+        return motor
+    motor = create_engine(url, **opcoes)
+    engines.append(motor)
+    return motor
+
+
 # Cria o "motor" (engine) do SQLAlchemy. O engine é o ponto de partida para qualquer
 # aplicação SQLAlchemy e gere a comunicação com a base de dados através de um "pool" de conexões.
-engine = create_engine(DATABASE_URL)
+engine = criar_engine(DATABASE_URL, "principal")
+# O engine de leitura usa a réplica, se existir; caso contrário, é o próprio engine principal.
+read_engine = criar_engine(DATABASE_READ_URL, "leitura") if DATABASE_READ_URL else engine
 
 # Cria uma fábrica de sessões ('SessionLocal'). Uma sessão é a unidade de trabalho principal
 # para a comunicação com a base de dados. 'autocommit=False' e 'autoflush=False' são as
 # configurações padrão recomendadas para a integração com o FastAPI.
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# --- Configuração do Acesso Assíncrono ---
+# Com 'DB_ASYNC=true' (o padrão), os pedidos usam um engine assíncrono (asyncpg em PostgreSQL,
+# aiosqlite em SQLite) e não ocupam uma thread enquanto esperam pela base de dados.
+# Com 'DB_ASYNC=false', a API volta ao caminho síncrono, em que cada acesso à base de dados
+# ocupa uma thread do threadpool do Starlette. Isto permite comparar os dois caminhos sob carga.
+DB_ASYNC = os.getenv("DB_ASYNC", "true").lower() in ("1", "true", "yes")
+
+# Drivers assíncronos a usar para cada base de dados, quando a URL não indica um.
+DRIVERS_ASSINCRONOS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def converter_url_assincrona(url):
+    """
+    Converte uma URL de ligação síncrona na URL equivalente com um driver assíncrono.
+    """
+    url = make_url(url)
+    driver = DRIVERS_ASSINCRONOS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"Não existe um driver assíncrono configurado para '{url.get_backend_name()}'. Defina ASYNC_DATABASE_URL.")
+    return url.set(drivername=driver)
+
+
+# As URLs assíncronas podem ser indicadas explicitamente; caso contrário, são derivadas da DATABASE_URL
+# e da DATABASE_READ_URL.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or converter_url_assincrona(DATABASE_URL)
+ASYNC_DATABASE_READ_URL = os.getenv("ASYNC_DATABASE_READ_URL") or (
+    converter_url_assincrona(DATABASE_READ_URL) if DATABASE_READ_URL else None
+)
+
+# Os engines assíncronos e as respetivas fábricas de sessões só são criados quando o modo assíncrono está ativo.
+# 'expire_on_commit=False' evita que os objetos sejam recarregados (de forma implícita) depois do commit,
+# o que não é possível fora de um contexto assíncrono.
+async_engine = criar_engine(ASYNC_DATABASE_URL, "principal_async", assincrono=True) if DB_ASYNC else None
+async_read_engine = (
+    criar_engine(ASYNC_DATABASE_READ_URL, "leitura_async", assincrono=True)
+    if DB_ASYNC and ASYNC_DATABASE_READ_URL else async_engine
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False) if DB_ASYNC else None
+AsyncReadSessionLocal = (
+    async_sessionmaker(async_read_engine, expire_on_commit=False, autoflush=False) if DB_ASYNC else None
+)
 
 # Cria uma classe 'Base' declarativa. Todas as nossas classes de modelo ORM (em 'models/')
 # irão herdar desta classe para que o SQLAlchemy possa mapeá-las para as tabelas na base de dados.
@@ -39,9 +134,37 @@ Base = declarative_base()
 # --- Dependência para Injeção de Sessão ---
 # Esta função é uma "dependência" do FastAPI. Ela será chamada em cada pedido à API
 # que precisar de uma ligação à base de dados.
-def get_db():
+# Devolve uma 'AsyncSession' no modo assíncrono ou uma 'Session' no modo síncrono;
+# as rotas usam a função 'executar' para trabalhar com qualquer uma das duas.
+async def get_db():
+    async with _sessao(AsyncSessionLocal, SessionLocal) as db:
+        yield db
+
+
+# Igual a 'get_db', mas com uma sessão da réplica de leitura (ou da base de dados principal, sem DATABASE_READ_URL).
+# Usada apenas pelas rotas que não escrevem. A réplica pode estar ligeiramente atrasada em relação à principal.
+async def get_read_db():
+    async with _sessao(AsyncReadSessionLocal, ReadSessionLocal) as db:
+        yield db
+
+
+# Sessão de curta duração, fora das dependências: fechada no fim do bloco 'async with', devolve a conexão ao pool
+# de imediato, em vez de a manter até ao fim da resposta (como as sessões de 'get_db' e 'get_read_db').
+# Usada pela autenticação, antes de a rota obter a sua própria sessão, e pelo stream de alterações, que fica aberto.
+def sessao():
+    return _sessao(AsyncSessionLocal, SessionLocal)
+
+
+@asynccontextmanager
+async def _sessao(fabrica_assincrona, fabrica_sincrona):
+    if DB_ASYNC:
+        # 'async with' garante que a sessão é fechada e a conexão devolvida ao pool no fim do pedido.
+        async with fabrica_assincrona() as db:
+            yield db
+        return
+
     # Cria uma nova instância de sessão a partir da nossa fábrica de sessões.
-    db = SessionLocal()
+    db = fabrica_sincrona()
     try:
         # A palavra-chave 'yield' entrega a sessão de base de dados para a rota que a pediu.
         # O código da rota é executado aqui.
@@ -51,4 +174,37 @@ def get_db():
         # mesmo que ocorra um erro durante o pedido.
         # 'db.close()' fecha a sessão, a devolver a conexão para o pool do engine.
         # Isto é crucial para evitar que as conexões à base de dados se esgotem.
-        db.close()
\ No newline at end of file
+        # No modo síncrono, o fecho pode bloquear, por isso é feito no threadpool.
+        await run_in_threadpool(db.close)
+
+
+# --- Execução de Operações na Base de Dados ---
+# As operações sobre a base de dados (em 'services/') são escritas uma única vez, com a API síncrona
+# da 'Session'. Esta função executa-as da forma adequada ao modo configurado:
+# - Modo assíncrono: 'AsyncSession.run_sync' executa a função no event loop, e cada acesso à base de dados
+#   é feito de forma assíncrona pelo driver (asyncpg/aiosqlite), sem ocupar threads.
+# - Modo síncrono: a função é executada no threadpool, tal como as rotas síncronas do FastAPI.
+async def executar(db, funcao, *args, **kwargs):
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(funcao, *args, **kwargs)
+    return await run_in_threadpool(funcao, db, *args, **kwargs)
+
+
+# --- Encerramento ---
+async def fechar():
+    """
+    Fecha as conexões dos pools de todos os engines. Chamada no encerramento da aplicação.
+    """
+    for motor in {async_engine, async_read_engine} - {None}:
+        await motor.dispose()
+    for motor in {engine, read_engine}:
+        await run_in_threadpool(motor.dispose)
+
+
+def reiniciar_pools():
+    """
+    Descarta os pools herdados do processo pai, sem fechar as conexões dele. Chamada em cada worker
+    criado com 'fork' (ver 'servidor.py'): as conexões não podem ser partilhadas entre processos.
+    """
+    for motor in engines:
+        motor.dispose(close=False)
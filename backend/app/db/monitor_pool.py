@@ -0,0 +1,121 @@
+# Esse arquivo contém a monitorização dos pools de conexões dos engines ('db/database.py').
+# Cada engine usa uma subclasse do pool escolhido pelo SQLAlchemy para o seu driver, que mede o tempo de cada
+# checkout (a espera por uma conexão livre, a abertura de uma nova conexão e o "pre-ping") e conta os pedidos
+# que desistiram por esgotar 'DB_POOL_TIMEOUT'. Os valores são consultados em 'GET /diagnostico/pool'.
+
+# --- Importações de Módulos ---
+import threading
+import time
+from collections import deque
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+# Número de tempos de checkout recentes usados no cálculo dos percentis.
+AMOSTRAS_CHECKOUT = 1024
+
+
+class EstatisticasPool:
+    """
+    Contadores de um pool de conexões, atualizados a cada checkout (por várias threads em simultâneo).
+    """
+    def __init__(self, nome):
+        self.nome = nome
+        self._lock = threading.Lock()
+        self._tempos = deque(maxlen=AMOSTRAS_CHECKOUT)
+        self.checkouts = 0
+        self.tempo_total = 0.0
+        self.tempo_maximo = 0.0
+        self.esgotados = 0
+        self.a_espera = 0
+        # O pool atual do engine (o 'engine.dispose()' substitui o pool por um novo, da mesma classe).
+        self.pool = None
+
+    def iniciar_checkout(self):
+        with self._lock:
+            self.a_espera += 1
+
+    def terminar_checkout(self, duracao, esgotado=False):
+        with self._lock:
+            self.a_espera -= 1
+            if esgotado:
+                self.esgotados += 1
+                return
+            self.checkouts += 1
+            self.tempo_total += duracao
+            self.tempo_maximo = max(self.tempo_maximo, duracao)
+            self._tempos.append(duracao)
+
+    def resumo(self):
+        """
+        Devolve o estado atual do pool e os tempos de checkout (em milissegundos).
+        """
+        with self._lock:
+            tempos = sorted(self._tempos)
+            resumo = {
+                "nome": self.nome,
+                "checkouts": self.checkouts,
+                "esgotados": self.esgotados,
+                "a_espera": self.a_espera,
+                "checkout_medio_ms": round(self.tempo_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "checkout_maximo_ms": round(self.tempo_maximo * 1000, 3),
+                "checkout_p50_ms": _percentil(tempos, 0.50),
+                "checkout_p95_ms": _percentil(tempos, 0.95),
+                "checkout_p99_ms": _percentil(tempos, 0.99),
+            }
+        pool = self.pool
+        if isinstance(pool, QueuePool):
+            capacidade = pool.size() + pool._max_overflow if pool._max_overflow > -1 else None
+            resumo.update({
+                "tamanho": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "em_uso": pool.checkedout(),
+                "livres": pool.checkedin(),
+                "overflow": pool.overflow(),
+                # Fração das conexões possíveis que está em uso (1.0 = os novos pedidos têm de esperar).
+                "saturacao": round(pool.checkedout() / capacidade, 3) if capacidade else None,
+            })
+        elif pool is not None:
+            resumo["estado"] = pool.status()
+        return resumo
+
+
+def _percentil(tempos, fracao):
+    if not tempos:
+        return 0.0
+    return round(tempos[min(len(tempos) - 1, int(len(tempos) * fracao))] * 1000, 3)
+
+
+class PoolMonitorizado:
+    """
+    Mixin que mede cada checkout. Combinado com a classe de pool original por 'classe_pool'.
+    """
+    estatisticas = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.estatisticas.pool = self
+
+    def connect(self):
+        self.estatisticas.iniciar_checkout()
+        inicio = time.perf_counter()
+        try:
+            conexao = super().connect()
+        except exc.TimeoutError:
+            self.estatisticas.terminar_checkout(time.perf_counter() - inicio, esgotado=True)
+            raise
+        except BaseException:
+            self.estatisticas.terminar_checkout(time.perf_counter() - inicio)
+            raise
+        self.estatisticas.terminar_checkout(time.perf_counter() - inicio)
+        return conexao
+
+
+def classe_pool(url, estatisticas):
+    """
+    Devolve a classe do pool que o SQLAlchemy usaria para a URL, com a monitorização de 'PoolMonitorizado'.
+    A classe guarda as estatísticas, por isso os pools recriados pelo engine continuam a atualizá-las.
+    """
+    url = make_url(url)
+    base = url.get_dialect().get_pool_class(url)
+    return type(f"{base.__name__}Monitorizado", (PoolMonitorizado, base), {"estatisticas": estatisticas})
@@ -4,14 +4,11 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 # Ferramentas da biblioteca 'jose' para descodificar e validar tokens JWT.
 from jose import JWTError, jwt
-# Ferramenta do SQLAlchemy para gerir a sessão com a base de dados.
-from sqlalchemy.orm import Session
 
 # Importa as nossas dependências e serviços locais.
-from .db.database import get_db
-from .services import auth_service
+from .db.database import sessao, executar
+from .services import auth_service, principal_service
 from .schemas.token import TokenData
-from .models.administrador import Administrador
 
 # --- Configuração do Esquema de Autenticação OAuth2 ---
 # Cria uma instância do 'OAuth2PasswordBearer'.
@@ -24,7 +21,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 # Esta função assíncrona é a nossa dependência de segurança principal.
 # Quando a aplicamos a uma rota, o FastAPI irá executá-la antes do código da rota.
 # A sua missão é: validar o token e devolver os dados do utilizador autenticado.
-async def get_current_admin(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_admin(token: str = Depends(oauth2_scheme)):
     # Prepara uma exceção padrão que será usada em vários cenários de falha.
     # 'status.HTTP_401_UNAUTHORIZED' é o código para "Não Autenticado".
     # O cabeçalho 'WWW-Authenticate' é parte do padrão OAuth2.
@@ -34,6 +31,12 @@ async def get_current_admin(token: str = Depends(oauth2_scheme), db: Session = D
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    # Se o token já foi validado recentemente, devolve o administrador guardado em cache,
+    # sem descodificar o token nem consultar a base de dados.
+    admin = principal_service.cache.obter(token)
+    if admin is not None:
+        return admin
+
     try:
         # Tenta descodificar o token JWT recebido do cliente.
         # Usa a nossa SECRET_KEY e o ALGORITHM definidos no 'auth_service'.
@@ -55,13 +58,22 @@ async def get_current_admin(token: str = Depends(oauth2_scheme), db: Session = D
         raise credentials_exception
     
     # Se o token foi descodificado com sucesso, agora verificamos se o utilizador realmente existe na base de dados.
-    admin = db.query(Administrador).filter(Administrador.username == token_data.username).first()
+    # A consulta é feita através de 'executar', para não bloquear o event loop, numa sessão própria, fechada logo
+    # a seguir: a conexão volta ao pool antes de a rota correr, em vez de ficar ocupada até ao fim da resposta
+    # (com a sessão da rota, cada pedido sem o principal em cache precisaria de duas conexões).
+    async with sessao() as db:
+        admin = await executar(db, auth_service.buscar_admin, token_data.username)
     
     # Se o utilizador não for encontrado na base de dados (ex: foi apagado depois da emissão do token),
     # o token já não é válido. Lança a exceção.
     if admin is None:
         raise credentials_exception
+
+    # Converte o administrador num valor imutável ('id' e 'username'), que é partilhado pelos pedidos seguintes
+    # através da cache, e guarda-o no máximo até à expiração do token.
+    admin = principal_service.principal(admin)
+    principal_service.cache.guardar(token, admin, payload.get("exp"))
         
-    # Se todas as verificações passarem, a função devolve o objeto 'admin' da base de dados.
+    # Se todas as verificações passarem, a função devolve o administrador autenticado ('id' e 'username').
     # A rota que usou esta dependência receberá este objeto e poderá usá-lo.
     return admin
\ No newline at end of file
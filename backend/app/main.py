@@ -1,18 +1,28 @@
 # Importa as classes e funções necessárias das bibliotecas.
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
 import os
 
+# --- Carregamento das Variáveis de Ambiente ---
+# A função 'load_dotenv()' lê o ficheiro '.env' na pasta 'backend' e carrega as variáveis definidas nele
+# (como a DATABASE_URL) para o ambiente do sistema. Isto permite-nos manter as senhas e outras informações
+# sensíveis fora do código-fonte. É chamada antes de importar os módulos da aplicação, que leem as configurações.
+load_dotenv()
+
 # Importa os componentes locais da aplicação.
-from .db.database import engine, Base
-from .routers import empresas, auth
+from .db import database
+from .routers import empresas, auth, diagnostico, tarefas
+from .services import admissao_service, auth_service, compressao_service, esquema_service, metricas_service, tarefa_service
 
 # --- Criação das Tabelas na Base de Dados ---
-# Esta linha lê os modelos definidos em 'models/' e cria as tabelas correspondentes
-# na base de dados PostgreSQL, caso elas ainda não existam.
-# É executado apenas uma vez quando a aplicação inicia.
-Base.metadata.create_all(bind=engine)
+# As tabelas não são criadas ao importar a aplicação: importar este módulo não liga à base de dados,
+# e cada worker arranca sem ler o esquema. O esquema é criado uma única vez, antes do arranque:
+#   python -m app.cli init-db
+# (ou no arranque, com 'DB_INIT_SCHEMA=true', ver 'services/esquema_service.py').
 
 # --- Metadados para a Documentação da API ---
 # Define as "tags" que serão usadas para agrupar os endpoints na documentação (/docs).
@@ -26,22 +36,15 @@ tags_metadata = [
         "name": "Empresas",
         "description": "Operações para gerir as empresas clientes (CRUD e consultas avançadas).",
     },
-]
-
-# --- Instanciação da Aplicação FastAPI ---
-# Cria a instância principal da aplicação FastAPI, passando os metadados
-# que serão exibidos na documentação automática.
-app = FastAPI(
-    title="API de Gestão de Clientes - Ecomp Jr.",
-    description="API desenvolvida para o Desafio Técnico do Processo Seletivo 2025.2 da Ecomp Jr.",
-    version="1.0.0",
-    contact={
-        "name": "Ecomp Jr. - Empresa Júnior de Computação",
-        "url": "http://ecompjr.com.br/",
-        "email": "ecompjr@uefs.br",
+    {
+        "name": "Tarefas",
+        "description": "Operações longas (importação, exportação e facetas) executadas em segundo plano.",
+    },
+    {
+        "name": "Diagnóstico",
+        "description": "Estado interno da API (pools de conexões), reservado a administradores.",
     },
-    openapi_tags=tags_metadata
-)
+]
 
 # --- Configuração do CORS (Cross-Origin Resource Sharing) ---
 # O CORS permite que o nosso front-end (a correr, por exemplo, em http://localhost:5173)
@@ -54,31 +57,114 @@ origins = [
     "http://127.0.0.1:5173",
 ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,       # Permite as origens da lista
-    allow_credentials=True,      # Permite o envio de cookies/autenticação
-    allow_methods=["*"],         # Permite todos os métodos HTTP (GET, POST, PUT, etc.)
-    allow_headers=["*"],         # Permite todos os cabeçalhos HTTP
-)
+# Obtém o caminho absoluto para o ficheiro 'docs_redirect.html'
+redirect_file_path = os.path.join(os.path.dirname(__file__), "docs_redirect.html")
 
-# --- Inclusão das Rotas (Routers) ---
-# Inclui os ficheiros de rotas na aplicação principal. Isto mantém o código organizado,
-# separando a lógica de cada recurso (autenticação, empresas, etc.) em ficheiros diferentes.
-app.include_router(auth.router)
-app.include_router(empresas.router)
 
-# --- Rota Principal (Endpoint Raiz) ---
-# Define o comportamento da rota principal da API ("/").
+# --- Arranque e Encerramento (Lifespan) ---
+# Executado por cada worker: no arranque, antes de aceitar pedidos, e no encerramento, depois do último.
+@asynccontextmanager
+async def lifespan(app):
+    # Em desenvolvimento, cria o esquema no arranque (em produção, com 'python -m app.cli init-db').
+    if esquema_service.DB_INIT_SCHEMA:
+        await run_in_threadpool(esquema_service.inicializar)
+    # Os workers das tarefas em segundo plano arrancam com a aplicação (e retomam as tarefas interrompidas)
+    # e param com ela: as tarefas em execução gravam o progresso e voltam a ficar pendentes,
+    # para serem retomadas no próximo arranque.
+    tarefa_service.gestor.iniciar()
+    try:
+        yield
+    finally:
+        await run_in_threadpool(tarefa_service.gestor.parar)
+        # Termina os processos do bcrypt (e o 'forkserver' que os cria), que não terminam sozinhos com o worker.
+        await run_in_threadpool(auth_service.pool_senhas.encerrar)
+        # Fecha as conexões dos pools, em vez de as deixar ser cortadas no fim do processo.
+        await database.fechar()
 
-# Obtém o caminho absoluto para o ficheiro 'docs_redirect.html'
-redirect_file_path = os.path.join(os.path.dirname(__file__), "docs_redirect.html")
 
-@app.get("/", tags=["Root"], include_in_schema=False)
-def read_root():
+# --- Instanciação da Aplicação FastAPI ---
+def create_app():
     """
-    Esta rota serve um ficheiro HTML que redireciona automaticamente o utilizador
-    para a página de documentação interativa em /docs.
-    Isto facilita o acesso à documentação para quem está a testar a API.
+    Cria a aplicação: os middlewares, as rotas e o 'lifespan'. Não abre nenhuma conexão à base de dados.
+    Usada pelo 'uvicorn' ('app.main:app', ou 'app.main:create_app' com '--factory') e por 'servidor.py'.
     """
-    return FileResponse(redirect_file_path)
\ No newline at end of file
+    # Cria a instância principal da aplicação FastAPI, passando os metadados
+    # que serão exibidos na documentação automática.
+    app = FastAPI(
+        title="API de Gestão de Clientes - Ecomp Jr.",
+        description="API desenvolvida para o Desafio Técnico do Processo Seletivo 2025.2 da Ecomp Jr.",
+        version="1.0.0",
+        contact={
+            "name": "Ecomp Jr. - Empresa Júnior de Computação",
+            "url": "http://ecompjr.com.br/",
+            "email": "ecompjr@uefs.br",
+        },
+        openapi_tags=tags_metadata,
+        lifespan=lifespan,
+    )
+
+    # --- Controlo de Admissão ---
+    # Limita o ritmo de cada IP e de cada administrador e a carga em curso, e rejeita os pedidos em excesso
+    # (429 e 503, com 'Retry-After') quando a API está sobrecarregada (ver 'services/admissao_service.py').
+    # Fica dentro do CORS, por isso as rejeições têm os cabeçalhos CORS e os pedidos 'preflight' não são contados.
+    # O estado (baldes, filas e contadores) é desta aplicação, e fica em 'app.state.admissao' para o 'GET /metrics'.
+    app.add_middleware(admissao_service.MiddlewareAdmissao, estado=app.state)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,       # Permite as origens da lista
+        allow_credentials=True,      # Permite o envio de cookies/autenticação
+        allow_methods=["*"],         # Permite todos os métodos HTTP (GET, POST, PUT, etc.)
+        allow_headers=["*"],         # Permite todos os cabeçalhos HTTP
+        # Permite ao front-end ler o cursor da página seguinte, a ETag, o total de resultados e o tempo de espera sugerido.
+        expose_headers=["X-Next-Cursor", "ETag", "X-Total-Count", "X-Total-Count-Mode", "Retry-After"],
+    )
+
+    # --- Compressão das Respostas ---
+    # Comprime as respostas (brotli ou gzip, conforme o 'Accept-Encoding' do cliente) a partir de 'COMPRESSAO_MINIMO' bytes.
+    # Fica dentro do middleware de métricas, que assim regista o tamanho das respostas tal como são enviadas.
+    app.add_middleware(
+        compressao_service.MiddlewareCompressao,
+        minimo=compressao_service.COMPRESSAO_MINIMO,
+        nivel_gzip=compressao_service.COMPRESSAO_GZIP_NIVEL,
+        nivel_brotli=compressao_service.COMPRESSAO_BROTLI_NIVEL,
+        cache_bytes=compressao_service.COMPRESSAO_CACHE_BYTES,
+    )
+
+    # --- Métricas de Desempenho ---
+    # Mede cada pedido (latência, consultas à base de dados, tamanho da resposta e código de estado) por rota.
+    # É o último middleware adicionado, por isso é o mais externo e mede também o tempo dos outros middlewares.
+    app.add_middleware(metricas_service.MiddlewareMetricas)
+
+    # --- Inclusão das Rotas (Routers) ---
+    # Inclui os ficheiros de rotas na aplicação principal. Isto mantém o código organizado,
+    # separando a lógica de cada recurso (autenticação, empresas, etc.) em ficheiros diferentes.
+    app.include_router(auth.router)
+    app.include_router(empresas.router)
+    app.include_router(tarefas.router)
+    app.include_router(diagnostico.router)
+
+    # --- Rota Principal (Endpoint Raiz) ---
+    # Define o comportamento da rota principal da API ("/").
+    @app.get("/", tags=["Root"], include_in_schema=False)
+    def read_root():
+        """
+        Esta rota serve um ficheiro HTML que redireciona automaticamente o utilizador
+        para a página de documentação interativa em /docs.
+        Isto facilita o acesso à documentação para quem está a testar a API.
+        """
+        return FileResponse(redirect_file_path)
+
+    # --- Endpoint de Métricas ---
+    # Exporta as métricas deste worker no formato de texto do Prometheus, para serem recolhidas periodicamente.
+    @app.get("/metrics", tags=["Root"], include_in_schema=False)
+    def read_metrics():
+        # O middleware de admissão só é criado no primeiro pedido (quando a pilha de middlewares é montada).
+        admissao = getattr(app.state, "admissao", None)
+        return Response(metricas_service.registo.exportar(admissao), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    return app
+
+
+# A aplicação usada pelo 'uvicorn app.main:app'.
+app = create_app()
@@ -0,0 +1,35 @@
+# Importa as ferramentas necessárias do SQLAlchemy para definir as colunas das tabelas.
+from sqlalchemy import Column, Integer, String
+
+# Importa a classe 'Base' do nosso módulo de configuração da base de dados.
+from ..db.database import Base
+
+
+# --- Entradas dos Catálogos ---
+# As cidades e os ramos de atuação repetem-se em muitas empresas. Em vez de guardar o texto em cada linha
+# da tabela 'empresas', cada valor distinto é guardado uma única vez numa tabela de catálogo,
+# e a empresa guarda apenas o ID (um inteiro) dessa entrada ('cidade_id' e 'ramo_atuacao_id').
+# Os valores são comparados pela 'chave': o texto sem acentos, sem distinção de maiúsculas e com os espaços
+# normalizados ('catalogo_service.chave'). Assim, "Feira de Santana" e "feira de santana" são a mesma cidade.
+# As entradas nunca são alteradas nem apagadas, por isso o ID de um valor é sempre o mesmo.
+class EntradaCatalogo:
+    # A chave primária, guardada nas empresas.
+    id = Column(Integer, primary_key=True)
+
+    # O nome apresentado nas respostas da API: a grafia com que o valor foi registado pela primeira vez.
+    nome = Column(String, nullable=False)
+
+    # A chave de comparação. 'unique=True' garante uma única entrada por valor, mesmo com escritas em simultâneo.
+    chave = Column(String, unique=True, index=True, nullable=False)
+
+
+# --- Definição do Modelo 'Cidade' ---
+# Esta classe representa a tabela 'cidades'.
+class Cidade(EntradaCatalogo, Base):
+    __tablename__ = "cidades"
+
+
+# --- Definição do Modelo 'RamoAtuacao' ---
+# Esta classe representa a tabela 'ramos_atuacao'.
+class RamoAtuacao(EntradaCatalogo, Base):
+    __tablename__ = "ramos_atuacao"
@@ -1,11 +1,15 @@
 # Importa as ferramentas necessárias do SQLAlchemy para definir os tipos de dados das colunas
 # e para usar funções do servidor da base de dados (como a data e hora atuais).
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Index, DDL, Sequence, event, select
+from sqlalchemy.orm import column_property
 from sqlalchemy.sql import func
+from datetime import datetime, timezone
 
 # Importa a classe 'Base' do nosso módulo de configuração da base de dados.
 # Todas as nossas classes de modelo devem herdar desta classe Base.
 from ..db.database import Base
+# Importa os catálogos das cidades e dos ramos de atuação, referenciados por cada empresa.
+from .catalogo import Cidade, RamoAtuacao
 
 
 # --- Definição do Modelo 'Empresa' ---
@@ -25,9 +29,9 @@ class Empresa(Base):
 
     # A coluna 'nome' irá guardar o nome da empresa.
     # - String: O tipo de dado é texto.
-    # - index=True: Cria um índice para acelerar as pesquisas por nome.
     # - nullable=False: Este campo não pode ser nulo; é obrigatório.
-    nome = Column(String, index=True, nullable=False)
+    # O índice desta coluna é o composto (nome, id), definido em '__table_args__'.
+    nome = Column(String, nullable=False)
 
     # A coluna 'cnpj' irá guardar o CNPJ da empresa.
     # - String: O tipo de dado é texto.
@@ -36,11 +40,31 @@ class Empresa(Base):
     # - nullable=False: Este campo é obrigatório.
     cnpj = Column(String, unique=True, index=True, nullable=False)
 
-    # A coluna 'cidade' irá guardar a cidade da empresa.
-    cidade = Column(String, index=True, nullable=False)
+    # A coluna 'cidade_id' guarda o ID da cidade da empresa, na tabela 'cidades' (ver 'models/catalogo.py').
+    # O filtro por cidade é uma igualdade sobre este inteiro, servida pelo índice composto (cidade_id, id)
+    # definido em '__table_args__'.
+    cidade_id = Column(Integer, ForeignKey("cidades.id"), nullable=False)
 
-    # A coluna 'ramo_atuacao' irá guardar o ramo de atuação da empresa.
-    ramo_atuacao = Column(String, index=True, nullable=False)
+    # A coluna 'cidade_nome' repete o nome da cidade do catálogo, apenas para a ordenação por cidade:
+    # o índice composto (cidade_nome, id), definido em '__table_args__', serve a paginação por chave, como nos
+    # outros campos de ordenação. Como as entradas do catálogo nunca são alteradas, a cópia nunca fica desatualizada.
+    # É preenchida juntamente com o 'cidade_id', na escrita ('catalogo_service.para_colunas').
+    cidade_nome = Column(String, nullable=False)
+
+    # A coluna 'ramo_atuacao_id' guarda o ID do ramo de atuação, na tabela 'ramos_atuacao'.
+    ramo_atuacao_id = Column(Integer, ForeignKey("ramos_atuacao.id"), nullable=False)
+
+    # --- Nomes da Cidade e do Ramo de Atuação ---
+    # 'cidade' e 'ramo_atuacao' continuam a ser atributos da empresa, só de leitura: cada um é uma subconsulta
+    # ao catálogo pelo ID (chave primária). Por isso, as consultas e as instruções com RETURNING que os pedem
+    # devolvem o nome, e as respostas da API mantêm o mesmo formato.
+    # Para gravar, usa-se o ID ('catalogo_service.para_colunas' converte os nomes nos IDs).
+    cidade = column_property(
+        select(Cidade.nome).where(Cidade.id == cidade_id).correlate_except(Cidade).scalar_subquery()
+    )
+    ramo_atuacao = column_property(
+        select(RamoAtuacao.nome).where(RamoAtuacao.id == ramo_atuacao_id).correlate_except(RamoAtuacao).scalar_subquery()
+    )
 
     # A coluna 'telefone' irá guardar o telefone de contacto da empresa.
     telefone = Column(String, nullable=False)
@@ -54,4 +78,73 @@ class Empresa(Base):
     # - server_default=func.now(): Define o valor padrão no lado da base de dados.
     #   Sempre que uma nova empresa for criada, a base de dados irá preencher este campo
     #   automaticamente com a data e hora atuais.
-    data_cadastro = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    # - default: Quando a empresa é criada pela aplicação, a data é preenchida já no Python,
+    #   com microssegundos. Assim, o valor guardado tem sempre o mesmo formato do valor que
+    #   a aplicação envia nas comparações do cursor de paginação (o SQLite guarda datas como texto,
+    #   e o 'now()' do servidor não inclui microssegundos).
+    data_cadastro = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
+
+    # A coluna 'data_atualizacao' irá guardar a data e hora da última alteração da empresa.
+    # - onupdate: Em cada atualização, a data é preenchida de novo no Python.
+    data_atualizacao = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+    )
+
+    # A coluna 'versao' identifica a versão de cada linha e serve de base às ETags da API.
+    # Em cada criação ou atualização, recebe o próximo valor de um contador global e crescente
+    # ('proxima_versao' em 'services/empresa_service.py'), por isso:
+    # - a versão de uma empresa muda sempre que ela é alterada (ETag do detalhe);
+    # - a maior versão da tabela muda a cada escrita (ETag da listagem);
+    # - a versão é também a sequência de alterações da sincronização incremental ('GET /empresas/changes'),
+    #   juntamente com as versões das exclusões (tabela 'empresas_removidas').
+    # - index=True: o maior valor (max) e as alterações posteriores a uma versão são lidos diretamente do índice.
+    versao = Column(BigInteger, nullable=False, index=True)
+
+    # --- Índices Compostos para a Paginação ---
+    # A listagem é paginada por chave (coluna de ordenação, id). Cada campo da lista branca
+    # de ordenação tem um índice composto com o id, para que a base de dados percorra
+    # o índice diretamente a partir da posição do cursor, sem OFFSET.
+    # Estes índices também servem as pesquisas que antes usavam os índices simples.
+    # A ordenação por cidade usa a cópia do nome do catálogo ('cidade_nome').
+    __table_args__ = (
+        Index("ix_empresas_nome_id", "nome", "id"),
+        Index("ix_empresas_data_cadastro_id", "data_cadastro", "id"),
+        Index("ix_empresas_cidade_nome_id", "cidade_nome", "id"),
+
+        # --- Índices dos Filtros por Cidade e por Ramo de Atuação ---
+        # Um filtro com o valor exato é uma igualdade sobre o ID do catálogo: o índice (ID, id) devolve
+        # as empresas dessa cidade (ou ramo) já pela ordem do ID, a ordem padrão da listagem.
+        Index("ix_empresas_cidade_id_id", "cidade_id", "id"),
+        Index("ix_empresas_ramo_atuacao_id_id", "ramo_atuacao_id", "id"),
+
+        # --- Índices de Trigramas para a Pesquisa Textual ---
+        # Um índice B-tree não serve pesquisas do tipo 'ILIKE %termo%'. Em PostgreSQL,
+        # os índices GIN com 'gin_trgm_ops' (extensão pg_trgm) servem essas pesquisas
+        # e a ordenação por semelhança. Só são criados em PostgreSQL ('ddl_if');
+        # nas outras bases de dados, a pesquisa usa o índice em memória do 'search_service'.
+        # A pesquisa por parte da cidade ou do ramo de atuação é feita nos catálogos (tabelas pequenas),
+        # por isso só o nome precisa deste índice.
+        Index("ix_empresas_nome_trgm", "nome", postgresql_using="gin",
+              postgresql_ops={"nome": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
+
+
+# --- Sequência das Versões ---
+# Em PostgreSQL, as versões vêm de uma sequência, que é segura com escritas em simultâneo
+# (e que as escritas só usam com o bloqueio de 'bloquear_versoes', para confirmar as versões por ordem).
+# Nas bases de dados sem sequências (como o SQLite), o 'create_all' ignora-a e a versão é calculada a partir do máximo atual
+# (das empresas e das exclusões).
+versao_seq = Sequence("empresas_versao_seq", metadata=Base.metadata)
+
+
+# --- Extensão pg_trgm ---
+# Os índices de trigramas precisam da extensão 'pg_trgm'. Ela é ativada antes da criação
+# da tabela, para que o 'create_all' crie o esquema completo de uma só vez.
+event.listen(
+    Empresa.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
@@ -0,0 +1,27 @@
+# Importa as ferramentas necessárias do SQLAlchemy para definir as colunas da tabela.
+from sqlalchemy import Column, Integer, BigInteger, DateTime
+from datetime import datetime, timezone
+
+# Importa a classe 'Base' do nosso módulo de configuração da base de dados.
+from ..db.database import Base
+
+
+# --- Definição do Modelo 'EmpresaRemovida' ---
+# Esta classe representa a tabela 'empresas_removidas': o registo ("tombstone") de cada empresa excluída.
+# A sincronização incremental ('GET /empresas/changes') usa-a para indicar aos clientes as empresas
+# que devem apagar, já que a linha da empresa deixa de existir na tabela 'empresas'.
+class EmpresaRemovida(Base):
+    __tablename__ = "empresas_removidas"
+
+    # --- Definição das Colunas da Tabela ---
+
+    # A versão da exclusão, tirada do mesmo contador das versões das empresas ('Empresa.versao').
+    # É a chave primária: o mesmo ID pode ser excluído mais do que uma vez (o SQLite pode reutilizar o ID
+    # mais alto depois de ele ser excluído).
+    versao = Column(BigInteger, primary_key=True)
+
+    # O ID da empresa excluída.
+    empresa_id = Column(Integer, nullable=False)
+
+    # A data e hora da exclusão.
+    data_remocao = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,23 @@
+# Importa as ferramentas necessárias do SQLAlchemy para definir as colunas da tabela.
+from sqlalchemy import Column, Integer, String
+
+# Importa a classe 'Base' do nosso módulo de configuração da base de dados.
+from ..db.database import Base
+
+
+# --- Definição do Modelo 'ContagemFaceta' ---
+# Esta classe representa a tabela 'facetas_empresas', com o número de empresas por cidade e por ramo de atuação.
+# Os contadores são atualizados na mesma transação de cada escrita de empresas ('services/faceta_service.py'),
+# por isso a contagem é lida diretamente desta tabela, sem agrupar (GROUP BY) a tabela de empresas.
+# A linha com o campo "total" (e o valor vazio) guarda o número total de empresas.
+class ContagemFaceta(Base):
+    __tablename__ = "facetas_empresas"
+
+    # --- Definição das Colunas da Tabela ---
+
+    # O campo da faceta ("cidade", "ramo_atuacao" ou "total") e o valor contado formam a chave primária.
+    campo = Column(String, primary_key=True)
+    valor = Column(String, primary_key=True)
+
+    # O número de empresas com esse valor. Um valor sem empresas fica com 0 até à próxima reconstrução.
+    total = Column(Integer, nullable=False, default=0)
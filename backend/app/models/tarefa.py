@@ -0,0 +1,74 @@
+# Importa as ferramentas necessárias do SQLAlchemy para definir as colunas da tabela.
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Boolean, DateTime, JSON, Index
+from datetime import datetime, timezone
+
+# Importa a classe 'Base' do nosso módulo de configuração da base de dados.
+from ..db.database import Base
+
+
+# --- Definição do Modelo 'Tarefa' ---
+# Esta classe representa a tabela 'tarefas': as operações longas (importações, exportações e reconstrução
+# das facetas) executadas em segundo plano pelos workers de 'services/tarefa_service.py'.
+# O estado de cada tarefa fica guardado na base de dados, por isso sobrevive a um reinício da aplicação:
+# as tarefas interrompidas são retomadas a partir do último ponto guardado ('ponto_retoma').
+class Tarefa(Base):
+    __tablename__ = "tarefas"
+
+    # --- Definição das Colunas da Tabela ---
+
+    # A chave primária, devolvida por 'POST /jobs' e usada para acompanhar a tarefa.
+    id = Column(Integer, primary_key=True)
+
+    # O tipo da tarefa ("importacao", "exportacao" ou "facetas") e os respetivos parâmetros
+    # (formato, filtros, ficheiro recebido...).
+    tipo = Column(String, nullable=False)
+    parametros = Column(JSON, nullable=False, default=dict)
+
+    # O estado: "pendente", "em_execucao", "concluida", "falhada" ou "cancelada".
+    estado = Column(String, nullable=False, default="pendente")
+
+    # As tarefas pendentes com maior prioridade são executadas primeiro (e, entre elas, as mais antigas).
+    prioridade = Column(Integer, nullable=False, default=0)
+
+    # O administrador que criou a tarefa.
+    administrador = Column(String, nullable=True)
+
+    # --- Progresso ---
+    # Unidades já processadas (linhas do ficheiro ou empresas exportadas) e o total, quando é conhecido.
+    processados = Column(BigInteger, nullable=False, default=0)
+    total = Column(BigInteger, nullable=True)
+    # Unidades já processadas quando a execução atual começou (para calcular o ritmo da execução atual,
+    # depois de uma retoma).
+    processados_inicio = Column(BigInteger, nullable=False, default=0)
+
+    # O ponto a partir do qual a tarefa é retomada (por exemplo, o último ID exportado e o tamanho do ficheiro).
+    # É gravado na mesma transação do trabalho correspondente, sempre que possível.
+    ponto_retoma = Column(JSON, nullable=True)
+
+    # O resumo do resultado (por exemplo, o número de empresas inseridas), o ficheiro produzido
+    # (na pasta 'JOBS_DIR') e a mensagem de erro, se a tarefa falhar.
+    resultado = Column(JSON, nullable=True)
+    ficheiro = Column(String, nullable=True)
+    erro = Column(Text, nullable=True)
+
+    # Pedido de cancelamento de uma tarefa em execução: o worker verifica-o em cada ponto de progresso.
+    cancelar = Column(Boolean, nullable=False, default=False)
+
+    # --- Execução ---
+    # O processo que está a executar a tarefa ("máquina:pid") e o número de execuções (mais de uma após retomas).
+    trabalhador = Column(String, nullable=True)
+    tentativas = Column(Integer, nullable=False, default=0)
+
+    # As datas de criação, de início da execução atual, de fim e do último sinal de vida do worker.
+    # Uma tarefa "em_execucao" sem sinal de vida recente (ou cujo processo já terminou) volta a ficar pendente.
+    data_criacao = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    data_inicio = Column(DateTime(timezone=True), nullable=True)
+    data_fim = Column(DateTime(timezone=True), nullable=True)
+    data_sinal = Column(DateTime(timezone=True), nullable=True)
+
+    # --- Índices ---
+    # Os workers procuram a próxima tarefa pendente (pela prioridade e pelo ID) com este índice, sem percorrer
+    # as tarefas já terminadas, que são a maioria da tabela.
+    __table_args__ = (
+        Index("ix_tarefas_estado_prioridade_id", "estado", "prioridade", "id"),
+    )
@@ -2,13 +2,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 # Classe especial do FastAPI para receber dados de formulário de login (username e password).
 from fastapi.security import OAuth2PasswordRequestForm
-# Ferramenta do SQLAlchemy para gerir a sessão com a base de dados.
-from sqlalchemy.orm import Session
 
-# Importa a nossa função 'get_db' para obter uma sessão da base de dados.
-from ..db.database import get_db
-# Importa o modelo 'Administrador' para interagir com a tabela de administradores.
-from ..models.administrador import Administrador
+# Importa a nossa função 'get_db' para obter uma sessão da base de dados
+# e a função 'executar', que corre as operações no modo assíncrono ou síncrono.
+from ..db.database import get_db, executar
 # Importa os schemas Pydantic para validar os dados de entrada e formatar os de saída.
 from ..schemas.administrador import AdminCreate, AdminResponse
 from ..schemas.token import Token
@@ -25,29 +22,36 @@ router = APIRouter(
 )
 
 
+# --- Operações de Senha ---
+# O bcrypt é lento de propósito, por isso corre no pool de processos das senhas e não no event loop.
+# Se o pool estiver sobrecarregado, o pedido é rejeitado de imediato com um erro HTTP 503.
+async def operacao_senha(funcao, *args):
+    try:
+        return await auth_service.pool_senhas.executar(funcao, *args)
+    except auth_service.PoolSenhasOcupado as erro:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(erro),
+            headers={"Retry-After": "1"},
+        )
+
+
 # --- Endpoint de Registo ---
 # Define uma rota para registar um novo administrador.
 @router.post("/register", response_model=AdminResponse, status_code=status.HTTP_201_CREATED, summary="Regista um novo administrador")
-def register_admin(admin: AdminCreate, db: Session = Depends(get_db)):
+async def register_admin(admin: AdminCreate, db=Depends(get_db)):
     # Procura na base de dados por um administrador com o mesmo username.
-    db_admin = db.query(Administrador).filter(Administrador.username == admin.username).first()
+    db_admin = await executar(db, auth_service.buscar_admin, admin.username)
     
     # Se um administrador com esse username já existir, lança um erro HTTP 400.
     if db_admin:
         raise HTTPException(status_code=400, detail="Username já registado.")
     
     # Se o username estiver disponível, cria um hash seguro da senha.
-    hashed_password = auth_service.get_password_hash(admin.password)
+    hashed_password = await operacao_senha(auth_service.get_password_hash, admin.password)
     
-    # Cria um novo objeto 'Administrador' com o username e a senha encriptada.
-    new_admin = Administrador(username=admin.username, hashed_password=hashed_password)
-    
-    # Adiciona o novo administrador à sessão da base de dados.
-    db.add(new_admin)
-    # Confirma (faz o "commit") da transação, guardando o novo utilizador permanentemente.
-    db.commit()
-    # Atualiza o objeto 'new_admin' com os dados que a base de dados gerou (como o ID).
-    db.refresh(new_admin)
+    # Guarda o novo administrador com a senha encriptada.
+    new_admin = await executar(db, auth_service.criar_admin, admin.username, hashed_password)
     
     # Retorna os dados do novo administrador (sem a senha).
     return new_admin
@@ -56,13 +60,20 @@ def register_admin(admin: AdminCreate, db: Session = Depends(get_db)):
 # --- Endpoint de Login ---
 # Define uma rota para o login, que irá devolver um token JWT.
 @router.post("/login", response_model=Token, summary="Realiza o login e retorna um token JWT")
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_db)):
     # Procura na base de dados pelo administrador com o username fornecido no formulário.
-    admin = db.query(Administrador).filter(Administrador.username == form_data.username).first()
+    admin = await executar(db, auth_service.buscar_admin, form_data.username)
     
+    # Verifica a senha fornecida. A função 'verificar_e_atualizar' compara a senha em texto simples
+    # com o hash guardado na base de dados e, se o hash estiver desatualizado, devolve um novo hash.
+    senha_correta, novo_hash = False, None
+    if admin:
+        senha_correta, novo_hash = await operacao_senha(
+            auth_service.verificar_e_atualizar, form_data.password, admin.hashed_password
+        )
+
     # Verifica se o administrador não existe OU se a senha fornecida está incorreta.
-    # A função 'verify_password' compara a senha em texto simples com o hash guardado na base de dados.
-    if not admin or not auth_service.verify_password(form_data.password, admin.hashed_password):
+    if not senha_correta:
         # Se a autenticação falhar, lança um erro HTTP 401.
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -70,6 +81,10 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
             headers={"WWW-Authenticate": "Bearer"}, # Cabeçalho padrão para erros de autenticação.
         )
     
+    # Se o hash guardado estava desatualizado, substitui-o pelo novo (de forma transparente para o utilizador).
+    if novo_hash:
+        await executar(db, auth_service.atualizar_hash, admin, novo_hash)
+
     # Se a autenticação for bem-sucedida, cria um novo token de acesso JWT.
     # O "sub" (subject) do token é o username, que identifica o utilizador.
     access_token = auth_service.create_access_token(
@@ -0,0 +1,73 @@
+# Esse arquivo contém as rotas de diagnóstico da API, reservadas a administradores autenticados.
+
+# Ferramentas do FastAPI para criar rotas, gerir dependências e parâmetros de query.
+from fastapi import APIRouter, Depends, Query, status
+
+# Importa a configuração dos pools de conexões e as respetivas estatísticas.
+from ..db import database
+# Importa o registo das consultas lentas.
+from ..services import consultas_lentas_service
+# Importa a nossa dependência 'get_current_admin' para proteger as rotas.
+from ..deps import get_current_admin
+
+# --- Configuração do Roteador ---
+router = APIRouter(
+    prefix="/diagnostico",  # Todos os endpoints neste ficheiro começarão com '/diagnostico'.
+    tags=["Diagnóstico"],  # Agrupa estes endpoints sob a etiqueta "Diagnóstico" na documentação /docs.
+    dependencies=[Depends(get_current_admin)]  # Apenas administradores autenticados.
+)
+
+
+# --- Endpoint do Estado dos Pools de Conexões ---
+@router.get("/pool", summary="Estado e tempos de checkout dos pools de conexões")
+async def get_pool():
+    """
+    Devolve a configuração dos pools e, para cada engine (principal e, se configurada, réplica de leitura):
+    as conexões em uso, livres e em overflow, a **saturacao** (fração das conexões possíveis em uso),
+    os pedidos **a_espera** de uma conexão, os que desistiram por esgotar o tempo (**esgotados**)
+    e os tempos de checkout (médio, máximo e percentis dos últimos checkouts, em milissegundos).
+    """
+    return {
+        "configuracao": {
+            "pool_size": database.DB_POOL_SIZE,
+            "max_overflow": database.DB_MAX_OVERFLOW,
+            "pool_timeout": database.DB_POOL_TIMEOUT,
+            "pool_recycle": database.DB_POOL_RECYCLE,
+            "pool_pre_ping": database.DB_POOL_PRE_PING,
+            "replica_leitura": database.DATABASE_READ_URL is not None,
+        },
+        "pools": [estatisticas.resumo() for estatisticas in database.estatisticas_pools.values()],
+    }
+
+
+# --- Endpoints das Consultas Lentas ---
+@router.get("/consultas-lentas", summary="Consultas lentas à base de dados e os respetivos planos")
+async def get_consultas_lentas(
+    top: int = Query(10, ge=1, le=100, description="Número de consultas no ranking por tempo total"),
+    limit: int = Query(50, ge=0, le=1000, description="Número de consultas lentas recentes"),
+):
+    """
+    Devolve as consultas que demoraram mais do que **SLOW_QUERY_MS**, registadas por este worker:
+    - **top**: as consultas (agrupadas pelo SQL normalizado) com maior tempo total, com o número de ocorrências,
+      os tempos médio e máximo e o último plano de execução capturado;
+    - **recentes**: as últimas consultas lentas (da mais recente para a mais antiga), com a forma dos parâmetros
+      (tipos e tamanhos, sem os valores), a duração e o plano, se tiver sido capturado.
+
+    Os planos ('EXPLAIN (ANALYZE, BUFFERS)') só são capturados em PostgreSQL, para consultas SELECT.
+    """
+    return {
+        "configuracao": {
+            "limiar_ms": consultas_lentas_service.SLOW_QUERY_MS,
+            "explain": consultas_lentas_service.SLOW_QUERY_EXPLAIN,
+            "intervalo_explain": consultas_lentas_service.SLOW_QUERY_EXPLAIN_INTERVAL,
+        },
+        **consultas_lentas_service.registo.resumo(top, limit),
+    }
+
+
+@router.delete("/consultas-lentas", status_code=status.HTTP_204_NO_CONTENT, summary="Limpa o registo das consultas lentas")
+async def delete_consultas_lentas():
+    """
+    Descarta as consultas lentas registadas (por exemplo, antes de medir o efeito de uma alteração).
+    """
+    consultas_lentas_service.registo.limpar()
@@ -1,18 +1,33 @@
 # Esse arquivo e o CRUD para o modelo da empresa.
 
 # Ferramentas do FastAPI para criar rotas, gerir dependências, exceções e parâmetros de query.
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-# Ferramenta do SQLAlchemy para gerir a sessão com a base de dados.
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Request, Response
+# Resposta enviada aos poucos, à medida que o conteúdo é gerado.
+from fastapi.responses import StreamingResponse
+# Codificador JSON rápido, usado nas respostas que não passam por 'serializacao_service'.
+import orjson
 # Tipos de dados do Python para anotações de tipo (type hints).
 from typing import List, Optional
+import asyncio
+import os
 
-# Importa a nossa função 'get_db' para obter uma sessão da base de dados.
-from ..db.database import get_db
-# Importa o modelo 'Empresa' para interagir com a tabela de empresas.
-from ..models.empresa import Empresa
+# Importa a nossa função 'get_db' para obter uma sessão da base de dados, a função 'get_read_db'
+# (usada pelas rotas que só leem, que podem usar a réplica de leitura), a função 'sessao' (uma sessão
+# de curta duração, para o stream) e a função 'executar', que corre as operações no modo assíncrono ou síncrono.
+from ..db.database import get_db, get_read_db, executar, sessao
 # Importa os schemas Pydantic para validar os dados de entrada e formatar os de saída.
-from ..schemas.empresa import EmpresaCreate, EmpresaResponse, EmpresaUpdate
+from ..schemas.empresa import (
+    EmpresaCreate, EmpresaResponse, EmpresaUpdate, CampoOrdenacao, DirecaoOrdenacao, ModoContagem,
+    FormatoImportacao, ImportacaoResultado, FormatoExportacao, FacetasResposta, PedidoLote, EmpresasLote,
+    AlteracoesResposta,
+)
+# Importa as operações sobre a base de dados das empresas, a importação e exportação em lote,
+# a cache de resultados das consultas, as ETags (pedidos condicionais), as facetas, a contagem dos resultados,
+# a serialização rápida das respostas e a difusão das alterações em tempo real.
+from ..services import (
+    cache_service, contagem_service, empresa_service, etag_service, eventos_service, export_service, faceta_service,
+    import_service, serializacao_service,
+)
 # Importa a nossa dependência 'get_current_admin' para proteger as rotas.
 from ..deps import get_current_admin
 
@@ -25,122 +40,489 @@ router = APIRouter(
 )
 
 
+# --- Serialização das Respostas ---
+# As rotas devolvem diretamente os bytes JSON gerados por 'serializacao_service', sem validar cada empresa
+# com o 'response_model' (que continua declarado, para a documentação). As consultas guardam na cache
+# a resposta já serializada, para que um acerto na cache devolva os bytes sem serializar de novo.
+def resposta_json(corpo, status_code=status.HTTP_200_OK, cabecalhos=None, tipo=serializacao_service.TIPO_JSON):
+    """
+    Devolve uma resposta com o corpo já serializado (JSON, ou outro formato negociado na listagem).
+    """
+    return Response(content=corpo, status_code=status_code, media_type=tipo, headers=cabecalhos)
+
+
+# --- Pedidos Condicionais ---
+def nao_modificado(etag, cabecalhos=None):
+    """
+    Resposta 304 Not Modified: o cliente já tem a versão atual, por isso o corpo não é enviado (nem serializado).
+    """
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={**(cabecalhos or {}), "ETag": etag})
+
+
+# --- Depois de Cada Escrita ---
+async def registar_escrita(tipo, versao=None, dados=None):
+    """
+    Chamada pelas rotas de escrita depois de a alteração ser confirmada: invalida as consultas em cache
+    e publica o evento da alteração para os clientes ligados a 'GET /empresas/stream'.
+    """
+    await cache_service.cache.invalidar()
+    await eventos_service.publicar(tipo, versao, dados)
+
+
+def versoes_pedidas(if_match, empresa_id):
+    """
+    Converte o cabeçalho 'If-Match' nas versões aceites pela escrita (None se não houver restrição).
+    """
+    if if_match is None:
+        return None
+    return etag_service.versoes_if_match(if_match, empresa_id)
+
+
 # --- Endpoint de Criação de Empresa ---
 @router.post("/", response_model=EmpresaResponse, status_code=status.HTTP_201_CREATED, summary="Regista uma nova empresa")
-def create_empresa(empresa: EmpresaCreate, db: Session = Depends(get_db)):
+async def create_empresa(empresa: EmpresaCreate, db=Depends(get_db)):
     """
     Regista uma nova empresa cliente na plataforma.
     - **cnpj**: Deve ser único.
     - **email_contato**: Deve ser único.
     """
-    # Verifica se já existe uma empresa com o mesmo CNPJ para evitar duplicados.
-    db_empresa_cnpj = db.query(Empresa).filter(Empresa.cnpj == empresa.cnpj).first()
-    if db_empresa_cnpj:
-        raise HTTPException(status_code=400, detail="CNPJ já registado.")
-        
-    # Verifica se já existe uma empresa com o mesmo email para evitar duplicados.
-    db_empresa_email = db.query(Empresa).filter(Empresa.email_contato == empresa.email_contato).first()
-    if db_empresa_email:
-        raise HTTPException(status_code=400, detail="Email de contacto já registado.")
-
-    # Cria uma nova instância do modelo 'Empresa' com os dados validados pelo schema.
-    new_empresa = Empresa(**empresa.dict())
-    # Adiciona o novo objeto à sessão da base de dados.
-    db.add(new_empresa)
-    # Confirma (faz o "commit") da transação, guardando a nova empresa.
-    db.commit()
-    # Atualiza o objeto 'new_empresa' com os dados gerados pela base de dados (ID, data_cadastro).
-    db.refresh(new_empresa)
-    # Retorna os dados da empresa recém-criada.
-    return new_empresa
+    # Cria a empresa com os dados validados pelo schema.
+    new_empresa = await executar(db, empresa_service.criar_empresa, empresa.dict())
+    # Invalida as consultas em cache, que já não incluem a nova empresa, e avisa os clientes ligados ao stream.
+    await registar_escrita("criada", new_empresa.versao, serializacao_service.para_dicionario(new_empresa))
+    # Retorna os dados da empresa recém-criada, com a ETag da versão criada
+    # (que o cliente pode usar em 'If-Match' ou 'If-None-Match').
+    return resposta_json(
+        serializacao_service.codificar(new_empresa),
+        status.HTTP_201_CREATED,
+        {"ETag": etag_service.etag_empresa(new_empresa.id, new_empresa.versao)},
+    )
+
+
+# --- Endpoint de Importação em Lote ---
+# Tipos de conteúdo aceites no corpo do pedido e o formato correspondente.
+TIPOS_IMPORTACAO = {
+    "text/csv": FormatoImportacao.csv,
+    "application/x-ndjson": FormatoImportacao.ndjson,
+    "application/ndjson": FormatoImportacao.ndjson,
+    "application/jsonl": FormatoImportacao.ndjson,
+}
+
+
+@router.post(
+    "/import",
+    response_model=ImportacaoResultado,
+    summary="Importa empresas em lote (CSV ou NDJSON)",
+    # O corpo é lido diretamente do pedido (em streaming), por isso é descrito manualmente na documentação.
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "text/csv": {"schema": {"type": "string", "format": "binary"}},
+                "application/x-ndjson": {"schema": {"type": "string", "format": "binary"}},
+            },
+        }
+    },
+)
+async def import_empresas(
+    request: Request,
+    formato: Optional[FormatoImportacao] = Query(None, description="Formato do ficheiro (por omissão, deduzido do Content-Type)"),
+    db=Depends(get_db)
+):
+    """
+    Importa empresas em lote a partir de um ficheiro enviado no corpo do pedido.
+    - **CSV**: a primeira linha é o cabeçalho com os nomes dos campos (nome, cnpj, cidade, ramo_atuacao, telefone, email_contato).
+    - **NDJSON**: um objeto JSON por linha, com os mesmos campos.
+
+    O ficheiro é lido à medida que chega e processado em blocos, cada um numa única transação.
+    As linhas inválidas ou duplicadas são ignoradas e descritas no relatório de erros.
+    """
+    # Determina o formato do ficheiro a partir do parâmetro ou do cabeçalho 'Content-Type'.
+    if formato is None:
+        tipo = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        formato = TIPOS_IMPORTACAO.get(tipo)
+        if formato is None:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Envie um ficheiro CSV (text/csv) ou NDJSON (application/x-ndjson).",
+            )
+
+    # Lê o corpo do pedido linha a linha, sem o carregar inteiro em memória.
+    linhas = import_service.ler_linhas(request.stream())
+    if formato == FormatoImportacao.csv:
+        registos = import_service.ler_registos_csv(linhas)
+    else:
+        registos = import_service.ler_registos_ndjson(linhas)
+
+    # CNPJs e emails já vistos no ficheiro, para detetar duplicados entre blocos.
+    vistos = {campo: set() for campo in import_service.CAMPOS_UNICOS}
+    total_linhas, inseridas, erros = 0, 0, []
+
+    # Processa o ficheiro bloco a bloco.
+    async for bloco in import_service.ler_blocos(registos):
+        total_linhas += len(bloco)
+        inseridas_bloco, erros_bloco = await executar(db, import_service.importar_lote, bloco, vistos)
+        inseridas += inseridas_bloco
+        erros.extend(erros_bloco)
+        # Invalida as consultas em cache após cada bloco inserido (cada bloco fica visível ao ser confirmado).
+        # Os clientes do stream recebem um único evento por bloco e obtêm as novas empresas em 'GET /empresas/changes'.
+        if inseridas_bloco:
+            await registar_escrita("importacao", dados={"inseridas": inseridas_bloco})
+
+    return {
+        "total_linhas": total_linhas,
+        "inseridas": inseridas,
+        "rejeitadas": total_linhas - inseridas,
+        "erros": sorted(erros, key=lambda erro: erro["linha"]),
+    }
 
 
 # --- Endpoint de Listagem de Empresas (com Filtros) ---
+async def contar_resultados(db, filtros, modo, total_tabela):
+    """
+    Devolve (total, modo usado) para os cabeçalhos 'X-Total-Count' e 'X-Total-Count-Mode'.
+    Sem filtros, o total é o da tabela (o contador, já lido para a ETag). Com filtros, a contagem é guardada
+    na cache de consultas, sem os parâmetros da paginação: as páginas seguintes da mesma pesquisa reutilizam-na.
+    """
+    if not any(filtros.values()):
+        return total_tabela, contagem_service.MODO_EXATA
+    chave = await cache_service.cache.chave("contagem", {**filtros, "modo": modo})
+    em_cache = await cache_service.cache.obter(chave)
+    if em_cache is not None:
+        return tuple(orjson.loads(em_cache[0]))
+    total, modo_usado = await executar(db, contagem_service.contar_empresas, filtros, modo)
+    await cache_service.cache.guardar(chave, orjson.dumps([total, modo_usado]))
+    return total, modo_usado
+
+
 @router.get("/", response_model=List[EmpresaResponse], summary="Lista todas as empresas com filtros")
-def get_empresas(
+async def get_empresas(
+    cidade: Optional[str] = Query(None, description="Filtra empresas por cidade"),
+    ramo_atuacao: Optional[str] = Query(None, description="Filtra empresas por ramo de atuação"),
+    nome: Optional[str] = Query(None, description="Busca textual pelo nome da empresa"),
+    limit: int = Query(100, ge=1, le=1000, description="Número máximo de empresas por página"),
+    cursor: Optional[str] = Query(None, description="Cursor devolvido no cabeçalho 'X-Next-Cursor' da página anterior"),
+    ordenar_por: Optional[CampoOrdenacao] = Query(None, description="Campo de ordenação (por omissão, a relevância quando há pesquisa e o ID caso contrário)"),
+    direcao: DirecaoOrdenacao = Query(DirecaoOrdenacao.asc, description="Direção da ordenação"),
+    contagem: ModoContagem = Query(ModoContagem.exata, description="Cálculo do total de resultados (cabeçalho X-Total-Count)"),
+    if_none_match: Optional[str] = Header(None, description="ETag de uma resposta anterior (devolve 304 se nada mudou)"),
+    accept: Optional[str] = Header(None, description="Formato da resposta: JSON (padrão), MessagePack ou em colunas"),
+    db=Depends(get_read_db)
+):
+    """
+    Lista as empresas registadas com opções de filtro, busca e ordenação.
+    Quando há termos de pesquisa e nenhuma ordenação é pedida, os resultados são ordenados por relevância.
+    A listagem é paginada por cursor: quando existem mais resultados, o cabeçalho
+    **X-Next-Cursor** traz o valor a enviar no parâmetro **cursor** para obter a página seguinte.
+    A resposta inclui uma **ETag**: enviada em **If-None-Match**, devolve 304 (sem corpo) se nada mudou.
+
+    O cabeçalho **X-Total-Count** traz o total de resultados e **X-Total-Count-Mode** o modo usado
+    (**contagem**): `exata` (padrão; sem filtros, lida de um contador), `estimada` (estimativa do planeador
+    do PostgreSQL, para tabelas muito grandes; nas outras bases de dados, é exata) ou `nenhuma` (sem o cabeçalho).
+
+    O formato é escolhido pelo cabeçalho **Accept**: `application/json` (padrão), `application/msgpack`,
+    ou o formato em colunas para consumidores em lote (`application/vnd.empresas.colunas+json` ou `+msgpack`).
+    """
+    # O formato e o modo de contagem fazem parte dos parâmetros: cada combinação tem a sua entrada na cache
+    # e a sua ETag. Os valores por omissão ficam fora dos parâmetros, por isso essas ETags não mudam.
+    tipo = serializacao_service.negociar(accept)
+    filtros = {"nome": nome, "cidade": cidade, "ramo_atuacao": ramo_atuacao}
+    parametros = {
+        **filtros, "limit": limit,
+        "cursor": cursor, "ordenar_por": ordenar_por, "direcao": direcao,
+        "formato": tipo if tipo != serializacao_service.TIPO_JSON else None,
+        "contagem": contagem if contagem != ModoContagem.exata else None,
+    }
+    # Se a mesma consulta já foi feita desde a última escrita, devolve a resposta guardada em cache.
+    chave = await cache_service.cache.chave("lista", parametros)
+    em_cache = await cache_service.cache.obter(chave)
+    if em_cache is not None:
+        corpo, cabecalhos = em_cache
+        if etag_service.corresponde(if_none_match, cabecalhos["ETag"]):
+            return nao_modificado(cabecalhos["ETag"], cabecalhos)
+        return resposta_json(corpo, cabecalhos=cabecalhos, tipo=tipo)
+
+    # Calcula a ETag a partir do estado da tabela (última versão e contagem) e dos parâmetros.
+    # Se o cliente já tiver esta versão, a consulta da página nem chega a ser feita.
+    versao, total = await executar(db, empresa_service.estado_tabela)
+    etag = etag_service.etag_lista(versao, total, parametros)
+    if etag_service.corresponde(if_none_match, etag):
+        return nao_modificado(etag, {"Vary": "Accept"})
+
+    empresas, proximo_cursor = await executar(
+        db,
+        empresa_service.listar_empresas,
+        filtros,
+        ordenar_por.value if ordenar_por else None,
+        direcao == DirecaoOrdenacao.desc,
+        cursor,
+        limit,
+    )
+
+    # Se existir uma página seguinte, devolve o cursor que aponta para o último item desta página.
+    # 'Vary: Accept' indica aos proxies e aos navegadores que a resposta depende do formato pedido.
+    cabecalhos = {"ETag": etag, "Vary": "Accept"}
+    if proximo_cursor:
+        cabecalhos["X-Next-Cursor"] = proximo_cursor
+    if contagem != ModoContagem.nenhuma:
+        total_resultados, modo_usado = await contar_resultados(db, filtros, contagem.value, total)
+        cabecalhos["X-Total-Count"] = str(total_resultados)
+        cabecalhos["X-Total-Count-Mode"] = modo_usado
+
+    # Serializa a resposta uma única vez, no formato pedido, e guarda-a em cache.
+    # A compressão (gzip/brotli) é feita depois, pelo middleware, sobre estes bytes.
+    corpo = serializacao_service.FORMATOS[tipo](empresas)
+    await cache_service.cache.guardar(chave, corpo, cabecalhos)
+    return resposta_json(corpo, cabecalhos=cabecalhos, tipo=tipo)
+
+
+# --- Endpoint de Exportação de Empresas ---
+# Tipo de conteúdo de cada formato de exportação.
+TIPOS_EXPORTACAO = {
+    FormatoExportacao.csv: "text/csv; charset=utf-8",
+    FormatoExportacao.ndjson: "application/x-ndjson",
+}
+
+
+@router.get("/export", summary="Exporta as empresas em CSV ou NDJSON", response_class=StreamingResponse)
+async def export_empresas(
+    formato: FormatoExportacao = Query(FormatoExportacao.csv, description="Formato do ficheiro exportado"),
+    cidade: Optional[str] = Query(None, description="Filtra empresas por cidade"),
+    ramo_atuacao: Optional[str] = Query(None, description="Filtra empresas por ramo de atuação"),
+    nome: Optional[str] = Query(None, description="Busca textual pelo nome da empresa"),
+    db=Depends(get_read_db)
+):
+    """
+    Exporta todas as empresas (ou as que correspondem aos filtros, iguais aos da listagem), ordenadas pelo ID.
+    As linhas são lidas da base de dados e enviadas ao cliente à medida que chegam, sem carregar a tabela em memória.
+    """
+    consulta = await executar(
+        db, export_service.preparar_consulta, {"nome": nome, "cidade": cidade, "ramo_atuacao": ramo_atuacao}
+    )
+    return StreamingResponse(
+        export_service.exportar(consulta, formato.value),
+        media_type=TIPOS_EXPORTACAO[formato],
+        headers={"Content-Disposition": f'attachment; filename="empresas.{formato.value}"'},
+    )
+
+
+# --- Endpoint de Facetas ---
+@router.get("/facets", response_model=FacetasResposta, summary="Conta as empresas por cidade e por ramo de atuação")
+async def get_facetas(
     cidade: Optional[str] = Query(None, description="Filtra empresas por cidade"),
     ramo_atuacao: Optional[str] = Query(None, description="Filtra empresas por ramo de atuação"),
     nome: Optional[str] = Query(None, description="Busca textual pelo nome da empresa"),
-    db: Session = Depends(get_db)
+    db=Depends(get_read_db)
+):
+    """
+    Devolve o número de empresas por cidade e por ramo de atuação (os valores mais frequentes primeiro)
+    e o total de empresas. Com filtros (iguais aos da listagem), as contagens são as dos resultados da pesquisa.
+    """
+    # As facetas são guardadas em cache, como as outras consultas, até à próxima escrita.
+    chave = await cache_service.cache.chave("facetas", {"nome": nome, "cidade": cidade, "ramo_atuacao": ramo_atuacao})
+    em_cache = await cache_service.cache.obter(chave)
+    if em_cache is not None:
+        return resposta_json(em_cache[0])
+
+    facetas = await executar(
+        db, faceta_service.obter_facetas, {"nome": nome, "cidade": cidade, "ramo_atuacao": ramo_atuacao}
+    )
+    corpo = orjson.dumps(facetas)
+    await cache_service.cache.guardar(chave, corpo)
+    return resposta_json(corpo)
+
+
+# --- Endpoints de Consulta em Lote ---
+# Número máximo de IDs por pedido.
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", 500))
+
+
+async def responder_lote(db, ids):
+    """
+    Procura as empresas pedidas com uma única consulta e devolve a resposta já serializada.
+    """
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Pode pedir no máximo {BATCH_MAX_IDS} IDs de cada vez.")
+    empresas, nao_encontrados = await executar(db, empresa_service.obter_empresas, ids)
+    return resposta_json(serializacao_service.para_json({
+        "empresas": [serializacao_service.para_dicionario(empresa) for empresa in empresas],
+        "nao_encontrados": nao_encontrados,
+    }))
+
+
+@router.get("/batch", response_model=EmpresasLote, summary="Detalha várias empresas por ID")
+async def get_empresas_lote(
+    ids: List[str] = Query(..., description="IDs das empresas, separados por vírgulas (ex: ids=1,2,3) ou repetidos (ex: ids=1&ids=2)"),
+    db=Depends(get_read_db)
+):
+    """
+    Exibe os detalhes de várias empresas com um único pedido (e uma única consulta à base de dados).
+    As empresas são devolvidas pela ordem dos IDs pedidos; os IDs que não existem são indicados em **nao_encontrados**.
+    """
+    try:
+        lista = [int(valor) for parte in ids for valor in parte.split(",") if valor.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Os IDs devem ser números inteiros.")
+    return await responder_lote(db, lista)
+
+
+@router.post("/batch", response_model=EmpresasLote, summary="Detalha várias empresas por ID (IDs no corpo)")
+async def post_empresas_lote(pedido: PedidoLote, db=Depends(get_read_db)):
+    """
+    Igual a **GET /empresas/batch**, com os IDs no corpo do pedido (útil para listas longas).
+    """
+    return await responder_lote(db, pedido.ids)
+
+
+# --- Endpoint de Sincronização Incremental ---
+@router.get("/changes", response_model=AlteracoesResposta, summary="Lista as alterações posteriores a uma versão")
+async def get_alteracoes(
+    since: int = Query(0, ge=0, description="Última versão já sincronizada ('ultima_versao' da resposta anterior; 0 para começar)"),
+    limit: int = Query(1000, ge=1, le=10000, description="Número máximo de alterações por página"),
+    db=Depends(get_db)
 ):
     """
-    Lista todas as empresas registadas com opções de filtro e busca.
+    Devolve as empresas criadas, atualizadas ou excluídas depois da versão **since**, pela ordem das versões.
+    Para manter uma cópia sincronizada, o cliente guarda **ultima_versao** e envia-a em **since** no pedido seguinte
+    (repetindo enquanto **tem_mais** for verdadeiro). Com since=0, a primeira sincronização devolve todas as empresas.
+    """
+    alteracoes, tem_mais = await executar(db, empresa_service.listar_alteracoes, since, limit)
+
+    itens = []
+    for tipo, linha in alteracoes:
+        if tipo == "alterada":
+            itens.append({
+                "tipo": tipo, "versao": linha.versao, "id": linha.id, "data": linha.data_atualizacao,
+                "empresa": serializacao_service.para_dicionario(linha),
+            })
+        else:
+            itens.append({"tipo": tipo, "versao": linha.versao, "id": linha.empresa_id, "data": linha.data_remocao})
+
+    return resposta_json(serializacao_service.para_json({
+        "alteracoes": itens,
+        "ultima_versao": alteracoes[-1][1].versao if alteracoes else since,
+        "tem_mais": tem_mais,
+    }))
+
+
+# --- Endpoint de Alterações em Tempo Real (Server-Sent Events) ---
+@router.get("/stream", summary="Recebe as alterações das empresas em tempo real (SSE)", response_class=StreamingResponse)
+async def stream_empresas():
+    """
+    Mantém a ligação aberta e envia cada alteração como um evento Server-Sent Events, com a versão no campo **id**:
+    - **inicio**: enviado ao ligar, com a versão atual (`{"versao": ...}`).
+    - **criada** / **atualizada**: os dados da empresa.
+    - **removida**: o ID da empresa excluída.
+    - **importacao**: uma importação em lote inseriu empresas (obtidas em **GET /empresas/changes**).
+    - **resincronizar**: o cliente não acompanhou os eventos e foi desligado; deve obter as alterações
+      em falta em **GET /empresas/changes** e voltar a ligar-se.
     """
-    # Inicia uma consulta à tabela de empresas.
-    query = db.query(Empresa)
-    
-    # Aplica os filtros à consulta, se eles forem fornecidos no pedido.
-    # '.ilike()' faz uma busca "case-insensitive" (não diferencia maiúsculas de minúsculas).
-    if cidade:
-        query = query.filter(Empresa.cidade.ilike(f"%{cidade}%"))
-    if ramo_atuacao:
-        query = query.filter(Empresa.ramo_atuacao.ilike(f"%{ramo_atuacao}%"))
-    if nome:
-        query = query.filter(Empresa.nome.ilike(f"%{nome}%"))
-    
-    # Executa a consulta e retorna todos os resultados.
-    return query.all()
+    await eventos_service.barramento.iniciar()
+    # A versão inicial é lida numa sessão própria, fechada antes de a resposta começar: o stream fica aberto
+    # enquanto o cliente estiver ligado, sem ocupar uma conexão do pool.
+    async with sessao() as db:
+        versao = await executar(db, empresa_service.versao_atual)
+
+    async def gerar():
+        async with eventos_service.difusor.assinar() as assinatura:
+            yield eventos_service.formatar(eventos_service.evento("inicio", versao, {"versao": versao}))
+            while True:
+                try:
+                    mensagem = await asyncio.wait_for(assinatura.fila.get(), eventos_service.EVENTOS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    # Um comentário SSE mantém a ligação ativa (e deteta os clientes que já se desligaram).
+                    yield ": ping\n\n"
+                    continue
+                yield mensagem
+                if assinatura.descartada and assinatura.fila.empty():
+                    return
+
+    return StreamingResponse(
+        gerar(),
+        media_type="text/event-stream",
+        # Desativa a cache e o buffering de proxies (como o nginx), para que cada evento chegue de imediato.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # --- Endpoint de Detalhe de Empresa ---
 @router.get("/{empresa_id}", response_model=EmpresaResponse, summary="Detalha uma empresa por ID")
-def get_empresa(empresa_id: int, db: Session = Depends(get_db)):
+async def get_empresa(
+    empresa_id: int,
+    if_none_match: Optional[str] = Header(None, description="ETag de uma resposta anterior (devolve 304 se nada mudou)"),
+    db=Depends(get_read_db)
+):
     """
     Exibe os detalhes de uma única empresa através do seu ID.
+    A resposta inclui uma **ETag** (forte), que muda sempre que a empresa é alterada:
+    enviada em **If-None-Match**, devolve 304 (sem corpo) se a empresa não mudou.
     """
-    # Procura pela empresa com o ID fornecido.
-    db_empresa = db.query(Empresa).filter(Empresa.id == empresa_id).first()
-    
-    # Se a empresa não for encontrada, lança um erro HTTP 404.
-    if db_empresa is None:
-        raise HTTPException(status_code=404, detail="Empresa não encontrada.")
-    
-    # Retorna os dados da empresa encontrada.
-    return db_empresa
+    # Se a empresa já foi consultada desde a última escrita, devolve a resposta guardada em cache.
+    chave = await cache_service.cache.chave("detalhe", {"id": empresa_id})
+    em_cache = await cache_service.cache.obter(chave)
+    if em_cache is not None:
+        corpo, cabecalhos = em_cache
+        if etag_service.corresponde(if_none_match, cabecalhos["ETag"]):
+            return nao_modificado(cabecalhos["ETag"])
+        return resposta_json(corpo, cabecalhos=cabecalhos)
+
+    # Procura pela empresa com o ID fornecido (lança um erro HTTP 404 se não existir).
+    db_empresa = await executar(db, empresa_service.obter_empresa, empresa_id)
+
+    # Se o cliente já tiver esta versão, responde 304 sem serializar a empresa.
+    etag = etag_service.etag_empresa(db_empresa.id, db_empresa.versao)
+    if etag_service.corresponde(if_none_match, etag):
+        return nao_modificado(etag)
+
+    # Serializa a resposta uma única vez e guarda-a em cache.
+    cabecalhos = {"ETag": etag}
+    corpo = serializacao_service.codificar(db_empresa)
+    await cache_service.cache.guardar(chave, corpo, cabecalhos)
+    return resposta_json(corpo, cabecalhos=cabecalhos)
 
 
 # --- Endpoint de Atualização de Empresa ---
 @router.put("/{empresa_id}", response_model=EmpresaResponse, summary="Atualiza os dados de uma empresa")
-def update_empresa(empresa_id: int, empresa_update: EmpresaUpdate, db: Session = Depends(get_db)):
+async def update_empresa(
+    empresa_id: int,
+    empresa_update: EmpresaUpdate,
+    if_match: Optional[str] = Header(None, description="ETag da versão conhecida (devolve 412 se a empresa mudou entretanto)"),
+    db=Depends(get_db)
+):
     """
     Atualiza os dados de uma empresa, exceto id, cnpj e data de registo.
+    Com o cabeçalho **If-Match** (a ETag obtida antes), a atualização só é feita se a empresa
+    não tiver sido alterada entretanto; caso contrário, devolve 412 Precondition Failed.
     """
-    # Procura pela empresa que será atualizada.
-    db_empresa = db.query(Empresa).filter(Empresa.id == empresa_id).first()
-    if db_empresa is None:
-        raise HTTPException(status_code=404, detail="Empresa não encontrada.")
-
     # Converte o schema de atualização num dicionário, excluindo os campos que não foram enviados.
     update_data = empresa_update.dict(exclude_unset=True)
-    
-    # Itera sobre os dados enviados e atualiza os atributos correspondentes no objeto da empresa.
-    for key, value in update_data.items():
-        setattr(db_empresa, key, value)
-    
-    # Confirma (faz o "commit") das alterações na base de dados.
-    db.commit()
-    # Atualiza o objeto para refletir os dados guardados.
-    db.refresh(db_empresa)
-    
-    # Retorna a empresa com os dados atualizados.
-    return db_empresa
+
+    db_empresa = await executar(
+        db, empresa_service.atualizar_empresa, empresa_id, update_data, versoes_pedidas(if_match, empresa_id)
+    )
+    # Invalida as consultas em cache, que ainda têm os dados antigos, e avisa os clientes ligados ao stream.
+    await registar_escrita("atualizada", db_empresa.versao, serializacao_service.para_dicionario(db_empresa))
+    # Retorna a empresa com os dados atualizados e a ETag da nova versão.
+    return resposta_json(
+        serializacao_service.codificar(db_empresa),
+        cabecalhos={"ETag": etag_service.etag_empresa(db_empresa.id, db_empresa.versao)},
+    )
 
 
 # --- Endpoint de Exclusão de Empresa ---
 @router.delete("/{empresa_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Exclui uma empresa")
-def delete_empresa(empresa_id: int, db: Session = Depends(get_db)):
+async def delete_empresa(
+    empresa_id: int,
+    if_match: Optional[str] = Header(None, description="ETag da versão conhecida (devolve 412 se a empresa mudou entretanto)"),
+    db=Depends(get_db)
+):
     """
     Remove uma empresa da base de dados.
+    Com o cabeçalho **If-Match**, a exclusão só é feita se a empresa não tiver sido alterada entretanto.
     """
-    # Procura pela empresa que será excluída.
-    db_empresa = db.query(Empresa).filter(Empresa.id == empresa_id).first()
-    if db_empresa is None:
-        raise HTTPException(status_code=404, detail="Empresa não encontrada.")
+    versao = await executar(db, empresa_service.excluir_empresa, empresa_id, versoes_pedidas(if_match, empresa_id))
+    # Invalida as consultas em cache, que ainda incluem a empresa removida, e avisa os clientes ligados ao stream.
+    await registar_escrita("removida", versao, {"id": empresa_id})
 
-    # Remove o objeto da sessão da base de dados.
-    db.delete(db_empresa)
-    # Confirma (faz o "commit") da exclusão.
-    db.commit()
-    
     # Retorna uma resposta vazia com status 204, a indicar sucesso.
     return
@@ -0,0 +1,153 @@
+# Esse arquivo contém as rotas das tarefas em segundo plano (importações, exportações e reconstrução das facetas).
+# As rotas só registam a tarefa e consultam o seu estado; a execução é feita pelos workers de 'services/tarefa_service.py'.
+
+# Ferramentas do FastAPI para criar rotas, gerir dependências, exceções e parâmetros de query.
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+# Resposta que envia um ficheiro do disco.
+from fastapi.responses import FileResponse
+# Tipos de dados do Python para anotações de tipo (type hints).
+from typing import List, Optional
+import os
+
+# Importa a função 'get_db' para obter uma sessão da base de dados e a função 'executar',
+# que corre as operações no modo assíncrono ou síncrono.
+from ..db.database import get_db, executar
+# Importa os schemas das tarefas e os formatos de ficheiro das empresas.
+from ..schemas.tarefa import TipoTarefa, EstadoTarefa, TarefaResposta
+from ..schemas.empresa import FormatoImportacao
+# Importa o motor das tarefas.
+from ..services import tarefa_service
+# Os tipos de conteúdo aceites na importação (os mesmos de 'POST /empresas/import').
+from .empresas import TIPOS_IMPORTACAO
+# Importa a nossa dependência 'get_current_admin' para proteger as rotas.
+from ..deps import get_current_admin
+
+# --- Configuração do Roteador ---
+router = APIRouter(
+    prefix="/jobs",  # Todos os endpoints neste ficheiro começarão com '/jobs'.
+    tags=["Tarefas"],  # Agrupa estes endpoints sob a etiqueta "Tarefas" na documentação /docs.
+    dependencies=[Depends(get_current_admin)]  # Apenas administradores autenticados.
+)
+
+# Tipo de conteúdo de cada ficheiro produzido, pela extensão.
+TIPOS_RESULTADO = {
+    ".csv": "text/csv; charset=utf-8",
+    ".ndjson": "application/x-ndjson",
+}
+
+
+# --- Endpoint de Criação de Tarefa ---
+@router.post(
+    "",
+    response_model=TarefaResposta,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Cria uma tarefa em segundo plano",
+    # Na importação, o corpo do pedido é o ficheiro (lido em streaming), por isso é descrito manualmente.
+    openapi_extra={
+        "requestBody": {
+            "required": False,
+            "content": {
+                "text/csv": {"schema": {"type": "string", "format": "binary"}},
+                "application/x-ndjson": {"schema": {"type": "string", "format": "binary"}},
+            },
+        }
+    },
+)
+async def create_tarefa(
+    request: Request,
+    response: Response,
+    tipo: TipoTarefa = Query(..., description="Operação a executar"),
+    prioridade: int = Query(0, ge=-10, le=10, description="As tarefas com maior prioridade são executadas primeiro"),
+    formato: Optional[FormatoImportacao] = Query(None, description="Formato do ficheiro importado ou exportado (CSV ou NDJSON)"),
+    cidade: Optional[str] = Query(None, description="Exportação: filtra empresas por cidade"),
+    ramo_atuacao: Optional[str] = Query(None, description="Exportação: filtra empresas por ramo de atuação"),
+    nome: Optional[str] = Query(None, description="Exportação: busca textual pelo nome da empresa"),
+    admin=Depends(get_current_admin),
+    db=Depends(get_db)
+):
+    """
+    Regista uma tarefa e devolve-a de imediato (202), sem esperar pela execução:
+    - **importacao**: o corpo do pedido é o ficheiro CSV ou NDJSON (como em **POST /empresas/import**).
+      O resultado é o relatório das linhas rejeitadas (NDJSON).
+    - **exportacao**: exporta as empresas (com os filtros da listagem) para um ficheiro CSV ou NDJSON.
+    - **facetas**: recalcula os contadores das facetas.
+
+    O estado e o progresso são consultados em **GET /jobs/{id}** (indicado no cabeçalho **Location**)
+    e o ficheiro produzido em **GET /jobs/{id}/result**.
+    """
+    parametros = {}
+    if tipo == TipoTarefa.importacao:
+        # Determina o formato do ficheiro a partir do parâmetro ou do cabeçalho 'Content-Type'.
+        if formato is None:
+            conteudo = request.headers.get("content-type", "").split(";")[0].strip().lower()
+            formato = TIPOS_IMPORTACAO.get(conteudo)
+            if formato is None:
+                raise HTTPException(
+                    status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                    detail="Envie um ficheiro CSV (text/csv) ou NDJSON (application/x-ndjson).",
+                )
+        # O ficheiro é guardado em disco à medida que chega; a importação é feita depois, pelo worker.
+        parametros["formato"] = formato.value
+        parametros["entrada"] = await tarefa_service.guardar_entrada(request.stream(), formato.value)
+    elif tipo == TipoTarefa.exportacao:
+        parametros["formato"] = (formato or FormatoImportacao.csv).value
+        parametros["filtros"] = {"nome": nome, "cidade": cidade, "ramo_atuacao": ramo_atuacao}
+
+    tarefa = await executar(db, tarefa_service.criar_tarefa, tipo.value, parametros, prioridade, admin.username)
+    # Avisa os workers deste processo, que não precisam de esperar pela próxima procura.
+    tarefa_service.gestor.acordar()
+    response.headers["Location"] = f"/jobs/{tarefa.id}"
+    return tarefa_service.descrever(tarefa)
+
+
+# --- Endpoint de Listagem de Tarefas ---
+@router.get("", response_model=List[TarefaResposta], summary="Lista as tarefas mais recentes")
+async def get_tarefas(
+    estado: Optional[EstadoTarefa] = Query(None, description="Filtra as tarefas pelo estado"),
+    limit: int = Query(50, ge=1, le=500, description="Número máximo de tarefas"),
+    db=Depends(get_db)
+):
+    """
+    Lista as tarefas, das mais recentes para as mais antigas.
+    """
+    tarefas = await executar(db, tarefa_service.listar_tarefas, estado.value if estado else None, limit)
+    return [tarefa_service.descrever(tarefa) for tarefa in tarefas]
+
+
+# --- Endpoint de Estado de Tarefa ---
+@router.get("/{tarefa_id}", response_model=TarefaResposta, summary="Estado e progresso de uma tarefa")
+async def get_tarefa(tarefa_id: int, db=Depends(get_db)):
+    """
+    Devolve o estado da tarefa, o progresso (**processados** de **total**), o ritmo da execução atual,
+    o tempo estimado até ao fim e, depois de concluída, o resumo do resultado e o endereço do ficheiro produzido.
+    """
+    tarefa = await executar(db, tarefa_service.obter_tarefa, tarefa_id)
+    return tarefa_service.descrever(tarefa)
+
+
+# --- Endpoint do Resultado de Tarefa ---
+@router.get("/{tarefa_id}/result", summary="Descarrega o ficheiro produzido por uma tarefa", response_class=FileResponse)
+async def get_resultado_tarefa(tarefa_id: int, db=Depends(get_db)):
+    """
+    Descarrega o ficheiro exportado ou, numa importação, o relatório das linhas rejeitadas (um erro por linha, em NDJSON).
+    Só está disponível depois de a tarefa ser concluída.
+    """
+    tarefa = await executar(db, tarefa_service.obter_tarefa, tarefa_id)
+    if tarefa.estado != EstadoTarefa.concluida.value or not tarefa.ficheiro:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A tarefa não tem um ficheiro disponível.")
+    caminho = tarefa_service.caminho(tarefa.ficheiro)
+    if not os.path.exists(caminho):
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="O ficheiro da tarefa já não existe.")
+    extensao = os.path.splitext(tarefa.ficheiro)[1]
+    return FileResponse(caminho, media_type=TIPOS_RESULTADO.get(extensao), filename=tarefa.ficheiro)
+
+
+# --- Endpoint de Cancelamento de Tarefa ---
+@router.post("/{tarefa_id}/cancel", response_model=TarefaResposta, summary="Cancela uma tarefa")
+async def cancel_tarefa(tarefa_id: int, db=Depends(get_db)):
+    """
+    Cancela uma tarefa pendente (de imediato) ou em execução (no fim do bloco atual; até lá, o estado continua
+    "em_execucao", com **cancelamento_pedido**). Uma tarefa já terminada devolve 409.
+    """
+    tarefa = await executar(db, tarefa_service.cancelar_tarefa, tarefa_id)
+    return tarefa_service.descrever(tarefa)
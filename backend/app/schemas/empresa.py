@@ -3,6 +3,10 @@
 from pydantic import BaseModel, EmailStr, Field
 # Importa o tipo 'datetime' para trabalhar com datas e horas.
 from datetime import datetime
+# 'Enum' permite restringir um parâmetro a um conjunto fixo de valores (uma "lista branca").
+from enum import Enum
+# Tipos 'List' e 'Optional' para anotar listas de objetos e campos opcionais.
+from typing import List, Optional
 
 
 # --- Schema Base da Empresa ---
@@ -57,4 +61,106 @@ class EmpresaResponse(EmpresaBase):
         # 'orm_mode = True' (ou 'from_attributes = True' em versões mais recentes)
         # permite ao Pydantic ler os dados diretamente de um objeto do SQLAlchemy,
         # facilitando a conversão do modelo da base de dados para a resposta da API.
-        orm_mode = True
\ No newline at end of file
+        # As duas opções são definidas para que 'from_orm' funcione em ambas as versões do Pydantic.
+        orm_mode = True
+        from_attributes = True
+
+
+# --- Opções de Ordenação da Listagem ---
+# Lista branca dos campos pelos quais a listagem pode ser ordenada.
+# Cada campo tem um índice composto (campo, id) no modelo 'Empresa' (a cidade, pela cópia do nome do catálogo, 'cidade_nome').
+# 'relevancia' ordena pela semelhança com os termos pesquisados (sempre da mais para a menos relevante).
+class CampoOrdenacao(str, Enum):
+    nome = "nome"
+    cidade = "cidade"
+    data_cadastro = "data_cadastro"
+    relevancia = "relevancia"
+
+
+# Direção da ordenação: ascendente ou descendente.
+class DirecaoOrdenacao(str, Enum):
+    asc = "asc"
+    desc = "desc"
+
+
+# --- Contagem do Total da Listagem ---
+# Como é calculado o total de resultados (cabeçalho 'X-Total-Count'): exato, estimado pelo planeador
+# do PostgreSQL (nas outras bases de dados, é exato) ou não calculado.
+class ModoContagem(str, Enum):
+    exata = "exata"
+    estimada = "estimada"
+    nenhuma = "nenhuma"
+
+
+# --- Schemas da Importação em Lote ---
+# Formatos aceites pela importação em lote.
+class FormatoImportacao(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+
+
+# Formatos disponíveis na exportação (os mesmos da importação).
+FormatoExportacao = FormatoImportacao
+
+
+# Descreve uma linha do ficheiro que não foi importada e o motivo.
+class ErroImportacao(BaseModel):
+    linha: int
+    erro: str
+
+
+# Relatório devolvido no fim da importação.
+class ImportacaoResultado(BaseModel):
+    total_linhas: int
+    inseridas: int
+    rejeitadas: int
+    erros: List[ErroImportacao]
+
+
+# --- Schemas das Facetas ---
+# Número de empresas com um determinado valor (de cidade ou de ramo de atuação).
+class ValorFaceta(BaseModel):
+    valor: str
+    total: int
+
+
+# Contagens por cidade e por ramo de atuação, e o total de empresas (da pesquisa, se houver).
+class FacetasResposta(BaseModel):
+    total: int
+    cidade: List[ValorFaceta]
+    ramo_atuacao: List[ValorFaceta]
+
+
+# --- Schemas da Consulta em Lote ---
+# IDs das empresas pedidas no corpo de 'POST /empresas/batch'.
+class PedidoLote(BaseModel):
+    ids: List[int] = Field(..., example=[1, 2, 3])
+
+
+# Empresas encontradas (pela ordem dos IDs pedidos) e os IDs que não existem.
+class EmpresasLote(BaseModel):
+    empresas: List[EmpresaResponse]
+    nao_encontrados: List[int]
+
+
+# --- Schemas da Sincronização Incremental ---
+# Tipo de alteração: empresa criada ou atualizada ("alterada") ou excluída ("removida").
+class TipoAlteracao(str, Enum):
+    alterada = "alterada"
+    removida = "removida"
+
+
+# Uma alteração: a versão, o ID e a data da alteração e, se a empresa ainda existir, os seus dados atuais.
+class AlteracaoEmpresa(BaseModel):
+    tipo: TipoAlteracao
+    versao: int
+    id: int
+    data: datetime
+    empresa: Optional[EmpresaResponse] = None
+
+
+# Página de alterações. 'ultima_versao' é o valor a enviar em 'since' no pedido seguinte.
+class AlteracoesResposta(BaseModel):
+    alteracoes: List[AlteracaoEmpresa]
+    ultima_versao: int
+    tem_mais: bool
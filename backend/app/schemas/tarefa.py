@@ -0,0 +1,53 @@
+# Importa a classe 'BaseModel' da biblioteca Pydantic.
+from pydantic import BaseModel
+# Importa o tipo 'datetime' para trabalhar com datas e horas.
+from datetime import datetime
+# 'Enum' permite restringir um parâmetro a um conjunto fixo de valores (uma "lista branca").
+from enum import Enum
+# Tipos para anotar campos opcionais e dicionários.
+from typing import Any, Dict, Optional
+
+
+# --- Tipos e Estados das Tarefas ---
+# Operações que podem ser executadas em segundo plano.
+class TipoTarefa(str, Enum):
+    importacao = "importacao"
+    exportacao = "exportacao"
+    facetas = "facetas"
+
+
+# Estados de uma tarefa: à espera de um worker, em execução, ou terminada (com sucesso, com erro ou cancelada).
+class EstadoTarefa(str, Enum):
+    pendente = "pendente"
+    em_execucao = "em_execucao"
+    concluida = "concluida"
+    falhada = "falhada"
+    cancelada = "cancelada"
+
+
+# --- Schema para a Resposta da API ---
+# O estado e o progresso de uma tarefa.
+# - 'processados' e 'total' são linhas do ficheiro (importação), empresas (exportação) ou 1 (facetas).
+# - 'unidades_por_segundo' e 'segundos_restantes' referem-se à execução atual (depois de uma retoma,
+#   não contam o trabalho feito antes da interrupção).
+# - 'url_resultado' é o endereço do ficheiro produzido (o ficheiro exportado ou o relatório de erros da importação).
+class TarefaResposta(BaseModel):
+    id: int
+    tipo: TipoTarefa
+    estado: EstadoTarefa
+    prioridade: int
+    parametros: Dict[str, Any]
+    processados: int
+    total: Optional[int] = None
+    progresso: Optional[float] = None
+    unidades_por_segundo: Optional[float] = None
+    segundos_restantes: Optional[float] = None
+    resultado: Optional[Dict[str, Any]] = None
+    url_resultado: Optional[str] = None
+    erro: Optional[str] = None
+    cancelamento_pedido: bool
+    tentativas: int
+    administrador: Optional[str] = None
+    data_criacao: datetime
+    data_inicio: Optional[datetime] = None
+    data_fim: Optional[datetime] = None
@@ -0,0 +1,357 @@
+# Esse arquivo contém o controlo de admissão dos pedidos: limita o ritmo de cada cliente e a carga em curso,
+# e rejeita pedidos de imediato quando a API está sobrecarregada, em vez de os deixar numa fila até os clientes
+# desistirem. O middleware 'MiddlewareAdmissao' (registado em 'main.py') aplica, por esta ordem:
+# - Limite de ritmo por cliente ("token bucket"): cada IP e cada administrador autenticado têm um balde que enche
+#   a 'RATE_LIMIT_*_RATE' unidades por segundo, até 'RATE_LIMIT_*_BURST'. Cada pedido gasta o custo da sua rota;
+#   sem saldo, a resposta é 429 com 'Retry-After' (o tempo até haver saldo).
+# - Custo das rotas: as operações caras (login e registo com bcrypt, listagem, exportação, importação) custam
+#   mais unidades do que as baratas (detalhe de uma empresa), por isso não as conseguem afastar.
+# - Limite de carga em curso: a soma dos custos dos pedidos em execução não passa de 'MAX_INFLIGHT'.
+#   Acima disso, os pedidos esperam numa fila (por ordem de chegada).
+# - Transferências longas ('GET /empresas/export'): ficam em curso durante toda a transferência, por isso têm
+#   um limite próprio ('MAX_DOWNLOADS' em simultâneo), em vez de ocuparem a capacidade dos restantes pedidos.
+# - Rejeição pela latência da fila (CoDel): se a fila não esvaziou durante o último 'QUEUE_INTERVAL_MS',
+#   a API está sobrecarregada, e os pedidos só esperam até 'QUEUE_TARGET_MS' (em vez de 'QUEUE_INTERVAL_MS');
+#   os que não forem admitidos a tempo recebem 503 com 'Retry-After'. Assim, a fila é curta durante a sobrecarga
+#   e os pedidos admitidos continuam a ter uma latência baixa.
+#
+# O administrador é identificado pela cache de principais ('principal_service'): os tokens ainda não validados
+# (o primeiro pedido de cada token, ou um token inválido) contam apenas para o IP.
+# Os contadores são exportados em 'GET /metrics' ('metricas_service'), para ajustar os limites ao tráfego real.
+# Os limites e a fila são de cada worker (e de cada aplicação: o estado fica no middleware, exposto em 'app.state').
+# Com 0, cada limite fica desativado.
+
+# --- Importações de Módulos ---
+import asyncio
+import math
+import os
+import time
+from collections import Counter, OrderedDict, deque
+import orjson
+
+from . import principal_service
+from .metricas_service import LIMITES_SEGUNDOS, Histograma
+
+# --- Configurações dos Limites ---
+# Ritmo (unidades por segundo) e rajada máxima (unidades) de cada IP e de cada administrador.
+RATE_LIMIT_IP_RATE = float(os.getenv("RATE_LIMIT_IP_RATE", 100))
+RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", 200))
+RATE_LIMIT_ADMIN_RATE = float(os.getenv("RATE_LIMIT_ADMIN_RATE", 200))
+RATE_LIMIT_ADMIN_BURST = float(os.getenv("RATE_LIMIT_ADMIN_BURST", 400))
+# Número máximo de clientes acompanhados (os menos recentes são esquecidos e voltam com o balde cheio).
+RATE_LIMIT_MAX_CLIENTES = int(os.getenv("RATE_LIMIT_MAX_CLIENTES", 10000))
+
+# Soma máxima dos custos dos pedidos em execução, e número máximo de pedidos à espera na fila.
+MAX_INFLIGHT = int(os.getenv("MAX_INFLIGHT", 100))
+QUEUE_MAX = int(os.getenv("QUEUE_MAX", 1000))
+# Espera máxima na fila (em milissegundos) em sobrecarga e em funcionamento normal (CoDel).
+QUEUE_TARGET_MS = float(os.getenv("QUEUE_TARGET_MS", 20))
+QUEUE_INTERVAL_MS = float(os.getenv("QUEUE_INTERVAL_MS", 200))
+# Número máximo de transferências longas em simultâneo (ver 'ROTAS_DOWNLOAD').
+MAX_DOWNLOADS = int(os.getenv("MAX_DOWNLOADS", 4))
+
+# Custo de cada rota (método e caminho); as que não estão na lista custam 1.
+# 'ROUTE_COSTS' acrescenta ou substitui custos, no formato "POST /auth/login=10;GET /empresas/=5".
+CUSTOS_ROTAS = {
+    ("POST", "/auth/login"): 10,
+    ("POST", "/auth/register"): 10,
+    ("GET", "/empresas/"): 5,
+    ("GET", "/empresas/export"): 10,
+    ("POST", "/empresas/import"): 20,
+    ("GET", "/empresas/facets"): 2,
+    ("GET", "/empresas/batch"): 2,
+    ("POST", "/empresas/batch"): 2,
+    ("GET", "/empresas/changes"): 2,
+    ("POST", "/jobs"): 5,
+}
+
+# Rotas que nunca são limitadas (as métricas continuam disponíveis durante a sobrecarga).
+ROTAS_ISENTAS = {"/metrics"}
+# Rotas de longa duração ('GET /empresas/stream', que fica aberta enquanto o cliente estiver ligado):
+# contam para o limite de ritmo, mas não para a carga em curso, que ocupariam indefinidamente.
+ROTAS_LONGA_DURACAO = {("GET", "/empresas/stream")}
+# Transferências longas, que leem a base de dados durante toda a resposta: contam para o limite de ritmo
+# e para o limite próprio das transferências ('MAX_DOWNLOADS'), e não para a carga em curso dos outros pedidos.
+ROTAS_DOWNLOAD = {("GET", "/empresas/export")}
+
+
+def ler_custos(texto):
+    """
+    Converte o texto de 'ROUTE_COSTS' ("MÉTODO /caminho=custo;...") em {(método, caminho): custo}.
+    """
+    custos = {}
+    for parte in (texto or "").split(";"):
+        if not parte.strip():
+            continue
+        rota, _, custo = parte.rpartition("=")
+        metodo, _, caminho = rota.strip().partition(" ")
+        custos[(metodo.upper(), caminho.strip())] = float(custo)
+    return custos
+
+
+# --- Limite de Ritmo (Token Bucket) ---
+
+class Baldes:
+    """
+    Um balde por cliente: (saldo, instante da última atualização). O saldo enche 'taxa' unidades por segundo,
+    até 'rajada'. Os clientes são guardados por ordem de utilização, para esquecer os menos recentes.
+    """
+    def __init__(self, taxa, rajada, max_clientes):
+        self.taxa = taxa
+        self.rajada = rajada
+        self.max_clientes = max_clientes
+        self._baldes = OrderedDict()
+
+    def gastar(self, cliente, custo, agora):
+        """
+        Gasta 'custo' unidades do balde do cliente. Devolve 0 se houver saldo ou, caso contrário,
+        o tempo (em segundos) até haver saldo suficiente (nada é gasto).
+        """
+        if self.taxa <= 0:
+            return 0.0
+        saldo, instante = self._baldes.pop(cliente, (self.rajada, agora))
+        saldo = min(self.rajada, saldo + (agora - instante) * self.taxa)
+        # Um pedido mais caro do que a rajada inteira é admitido com o balde cheio (nunca ficaria com saldo).
+        custo = min(custo, self.rajada)
+        if saldo >= custo:
+            saldo -= custo
+            espera = 0.0
+        else:
+            espera = (custo - saldo) / self.taxa
+        self._baldes[cliente] = (saldo, agora)
+        while len(self._baldes) > self.max_clientes:
+            self._baldes.popitem(last=False)
+        return espera
+
+    def __len__(self):
+        return len(self._baldes)
+
+
+# --- Carga em Curso e Fila (CoDel) ---
+
+class Sobrecarga(Exception):
+    """
+    Lançada quando um pedido não pode ser admitido: a fila está cheia ou a espera excedeu o limite.
+    """
+    def __init__(self, motivo):
+        super().__init__(motivo)
+        self.motivo = motivo
+
+
+class Admissao:
+    """
+    Limite da soma dos custos dos pedidos em execução, com uma fila por ordem de chegada.
+    Só é usada no event loop do worker, por isso não precisa de locks.
+    """
+    def __init__(self, capacidade, fila_max, alvo, intervalo):
+        self.capacidade = capacidade
+        self.fila_max = fila_max
+        self.alvo = alvo
+        self.intervalo = intervalo
+        self.em_curso = 0
+        # Pedidos à espera: (custo, futuro resolvido quando o pedido é admitido).
+        self._fila = deque()
+        # Último instante em que a fila esteve vazia (ou um pedido foi admitido sem esperar).
+        self._ultimo_vazio = time.monotonic()
+
+    def sobrecarregada(self, agora):
+        # CoDel: a fila não esvaziou durante um intervalo inteiro, por isso o atraso não é uma rajada passageira.
+        return bool(self._fila) and agora - self._ultimo_vazio > self.intervalo
+
+    async def entrar(self, custo):
+        """
+        Espera até o pedido poder ser executado. Devolve o tempo de espera (em segundos) ou lança 'Sobrecarga'.
+        """
+        if self.capacidade <= 0:
+            return 0.0
+        # Um pedido mais caro do que a capacidade inteira é admitido quando não houver mais nada em execução.
+        custo = min(custo, self.capacidade)
+        agora = time.monotonic()
+        if not self._fila and self.em_curso + custo <= self.capacidade:
+            self.em_curso += custo
+            self._ultimo_vazio = agora
+            return 0.0
+        if len(self._fila) >= self.fila_max:
+            raise Sobrecarga("fila_cheia")
+
+        limite = self.alvo if self.sobrecarregada(agora) else self.intervalo
+        futuro = asyncio.get_running_loop().create_future()
+        entrada = (custo, futuro)
+        self._fila.append(entrada)
+        try:
+            await asyncio.wait_for(asyncio.shield(futuro), limite)
+        except asyncio.TimeoutError:
+            # O pedido pode ter sido admitido no instante em que o tempo terminou.
+            if not (futuro.done() and not futuro.cancelled()):
+                self._retirar(entrada)
+                raise Sobrecarga("espera_excedida")
+        except asyncio.CancelledError:
+            # O cliente desligou-se durante a espera: liberta o lugar, se já o tinha recebido.
+            if futuro.done() and not futuro.cancelled():
+                self.sair(custo)
+            else:
+                self._retirar(entrada)
+            raise
+        return time.monotonic() - agora
+
+    def _retirar(self, entrada):
+        try:
+            self._fila.remove(entrada)
+        except ValueError:
+            pass
+        entrada[1].cancel()
+        # Um pedido caro retirado do início da fila pode estar a impedir a entrada dos seguintes.
+        self._admitir()
+
+    def sair(self, custo):
+        """
+        Chamada no fim de cada pedido admitido: liberta a capacidade e admite os pedidos seguintes da fila.
+        """
+        if self.capacidade <= 0:
+            return
+        self.em_curso -= min(custo, self.capacidade)
+        self._admitir()
+
+    def _admitir(self):
+        while self._fila and self.em_curso + self._fila[0][0] <= self.capacidade:
+            custo, futuro = self._fila.popleft()
+            if futuro.done():
+                continue
+            self.em_curso += custo
+            futuro.set_result(None)
+        if not self._fila:
+            self._ultimo_vazio = time.monotonic()
+
+    def __len__(self):
+        return len(self._fila)
+
+
+# --- Contadores ---
+
+class Contadores:
+    """
+    Contadores exportados em 'GET /metrics': pedidos admitidos, rejeitados (por motivo) e tempo de espera na fila.
+    Só são alterados no event loop do worker.
+    """
+    def __init__(self):
+        self.admitidos = 0
+        # motivo -> número de pedidos rejeitados ("ritmo_ip", "ritmo_admin", "fila_cheia", "espera_excedida").
+        self.rejeitados = Counter()
+        # Custo total admitido e rejeitado por rota da lista de custos (as restantes ficam em "outras").
+        self.custo_admitido = Counter()
+        self.custo_rejeitado = Counter()
+        # Tempo de espera na fila dos pedidos admitidos, em segundos.
+        self.espera = Histograma(LIMITES_SEGUNDOS)
+
+
+# --- Middleware ---
+
+def _resposta_json(detalhe, segundos):
+    # O mesmo formato dos erros do FastAPI ('HTTPException'), com o tempo de espera sugerido (em segundos inteiros).
+    corpo = orjson.dumps({"detail": detalhe})
+    cabecalhos = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(corpo)).encode()),
+        (b"retry-after", str(max(1, math.ceil(segundos))).encode()),
+    ]
+    return corpo, cabecalhos
+
+
+class MiddlewareAdmissao:
+    """
+    Middleware ASGI do controlo de admissão. Como o 'MiddlewareMetricas', não usa o 'BaseHTTPMiddleware'.
+    Os limites são lidos da configuração, exceto os indicados; os baldes, as filas e os contadores são
+    de cada instância. Com 'estado' (o 'app.state' da aplicação), o middleware fica em 'estado.admissao',
+    onde 'GET /metrics' o encontra.
+    """
+    def __init__(
+        self, app, custos=None, estado=None,
+        taxa_ip=RATE_LIMIT_IP_RATE, rajada_ip=RATE_LIMIT_IP_BURST,
+        taxa_admin=RATE_LIMIT_ADMIN_RATE, rajada_admin=RATE_LIMIT_ADMIN_BURST,
+        capacidade=MAX_INFLIGHT, fila_max=QUEUE_MAX, alvo_ms=QUEUE_TARGET_MS, intervalo_ms=QUEUE_INTERVAL_MS,
+        downloads=MAX_DOWNLOADS,
+    ):
+        self.app = app
+        self.custos = {**CUSTOS_ROTAS, **ler_custos(os.getenv("ROUTE_COSTS")), **(custos or {})}
+        self.baldes_ip = Baldes(taxa_ip, rajada_ip, RATE_LIMIT_MAX_CLIENTES)
+        self.baldes_admin = Baldes(taxa_admin, rajada_admin, RATE_LIMIT_MAX_CLIENTES)
+        self.admissao = Admissao(capacidade, fila_max, alvo_ms / 1000, intervalo_ms / 1000)
+        # As transferências longas contam uma unidade cada, num limite à parte.
+        self.downloads = Admissao(downloads, fila_max, alvo_ms / 1000, intervalo_ms / 1000)
+        self.contadores = Contadores()
+        if estado is not None:
+            estado.admissao = self
+
+    @staticmethod
+    def _admin(scope):
+        for nome, valor in scope["headers"]:
+            if nome == b"authorization":
+                esquema, _, token = valor.decode("latin-1").partition(" ")
+                if esquema.lower() == "bearer" and token:
+                    return principal_service.cache.username(token)
+                return None
+        return None
+
+    async def _rejeitar(self, send, estado, motivo, rota, custo, detalhe, segundos):
+        self.contadores.rejeitados[motivo] += 1
+        self.contadores.custo_rejeitado[rota] += custo
+        corpo, cabecalhos = _resposta_json(detalhe, segundos)
+        await send({"type": "http.response.start", "status": estado, "headers": cabecalhos})
+        await send({"type": "http.response.body", "body": corpo})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in ROTAS_ISENTAS:
+            await self.app(scope, receive, send)
+            return
+
+        chave = (scope["method"], scope["path"])
+        custo = self.custos.get(chave, 1)
+        rota = f"{chave[0]} {chave[1]}" if chave in self.custos else "outras"
+        agora = time.monotonic()
+
+        # Limite de ritmo: primeiro o IP, depois o administrador (se o token já tiver sido validado).
+        cliente = scope.get("client")
+        espera = self.baldes_ip.gastar(cliente[0] if cliente else "", custo, agora)
+        if espera:
+            await self._rejeitar(send, 429, "ritmo_ip", rota, custo, "Demasiados pedidos deste endereço.", espera)
+            return
+        admin = self._admin(scope)
+        if admin is not None:
+            espera = self.baldes_admin.gastar(admin, custo, agora)
+            if espera:
+                await self._rejeitar(send, 429, "ritmo_admin", rota, custo, "Demasiados pedidos deste administrador.", espera)
+                return
+
+        # Carga em curso: as rotas de longa duração não ocupam capacidade, e as transferências longas
+        # ocupam um lugar do seu próprio limite.
+        if chave in ROTAS_LONGA_DURACAO:
+            self.contadores.admitidos += 1
+            await self.app(scope, receive, send)
+            return
+        admissao, lugar = (self.downloads, 1) if chave in ROTAS_DOWNLOAD else (self.admissao, custo)
+        try:
+            espera = await admissao.entrar(lugar)
+        except Sobrecarga as erro:
+            await self._rejeitar(
+                send, 503, erro.motivo, rota, custo, "A API está sobrecarregada. Tente novamente.", admissao.intervalo
+            )
+            return
+        self.contadores.admitidos += 1
+        self.contadores.custo_admitido[rota] += custo
+        self.contadores.espera.observar(espera)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admissao.sair(lugar)
+
+    def estatisticas(self):
+        return {
+            "em_curso": self.admissao.em_curso,
+            "capacidade": self.admissao.capacidade,
+            "em_fila": len(self.admissao),
+            "sobrecarregada": self.admissao.sobrecarregada(time.monotonic()),
+            "clientes_ip": len(self.baldes_ip),
+            "clientes_admin": len(self.baldes_admin),
+            "downloads_em_curso": self.downloads.em_curso,
+            "downloads_capacidade": self.downloads.capacidade,
+        }
@@ -1,19 +1,20 @@
 # --- Importações de Módulos ---
+import asyncio
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
 # CryptContext é a ferramenta principal do passlib para gerir múltiplos algoritmos de hash.
 from passlib.context import CryptContext
 # JWTError para tratamento de erros e 'jwt' para criar e verificar tokens.
 from jose import JWTError, jwt
-# load_dotenv para carregar variáveis de ambiente a partir de um ficheiro .env.
-from dotenv import load_dotenv
 
-# --- Carregamento das Variáveis de Ambiente ---
-# Carrega as variáveis definidas no ficheiro .env para o ambiente do sistema.
-load_dotenv()
+# Importa o modelo 'Administrador' para interagir com a tabela de administradores.
+from ..models.administrador import Administrador
 
 # --- Configurações de Segurança ---
-# Lê as configurações de segurança a partir das variáveis de ambiente.
+# Lê as configurações de segurança a partir das variáveis de ambiente
+# (o ficheiro .env é carregado pelos pontos de entrada, 'main.py' e 'cli.py').
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256") # Usa "HS256" como valor padrão se não for encontrado.
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30)) # Usa 30 minutos como padrão.
@@ -23,9 +24,33 @@ if SECRET_KEY is None:
     raise ValueError("A variável de ambiente SECRET_KEY não foi definida. Verifique o seu ficheiro .env")
 
 # --- Configuração do Hashing de Senhas ---
+# Custo do bcrypt (número de "rounds", em escala logarítmica). Hashes com um custo inferior
+# são considerados desatualizados e são refeitos de forma transparente no login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+
 # Cria um 'CryptContext' que especifica que o algoritmo de hashing a ser usado é o 'bcrypt'.
 # 'deprecated="auto"' permite que o passlib atualize automaticamente os hashes se um esquema mais seguro for adicionado no futuro.
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 'min_rounds' faz com que 'needs_update' assinale os hashes gerados com um custo inferior ao configurado.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+# --- Configuração do Pool de Processos das Senhas ---
+# O bcrypt gasta centenas de milissegundos de CPU por operação. Para não ocupar as threads
+# que servem os restantes pedidos, as operações de senha correm num pool de processos dedicado,
+# que usa os outros núcleos da máquina.
+# - PASSWORD_WORKERS: número de processos (e de operações em simultâneo) de cada worker da API. Com 0, usa o threadpool.
+#   Por omissão, os núcleos são divididos pelos workers da API ('WEB_CONCURRENCY'), para que o total de processos
+#   do bcrypt não passe do número de núcleos.
+# - PASSWORD_MAX_QUEUE: número máximo de operações à espera de um processo livre.
+# - PASSWORD_QUEUE_TIMEOUT: tempo máximo (em segundos) de espera por um processo livre.
+_WORKERS_API = max(int(os.getenv("WEB_CONCURRENCY", 1) or 1), 1)
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", max((os.cpu_count() or 1) // _WORKERS_API, 1)))
+PASSWORD_MAX_QUEUE = int(os.getenv("PASSWORD_MAX_QUEUE", max(PASSWORD_WORKERS, 1) * 4))
+PASSWORD_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_QUEUE_TIMEOUT", 5))
 
 
 # --- Funções de Hashing e Verificação ---
@@ -48,6 +73,108 @@ def get_password_hash(password):
     return pwd_context.hash(password[:72])
 
 
+def verificar_e_atualizar(plain_password, hashed_password):
+    """
+    Verifica uma senha e, se o hash guardado estiver desatualizado (por exemplo, com um custo inferior
+    ao configurado), gera um novo hash. Devolve (senha_correta, novo_hash_ou_None).
+    """
+    if not verify_password(plain_password, hashed_password):
+        return False, None
+    if pwd_context.needs_update(hashed_password):
+        return True, get_password_hash(plain_password)
+    return True, None
+
+
+# --- Pool de Operações de Senha com Controlo de Admissão ---
+
+class PoolSenhasOcupado(Exception):
+    """
+    Lançada quando o pool de senhas não aceita mais operações (fila cheia ou espera demasiado longa).
+    As rotas convertem-na num erro HTTP 503 com o cabeçalho 'Retry-After'.
+    """
+
+
+class PoolSenhas:
+    def __init__(self, workers, max_fila, timeout_fila):
+        self.workers = workers
+        self.max_fila = max_fila
+        self.timeout_fila = timeout_fila
+        self._executor = None
+        self._semaforo = None
+        # Operações admitidas (em execução ou à espera). Só é alterado no event loop.
+        self._em_curso = 0
+        # Contadores para acompanhar a carga do pool.
+        self.concluidas = 0
+        self.rejeitadas = 0
+
+    def _obter_executor(self):
+        # O pool de processos só é criado na primeira utilização.
+        if self._executor is None and self.workers > 0:
+            # Os processos não são criados com 'fork': o worker já tem threads em execução (o threadpool e as tarefas
+            # em segundo plano), e um 'fork' copiaria os seus locks no estado em que estivessem. Com 'forkserver',
+            # os processos são criados a partir de um processo limpo ('spawn' onde o 'forkserver' não existe).
+            metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(metodo))
+        return self._executor
+
+    async def executar(self, funcao, *args):
+        """
+        Executa uma operação de senha no pool. Rejeita de imediato (PoolSenhasOcupado) se a fila
+        estiver cheia, em vez de deixar os pedidos acumularem-se sem limite.
+        """
+        limite = max(self.workers, 1)
+        if self._em_curso >= limite + self.max_fila:
+            self.rejeitadas += 1
+            raise PoolSenhasOcupado("Demasiadas operações de senha em curso.")
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(limite)
+
+        self._em_curso += 1
+        try:
+            # Espera por um processo livre, no máximo durante 'timeout_fila' segundos.
+            try:
+                await asyncio.wait_for(self._semaforo.acquire(), self.timeout_fila)
+            except asyncio.TimeoutError:
+                self.rejeitadas += 1
+                raise PoolSenhasOcupado("Tempo de espera por uma operação de senha esgotado.")
+            try:
+                loop = asyncio.get_running_loop()
+                # Sem processos configurados, 'run_in_executor(None, ...)' usa o threadpool por omissão.
+                resultado = await loop.run_in_executor(self._obter_executor(), funcao, *args)
+                self.concluidas += 1
+                return resultado
+            finally:
+                self._semaforo.release()
+        finally:
+            self._em_curso -= 1
+
+    def encerrar(self):
+        """
+        Termina os processos do pool (chamada no encerramento da aplicação). O pool volta a ser criado
+        se for usado novamente.
+        """
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def estatisticas(self):
+        """
+        Devolve o estado atual do pool.
+        """
+        limite = max(self.workers, 1)
+        return {
+            "workers": self.workers,
+            "em_execucao": min(self._em_curso, limite),
+            "em_fila": max(self._em_curso - limite, 0),
+            "concluidas": self.concluidas,
+            "rejeitadas": self.rejeitadas,
+        }
+
+
+# Instância única do pool, partilhada por todos os pedidos deste processo.
+pool_senhas = PoolSenhas(PASSWORD_WORKERS, PASSWORD_MAX_QUEUE, PASSWORD_QUEUE_TIMEOUT)
+
+
 # --- Funções de Token JWT ---
 
 def create_access_token(data: dict):
@@ -67,4 +194,34 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     
     # Retorna o token JWT como uma string.
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+
+# --- Funções de Acesso aos Administradores ---
+# Estas funções usam a API síncrona da 'Session' e são executadas através de 'database.executar'.
+
+def buscar_admin(db, username):
+    """
+    Procura um administrador pelo username. Devolve None se ele não existir.
+    """
+    return db.query(Administrador).filter(Administrador.username == username).first()
+
+def atualizar_hash(db, admin, hashed_password):
+    """
+    Substitui o hash da senha de um administrador (usado quando o hash guardado está desatualizado).
+    """
+    admin.hashed_password = hashed_password
+    db.commit()
+
+def criar_admin(db, username, hashed_password):
+    """
+    Guarda um novo administrador com a senha já encriptada.
+    """
+    # Cria um novo objeto 'Administrador' com o username e a senha encriptada.
+    new_admin = Administrador(username=username, hashed_password=hashed_password)
+    # Adiciona o novo administrador à sessão e confirma a transação.
+    db.add(new_admin)
+    db.commit()
+    # Atualiza o objeto 'new_admin' com os dados que a base de dados gerou (como o ID).
+    db.refresh(new_admin)
+    return new_admin
@@ -0,0 +1,272 @@
+# Esse arquivo contém a cache de resultados das consultas de empresas ('get_empresas' e 'get_empresa').
+# As respostas são guardadas já serializadas (bytes JSON), indexadas pelos parâmetros normalizados do pedido.
+# A invalidação é feita por um contador de geração: cada escrita incrementa a geração, e as chaves
+# passam a incluir a nova geração, pelo que as entradas antigas deixam de ser usadas (e acabam por ser descartadas).
+#
+# O armazenamento é configurável ('CACHE_URL'):
+# - "memory" (padrão): em memória, no próprio processo (LRU + TTL + limite de memória).
+#   Só serve com um único worker: a invalidação de um processo não chega aos outros, que continuariam a devolver
+#   as respostas antigas (e a ETag antiga, com 304). Com vários workers ('WEB_CONCURRENCY'), a cache é desativada.
+# - "redis://...": um servidor Redis, partilhado por todos os workers (requer o pacote 'redis').
+# - "local": um substituto local do Redis, em memória, útil para testar o armazenamento partilhado.
+
+# --- Importações de Módulos ---
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from starlette.concurrency import run_in_threadpool
+
+from . import etag_service
+
+# --- Configurações da Cache ---
+CACHE_URL = os.getenv("CACHE_URL", "memory")
+# Tempo (em segundos) que uma resposta fica em cache.
+CACHE_TTL = float(os.getenv("CACHE_TTL", 30))
+# Número máximo de respostas e memória máxima (em bytes) usadas pela cache em memória.
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Número de workers da API (definido pelo lançador 'app.servidor', e também lido pelo uvicorn).
+WEB_CONCURRENCY = max(int(os.getenv("WEB_CONCURRENCY", 1) or 1), 1)
+
+# Chave onde é guardado o contador de geração das empresas.
+CHAVE_GERACAO = "empresas:geracao"
+
+logger = logging.getLogger(__name__)
+
+
+# --- Armazenamento em Memória ---
+
+class MemoriaBackend:
+    """
+    Armazenamento no próprio processo: LRU com TTL e limite de memória.
+    """
+    # As operações são rápidas e não fazem I/O, por isso são chamadas diretamente no event loop.
+    bloqueante = False
+
+    def __init__(self, max_entradas, max_bytes):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # chave -> (valor, instante de expiração)
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._contadores = {}
+
+    def _retirar(self, chave):
+        valor, _ = self._entradas.pop(chave)
+        self._bytes -= len(valor)
+
+    def get(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            if entrada[1] <= time.monotonic():
+                self._retirar(chave)
+                return None
+            self._entradas.move_to_end(chave)
+            return entrada[0]
+
+    def set(self, chave, valor, ttl):
+        # Uma resposta maior do que a memória total da cache não é guardada.
+        if len(valor) > self.max_bytes:
+            return
+        with self._lock:
+            if chave in self._entradas:
+                self._retirar(chave)
+            self._entradas[chave] = (valor, time.monotonic() + ttl)
+            self._bytes += len(valor)
+            # Descarta as entradas menos usadas recentemente até respeitar os limites.
+            while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                self._retirar(next(iter(self._entradas)))
+
+    def get_int(self, chave):
+        with self._lock:
+            return self._contadores.get(chave, 0)
+
+    def incr(self, chave):
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + 1
+            return self._contadores[chave]
+
+    def estatisticas(self):
+        with self._lock:
+            return {"entradas": len(self._entradas), "bytes": self._bytes}
+
+
+# --- Cache Desativada ---
+
+class SemCacheBackend:
+    """
+    Armazenamento que não guarda nada: todas as consultas vão à base de dados.
+    Usado em vez da memória do processo quando a API corre com vários workers.
+    """
+    bloqueante = False
+
+    def get(self, chave):
+        return None
+
+    def set(self, chave, valor, ttl):
+        pass
+
+    def get_int(self, chave):
+        return 0
+
+    def incr(self, chave):
+        return 0
+
+    def estatisticas(self):
+        return {"desativada": True}
+
+
+# --- Armazenamento Partilhado (Redis) ---
+
+class RedisBackend:
+    """
+    Armazenamento partilhado por todos os workers, num servidor Redis (ou num cliente compatível).
+    O limite de memória e a política de descarte são os do próprio servidor ('maxmemory').
+    """
+    # As operações fazem I/O de rede, por isso correm no threadpool.
+    bloqueante = True
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+
+    def get(self, chave):
+        return self.cliente.get(chave)
+
+    def set(self, chave, valor, ttl):
+        self.cliente.set(chave, valor, ex=max(int(ttl), 1))
+
+    def get_int(self, chave):
+        valor = self.cliente.get(chave)
+        return int(valor) if valor is not None else 0
+
+    def incr(self, chave):
+        return self.cliente.incr(chave)
+
+    def estatisticas(self):
+        return {}
+
+
+class ClienteRedisLocal:
+    """
+    Substituto local de um cliente Redis (apenas 'get', 'set' e 'incr'), para testes.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dados = {}
+
+    def get(self, chave):
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is None:
+                return None
+            valor, expira_em = entrada
+            if expira_em is not None and expira_em <= time.monotonic():
+                del self._dados[chave]
+                return None
+            return valor
+
+    def set(self, chave, valor, ex=None):
+        with self._lock:
+            self._dados[chave] = (valor, time.monotonic() + ex if ex else None)
+
+    def incr(self, chave):
+        with self._lock:
+            valor = int(self._dados.get(chave, (0, None))[0]) + 1
+            self._dados[chave] = (str(valor).encode(), None)
+            return valor
+
+
+def criar_backend(url, workers=1):
+    """
+    Cria o armazenamento da cache a partir da configuração 'CACHE_URL'.
+    Com vários workers, a cache em memória é desativada (cada processo teria a sua, sem as invalidações dos outros).
+    """
+    if url == "memory":
+        if workers > 1:
+            logger.warning(
+                "CACHE_URL=memory com %d workers: a cache de consultas fica desativada, porque as escritas de um worker "
+                "não invalidam a cache dos outros. Use um servidor Redis (CACHE_URL=redis://...) para a partilhar.",
+                workers,
+            )
+            return SemCacheBackend()
+        return MemoriaBackend(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)
+    if url == "local":
+        return RedisBackend(ClienteRedisLocal())
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_URL aponta para um servidor Redis, mas o pacote 'redis' não está instalado.")
+        return RedisBackend(redis.Redis.from_url(url))
+    raise ValueError(f"CACHE_URL inválida: '{url}'.")
+
+
+# --- Cache de Consultas ---
+
+class CacheConsultas:
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        # Contadores para acompanhar a eficácia da cache.
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+
+    async def _chamar(self, metodo, *args):
+        if self.backend.bloqueante:
+            return await run_in_threadpool(metodo, *args)
+        return metodo(*args)
+
+    async def chave(self, nome, parametros):
+        """
+        Gera a chave de uma consulta: o nome, a geração atual e um resumo dos parâmetros normalizados
+        (sem os parâmetros vazios, e com os termos de pesquisa sem diferenciar maiúsculas de minúsculas).
+        """
+        resumo = etag_service.resumir_parametros(parametros)
+        geracao = await self._chamar(self.backend.get_int, CHAVE_GERACAO)
+        return f"empresas:{geracao}:{nome}:{resumo}"
+
+    async def obter(self, chave):
+        """
+        Devolve (corpo, cabeçalhos) da resposta guardada, ou None se não existir.
+        """
+        valor = await self._chamar(self.backend.get, chave)
+        if valor is None:
+            self.falhas += 1
+            return None
+        self.acertos += 1
+        cabecalhos, corpo = valor.split(b"\n", 1)
+        return corpo, json.loads(cabecalhos)
+
+    async def guardar(self, chave, corpo, cabecalhos=None):
+        """
+        Guarda o corpo já serializado de uma resposta e os cabeçalhos que a acompanham.
+        """
+        valor = json.dumps(cabecalhos or {}).encode() + b"\n" + corpo
+        await self._chamar(self.backend.set, chave, valor, self.ttl)
+
+    async def invalidar(self):
+        """
+        Incrementa a geração, invalidando todas as respostas guardadas. Chamada pelas rotas de escrita.
+        """
+        self.invalidacoes += 1
+        await self._chamar(self.backend.incr, CHAVE_GERACAO)
+
+    def estatisticas(self):
+        return {
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "invalidacoes": self.invalidacoes,
+            **self.backend.estatisticas(),
+        }
+
+
+# Instância única da cache, partilhada por todos os pedidos deste processo.
+cache = CacheConsultas(criar_backend(CACHE_URL, WEB_CONCURRENCY), CACHE_TTL)
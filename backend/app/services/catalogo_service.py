@@ -0,0 +1,239 @@
+# Esse arquivo contém os catálogos das cidades e dos ramos de atuação (tabelas 'cidades' e 'ramos_atuacao').
+# Cada valor distinto é guardado uma única vez e as empresas guardam o seu ID ("interning"):
+# - na escrita, os nomes recebidos são convertidos nos IDs ('para_colunas'), criando as entradas em falta;
+# - na pesquisa, o termo é procurado no catálogo (uma tabela pequena) e o filtro das empresas passa a ser
+#   uma igualdade sobre o ID, servida pelo índice (cidade_id, id), quando o valor corresponde exatamente a uma entrada.
+# Os valores são comparados pela chave: sem acentos, sem distinção de maiúsculas e com os espaços normalizados.
+
+# --- Importações de Módulos ---
+import re
+import threading
+import unicodedata
+from sqlalchemy import String, event, inspect, literal_column, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..models.catalogo import Cidade, RamoAtuacao
+from ..models.empresa import Empresa
+
+
+# --- Chave de Comparação ---
+
+def chave(texto):
+    """
+    Calcula a chave de um valor: sem acentos, sem distinção de maiúsculas e com os espaços normalizados.
+    """
+    decomposto = unicodedata.normalize("NFKD", texto.casefold())
+    return " ".join("".join(c for c in decomposto if not unicodedata.combining(c)).split())
+
+
+def nome_normalizado(texto):
+    """
+    Normaliza os espaços do nome guardado no catálogo (a grafia é mantida).
+    """
+    return " ".join(texto.split())
+
+
+# --- Catálogo ---
+
+class Catalogo:
+    """
+    Um catálogo (tabela de valores distintos) e a cache, neste processo, das chaves já conhecidas.
+    Como as entradas nunca são alteradas nem apagadas, uma chave em cache é sempre válida.
+    """
+    def __init__(self, campo, modelo, coluna, coluna_nome=None):
+        # O campo da empresa (ex: "cidade"), o modelo do catálogo, a coluna da empresa com o ID (ex: Empresa.cidade_id)
+        # e, se existir, a coluna da empresa com a cópia do nome (ex: Empresa.cidade_nome).
+        self.campo = campo
+        self.modelo = modelo
+        self.coluna = coluna
+        self.coluna_nome = coluna_nome
+        self._lock = threading.Lock()
+        # chave -> (ID, nome), apenas de entradas já confirmadas (commit) na base de dados.
+        self._ids = {}
+
+    def guardar(self, entradas):
+        with self._lock:
+            self._ids.update(entradas)
+
+    def resolver(self, db, nomes):
+        """
+        Devolve {chave: (ID, nome)} para os nomes indicados, criando as entradas em falta na transação da sessão
+        (com 'INSERT ... ON CONFLICT DO NOTHING', seguro com escritas em simultâneo). Não faz o commit.
+        As entradas criadas ou lidas nesta transação só entram na cache depois do commit (ver '_confirmar'):
+        se a transação for desfeita, a cache não fica com IDs que não existem.
+        """
+        pendentes = db.info.setdefault("catalogo_pendente", {}).setdefault(self.campo, {})
+        resultado, em_falta = {}, {}
+        with self._lock:
+            for nome in nomes:
+                k = chave(nome)
+                entrada = self._ids.get(k) or pendentes.get(k)
+                if entrada is not None:
+                    resultado[k] = entrada
+                else:
+                    # A primeira grafia recebida é a que fica registada.
+                    em_falta.setdefault(k, nome_normalizado(nome))
+        if not em_falta:
+            return resultado
+
+        # A ordem fixa das chaves evita bloqueios mútuos (deadlocks) entre escritas em simultâneo no PostgreSQL.
+        dialeto = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        db.execute(
+            dialeto.insert(self.modelo)
+            .values([{"nome": nome, "chave": k} for k, nome in sorted(em_falta.items())])
+            .on_conflict_do_nothing(index_elements=[self.modelo.chave])
+        )
+        encontrados = {
+            k: (identificador, nome)
+            for k, identificador, nome in db.execute(
+                select(self.modelo.chave, self.modelo.id, self.modelo.nome).where(self.modelo.chave.in_(list(em_falta)))
+            )
+        }
+        pendentes.update(encontrados)
+        resultado.update(encontrados)
+        return resultado
+
+    def procurar(self, db, termo):
+        """
+        Procura o termo no catálogo. Devolve {ID: chave} de uma única entrada, se a chave do termo corresponder
+        exatamente a uma entrada, ou das entradas cuja chave contém a chave do termo.
+        """
+        k = chave(termo)
+        linhas = db.execute(
+            select(self.modelo.id, self.modelo.chave).where(self.modelo.chave.contains(k, autoescape=True))
+        ).all()
+        exatas = {identificador: c for identificador, c in linhas if c == k}
+        return exatas or dict(linhas)
+
+
+# Catálogos, pelo campo da empresa.
+CATALOGOS = {
+    "cidade": Catalogo("cidade", Cidade, Empresa.cidade_id, Empresa.cidade_nome),
+    "ramo_atuacao": Catalogo("ramo_atuacao", RamoAtuacao, Empresa.ramo_atuacao_id),
+}
+
+
+def para_colunas(db, registos):
+    """
+    Converte os dados de empresas (dicionários com os nomes da cidade e do ramo de atuação) nos valores
+    das colunas da tabela: 'cidade' passa a 'cidade_id' (e 'cidade_nome', com o nome do catálogo)
+    e 'ramo_atuacao' a 'ramo_atuacao_id'.
+    Resolve os nomes de todos os registos de uma só vez (uma consulta por catálogo, no máximo).
+    """
+    registos = [dict(dados) for dados in registos]
+    for campo, catalogo in CATALOGOS.items():
+        nomes = [dados[campo] for dados in registos if campo in dados]
+        if not nomes:
+            continue
+        entradas = catalogo.resolver(db, nomes)
+        for dados in registos:
+            if campo in dados:
+                identificador, nome = entradas[chave(dados.pop(campo))]
+                dados[catalogo.coluna.key] = identificador
+                if catalogo.coluna_nome is not None:
+                    dados[catalogo.coluna_nome.key] = nome
+    return registos
+
+
+def nome_inserido(campo):
+    """
+    Devolve a coluna do nome do catálogo para o RETURNING de um INSERT na tabela de empresas.
+    Nas consultas, o nome vem da subconsulta do modelo ('Empresa.cidade'); num INSERT, o SQLAlchemy
+    não a associa à linha inserida, por isso a subconsulta é escrita com o nome da tabela.
+    """
+    catalogo = CATALOGOS[campo]
+    tabela = catalogo.modelo.__tablename__
+    return literal_column(
+        f"(SELECT {tabela}.nome FROM {tabela} WHERE {tabela}.id = empresas.{catalogo.coluna.key})", String
+    ).label(campo)
+
+
+# --- Cache Após o Commit ---
+# As entradas resolvidas numa transação ficam em 'db.info' até ao fim da transação:
+# entram na cache com o commit e são descartadas com o rollback.
+
+@event.listens_for(Session, "after_commit")
+def _confirmar(session):
+    for campo, entradas in session.info.pop("catalogo_pendente", {}).items():
+        CATALOGOS[campo].guardar(entradas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar(session):
+    session.info.pop("catalogo_pendente", None)
+
+
+# --- Migração dos Dados Existentes ---
+
+def _indices_texto(conexao):
+    """
+    Devolve os nomes dos índices da tabela 'empresas' que usam as colunas de texto 'cidade' ou 'ramo_atuacao'
+    (incluindo os criados com 'index=True' e os índices de expressões, como os de trigramas).
+    """
+    campos = re.compile(r"\b(" + "|".join(CATALOGOS) + r")\b")
+    indices = []
+    for indice in inspect(conexao).get_indexes(Empresa.__tablename__):
+        colunas = [coluna for coluna in indice["column_names"] if coluna] + list(indice.get("expressions") or [])
+        if any(campos.search(coluna) for coluna in colunas):
+            indices.append(indice["name"])
+    return indices
+
+
+def migrar(conexao):
+    """
+    Converte uma tabela 'empresas' criada antes dos catálogos (com as colunas de texto 'cidade' e 'ramo_atuacao'):
+    preenche os catálogos com os valores distintos, acrescenta e preenche as colunas 'cidade_id' e 'ramo_atuacao_id',
+    cria os índices novos e apaga as colunas de texto (e os respetivos índices). É executada na transação
+    da conexão recebida (ver 'esquema_service.atualizar'), depois de criadas as tabelas dos catálogos.
+    Quando várias grafias têm a mesma chave, a entrada fica com a mais frequente (em caso de empate, a primeira
+    por ordem alfabética, que prefere as maiúsculas).
+    Devolve {campo: número de entradas do catálogo}, ou None se a tabela já estiver no formato novo.
+    """
+    colunas = {coluna["name"] for coluna in inspect(conexao).get_columns(Empresa.__tablename__)}
+    if "cidade" not in colunas:
+        return None
+
+    postgres = conexao.dialect.name == "postgresql"
+    resultado = {}
+    for campo, catalogo in CATALOGOS.items():
+        coluna_id = catalogo.coluna.key
+        tabela = catalogo.modelo.__tablename__
+        if coluna_id not in colunas:
+            conexao.execute(text(f"ALTER TABLE empresas ADD COLUMN {coluna_id} INTEGER REFERENCES {tabela} (id)"))
+
+        # Os valores distintos e a respetiva frequência, agrupados pela chave.
+        grafias = {}
+        for valor, total in conexao.execute(text(f"SELECT {campo}, COUNT(*) FROM empresas GROUP BY {campo}")):
+            grafias.setdefault(chave(valor), []).append((total, valor))
+        if grafias:
+            dialeto = postgresql if postgres else sqlite
+            conexao.execute(
+                dialeto.insert(catalogo.modelo)
+                .values([
+                    {"nome": nome_normalizado(min(valores, key=lambda item: (-item[0], item[1]))[1]), "chave": k}
+                    for k, valores in sorted(grafias.items())
+                ])
+                .on_conflict_do_nothing(index_elements=[catalogo.modelo.chave])
+            )
+        ids = dict(conexao.execute(select(catalogo.modelo.chave, catalogo.modelo.id)).all())
+
+        # Uma atualização por valor distinto (executemany).
+        conexao.execute(
+            text(f"UPDATE empresas SET {coluna_id} = :id WHERE {campo} = :valor"),
+            [{"id": ids[k], "valor": valor} for k, valores in grafias.items() for _, valor in valores],
+        )
+        resultado[campo] = len(ids)
+
+    # Os índices das colunas de texto têm de ser apagados antes das colunas.
+    for indice in _indices_texto(conexao):
+        conexao.execute(text(f"DROP INDEX {indice}"))
+    for campo, catalogo in CATALOGOS.items():
+        conexao.execute(text(f"ALTER TABLE empresas DROP COLUMN {campo}"))
+        # O SQLite não permite acrescentar a restrição NOT NULL a uma coluna existente.
+        if postgres:
+            conexao.execute(text(f"ALTER TABLE empresas ALTER COLUMN {catalogo.coluna.key} SET NOT NULL"))
+    for indice in Empresa.__table__.indexes:
+        if indice.name in ("ix_empresas_cidade_id_id", "ix_empresas_ramo_atuacao_id_id"):
+            indice.create(bind=conexao, checkfirst=True)
+    return resultado
@@ -0,0 +1,247 @@
+# Esse arquivo contém a compressão das respostas HTTP (gzip e brotli), negociada pelo cabeçalho 'Accept-Encoding'.
+# O middleware 'MiddlewareCompressao' (registado em 'main.py') comprime os bytes que a rota já produziu
+# (a serialização é feita uma única vez, pela rota ou pela cache de consultas):
+# - Respostas completas (com o corpo numa única mensagem) só são comprimidas a partir de 'COMPRESSAO_MINIMO' bytes:
+#   abaixo disso, o ganho não compensa o custo. Se a resposta tiver uma ETag forte, o resultado comprimido
+#   fica numa pequena cache (por ETag, tipo de conteúdo e codificação), para que os pedidos repetidos da mesma
+#   página não voltem a comprimir os mesmos bytes.
+# - Respostas em streaming (exportação, ficheiros das tarefas) são comprimidas bloco a bloco, à medida que são enviadas.
+# - Os eventos em tempo real ('text/event-stream') nunca são comprimidos, para que cada evento chegue de imediato.
+# O brotli é opcional: sem o pacote 'brotli', só o gzip é oferecido.
+
+# --- Importações de Módulos ---
+import gzip
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# --- Configurações da Compressão ---
+# Tamanho mínimo (em bytes) de uma resposta completa para ser comprimida.
+COMPRESSAO_MINIMO = int(os.getenv("COMPRESSAO_MINIMO", 1024))
+# Níveis de compressão: gzip de 1 a 9, brotli de 0 a 11. Os níveis altos comprimem pouco mais e custam muito mais CPU.
+COMPRESSAO_GZIP_NIVEL = int(os.getenv("COMPRESSAO_GZIP_NIVEL", 6))
+COMPRESSAO_BROTLI_NIVEL = int(os.getenv("COMPRESSAO_BROTLI_NIVEL", 4))
+# Memória máxima (em bytes) da cache das respostas comprimidas. Com 0, a cache fica desativada.
+COMPRESSAO_CACHE_BYTES = int(os.getenv("COMPRESSAO_CACHE_BYTES", 16 * 1024 * 1024))
+
+# Tipos de conteúdo comprimidos (texto, JSON, NDJSON, CSV e os formatos binários da listagem, muito repetitivos).
+TIPOS_COMPRIMIVEIS = ("text/", "application/json", "application/x-ndjson", "application/msgpack", "application/vnd.")
+TIPOS_EXCLUIDOS = ("text/event-stream",)
+
+
+# --- Codificações ---
+
+class Gzip:
+    nome = "gzip"
+
+    def __init__(self, nivel):
+        self.nivel = nivel
+
+    def comprimir(self, dados):
+        # 'mtime=0' torna o resultado igual para os mesmos bytes (sem a data no cabeçalho gzip).
+        return gzip.compress(dados, compresslevel=self.nivel, mtime=0)
+
+    def fluxo(self):
+        # 'wbits=31': formato gzip (cabeçalho e soma de verificação), com a janela máxima.
+        compressor = zlib.compressobj(self.nivel, zlib.DEFLATED, 31)
+        # Cada bloco é enviado de imediato ('Z_SYNC_FLUSH'), sem esperar pelos seguintes.
+        return (lambda dados: compressor.compress(dados) + compressor.flush(zlib.Z_SYNC_FLUSH)), compressor.flush
+
+
+class Brotli:
+    nome = "br"
+
+    def __init__(self, nivel):
+        self.nivel = nivel
+
+    def comprimir(self, dados):
+        return brotli.compress(dados, quality=self.nivel)
+
+    def fluxo(self):
+        compressor = brotli.Compressor(quality=self.nivel)
+        return (lambda dados: compressor.process(dados) + compressor.flush()), compressor.finish
+
+
+def criar_codificacoes(nivel_gzip=COMPRESSAO_GZIP_NIVEL, nivel_brotli=COMPRESSAO_BROTLI_NIVEL):
+    """
+    Devolve as codificações disponíveis, por ordem de preferência (o brotli comprime mais do que o gzip).
+    """
+    codificacoes = {}
+    if brotli is not None:
+        codificacoes["br"] = Brotli(nivel_brotli)
+    codificacoes["gzip"] = Gzip(nivel_gzip)
+    return codificacoes
+
+
+def escolher(accept_encoding, codificacoes):
+    """
+    Escolhe a codificação a partir do cabeçalho 'Accept-Encoding' (com os pesos 'q').
+    Devolve None se o cliente não aceitar nenhuma das disponíveis (a resposta segue sem compressão).
+    """
+    if not accept_encoding:
+        return None
+    pesos = {}
+    for parte in accept_encoding.split(","):
+        nome, _, opcoes = parte.partition(";")
+        peso = 1.0
+        nome_opcao, _, valor = opcoes.partition("=")
+        if nome_opcao.strip() == "q":
+            try:
+                peso = float(valor)
+            except ValueError:
+                peso = 0.0
+        pesos[nome.strip().lower()] = peso
+    melhor, melhor_peso = None, 0.0
+    for nome, codificacao in codificacoes.items():
+        peso = pesos.get(nome, pesos.get("*", 0.0))
+        if peso > melhor_peso:
+            melhor, melhor_peso = codificacao, peso
+    return melhor
+
+
+def comprimivel(cabecalhos):
+    tipo = cabecalhos.get("content-type", "")
+    return (
+        tipo.startswith(TIPOS_COMPRIMIVEIS)
+        and not tipo.startswith(TIPOS_EXCLUIDOS)
+        and "content-encoding" not in cabecalhos
+    )
+
+
+# --- Cache das Respostas Comprimidas ---
+
+class CacheComprimidas:
+    """
+    LRU com limite de memória: (ETag, tipo de conteúdo, codificação) -> bytes comprimidos.
+    Uma ETag forte identifica exatamente os bytes da resposta, por isso a entrada nunca fica desatualizada.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        # Contadores para acompanhar a eficácia da cache.
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave):
+        with self._lock:
+            valor = self._entradas.get(chave)
+            if valor is None:
+                self.falhas += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def guardar(self, chave, valor):
+        if len(valor) > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(chave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior)
+            self._entradas[chave] = valor
+            self._bytes += len(valor)
+            while self._bytes > self.max_bytes:
+                _, descartado = self._entradas.popitem(last=False)
+                self._bytes -= len(descartado)
+
+
+# --- Middleware ---
+
+class MiddlewareCompressao:
+    """
+    Middleware ASGI que comprime as respostas com a codificação negociada.
+    Como o 'MiddlewareMetricas', não usa o 'BaseHTTPMiddleware' do Starlette, para não atrasar as respostas em streaming.
+    """
+    def __init__(self, app, minimo=COMPRESSAO_MINIMO, nivel_gzip=COMPRESSAO_GZIP_NIVEL,
+                 nivel_brotli=COMPRESSAO_BROTLI_NIVEL, cache_bytes=COMPRESSAO_CACHE_BYTES):
+        self.app = app
+        self.minimo = minimo
+        self.codificacoes = criar_codificacoes(nivel_gzip, nivel_brotli)
+        self.cache = CacheComprimidas(cache_bytes) if cache_bytes > 0 else None
+
+    def _comprimir(self, codificacao, corpo, etag, tipo):
+        if self.cache is None or not etag or etag.startswith("W/"):
+            return codificacao.comprimir(corpo)
+        chave = (etag, tipo, codificacao.nome)
+        comprimido = self.cache.obter(chave)
+        if comprimido is None:
+            comprimido = codificacao.comprimir(corpo)
+            self.cache.guardar(chave, comprimido)
+        return comprimido
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codificacao = escolher(Headers(scope=scope).get("accept-encoding"), self.codificacoes)
+        inicio = None
+        # Funções do compressor em streaming (comprimir um bloco, terminar), quando a resposta é enviada aos poucos.
+        fluxo = None
+
+        async def enviar(mensagem):
+            nonlocal inicio, fluxo
+            if mensagem["type"] == "http.response.start":
+                # O início da resposta só é enviado com o primeiro bloco do corpo, quando já se sabe se vai ser comprimida.
+                inicio = mensagem
+                return
+            if mensagem["type"] != "http.response.body":
+                await send(mensagem)
+                return
+
+            if inicio is not None:
+                mensagem_inicio, inicio = inicio, None
+                cabecalhos = MutableHeaders(raw=mensagem_inicio["headers"])
+                corpo = mensagem.get("body", b"")
+                mais = mensagem.get("more_body", False)
+                if mensagem_inicio["status"] in (204, 206, 304) or not comprimivel(cabecalhos):
+                    await send(mensagem_inicio)
+                    await send(mensagem)
+                    return
+                # A resposta depende do 'Accept-Encoding', mesmo quando não é comprimida.
+                cabecalhos.add_vary_header("Accept-Encoding")
+                if codificacao is None or (not mais and len(corpo) < self.minimo):
+                    await send(mensagem_inicio)
+                    await send(mensagem)
+                    return
+
+                cabecalhos["Content-Encoding"] = codificacao.nome
+                # Os bytes enviados deixam de ser os da ETag forte: passa a fraca, que continua a servir
+                # o 'If-None-Match' (comparação fraca), como nos proxies que comprimem as respostas.
+                etag = cabecalhos.get("etag")
+                if etag and not etag.startswith("W/"):
+                    cabecalhos["ETag"] = "W/" + etag
+                if not mais:
+                    comprimido = self._comprimir(codificacao, corpo, etag, cabecalhos.get("content-type"))
+                    cabecalhos["Content-Length"] = str(len(comprimido))
+                    await send(mensagem_inicio)
+                    await send({"type": "http.response.body", "body": comprimido})
+                    return
+                # Em streaming, o tamanho final não é conhecido.
+                if "content-length" in cabecalhos:
+                    del cabecalhos["content-length"]
+                fluxo = codificacao.fluxo()
+                await send(mensagem_inicio)
+
+            if fluxo is None:
+                await send(mensagem)
+                return
+            comprimir, terminar = fluxo
+            dados = comprimir(mensagem.get("body", b""))
+            mais = mensagem.get("more_body", False)
+            if not mais:
+                dados += terminar()
+            if dados or not mais:
+                await send({"type": "http.response.body", "body": dados, "more_body": mais})
+
+        await self.app(scope, receive, enviar)
@@ -0,0 +1,257 @@
+# Esse arquivo contém o registo das consultas lentas à base de dados, consultado em 'GET /diagnostico/consultas-lentas'.
+# Os eventos 'before/after_cursor_execute' de cada engine medem todas as consultas; as que demoram mais
+# do que 'SLOW_QUERY_MS' são registadas com:
+# - o SQL normalizado (valores literais e listas de parâmetros substituídos por '?'), que identifica a consulta
+#   (a "impressão digital") independentemente dos valores usados, por isso cada combinação de filtros
+#   da listagem tem a sua própria entrada;
+# - a forma dos parâmetros (o tipo e o tamanho de cada um, nunca os valores, que podem conter dados pessoais);
+# - a duração e, em PostgreSQL, o plano de execução ('EXPLAIN (ANALYZE, BUFFERS)').
+#
+# As consultas recentes ficam num buffer circular ('SLOW_QUERY_BUFFER' entradas) e são agregadas por impressão digital
+# (número de ocorrências, tempo total e tempo máximo), para mostrar as que mais pesam na base de dados.
+# O 'EXPLAIN ANALYZE' volta a executar a consulta, por isso é limitado a uma vez por impressão digital
+# a cada 'SLOW_QUERY_EXPLAIN_INTERVAL' segundos e só é feito para consultas SELECT.
+
+# --- Importações de Módulos ---
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from sqlalchemy import event
+
+from ..db import database
+
+# --- Configurações do Registo ---
+# Duração mínima (em milissegundos) de uma consulta registada. Com um valor negativo, o registo fica desativado.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 100))
+# Número de consultas lentas recentes guardadas.
+SLOW_QUERY_BUFFER = int(os.getenv("SLOW_QUERY_BUFFER", 200))
+# Captura do plano de execução em PostgreSQL e intervalo mínimo (em segundos) entre capturas da mesma consulta.
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes")
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", 60))
+
+# Número máximo de impressões digitais agregadas (as que menos tempo somam são descartadas primeiro).
+MAX_IMPRESSOES = 1000
+# Intervalo mínimo (em segundos) entre duas capturas de planos quaisquer, para não sobrecarregar a base de dados.
+INTERVALO_GLOBAL_EXPLAIN = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+# --- Normalização das Consultas ---
+
+_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_MARCADOR = re.compile(r"%\(\w+\)s|\$\d+|%s|\?")
+_LISTA_MARCADORES = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_LISTAS_REPETIDAS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_ESPACOS = re.compile(r"\s+")
+
+
+def normalizar(sql):
+    """
+    Substitui os valores literais e os marcadores de parâmetros por '?' e reduz as listas de tamanho variável
+    (ex: 'IN (?, ?, ?)' ou várias linhas de VALUES) a uma única forma.
+    """
+    sql = _TEXTO.sub("?", sql)
+    sql = _MARCADOR.sub("?", sql)
+    sql = _NUMERO.sub("?", sql)
+    sql = _LISTA_MARCADORES.sub("(?)", sql)
+    sql = _LISTAS_REPETIDAS.sub("(?), ...", sql)
+    return _ESPACOS.sub(" ", sql).strip()
+
+
+def impressao_digital(sql_normalizado):
+    return hashlib.sha1(sql_normalizado.encode()).hexdigest()[:16]
+
+
+def _tipo(valor):
+    if valor is None:
+        return "None"
+    if isinstance(valor, (str, bytes, list, tuple)):
+        return f"{type(valor).__name__}[{len(valor)}]"
+    return type(valor).__name__
+
+
+def _forma(parametros):
+    if isinstance(parametros, dict):
+        return {nome: _tipo(valor) for nome, valor in parametros.items()}
+    if isinstance(parametros, (list, tuple)):
+        # Os tipos repetidos seguidos (ex: os IDs de um 'IN') são agrupados: ["int x 500"].
+        forma = []
+        for tipo in map(_tipo, parametros):
+            if forma and forma[-1][0] == tipo:
+                forma[-1][1] += 1
+            else:
+                forma.append([tipo, 1])
+        return [tipo if n == 1 else f"{tipo} x {n}" for tipo, n in forma]
+    return _tipo(parametros)
+
+
+def forma_parametros(parametros, executemany):
+    """
+    Descreve os parâmetros de uma consulta pelo tipo (e tamanho) de cada um, sem os valores.
+    """
+    if executemany:
+        return {"linhas": len(parametros), "forma": _forma(parametros[0]) if parametros else None}
+    return _forma(parametros)
+
+
+# --- Registo ---
+
+class RegistoConsultasLentas:
+    """
+    Buffer circular das consultas lentas recentes e agregação por impressão digital.
+    """
+    def __init__(self, tamanho):
+        self._lock = threading.Lock()
+        self._recentes = deque(maxlen=tamanho)
+        # impressão digital -> {sql, ocorrencias, tempo_total_ms, tempo_maximo_ms, ultima, plano}
+        self._agregados = {}
+        # impressão digital -> instante da última captura do plano
+        self._ultimo_explain = {}
+        self._ultimo_explain_global = 0.0
+
+    def registar(self, impressao, sql, parametros, duracao_ms, plano=None):
+        agora = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self._recentes.append({
+                "impressao_digital": impressao, "sql": sql, "parametros": parametros,
+                "duracao_ms": round(duracao_ms, 3), "instante": agora, "plano": plano,
+            })
+            agregado = self._agregados.get(impressao)
+            if agregado is None:
+                if len(self._agregados) >= MAX_IMPRESSOES:
+                    menor = min(self._agregados, key=lambda chave: self._agregados[chave]["tempo_total_ms"])
+                    del self._agregados[menor]
+                agregado = self._agregados[impressao] = {
+                    "impressao_digital": impressao, "sql": sql, "ocorrencias": 0,
+                    "tempo_total_ms": 0.0, "tempo_maximo_ms": 0.0, "ultima": None, "plano": None,
+                }
+            agregado["ocorrencias"] += 1
+            agregado["tempo_total_ms"] += duracao_ms
+            agregado["tempo_maximo_ms"] = max(agregado["tempo_maximo_ms"], duracao_ms)
+            agregado["ultima"] = agora
+            if plano is not None:
+                agregado["plano"] = plano
+
+    def reservar_explain(self, impressao):
+        """
+        Indica se o plano desta consulta pode ser capturado agora (e, se sim, conta a captura).
+        """
+        agora = time.monotonic()
+        with self._lock:
+            if agora - self._ultimo_explain_global < INTERVALO_GLOBAL_EXPLAIN:
+                return False
+            if agora - self._ultimo_explain.get(impressao, float("-inf")) < SLOW_QUERY_EXPLAIN_INTERVAL:
+                return False
+            self._ultimo_explain_global = agora
+            self._ultimo_explain[impressao] = agora
+            return True
+
+    def resumo(self, top, limite):
+        """
+        Devolve as 'top' consultas com maior tempo total e as 'limite' consultas lentas mais recentes.
+        """
+        with self._lock:
+            agregados = sorted(self._agregados.values(), key=lambda item: item["tempo_total_ms"], reverse=True)[:top]
+            recentes = list(self._recentes)[-limite:] if limite else []
+            return {
+                "top": [
+                    {**item, "tempo_total_ms": round(item["tempo_total_ms"], 3),
+                     "tempo_medio_ms": round(item["tempo_total_ms"] / item["ocorrencias"], 3),
+                     "tempo_maximo_ms": round(item["tempo_maximo_ms"], 3)}
+                    for item in agregados
+                ],
+                "recentes": recentes[::-1],
+            }
+
+    def limpar(self):
+        with self._lock:
+            self._recentes.clear()
+            self._agregados.clear()
+            self._ultimo_explain.clear()
+
+
+# Instância única do registo, partilhada por todos os pedidos deste processo.
+registo = RegistoConsultasLentas(SLOW_QUERY_BUFFER)
+
+
+# --- Captura do Plano (PostgreSQL) ---
+
+def _capturar_plano(conn, statement, parameters):
+    """
+    Executa 'EXPLAIN (ANALYZE, BUFFERS)' na mesma conexão (e transação) da consulta, dentro de um SAVEPOINT,
+    para que uma falha não invalide a transação do pedido. Usa o cursor do driver diretamente,
+    por isso o EXPLAIN não passa pelos eventos do engine (nem é contado nas métricas do pedido).
+    """
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("SAVEPOINT consulta_lenta_explain")
+        try:
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+            plano = "\n".join(linha[0] for linha in cursor.fetchall())
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT consulta_lenta_explain")
+            raise
+        finally:
+            cursor.execute("RELEASE SAVEPOINT consulta_lenta_explain")
+        return plano
+    finally:
+        cursor.close()
+
+
+def _pode_explicar(conn, statement, context, executemany):
+    if not SLOW_QUERY_EXPLAIN or executemany or conn.dialect.name != "postgresql":
+        return False
+    # O ANALYZE executa a consulta de novo: apenas leituras, e nunca as exportações (cursores do lado do servidor),
+    # que percorrem a tabela inteira.
+    if context is not None and context.execution_options.get("stream_results"):
+        return False
+    inicio = statement.lstrip()[:6].upper()
+    return inicio in ("SELECT", "WITH") and " FOR UPDATE" not in statement.upper()
+
+
+# --- Eventos do Engine ---
+
+def _antes_consulta(conn, cursor, statement, parameters, context, executemany):
+    conn.info["lentas_inicio"] = time.perf_counter()
+
+
+def _depois_consulta(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info.pop("lentas_inicio", None)
+    if inicio is None:
+        return
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+    if duracao_ms < SLOW_QUERY_MS:
+        return
+
+    sql = normalizar(statement)
+    impressao = impressao_digital(sql)
+    plano = None
+    if _pode_explicar(conn, statement, context, executemany) and registo.reservar_explain(impressao):
+        try:
+            plano = _capturar_plano(conn, statement, parameters)
+        except Exception:
+            logger.warning("Não foi possível obter o plano da consulta %s.", impressao, exc_info=True)
+
+    registo.registar(impressao, sql, forma_parametros(parameters, executemany), duracao_ms, plano)
+    logger.warning("Consulta lenta (%.1f ms) [%s]: %s", duracao_ms, impressao, sql)
+
+
+def instrumentar(engine):
+    """
+    Regista os eventos que medem as consultas do engine.
+    """
+    if not event.contains(engine, "before_cursor_execute", _antes_consulta):
+        event.listen(engine, "before_cursor_execute", _antes_consulta)
+        event.listen(engine, "after_cursor_execute", _depois_consulta)
+
+
+if SLOW_QUERY_MS >= 0:
+    for _engine in database.engines:
+        instrumentar(_engine)
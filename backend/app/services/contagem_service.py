@@ -0,0 +1,65 @@
+# Esse arquivo contém a contagem do total de resultados da listagem de empresas (cabeçalho 'X-Total-Count').
+# - Sem filtros, o total é o contador mantido pelas escritas ('faceta_service'): exato e lido em O(1).
+# - Com filtros, o total exato é um 'count(*)' sobre os resultados da pesquisa, tão lento como a própria consulta.
+#   Por isso, a rota guarda-o na cache de consultas (que é invalidada a cada escrita): as páginas seguintes
+#   da mesma pesquisa reutilizam-no.
+# - No modo "estimada", em PostgreSQL, o total é a estimativa do planeador ('EXPLAIN'), sem ler as linhas:
+#   é imediata, mesmo em tabelas muito grandes, mas pode afastar-se do valor real (sobretudo antes de um 'ANALYZE').
+#   Nas outras bases de dados não há estimativa, e a contagem é exata.
+
+# --- Importações de Módulos ---
+import json
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from ..models.empresa import Empresa
+from . import search_service
+
+# Modos de contagem: o modo efetivamente usado é devolvido no cabeçalho 'X-Total-Count-Mode'.
+MODO_EXATA = "exata"
+MODO_ESTIMADA = "estimada"
+
+
+# --- Estimativa do Planeador (PostgreSQL) ---
+
+class Explicar(Executable, ClauseElement):
+    """
+    Instrução 'EXPLAIN (FORMAT JSON)' sobre uma consulta. Os parâmetros da consulta são enviados
+    pelo SQLAlchemy como em qualquer outra instrução (sem os escrever no texto do SQL).
+    """
+    inherit_cache = False
+
+    def __init__(self, consulta):
+        self.consulta = consulta
+
+
+@compiles(Explicar, "postgresql")
+def _compilar_explicar(elemento, compilador, **opcoes):
+    return "EXPLAIN (FORMAT JSON) " + compilador.process(elemento.consulta, **opcoes)
+
+
+def estimar(db, consulta):
+    """
+    Devolve o número de linhas que o planeador do PostgreSQL estima para a consulta (sem a executar).
+    """
+    plano = db.execute(Explicar(consulta)).scalar()
+    # Conforme o driver, o plano chega já descodificado ou como texto JSON.
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return int(plano[0]["Plan"]["Plan Rows"])
+
+
+# --- Contagem dos Resultados ---
+
+def contar_empresas(db, filtros, modo):
+    """
+    Conta as empresas que correspondem aos filtros da listagem (com a mesma pesquisa que 'listar_empresas').
+    Devolve (total, modo usado): o modo "estimada" só é possível em PostgreSQL; nas outras bases, a contagem é exata.
+    """
+    pesquisa = search_service.criar_pesquisa(db, filtros)
+    consulta = db.query(Empresa.id)
+    if pesquisa is not None:
+        consulta = pesquisa.filtrar(consulta)
+    if modo == MODO_ESTIMADA and db.get_bind().dialect.name == "postgresql":
+        return estimar(db, consulta.statement), MODO_ESTIMADA
+    return consulta.count(), MODO_EXATA
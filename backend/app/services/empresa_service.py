@@ -0,0 +1,400 @@
+# Esse arquivo contém as operações sobre a base de dados das empresas, usadas pelas rotas em 'routers/empresas.py'.
+# As funções usam a API síncrona da 'Session' e são executadas através de 'database.executar',
+# que as corre no modo assíncrono ou no modo síncrono, consoante a configuração.
+
+# Ferramenta do FastAPI para lançar erros HTTP.
+from fastapi import HTTPException
+# Instruções de escrita do SQLAlchemy (usadas com RETURNING) e o erro de violação de restrições.
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+# Importa o modelo 'Empresa' para interagir com a tabela de empresas e a sequência das versões.
+from ..models.empresa import Empresa, versao_seq
+# Importa o modelo dos registos de exclusão ("tombstones"), usados pela sincronização incremental.
+from ..models.empresa_removida import EmpresaRemovida
+# Importa as funções de paginação por cursor (keyset), o motor de pesquisa textual, os contadores das facetas
+# e os catálogos das cidades e dos ramos de atuação.
+from . import catalogo_service, faceta_service, pagination_service, search_service
+
+
+# Colunas devolvidas pelas instruções de escrita (RETURNING), com os campos da resposta da API.
+# A cidade e o ramo de atuação são lidos do catálogo pelo ID (ver 'models/empresa.py'); os IDs
+# também são devolvidos, para o índice de pesquisa em memória.
+COLUNAS_RESPOSTA = (
+    Empresa.id, Empresa.nome, Empresa.cnpj, Empresa.cidade, Empresa.ramo_atuacao,
+    Empresa.telefone, Empresa.email_contato, Empresa.data_cadastro, Empresa.versao,
+    Empresa.cidade_id, Empresa.ramo_atuacao_id,
+)
+
+# As mesmas colunas, no RETURNING dos INSERT (os nomes do catálogo são lidos pela subconsulta de 'nome_inserido').
+COLUNAS_INSERCAO = tuple(
+    catalogo_service.nome_inserido(coluna.key) if coluna.key in catalogo_service.CATALOGOS else coluna
+    for coluna in COLUNAS_RESPOSTA
+)
+
+# Coluna de ordenação de cada campo da lista branca, quando não é a coluna com o mesmo nome: a cidade é ordenada
+# pela cópia do nome do catálogo, servida pelo índice (cidade_nome, id). O valor guardado no cursor é o mesmo.
+COLUNAS_ORDENACAO = {"cidade": Empresa.cidade_nome}
+
+# Mensagens de erro para as violações das restrições de unicidade, pelo nome da coluna.
+MENSAGENS_UNICIDADE = {
+    "cnpj": "CNPJ já registado.",
+    "email_contato": "Email de contacto já registado.",
+}
+
+
+def erro_unicidade(erro):
+    """
+    Converte um IntegrityError de unicidade (CNPJ ou email) no erro HTTP 400 correspondente.
+    A coluna é identificada pela mensagem da base de dados, que inclui o nome da coluna
+    (SQLite: "UNIQUE constraint failed: empresas.cnpj") ou do índice (PostgreSQL: "ix_empresas_cnpj").
+    """
+    mensagem = str(erro.orig)
+    for coluna, detalhe in MENSAGENS_UNICIDADE.items():
+        if coluna in mensagem:
+            return HTTPException(status_code=400, detail=detalhe)
+    return None
+
+
+# --- Versões das Empresas ---
+# Cada escrita (incluindo as exclusões) recebe a próxima versão de um contador global e crescente
+# (ver 'models/empresa.py'). As versões servem as ETags e a sincronização incremental.
+# As versões têm de ficar visíveis pela mesma ordem em que são atribuídas: se uma transação confirmasse
+# a versão 5 depois de outra ter confirmado a 6, um cliente que já tivesse sincronizado até à 6 nunca veria a 5
+# ('GET /empresas/changes'), e a ETag da listagem podia não mudar. Em SQLite, as escritas já são feitas
+# uma de cada vez. Em PostgreSQL, a sequência entrega os valores sem esperar pelos commits, por isso cada
+# escrita obtém primeiro um bloqueio da transação ('bloquear_versoes'), libertado no commit ou no rollback.
+
+# Chave do bloqueio consultivo ('pg_advisory_xact_lock') que ordena as escritas das empresas em PostgreSQL.
+CHAVE_BLOQUEIO_VERSOES = 1_907_201_401
+
+
+def bloquear_versoes(db):
+    """
+    Em PostgreSQL, espera pelas escritas que já obtiveram uma versão e ainda não a confirmaram, e impede as
+    seguintes de obter a sua até ao fim desta transação. Deve ser a primeira instrução de cada escrita,
+    antes de bloquear qualquer linha (das empresas, dos catálogos ou das facetas), para evitar bloqueios mútuos.
+    Nas outras bases de dados, não faz nada.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(CHAVE_BLOQUEIO_VERSOES)))
+
+def _maior_versao(db):
+    # A maior versão já atribuída, nas empresas e nas exclusões. As exclusões contam porque a linha
+    # da empresa excluída desaparece: sem elas, a versão dessa linha podia voltar a ser atribuída.
+    # 'correlate(None)': as subconsultas leem sempre a tabela inteira, mesmo dentro de uma instrução sobre 'empresas'.
+    # O maior de dois valores é 'greatest' em PostgreSQL e 'max' (com dois argumentos) em SQLite.
+    maior = func.greatest if db.get_bind().dialect.name == "postgresql" else func.max
+    return maior(
+        func.coalesce(select(func.max(Empresa.versao)).correlate(None).scalar_subquery(), 0),
+        func.coalesce(select(func.max(EmpresaRemovida.versao)).correlate(None).scalar_subquery(), 0),
+    )
+
+
+def proxima_versao(db):
+    """
+    Devolve a expressão SQL da próxima versão, para usar dentro da própria instrução de escrita.
+    Em PostgreSQL, usa a sequência; nas outras bases, o maior valor atual mais um
+    (o SQLite só permite uma escrita de cada vez, por isso não há versões repetidas).
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return versao_seq.next_value()
+    return select(_maior_versao(db) + 1).scalar_subquery()
+
+
+def reservar_versoes(db, quantidade):
+    """
+    Reserva 'quantidade' versões consecutivas de uma só vez, para as inserções em lote.
+    Obtém o bloqueio das versões ('bloquear_versoes'), por isso deve ser chamada antes das outras escritas do lote.
+    """
+    bloquear_versoes(db)
+    if db.get_bind().dialect.name == "postgresql":
+        serie = func.generate_series(1, quantidade).table_valued("n")
+        return list(db.execute(select(versao_seq.next_value()).select_from(serie)).scalars())
+    inicio = db.execute(select(_maior_versao(db))).scalar()
+    return list(range(inicio + 1, inicio + 1 + quantidade))
+
+
+def versao_atual(db):
+    """
+    Devolve a maior versão já atribuída (a última alteração, incluindo as exclusões).
+    """
+    return db.execute(select(_maior_versao(db))).scalar()
+
+
+def estado_tabela(db):
+    """
+    Devolve (última versão, número de empresas), usados na ETag da listagem e no cabeçalho 'X-Total-Count'.
+    A última versão inclui as exclusões ('versao_atual'), por isso muda a cada escrita, mesmo quando uma exclusão
+    e uma criação deixam o número de empresas igual.
+    O número de empresas é lido do contador mantido pelas escritas ('faceta_service'), sem contar a tabela.
+    """
+    versao, total = db.execute(select(_maior_versao(db), faceta_service.contador_total())).one()
+    if total is None:
+        # Base de dados sem o contador (criada antes dele): conta a tabela, até à reconstrução das facetas.
+        total = db.execute(select(faceta_service.contar_tabela())).scalar()
+    return versao, total
+
+
+def _verificar_conflito(db, empresa_id, versoes):
+    """
+    Chamada quando uma escrita condicional não alterou nenhuma linha: distingue a empresa inexistente (404)
+    da empresa alterada entretanto, cuja versão já não corresponde ao 'If-Match' (412).
+    """
+    if versoes is not None and db.execute(select(Empresa.id).where(Empresa.id == empresa_id)).first() is not None:
+        raise HTTPException(status_code=412, detail="A empresa foi alterada entretanto (a versão não corresponde ao If-Match).")
+    raise HTTPException(status_code=404, detail="Empresa não encontrada.")
+
+
+# --- Criação de Empresa ---
+
+def criar_empresa(db, dados):
+    """
+    Regista uma nova empresa com uma única instrução (INSERT ... RETURNING).
+    A unicidade do CNPJ e do email é garantida pelas restrições da própria tabela: um duplicado
+    faz o INSERT falhar, mesmo quando dois pedidos tentam criar a mesma empresa em simultâneo.
+    """
+    try:
+        bloquear_versoes(db)
+        # Converte a cidade e o ramo de atuação nos IDs dos catálogos (criando as entradas novas).
+        valores, = catalogo_service.para_colunas(db, [dados])
+        # Insere a empresa e recebe, na mesma ida à base de dados, os valores gerados (ID, data_cadastro).
+        new_empresa = db.execute(
+            insert(Empresa).values(**valores, versao=proxima_versao(db)).returning(*COLUNAS_INSERCAO)
+        ).one()
+        # Conta a nova empresa nas facetas (cidade e ramo de atuação), na mesma transação.
+        faceta_service.aplicar(db, faceta_service.variacoes(acrescentadas=[new_empresa]))
+        # Confirma (faz o "commit") da transação, guardando a nova empresa.
+        db.commit()
+    except IntegrityError as erro:
+        db.rollback()
+        # Converte a violação de unicidade na mesma mensagem de erro de antes.
+        http_erro = erro_unicidade(erro)
+        if http_erro is None:
+            raise
+        raise http_erro
+
+    # Mantém o índice de pesquisa em memória atualizado (usado fora do PostgreSQL).
+    search_service.indice.indexar(new_empresa)
+    return new_empresa
+
+
+# --- Listagem de Empresas ---
+
+def listar_empresas(db, filtros, ordenar_por, descendente, cursor, limit):
+    """
+    Devolve uma página de empresas e o cursor da página seguinte (ou None, se for a última).
+    Quando há termos de pesquisa e nenhuma ordenação é pedida, os resultados são ordenados por relevância.
+    """
+    # Inicia uma consulta à tabela de empresas, apenas com as colunas da resposta: as linhas são tuplos,
+    # sem o custo de criar e acompanhar um objeto do ORM por empresa.
+    query = db.query(*COLUNAS_RESPOSTA)
+
+    # Prepara a pesquisa textual (índices de trigramas em PostgreSQL, índice em memória nas outras bases).
+    pesquisa = search_service.criar_pesquisa(db, filtros)
+
+    # Resolve o campo de ordenação a partir da lista branca. Por omissão, ordena pela relevância
+    # quando há termos de pesquisa e pelo ID caso contrário.
+    if ordenar_por is None:
+        campo = "relevancia" if pesquisa else "id"
+    else:
+        campo = ordenar_por
+    if campo == "relevancia" and pesquisa is None:
+        raise HTTPException(status_code=400, detail="A ordenação por relevância requer um termo de pesquisa.")
+
+    # Descodifica a posição guardada no cursor, se este tiver sido enviado.
+    posicao = None
+    if cursor:
+        try:
+            posicao = pagination_service.descodificar_cursor(cursor, campo)
+        except pagination_service.CursorInvalido as erro:
+            raise HTTPException(status_code=400, detail=str(erro))
+
+    if campo == "relevancia":
+        # Ordenação por relevância: a posição do cursor é o par (relevância, ID).
+        itens, tem_mais = pesquisa.paginar_por_relevancia(query, posicao, limit)
+        empresas = [empresa for empresa, _ in itens]
+        ultimo_valor = itens[-1][1] if itens else None
+    else:
+        # Aplica os filtros de pesquisa, se existirem, e executa a consulta paginada por chave (keyset).
+        if pesquisa:
+            query = pesquisa.filtrar(query)
+        coluna_ordem = COLUNAS_ORDENACAO.get(campo, getattr(Empresa, campo)) if campo != "id" else None
+        empresas, tem_mais = pagination_service.paginar(query, coluna_ordem, Empresa.id, descendente, posicao, limit)
+        ultimo_valor = getattr(empresas[-1], campo) if empresas and campo != "id" else None
+
+    # Se existir uma página seguinte, gera o cursor que aponta para o último item desta página.
+    proximo_cursor = None
+    if tem_mais:
+        proximo_cursor = pagination_service.codificar_cursor(campo, ultimo_valor, empresas[-1].id)
+
+    return empresas, proximo_cursor
+
+
+# --- Detalhe de Empresa ---
+
+def obter_empresa(db, empresa_id):
+    """
+    Procura uma empresa pelo ID, lançando um erro HTTP 404 se ela não existir.
+    """
+    # Procura pela empresa com o ID fornecido (apenas as colunas da resposta, incluindo a versão).
+    db_empresa = db.execute(select(*COLUNAS_RESPOSTA).where(Empresa.id == empresa_id)).first()
+
+    # Se a empresa não for encontrada, lança um erro HTTP 404.
+    if db_empresa is None:
+        raise HTTPException(status_code=404, detail="Empresa não encontrada.")
+
+    return db_empresa
+
+
+# --- Consulta em Lote ---
+
+def obter_empresas(db, ids):
+    """
+    Procura várias empresas pelo ID com uma única consulta.
+    Devolve (empresas encontradas, pela ordem dos IDs pedidos; IDs não encontrados).
+    """
+    # Ignora os IDs repetidos, mantendo a primeira ocorrência de cada um.
+    ids = list(dict.fromkeys(ids))
+    encontradas = {
+        linha.id: linha for linha in db.execute(select(*COLUNAS_RESPOSTA).where(Empresa.id.in_(ids)))
+    } if ids else {}
+    empresas = [encontradas[empresa_id] for empresa_id in ids if empresa_id in encontradas]
+    nao_encontrados = [empresa_id for empresa_id in ids if empresa_id not in encontradas]
+    return empresas, nao_encontrados
+
+
+# --- Atualização de Empresa ---
+
+def atualizar_empresa(db, empresa_id, dados, versoes=None):
+    """
+    Atualiza os campos enviados de uma empresa com uma única instrução (UPDATE ... RETURNING),
+    precedida da leitura dos valores antigos da cidade e do ramo de atuação quando estes são enviados (facetas).
+    'versoes' (do cabeçalho 'If-Match') restringe a atualização às versões indicadas (concorrência otimista):
+    se a empresa tiver sido alterada entretanto, nenhuma linha é atualizada e o erro é HTTP 412.
+    """
+    if not dados:
+        db_empresa = obter_empresa(db, empresa_id)
+        if versoes is not None and db_empresa.versao not in versoes:
+            _verificar_conflito(db, empresa_id, versoes)
+        return db_empresa
+
+    condicao = Empresa.id == empresa_id
+    if versoes is not None:
+        condicao = condicao & Empresa.versao.in_(versoes)
+
+    try:
+        bloquear_versoes(db)
+        # Se a cidade ou o ramo de atuação forem alterados, as facetas precisam dos valores antigos:
+        # são lidos antes, com a linha bloqueada até ao fim da transação (FOR UPDATE, em PostgreSQL).
+        antiga = None
+        if any(campo in dados for campo in faceta_service.CAMPOS_FACETAS):
+            antiga = db.execute(
+                select(Empresa.cidade, Empresa.ramo_atuacao).where(condicao).with_for_update()
+            ).one_or_none()
+            if antiga is None:
+                db.rollback()
+                _verificar_conflito(db, empresa_id, versoes)
+
+        # 'synchronize_session=False': a sessão não tem objetos a sincronizar, o que evita consultas extra.
+        valores, = catalogo_service.para_colunas(db, [dados])
+        db_empresa = db.execute(
+            update(Empresa)
+            .where(condicao)
+            .values(**valores, versao=proxima_versao(db))
+            .returning(*COLUNAS_RESPOSTA)
+            .execution_options(synchronize_session=False)
+        ).one_or_none()
+        if db_empresa is not None and antiga is not None:
+            faceta_service.aplicar(db, faceta_service.variacoes(removidas=[antiga], acrescentadas=[db_empresa]))
+        # Confirma (faz o "commit") das alterações na base de dados.
+        db.commit()
+    except IntegrityError as erro:
+        db.rollback()
+        http_erro = erro_unicidade(erro)
+        if http_erro is None:
+            raise
+        raise http_erro
+
+    # Se nenhuma linha foi atualizada, a empresa não existe (ou a versão não corresponde ao 'If-Match').
+    if db_empresa is None:
+        _verificar_conflito(db, empresa_id, versoes)
+
+    # Mantém o índice de pesquisa em memória atualizado (usado fora do PostgreSQL).
+    search_service.indice.indexar(db_empresa)
+    return db_empresa
+
+
+# --- Exclusão de Empresa ---
+
+def excluir_empresa(db, empresa_id, versoes=None):
+    """
+    Remove uma empresa da base de dados (DELETE ... RETURNING) e regista a exclusão na tabela 'empresas_removidas',
+    para a sincronização incremental. Devolve a versão da exclusão.
+    'versoes' (do cabeçalho 'If-Match') restringe a exclusão às versões indicadas, como na atualização.
+    """
+    condicao = Empresa.id == empresa_id
+    if versoes is not None:
+        condicao = condicao & Empresa.versao.in_(versoes)
+
+    # Regista a exclusão (com uma nova versão) antes de apagar a linha, para que a versão seja calculada
+    # enquanto a versão atual da empresa ainda existe. Se a empresa não existir, nada é registado.
+    bloquear_versoes(db)
+    versao = db.execute(
+        insert(EmpresaRemovida).from_select(
+            ["versao", "empresa_id"],
+            select(proxima_versao(db), Empresa.id).where(condicao),
+        ).returning(EmpresaRemovida.versao)
+    ).scalar()
+    removida = db.execute(
+        delete(Empresa)
+        .where(condicao)
+        .returning(Empresa.id, Empresa.cidade, Empresa.ramo_atuacao)
+        .execution_options(synchronize_session=False)
+    ).one_or_none()
+    # Se nenhuma linha foi removida, a empresa não existe (ou a versão não corresponde ao 'If-Match').
+    if removida is None:
+        db.rollback()
+        _verificar_conflito(db, empresa_id, versoes)
+
+    # Retira a empresa das facetas, na mesma transação.
+    faceta_service.aplicar(db, faceta_service.variacoes(removidas=[removida]))
+    # Confirma (faz o "commit") da exclusão.
+    db.commit()
+
+    # Retira a empresa do índice de pesquisa em memória (usado fora do PostgreSQL).
+    search_service.indice.remover(empresa_id)
+    return versao
+
+
+# --- Sincronização Incremental ---
+
+def listar_alteracoes(db, desde, limit):
+    """
+    Devolve as alterações posteriores à versão 'desde', pela ordem das versões: as empresas criadas ou
+    atualizadas (com os dados atuais) e as empresas excluídas. Cada empresa aparece uma única vez,
+    com a sua versão mais recente. As duas consultas percorrem apenas os índices das versões, por isso
+    o custo depende do número de alterações e não do tamanho da tabela.
+    Devolve (lista de pares (tipo, linha), indicador de mais alterações).
+    As versões são confirmadas pela ordem em que são atribuídas ('bloquear_versoes'): depois de uma resposta,
+    nenhuma alteração ainda por confirmar pode ter uma versão inferior à última devolvida.
+    """
+    alteradas = db.execute(
+        select(*COLUNAS_RESPOSTA, Empresa.data_atualizacao)
+        .where(Empresa.versao > desde)
+        .order_by(Empresa.versao)
+        .limit(limit + 1)
+    ).all()
+    removidas = db.execute(
+        select(EmpresaRemovida.versao, EmpresaRemovida.empresa_id, EmpresaRemovida.data_remocao)
+        .where(EmpresaRemovida.versao > desde)
+        .order_by(EmpresaRemovida.versao)
+        .limit(limit + 1)
+    ).all()
+
+    # Junta as duas listas (já ordenadas) pela versão.
+    alteracoes = sorted(
+        [("alterada", linha) for linha in alteradas] + [("removida", linha) for linha in removidas],
+        key=lambda alteracao: alteracao[1].versao,
+    )
+    return alteracoes[:limit], len(alteracoes) > limit
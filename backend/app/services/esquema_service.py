@@ -0,0 +1,147 @@
+# Esse arquivo contém a criação do esquema da base de dados: as tabelas (e a extensão pg_trgm, em PostgreSQL)
+# e o contador do total de empresas.
+# É executada uma única vez, por um passo explícito, antes de arrancar a API:
+#   python -m app.cli init-db
+# e não por cada worker: assim, importar a aplicação não liga à base de dados, e os workers arrancam
+# sem esperar pela leitura do esquema. Em desenvolvimento, 'DB_INIT_SCHEMA=true' faz a mesma criação
+# no arranque da aplicação (no 'lifespan').
+# Uma base de dados criada por uma versão anterior da API é atualizada com:
+#   python -m app.cli atualizar-esquema
+
+# --- Importações de Módulos ---
+import os
+from sqlalchemy import inspect, text
+
+from ..db.database import Base, SessionLocal, engine
+# Importa todos os modelos, para que as respetivas tabelas fiquem registadas em 'Base.metadata'.
+from ..models import administrador, catalogo, empresa, empresa_removida, faceta, tarefa  # noqa: F401
+from ..models.empresa import Empresa, versao_seq
+from . import catalogo_service, faceta_service
+
+# Cria o esquema no arranque da aplicação (apenas para desenvolvimento, com um único processo).
+DB_INIT_SCHEMA = os.getenv("DB_INIT_SCHEMA", "false").lower() in ("1", "true", "yes")
+
+
+def inicializar():
+    """
+    Cria as tabelas que ainda não existem e o contador do total de empresas. Pode ser repetida sem efeitos:
+    as tabelas e o contador já existentes não são alterados.
+    """
+    # Lê os modelos definidos em 'models/' e cria as tabelas correspondentes, caso ainda não existam.
+    Base.metadata.create_all(bind=engine)
+    # Cria o contador do total de empresas (usado pela listagem), com a contagem atual da tabela.
+    with SessionLocal() as db:
+        faceta_service.criar_contador_total(db)
+
+
+# --- Atualização de Bases de Dados Antigas ---
+# O 'create_all' cria as tabelas em falta, mas não altera as que já existem. 'atualizar' acrescenta à tabela
+# 'empresas' as colunas criadas depois dela, preenche-as e cria os índices e a sequência em falta.
+# A aplicação deve estar parada durante a atualização.
+
+def _colunas(conexao, tabela):
+    return {coluna["name"] for coluna in inspect(conexao).get_columns(tabela)}
+
+
+def _acrescentar_coluna(conexao, coluna):
+    """
+    Acrescenta a coluna do modelo à tabela, ainda sem valores (e por isso sem NOT NULL).
+    """
+    tipo = coluna.type.compile(dialect=conexao.dialect)
+    conexao.execute(text(f"ALTER TABLE {coluna.table.name} ADD COLUMN {coluna.name} {tipo}"))
+
+
+def _criar_indices(conexao, tabela):
+    """
+    Cria os índices do modelo que ainda não existem na tabela e cujas colunas já existem
+    (os índices limitados a outra base de dados, com 'ddl_if', continuam a ser ignorados).
+    """
+    existentes = {indice["name"] for indice in inspect(conexao).get_indexes(tabela.name)}
+    colunas = _colunas(conexao, tabela.name)
+    for indice in tabela.indexes:
+        if indice.name not in existentes and all(coluna.name in colunas for coluna in indice.columns):
+            indice.create(bind=conexao)
+
+
+def _acrescentar_versao(conexao):
+    """
+    Acrescenta a coluna 'versao' (ETags e sincronização incremental). Cada empresa existente recebe
+    uma versão distinta, igual ao seu ID.
+    """
+    if "versao" in _colunas(conexao, "empresas"):
+        return False
+    _acrescentar_coluna(conexao, Empresa.__table__.c.versao)
+    conexao.execute(text("UPDATE empresas SET versao = id"))
+    if conexao.dialect.name == "postgresql":
+        conexao.execute(text("ALTER TABLE empresas ALTER COLUMN versao SET NOT NULL"))
+    return True
+
+
+def _acrescentar_data_atualizacao(conexao):
+    """
+    Acrescenta a coluna 'data_atualizacao' (sincronização incremental), preenchida com a data de registo de cada empresa.
+    """
+    if "data_atualizacao" in _colunas(conexao, "empresas"):
+        return False
+    _acrescentar_coluna(conexao, Empresa.__table__.c.data_atualizacao)
+    conexao.execute(text("UPDATE empresas SET data_atualizacao = COALESCE(data_cadastro, CURRENT_TIMESTAMP)"))
+    return True
+
+
+def _acrescentar_cidade_nome(conexao):
+    """
+    Acrescenta a coluna 'cidade_nome' (ordenação por cidade), preenchida com o nome da cidade no catálogo.
+    """
+    if "cidade_nome" in _colunas(conexao, "empresas"):
+        return False
+    _acrescentar_coluna(conexao, Empresa.__table__.c.cidade_nome)
+    conexao.execute(text("UPDATE empresas SET cidade_nome = (SELECT nome FROM cidades WHERE cidades.id = empresas.cidade_id)"))
+    if conexao.dialect.name == "postgresql":
+        conexao.execute(text("ALTER TABLE empresas ALTER COLUMN cidade_nome SET NOT NULL"))
+    return True
+
+
+def _acertar_sequencia(conexao):
+    """
+    Em PostgreSQL, cria a sequência das versões (se não existir) e garante que o próximo valor
+    é maior do que todas as versões já usadas (das empresas e das exclusões).
+    """
+    if conexao.dialect.name != "postgresql":
+        return
+    versao_seq.create(bind=conexao, checkfirst=True)
+    conexao.execute(text(
+        "SELECT setval('empresas_versao_seq', GREATEST("
+        "(SELECT COALESCE(MAX(versao), 1) FROM empresas), "
+        "(SELECT COALESCE(MAX(versao), 1) FROM empresas_removidas), "
+        "(SELECT last_value FROM empresas_versao_seq)))"
+    ))
+
+
+def atualizar():
+    """
+    Atualiza o esquema de uma base de dados criada por uma versão anterior da API: cria as tabelas em falta
+    (como a 'empresas_removidas' e os catálogos), acrescenta e preenche as colunas em falta na tabela 'empresas',
+    converte as colunas de texto da cidade e do ramo de atuação nos catálogos ('catalogo_service.migrar')
+    e cria os índices e a sequência das versões. Tudo numa única transação; pode ser repetida sem efeitos.
+    Devolve as colunas acrescentadas e o número de entradas de cada catálogo (None se já existiam).
+    """
+    inicializar()
+    alteracoes = {"colunas": [], "catalogos": None}
+    with engine.begin() as conexao:
+        if _acrescentar_versao(conexao):
+            alteracoes["colunas"].append("versao")
+        if _acrescentar_data_atualizacao(conexao):
+            alteracoes["colunas"].append("data_atualizacao")
+        alteracoes["catalogos"] = catalogo_service.migrar(conexao)
+        # Depende do 'cidade_id', criado pela conversão nos catálogos.
+        if _acrescentar_cidade_nome(conexao):
+            alteracoes["colunas"].append("cidade_nome")
+        if conexao.dialect.name == "postgresql":
+            conexao.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        _criar_indices(conexao, Empresa.__table__)
+        _acertar_sequencia(conexao)
+    # Os contadores das facetas passam a contar juntas as grafias do mesmo valor.
+    if alteracoes["catalogos"] is not None:
+        with SessionLocal() as db:
+            faceta_service.reconstruir(db)
+    return alteracoes
@@ -0,0 +1,84 @@
+# Esse arquivo contém as ETags das respostas de empresas e a leitura dos cabeçalhos condicionais
+# ('If-None-Match' nas consultas e 'If-Match' nas escritas).
+# - Detalhe: ETag forte com o ID e a versão da empresa (coluna 'versao'), que muda a cada alteração.
+# - Listagem: resumo da última versão atribuída (incluindo as exclusões), do número de empresas e dos parâmetros
+#   da consulta. Qualquer escrita aumenta a última versão, e as versões ficam visíveis pela ordem em que são
+#   atribuídas ('empresa_service.bloquear_versoes'): uma escrita confirmada depois de uma leitura nunca
+#   deixa a ETag igual à dessa leitura.
+
+# --- Importações de Módulos ---
+import hashlib
+import json
+
+
+# --- Geração das ETags ---
+
+def normalizar_parametros(parametros):
+    """
+    Normaliza os parâmetros de uma consulta: retira os vazios e ignora maiúsculas/minúsculas nos termos de pesquisa.
+    Consultas com os mesmos parâmetros normalizados devolvem o mesmo resultado.
+    """
+    return {
+        campo: valor.casefold() if campo in ("nome", "cidade", "ramo_atuacao") else valor
+        for campo, valor in parametros.items()
+        if valor not in (None, "")
+    }
+
+
+def resumir_parametros(parametros):
+    """
+    Devolve um resumo (SHA-1) dos parâmetros normalizados de uma consulta.
+    """
+    normalizados = normalizar_parametros(parametros)
+    return hashlib.sha1(json.dumps(normalizados, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def etag_empresa(empresa_id, versao):
+    """
+    ETag forte do detalhe de uma empresa.
+    """
+    return f'"{empresa_id}.{versao}"'
+
+
+def etag_lista(versao_atual, total, parametros):
+    """
+    ETag forte de uma página da listagem.
+    """
+    return f'"l.{versao_atual or 0}.{total}.{resumir_parametros(parametros)[:16]}"'
+
+
+# --- Cabeçalhos Condicionais ---
+
+def _etags(cabecalho):
+    return [etag.strip() for etag in cabecalho.split(",") if etag.strip()]
+
+
+def corresponde(if_none_match, etag):
+    """
+    Indica se o cabeçalho 'If-None-Match' inclui a ETag atual (a resposta pode ser 304 Not Modified).
+    Segue a comparação fraca do HTTP: o prefixo 'W/' é ignorado.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (valor[2:] if valor.startswith("W/") else valor for valor in _etags(if_none_match))
+
+
+def versoes_if_match(if_match, empresa_id):
+    """
+    Extrai do cabeçalho 'If-Match' as versões aceites para a empresa.
+    Devolve None se a condição não restringir a versão ('*'), ou a lista de versões (possivelmente vazia).
+    Segue a comparação forte do HTTP: as ETags fracas ('W/') e as de outras empresas nunca correspondem.
+    """
+    if if_match.strip() == "*":
+        return None
+    versoes = []
+    prefixo = f'"{empresa_id}.'
+    for etag in _etags(if_match):
+        if etag.startswith(prefixo) and etag.endswith('"'):
+            try:
+                versoes.append(int(etag[len(prefixo):-1]))
+            except ValueError:
+                pass
+    return versoes
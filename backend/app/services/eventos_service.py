@@ -0,0 +1,200 @@
+# Esse arquivo contém a difusão das alterações de empresas em tempo real ('GET /empresas/stream', Server-Sent Events).
+# As rotas de escrita publicam um evento por alteração (criada, atualizada, removida ou importação em lote).
+# O evento passa por um barramento ('EVENTOS_BUS') e chega ao difusor de cada processo, que o entrega
+# a todos os clientes ligados a esse processo:
+# - "local" (padrão): o barramento é o próprio processo (adequado a um único worker).
+# - "postgres": PostgreSQL LISTEN/NOTIFY, partilhado por todos os workers (requer o pacote 'asyncpg').
+#
+# Cada cliente tem uma fila limitada ('EVENTOS_FILA_MAX'). Um cliente lento que deixe a fila encher é desligado
+# com o evento "resincronizar", em vez de atrasar os outros clientes ou acumular memória sem limite;
+# ao voltar a ligar-se, obtém as alterações que perdeu em 'GET /empresas/changes'.
+
+# --- Importações de Módulos ---
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+import orjson
+from sqlalchemy.engine import make_url
+
+from . import serializacao_service
+
+# --- Configurações dos Eventos ---
+EVENTOS_BUS = os.getenv("EVENTOS_BUS", "local")
+# Número máximo de eventos à espera de envio para cada cliente.
+EVENTOS_FILA_MAX = int(os.getenv("EVENTOS_FILA_MAX", 100))
+# Intervalo (em segundos) entre as mensagens de manutenção da ligação, enviadas quando não há eventos.
+EVENTOS_HEARTBEAT = float(os.getenv("EVENTOS_HEARTBEAT", 15))
+
+# Canal do PostgreSQL usado pelo barramento "postgres".
+CANAL_EVENTOS = "empresas_eventos"
+# Tamanho máximo da mensagem de um NOTIFY (o limite do PostgreSQL é 8000 bytes).
+LIMITE_NOTIFY = 7900
+
+logger = logging.getLogger(__name__)
+
+
+# --- Formato dos Eventos ---
+
+def evento(tipo, versao=None, dados=None):
+    """
+    Cria um evento: o tipo, a versão da alteração (se existir) e os dados enviados ao cliente.
+    """
+    return {"tipo": tipo, "versao": versao, "dados": dados}
+
+
+def formatar(evento):
+    """
+    Converte um evento numa mensagem SSE. A versão é enviada como 'id' da mensagem.
+    """
+    linhas = f"event: {evento['tipo']}\n"
+    if evento["versao"] is not None:
+        linhas += f"id: {evento['versao']}\n"
+    dados = evento["dados"] if evento["dados"] is not None else {}
+    return linhas + "data: " + serializacao_service.para_json(dados).decode() + "\n\n"
+
+
+# Mensagem enviada a um cliente desligado por ser lento, a indicar que deve resincronizar.
+MENSAGEM_RESINCRONIZAR = formatar(evento("resincronizar"))
+
+
+# --- Difusor (no próprio processo) ---
+
+class Assinatura:
+    """
+    Um cliente ligado ao stream: a sua fila de mensagens e o indicador de que foi desligado.
+    """
+    def __init__(self, tamanho_fila):
+        self.fila = asyncio.Queue(maxsize=tamanho_fila)
+        self.descartada = False
+
+
+class Difusor:
+    """
+    Entrega cada mensagem a todos os clientes ligados a este processo, sem nunca esperar por nenhum deles.
+    """
+    def __init__(self, tamanho_fila):
+        self.tamanho_fila = tamanho_fila
+        self._assinaturas = set()
+        # Contadores para acompanhar o stream.
+        self.publicados = 0
+        self.descartados = 0
+
+    @asynccontextmanager
+    async def assinar(self):
+        """
+        Liga um cliente, enquanto durar o bloco 'async with'.
+        """
+        assinatura = Assinatura(self.tamanho_fila)
+        self._assinaturas.add(assinatura)
+        try:
+            yield assinatura
+        finally:
+            self._assinaturas.discard(assinatura)
+
+    def publicar(self, mensagem):
+        """
+        Coloca a mensagem na fila de cada cliente. Um cliente com a fila cheia é desligado:
+        a fila é esvaziada e fica apenas com a mensagem "resincronizar", a última que ele recebe.
+        """
+        self.publicados += 1
+        for assinatura in list(self._assinaturas):
+            try:
+                assinatura.fila.put_nowait(mensagem)
+            except asyncio.QueueFull:
+                self._assinaturas.discard(assinatura)
+                assinatura.descartada = True
+                while not assinatura.fila.empty():
+                    assinatura.fila.get_nowait()
+                assinatura.fila.put_nowait(MENSAGEM_RESINCRONIZAR)
+                self.descartados += 1
+
+    def estatisticas(self):
+        return {"clientes": len(self._assinaturas), "publicados": self.publicados, "descartados": self.descartados}
+
+
+# --- Barramentos ---
+
+class BarramentoLocal:
+    """
+    Barramento no próprio processo: cada evento publicado é entregue diretamente ao difusor.
+    """
+    def __init__(self, difusor):
+        self.difusor = difusor
+
+    async def iniciar(self):
+        pass
+
+    async def publicar(self, evento):
+        self.difusor.publicar(formatar(evento))
+
+
+class BarramentoPostgres:
+    """
+    Barramento partilhado por todos os workers, com PostgreSQL LISTEN/NOTIFY.
+    Cada processo mantém uma ligação dedicada, que recebe os eventos de todos os processos
+    (incluindo os seus) e os entrega ao seu difusor.
+    """
+    def __init__(self, dsn, difusor, canal=CANAL_EVENTOS):
+        self.dsn = dsn
+        self.difusor = difusor
+        self.canal = canal
+        self._conexao = None
+        self._lock = asyncio.Lock()
+
+    def _receber(self, conexao, pid, canal, mensagem):
+        self.difusor.publicar(formatar(orjson.loads(mensagem)))
+
+    async def iniciar(self):
+        """
+        Abre a ligação e começa a escutar o canal (apenas na primeira utilização, ou se a ligação tiver caído).
+        """
+        async with self._lock:
+            if self._conexao is None or self._conexao.is_closed():
+                import asyncpg
+                self._conexao = await asyncpg.connect(self.dsn)
+                await self._conexao.add_listener(self.canal, self._receber)
+
+    async def publicar(self, evento):
+        mensagem = serializacao_service.para_json(evento).decode()
+        # Um evento maior do que o limite do NOTIFY é substituído por "resincronizar":
+        # os clientes obtêm a alteração em 'GET /empresas/changes'.
+        if len(mensagem.encode()) > LIMITE_NOTIFY:
+            mensagem = orjson.dumps({**evento, "tipo": "resincronizar", "dados": None}).decode()
+        await self.iniciar()
+        # A ligação só executa uma instrução de cada vez.
+        async with self._lock:
+            await self._conexao.execute("SELECT pg_notify($1, $2)", self.canal, mensagem)
+
+
+def criar_barramento(nome, difusor):
+    """
+    Cria o barramento a partir da configuração 'EVENTOS_BUS'.
+    """
+    if nome == "local":
+        return BarramentoLocal(difusor)
+    if nome == "postgres":
+        try:
+            import asyncpg  # noqa: F401
+        except ImportError:
+            raise RuntimeError("EVENTOS_BUS=postgres requer o pacote 'asyncpg'.")
+        # O asyncpg recebe o endereço sem o nome do driver do SQLAlchemy (ex: 'postgresql+psycopg2').
+        url = make_url(os.getenv("DATABASE_URL")).set(drivername="postgresql")
+        return BarramentoPostgres(url.render_as_string(hide_password=False), difusor)
+    raise ValueError(f"EVENTOS_BUS inválido: '{nome}'.")
+
+
+# Instâncias únicas do difusor e do barramento, partilhadas por todos os pedidos deste processo.
+difusor = Difusor(EVENTOS_FILA_MAX)
+barramento = criar_barramento(EVENTOS_BUS, difusor)
+
+
+async def publicar(tipo, versao=None, dados=None):
+    """
+    Publica uma alteração. Chamada pelas rotas de escrita depois de a alteração ser confirmada.
+    Uma falha do barramento não faz falhar a escrita: os clientes recuperam com 'GET /empresas/changes'.
+    """
+    try:
+        await barramento.publicar(evento(tipo, versao, dados))
+    except Exception:
+        logger.exception("Falha ao publicar o evento '%s'.", tipo)
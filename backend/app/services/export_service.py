@@ -0,0 +1,104 @@
+# Esse arquivo contém a exportação de empresas em CSV ou NDJSON.
+# As linhas são lidas da base de dados com um cursor do lado do servidor ('yield_per') e codificadas
+# à medida que chegam, por isso a memória usada não depende do número de empresas exportadas.
+
+# --- Importações de Módulos ---
+import csv
+import io
+import json
+import os
+from sqlalchemy import select
+
+from ..db.database import DB_ASYNC, AsyncReadSessionLocal, ReadSessionLocal
+from ..models.empresa import Empresa
+from . import catalogo_service, search_service, serializacao_service
+
+# Número de linhas lidas da base de dados (e enviadas ao cliente) de cada vez.
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 1000))
+
+# Colunas exportadas, pela mesma ordem dos campos da resposta da API.
+COLUNAS_EXPORTACAO = ("id", "nome", "cnpj", "cidade", "ramo_atuacao", "telefone", "email_contato", "data_cadastro")
+
+
+# --- Preparação da Consulta ---
+
+def preparar_consulta(db, filtros):
+    """
+    Constrói a consulta de exportação com os mesmos filtros da listagem, ordenada pelo ID.
+    Executada através de 'database.executar', porque a pesquisa pode precisar da base de dados
+    (por exemplo, para carregar o índice em memória).
+    """
+    # A cidade e o ramo de atuação vêm dos catálogos, com uma junção (JOIN) em vez de uma subconsulta por linha:
+    # as tabelas dos catálogos são pequenas e a base de dados junta-as às empresas numa única passagem.
+    catalogos = catalogo_service.CATALOGOS
+    consulta = select(*(
+        catalogos[coluna].modelo.nome.label(coluna) if coluna in catalogos else getattr(Empresa, coluna)
+        for coluna in COLUNAS_EXPORTACAO
+    )).select_from(Empresa)
+    for catalogo in catalogos.values():
+        consulta = consulta.join(catalogo.modelo, catalogo.modelo.id == catalogo.coluna)
+    pesquisa = search_service.criar_pesquisa(db, filtros)
+    if pesquisa:
+        consulta = pesquisa.filtrar(consulta)
+    # 'yield_per' ativa o cursor do lado do servidor: as linhas são recebidas em blocos, e não todas de uma vez.
+    return consulta.order_by(Empresa.id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+
+
+# --- Codificação ---
+
+def _valor_json(valor):
+    # As datas no mesmo formato da API (ISO 8601, UTC com "Z").
+    return serializacao_service.formatar_data(valor) if hasattr(valor, "isoformat") else valor
+
+
+def cabecalho(formato):
+    """
+    Devolve o início do ficheiro (o cabeçalho, no caso do CSV).
+    """
+    if formato == "csv":
+        return codificar_lote(formato, [COLUNAS_EXPORTACAO])
+    return ""
+
+
+def codificar_lote(formato, linhas):
+    """
+    Codifica um bloco de linhas (tuplos com os valores de COLUNAS_EXPORTACAO) num único pedaço de texto.
+    """
+    if formato == "csv":
+        buffer = io.StringIO()
+        # As datas são escritas em ISO 8601, como no NDJSON e na API (o 'csv' usaria 'str()', sem o 'T').
+        csv.writer(buffer, lineterminator="\n").writerows([_valor_json(valor) for valor in linha] for linha in linhas)
+        return buffer.getvalue()
+    return "".join(
+        json.dumps({coluna: _valor_json(valor) for coluna, valor in zip(COLUNAS_EXPORTACAO, linha)}, ensure_ascii=False) + "\n"
+        for linha in linhas
+    )
+
+
+# --- Geradores de Conteúdo ---
+# Cada gerador abre a sua própria sessão (na réplica de leitura, se existir), porque a resposta continua
+# a ser enviada depois de a rota terminar (e de a sessão do pedido ser fechada).
+
+async def _exportar_assincrono(consulta, formato):
+    yield cabecalho(formato)
+    async with AsyncReadSessionLocal() as db:
+        resultado = await db.stream(consulta)
+        async for linhas in resultado.partitions():
+            yield codificar_lote(formato, linhas)
+
+
+def _exportar_sincrono(consulta, formato):
+    # O Starlette percorre os geradores síncronos no threadpool, sem bloquear o event loop.
+    yield cabecalho(formato)
+    with ReadSessionLocal() as db:
+        for linhas in db.execute(consulta).partitions():
+            yield codificar_lote(formato, linhas)
+
+
+def exportar(consulta, formato):
+    """
+    Devolve o gerador do conteúdo do ficheiro exportado, adequado ao modo (assíncrono ou síncrono) configurado.
+    """
+    if DB_ASYNC:
+        return _exportar_assincrono(consulta, formato)
+    return _exportar_sincrono(consulta, formato)
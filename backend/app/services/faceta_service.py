@@ -0,0 +1,166 @@
+# Esse arquivo contém as facetas das empresas: o número de empresas por cidade e por ramo de atuação.
+# Sem pesquisa, as contagens são lidas da tabela 'facetas_empresas', mantida de forma incremental
+# na mesma transação de cada escrita (criação, atualização, exclusão e importação em lote).
+# A resposta custa apenas O(número de valores distintos), qualquer que seja o tamanho da tabela de empresas.
+# Com pesquisa, as contagens são calculadas sobre os resultados (e guardadas na cache de consultas pela rota).
+# A mesma tabela guarda também o número total de empresas (a linha 'CAMPO_TOTAL'), lido em O(1) pela listagem
+# (cabeçalho 'X-Total-Count' e ETag) em vez de um 'count(*)' sobre a tabela de empresas.
+
+# --- Importações de Módulos ---
+from collections import Counter
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from ..models.empresa import Empresa
+from ..models.faceta import ContagemFaceta
+from . import catalogo_service, search_service
+
+# Campos com facetas.
+CAMPOS_FACETAS = ("cidade", "ramo_atuacao")
+# O contador do total de empresas: uma única linha, com este campo e um valor vazio.
+CAMPO_TOTAL = "total"
+
+
+# --- Manutenção Incremental ---
+
+def variacoes(removidas=(), acrescentadas=()):
+    """
+    Calcula a variação dos contadores a partir das linhas removidas e acrescentadas
+    (objetos ou tuplos com os campos 'cidade' e 'ramo_atuacao'). Devolve {(campo, valor): variação}.
+    """
+    deltas = Counter()
+    for linha in removidas:
+        for campo in CAMPOS_FACETAS:
+            deltas[(campo, getattr(linha, campo))] -= 1
+    for linha in acrescentadas:
+        for campo in CAMPOS_FACETAS:
+            deltas[(campo, getattr(linha, campo))] += 1
+    # O total de empresas (numa atualização, a empresa removida e a acrescentada anulam-se).
+    deltas[(CAMPO_TOTAL, "")] += len(acrescentadas) - len(removidas)
+    return deltas
+
+
+def aplicar(db, deltas):
+    """
+    Aplica as variações aos contadores com uma única instrução (INSERT ... ON CONFLICT DO UPDATE),
+    na transação da escrita que as originou. Não faz o commit.
+    """
+    linhas = [
+        {"campo": campo, "valor": valor, "total": delta}
+        # A ordem fixa das chaves evita bloqueios mútuos (deadlocks) entre escritas em simultâneo no PostgreSQL.
+        for (campo, valor), delta in sorted(deltas.items())
+        if delta
+    ]
+    if not linhas:
+        return
+    # O PostgreSQL e o SQLite suportam a mesma sintaxe de "upsert".
+    dialeto = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    instrucao = dialeto.insert(ContagemFaceta).values(linhas)
+    instrucao = instrucao.on_conflict_do_update(
+        index_elements=[ContagemFaceta.campo, ContagemFaceta.valor],
+        set_={"total": ContagemFaceta.total + instrucao.excluded.total},
+    )
+    db.execute(instrucao)
+
+
+# --- Total de Empresas ---
+
+def contador_total():
+    """
+    Subconsulta com o valor do contador do total de empresas (NULL se a linha ainda não existir).
+    """
+    return (
+        select(ContagemFaceta.total)
+        .where(ContagemFaceta.campo == CAMPO_TOTAL, ContagemFaceta.valor == "")
+        .scalar_subquery()
+    )
+
+
+def criar_contador_total(db):
+    """
+    Cria o contador do total de empresas, com a contagem atual da tabela, se ainda não existir
+    (numa base de dados nova, ou criada antes do contador). Chamada no arranque da aplicação.
+    """
+    if db.execute(select(contador_total())).scalar() is not None:
+        return
+    # Se outro processo criar o contador ao mesmo tempo, o deste é ignorado ('ON CONFLICT DO NOTHING').
+    dialeto = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    db.execute(
+        dialeto.insert(ContagemFaceta)
+        .values(campo=CAMPO_TOTAL, valor="", total=contar_tabela())
+        .on_conflict_do_nothing(index_elements=[ContagemFaceta.campo, ContagemFaceta.valor])
+    )
+    db.commit()
+
+
+def contar_tabela():
+    """
+    Subconsulta que conta a tabela de empresas ('count(*)'). Usada só quando o contador não existe
+    (numa base de dados criada antes do contador, até à próxima reconstrução das facetas).
+    """
+    return select(func.count()).select_from(Empresa).scalar_subquery()
+
+
+# --- Consulta das Facetas ---
+
+def _contagem(campo, *colunas):
+    """
+    Consulta que conta as empresas por entrada do catálogo do campo: agrupa pelo ID (inteiro)
+    e junta o nome da entrada, que é o valor da faceta. 'colunas' são acrescentadas no início.
+    """
+    catalogo = catalogo_service.CATALOGOS[campo]
+    modelo = catalogo.modelo
+    return (
+        select(*colunas, modelo.nome, func.count())
+        .select_from(Empresa)
+        .join(modelo, modelo.id == catalogo.coluna)
+        .group_by(modelo.id, modelo.nome)
+    )
+
+
+def _ordenar(contagens):
+    # Os valores mais frequentes primeiro; em caso de empate, por ordem alfabética.
+    return [{"valor": valor, "total": total} for valor, total in sorted(contagens, key=lambda item: (-item[1], item[0]))]
+
+
+def obter_facetas(db, filtros):
+    """
+    Devolve o total de empresas e as contagens por cidade e por ramo de atuação.
+    Sem termos de pesquisa, lê os contadores; com pesquisa, conta os resultados da pesquisa.
+    """
+    pesquisa = search_service.criar_pesquisa(db, filtros)
+    facetas = {}
+
+    if pesquisa is None:
+        linhas = db.execute(
+            select(ContagemFaceta.campo, ContagemFaceta.valor, ContagemFaceta.total).where(ContagemFaceta.total > 0)
+        ).all()
+        for campo in CAMPOS_FACETAS:
+            facetas[campo] = _ordenar((valor, total) for c, valor, total in linhas if c == campo)
+    else:
+        for campo in CAMPOS_FACETAS:
+            consulta = pesquisa.filtrar(_contagem(campo))
+            facetas[campo] = _ordenar(db.execute(consulta).all())
+
+    # Cada empresa tem exatamente uma cidade, por isso o total é a soma das contagens por cidade.
+    return {"total": sum(item["total"] for item in facetas["cidade"]), **facetas}
+
+
+# --- Reconstrução ---
+
+def reconstruir(db):
+    """
+    Recalcula todos os contadores a partir da tabela de empresas (numa única transação).
+    Usada para recuperar contadores incorretos, por exemplo após alterações feitas fora da API.
+    Devolve o número de valores distintos contados.
+    """
+    db.execute(delete(ContagemFaceta))
+    for campo in CAMPOS_FACETAS:
+        db.execute(
+            ContagemFaceta.__table__.insert().from_select(["campo", "valor", "total"], _contagem(campo, literal(campo)))
+        )
+    db.execute(ContagemFaceta.__table__.insert().values(campo=CAMPO_TOTAL, valor="", total=contar_tabela()))
+    db.commit()
+    return db.execute(
+        select(func.count()).select_from(ContagemFaceta).where(ContagemFaceta.campo.in_(CAMPOS_FACETAS))
+    ).scalar()
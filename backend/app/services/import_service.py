@@ -0,0 +1,222 @@
+# Esse arquivo contém a importação em lote de empresas a partir de ficheiros CSV ou NDJSON.
+# O ficheiro é lido à medida que chega (sem ser carregado inteiro em memória) e processado em blocos:
+# cada bloco é validado, verificado contra duplicados de uma só vez e inserido numa única transação.
+
+# --- Importações de Módulos ---
+import codecs
+import csv
+import json
+import os
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from ..models.empresa import Empresa
+from ..schemas.empresa import EmpresaCreate
+from . import catalogo_service, empresa_service, faceta_service, search_service
+
+# Número de linhas processadas (validadas e inseridas) de cada vez, numa única transação.
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 1000))
+
+# Campos que têm de ser únicos, com a mensagem de erro correspondente.
+CAMPOS_UNICOS = {
+    "cnpj": "CNPJ já registado.",
+    "email_contato": "Email de contacto já registado.",
+}
+
+
+# --- Leitura do Ficheiro em Streaming ---
+
+async def ler_linhas(fluxo):
+    """
+    Converte um fluxo de bytes (o corpo do pedido) em linhas de texto, à medida que os bytes chegam.
+    """
+    # O descodificador incremental trata os caracteres UTF-8 divididos entre dois blocos
+    # e descarta o BOM que alguns editores (como o Excel) colocam no início do ficheiro.
+    descodificador = codecs.getincrementaldecoder("utf-8-sig")()
+    resto = ""
+    async for bloco in fluxo:
+        texto = resto + descodificador.decode(bloco)
+        linhas = texto.split("\n")
+        resto = linhas.pop()
+        for linha in linhas:
+            yield linha.rstrip("\r")
+    resto += descodificador.decode(b"", final=True)
+    if resto:
+        yield resto.rstrip("\r")
+
+
+async def ler_registos_csv(linhas):
+    """
+    Lê os registos de um CSV com cabeçalho. Devolve pares (número da linha, dicionário com os campos).
+    """
+    cabecalho = None
+    registo, inicio = None, 0
+    numero = 0
+    async for linha in linhas:
+        numero += 1
+        if registo is None:
+            registo, inicio = linha, numero
+        else:
+            registo += "\n" + linha
+        # Um campo entre aspas pode conter quebras de linha: o registo só está completo
+        # quando o número de aspas é par (as aspas dentro de um campo aparecem duplicadas).
+        if registo.count('"') % 2:
+            continue
+        texto, registo = registo, None
+        if not texto.strip():
+            continue
+        valores = next(csv.reader([texto]))
+        if cabecalho is None:
+            cabecalho = [campo.strip() for campo in valores]
+            continue
+        yield inicio, dict(zip(cabecalho, valores))
+    if registo is not None:
+        yield inicio, ValueError("Registo CSV incompleto (aspas por fechar).")
+
+
+async def ler_registos_ndjson(linhas):
+    """
+    Lê os registos de um ficheiro NDJSON (um objeto JSON por linha).
+    """
+    numero = 0
+    async for linha in linhas:
+        numero += 1
+        if not linha.strip():
+            continue
+        try:
+            registo = json.loads(linha)
+        except ValueError:
+            yield numero, ValueError("JSON inválido.")
+            continue
+        if not isinstance(registo, dict):
+            yield numero, ValueError("Cada linha deve conter um objeto JSON.")
+            continue
+        yield numero, registo
+
+
+async def ler_blocos(registos, tamanho=IMPORT_CHUNK_SIZE):
+    """
+    Agrupa os registos em blocos de 'tamanho' registos.
+    """
+    bloco = []
+    async for registo in registos:
+        bloco.append(registo)
+        if len(bloco) >= tamanho:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+# --- Processamento de um Bloco ---
+
+def marcar_vistos(registos, vistos):
+    """
+    Acrescenta a 'vistos' os CNPJs e emails dos registos válidos, sem os inserir.
+    Usada para retomar uma importação a meio: os blocos já processados são saltados, mas os seus valores
+    continuam a contar para os duplicados no ficheiro (tal como em 'importar_lote').
+    """
+    for _, dados in registos:
+        if isinstance(dados, Exception):
+            continue
+        try:
+            dados = EmpresaCreate(**dados).model_dump()
+        except ValidationError:
+            continue
+        if not any(dados[campo] in vistos[campo] for campo in CAMPOS_UNICOS):
+            for campo in CAMPOS_UNICOS:
+                vistos[campo].add(dados[campo])
+
+
+def _mensagem_validacao(erro):
+    """
+    Converte um erro de validação do Pydantic numa mensagem curta.
+    """
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in erro.errors())
+
+
+def importar_lote(db, registos, vistos, confirmar=None):
+    """
+    Valida e insere um bloco de registos numa única transação.
+    'vistos' guarda os CNPJs e emails já encontrados no ficheiro, para detetar duplicados entre blocos.
+    'confirmar', se indicada, é chamada com (db, número de empresas inseridas, erros) imediatamente antes do commit,
+    para gravar outras alterações na mesma transação (por exemplo, o progresso de uma tarefa em segundo plano).
+    Devolve (número de empresas inseridas, lista de erros).
+    """
+    erros = []
+    validos = []
+
+    # 1. Validação de cada linha com o mesmo schema da criação individual.
+    for numero, dados in registos:
+        if isinstance(dados, Exception):
+            erros.append({"linha": numero, "erro": str(dados)})
+            continue
+        try:
+            validos.append((numero, EmpresaCreate(**dados).model_dump()))
+        except ValidationError as erro:
+            erros.append({"linha": numero, "erro": _mensagem_validacao(erro)})
+
+    # 2. Duplicados dentro do próprio ficheiro.
+    unicos = []
+    for numero, dados in validos:
+        repetido = next((campo for campo in CAMPOS_UNICOS if dados[campo] in vistos[campo]), None)
+        if repetido:
+            erros.append({"linha": numero, "erro": f"{CAMPOS_UNICOS[repetido]} (repetido no ficheiro)"})
+            continue
+        for campo in CAMPOS_UNICOS:
+            vistos[campo].add(dados[campo])
+        unicos.append((numero, dados))
+
+    # 3. Duplicados na tabela, verificados com uma consulta por campo para o bloco inteiro.
+    # Se outra operação inserir uma empresa igual entretanto, o INSERT falha com IntegrityError;
+    # nesse caso, a verificação é repetida uma vez (já a ver a nova empresa).
+    for tentativa in range(2):
+        existentes = {}
+        for campo in CAMPOS_UNICOS:
+            valores = [dados[campo] for _, dados in unicos]
+            coluna = getattr(Empresa, campo)
+            existentes[campo] = set(db.execute(select(coluna).where(coluna.in_(valores))).scalars()) if valores else set()
+
+        a_inserir = []
+        for numero, dados in unicos:
+            repetido = next((campo for campo in CAMPOS_UNICOS if dados[campo] in existentes[campo]), None)
+            if repetido:
+                erros.append({"linha": numero, "erro": CAMPOS_UNICOS[repetido]})
+            else:
+                a_inserir.append((numero, dados))
+
+        if not a_inserir:
+            if confirmar:
+                confirmar(db, 0, erros)
+            db.commit()
+            return 0, erros
+
+        # 4. Inserção em lote (executemany) numa única transação, com uma versão reservada para cada empresa.
+        # As cidades e os ramos de atuação do bloco são convertidos nos IDs dos catálogos de uma só vez.
+        try:
+            versoes = empresa_service.reservar_versoes(db, len(a_inserir))
+            inseridas = db.execute(
+                insert(Empresa).returning(*empresa_service.COLUNAS_INSERCAO),
+                catalogo_service.para_colunas(db, [
+                    {**dados, "versao": versao} for (_, dados), versao in zip(a_inserir, versoes)
+                ]),
+            ).all()
+            # Conta as empresas inseridas nas facetas, com uma única instrução para o bloco inteiro.
+            faceta_service.aplicar(db, faceta_service.variacoes(acrescentadas=inseridas))
+            if confirmar:
+                confirmar(db, len(inseridas), erros)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            # Descarta os erros de duplicado acrescentados nesta tentativa, que vão ser recalculados.
+            erros = [e for e in erros if e["linha"] not in {numero for numero, _ in unicos}]
+            if tentativa == 0:
+                continue
+            erros.extend({"linha": numero, "erro": "Conflito com uma empresa registada em simultâneo."} for numero, _ in unicos)
+            return 0, erros
+
+        # Mantém o índice de pesquisa em memória atualizado (usado fora do PostgreSQL).
+        for linha in inseridas:
+            search_service.indice.indexar(linha)
+        return len(inseridas), erros
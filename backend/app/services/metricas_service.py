@@ -0,0 +1,288 @@
+# Esse arquivo contém as métricas de desempenho dos pedidos à API, exportadas em 'GET /metrics'
+# no formato de texto do Prometheus.
+# O middleware 'MiddlewareMetricas' (registado em 'main.py') mede cada pedido HTTP e, por rota
+# (o modelo do caminho, ex: '/empresas/{empresa_id}', e não o caminho concreto), regista:
+# - a latência, o número de consultas à base de dados, o tempo passado na base de dados
+#   e o tamanho da resposta (histogramas);
+# - o número de respostas por código de estado (contador).
+# As consultas são contadas pelos eventos 'before/after_cursor_execute' de cada engine, associados ao pedido
+# através de uma 'ContextVar' (propagada pelo SQLAlchemy ao 'run_sync' e pelo Starlette ao threadpool).
+#
+# O registo é protegido por um lock, por isso nenhuma amostra se perde com as rotas síncronas a correr no threadpool.
+# Cada pedido faz apenas algumas operações em memória: o custo é de alguns microssegundos
+# (medido por 'benchmarks/bench_metricas.py'). As métricas são de cada worker.
+
+# --- Importações de Módulos ---
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from sqlalchemy import event
+
+from ..db import database
+
+# --- Limites dos Histogramas ---
+# Latência e tempo na base de dados, em segundos.
+LIMITES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Número de consultas à base de dados por pedido.
+LIMITES_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Tamanho da resposta, em bytes.
+LIMITES_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Nome usado para os pedidos que não correspondem a nenhuma rota (ex: 404 num caminho inexistente),
+# para que os caminhos concretos não criem uma série por pedido.
+ROTA_DESCONHECIDA = "desconhecida"
+
+
+# --- Histogramas e Registo ---
+
+class Histograma:
+    """
+    Histograma com limites fixos: contagem por intervalo, soma e número de observações.
+    """
+    __slots__ = ("limites", "contagens", "soma", "total")
+
+    def __init__(self, limites):
+        self.limites = limites
+        # Uma contagem por limite, mais uma para os valores acima do último limite (+Inf).
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+
+class MetricasRota:
+    """
+    Os histogramas de uma rota (método HTTP e modelo do caminho).
+    """
+    __slots__ = ("latencia", "consultas", "tempo_db", "bytes")
+
+    def __init__(self):
+        self.latencia = Histograma(LIMITES_SEGUNDOS)
+        self.consultas = Histograma(LIMITES_CONSULTAS)
+        self.tempo_db = Histograma(LIMITES_SEGUNDOS)
+        self.bytes = Histograma(LIMITES_BYTES)
+
+
+class RegistoMetricas:
+    """
+    Guarda as métricas de todos os pedidos deste processo.
+    """
+    # Nome, descrição e atributo de 'MetricasRota' de cada histograma exportado.
+    HISTOGRAMAS = (
+        ("http_request_duration_seconds", "Latência dos pedidos HTTP.", "latencia"),
+        ("http_request_db_queries", "Consultas à base de dados por pedido HTTP.", "consultas"),
+        ("http_request_db_duration_seconds", "Tempo passado na base de dados por pedido HTTP.", "tempo_db"),
+        ("http_response_size_bytes", "Tamanho do corpo das respostas HTTP.", "bytes"),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (método, rota) -> MetricasRota
+        self._rotas = {}
+        # (método, rota, código de estado) -> número de respostas
+        self._estados = Counter()
+
+    def registar(self, metodo, rota, estado, duracao, consultas, tempo_db, tamanho):
+        chave = (metodo, rota)
+        with self._lock:
+            metricas = self._rotas.get(chave)
+            if metricas is None:
+                metricas = self._rotas[chave] = MetricasRota()
+            metricas.latencia.observar(duracao)
+            metricas.consultas.observar(consultas)
+            metricas.tempo_db.observar(tempo_db)
+            metricas.bytes.observar(tamanho)
+            self._estados[(metodo, rota, estado)] += 1
+
+    def limpar(self):
+        with self._lock:
+            self._rotas.clear()
+            self._estados.clear()
+
+    def exportar(self, admissao=None):
+        """
+        Devolve as métricas no formato de texto do Prometheus, com as do controlo de admissão indicado
+        (o 'MiddlewareAdmissao' da aplicação), se existir.
+        """
+        linhas = []
+        with self._lock:
+            linhas.append("# HELP http_requests_total Número de pedidos HTTP, por código de estado.")
+            linhas.append("# TYPE http_requests_total counter")
+            for (metodo, rota, estado), total in sorted(self._estados.items()):
+                linhas.append(f'http_requests_total{{method="{metodo}",route="{_escapar(rota)}",status="{estado}"}} {total}')
+
+            for nome, descricao, atributo in self.HISTOGRAMAS:
+                linhas.append(f"# HELP {nome} {descricao}")
+                linhas.append(f"# TYPE {nome} histogram")
+                for (metodo, rota), metricas in sorted(self._rotas.items()):
+                    _exportar_histograma(linhas, nome, f'method="{metodo}",route="{_escapar(rota)}"', getattr(metricas, atributo))
+
+        _exportar_pools(linhas)
+        _exportar_admissao(linhas, admissao)
+        return "\n".join(linhas) + "\n"
+
+
+def _escapar(valor):
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _exportar_histograma(linhas, nome, etiquetas, histograma):
+    # No formato do Prometheus, a contagem de cada limite inclui as observações dos limites anteriores.
+    acumulado = 0
+    for limite, contagem in zip(histograma.limites, histograma.contagens):
+        acumulado += contagem
+        linhas.append(f'{nome}_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+    linhas.append(f'{nome}_bucket{{{etiquetas},le="+Inf"}} {histograma.total}')
+    linhas.append(f"{nome}_sum{{{etiquetas}}} {histograma.soma}")
+    linhas.append(f"{nome}_count{{{etiquetas}}} {histograma.total}")
+
+
+def _exportar_pools(linhas):
+    # O estado dos pools de conexões ('db/monitor_pool.py'), para acompanhar a saturação ao longo do tempo.
+    resumos = [estatisticas.resumo() for estatisticas in database.estatisticas_pools.values()]
+    for nome, tipo, descricao, campo in (
+        ("db_pool_checked_out", "gauge", "Conexões do pool em uso.", "em_uso"),
+        ("db_pool_waiting", "gauge", "Pedidos à espera de uma conexão do pool.", "a_espera"),
+        ("db_pool_checkouts_total", "counter", "Conexões entregues pelo pool.", "checkouts"),
+        ("db_pool_timeouts_total", "counter", "Pedidos que esgotaram o tempo de espera por uma conexão.", "esgotados"),
+    ):
+        linhas.append(f"# HELP {nome} {descricao}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        for resumo in resumos:
+            if campo in resumo:
+                linhas.append(f'{nome}{{pool="{resumo["nome"]}"}} {resumo[campo]}')
+
+
+def _exportar_admissao(linhas, middleware):
+    # O controlo de admissão da aplicação ('services/admissao_service.py'): pedidos admitidos e rejeitados,
+    # carga em curso e fila.
+    if middleware is None:
+        return
+    contadores = middleware.contadores
+    estado = middleware.estatisticas()
+    linhas.append("# HELP http_admitted_requests_total Pedidos admitidos pelo controlo de admissão.")
+    linhas.append("# TYPE http_admitted_requests_total counter")
+    linhas.append(f"http_admitted_requests_total {contadores.admitidos}")
+    linhas.append("# HELP http_rejected_requests_total Pedidos rejeitados (429 por limite de ritmo, 503 por sobrecarga), por motivo.")
+    linhas.append("# TYPE http_rejected_requests_total counter")
+    for motivo in ("ritmo_ip", "ritmo_admin", "fila_cheia", "espera_excedida"):
+        linhas.append(f'http_rejected_requests_total{{reason="{motivo}"}} {contadores.rejeitados[motivo]}')
+    for nome, descricao, custos in (
+        ("http_admitted_cost_total", "Custo dos pedidos admitidos, por rota.", contadores.custo_admitido),
+        ("http_rejected_cost_total", "Custo dos pedidos rejeitados, por rota.", contadores.custo_rejeitado),
+    ):
+        linhas.append(f"# HELP {nome} {descricao}")
+        linhas.append(f"# TYPE {nome} counter")
+        for rota, custo in sorted(custos.items()):
+            linhas.append(f'{nome}{{route="{_escapar(rota)}"}} {custo:g}')
+    for nome, descricao, campo in (
+        ("http_inflight_cost", "Soma dos custos dos pedidos em execução.", "em_curso"),
+        ("http_inflight_capacity", "Soma máxima dos custos dos pedidos em execução (0: sem limite).", "capacidade"),
+        ("http_queue_length", "Pedidos à espera na fila de admissão.", "em_fila"),
+        ("http_admission_overloaded", "1 se a fila não esvaziou no último intervalo (CoDel).", "sobrecarregada"),
+        ("http_inflight_downloads", "Transferências longas em curso (ex: exportação).", "downloads_em_curso"),
+        ("http_inflight_downloads_capacity", "Número máximo de transferências longas em simultâneo (0: sem limite).", "downloads_capacidade"),
+    ):
+        linhas.append(f"# HELP {nome} {descricao}")
+        linhas.append(f"# TYPE {nome} gauge")
+        linhas.append(f"{nome} {int(estado[campo]) if campo == 'sobrecarregada' else estado[campo]:g}")
+    linhas.append("# HELP http_queue_wait_seconds Tempo de espera na fila dos pedidos admitidos.")
+    linhas.append("# TYPE http_queue_wait_seconds histogram")
+    _exportar_histograma(linhas, "http_queue_wait_seconds", 'queue="admissao"', contadores.espera)
+
+
+# Instância única do registo, partilhada por todos os pedidos deste processo.
+registo = RegistoMetricas()
+
+
+# --- Medição de Cada Pedido ---
+
+class MedicaoPedido:
+    """
+    Consultas à base de dados e bytes enviados durante um pedido.
+    """
+    __slots__ = ("consultas", "tempo_db", "bytes")
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_db = 0.0
+        self.bytes = 0
+
+
+# A medição do pedido em curso (None fora de um pedido, por exemplo nos comandos de 'cli.py').
+pedido_atual = ContextVar("metricas_pedido_atual", default=None)
+
+
+def _antes_consulta(conn, cursor, statement, parameters, context, executemany):
+    conn.info["metricas_inicio"] = time.perf_counter()
+
+
+def _depois_consulta(conn, cursor, statement, parameters, context, executemany):
+    medicao = pedido_atual.get()
+    inicio = conn.info.pop("metricas_inicio", None)
+    if medicao is None or inicio is None:
+        return
+    medicao.consultas += 1
+    medicao.tempo_db += time.perf_counter() - inicio
+
+
+def instrumentar(engine):
+    """
+    Regista os eventos que contam as consultas e o tempo na base de dados de cada pedido.
+    """
+    if not event.contains(engine, "before_cursor_execute", _antes_consulta):
+        event.listen(engine, "before_cursor_execute", _antes_consulta)
+        event.listen(engine, "after_cursor_execute", _depois_consulta)
+
+
+for _engine in database.engines:
+    instrumentar(_engine)
+
+
+# --- Middleware ---
+
+class MiddlewareMetricas:
+    """
+    Middleware ASGI que mede cada pedido HTTP e o regista em 'registo'.
+    Não usa o 'BaseHTTPMiddleware' do Starlette, que acrescenta uma tarefa e filas por pedido
+    e atrasaria as respostas em streaming (exportação e 'GET /empresas/stream').
+    """
+    def __init__(self, app, registo=registo):
+        self.app = app
+        self.registo = registo
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        medicao = MedicaoPedido()
+        token = pedido_atual.set(medicao)
+        # Sem o início da resposta (uma exceção não tratada), o pedido é contado como erro 500.
+        estado = 500
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            nonlocal estado
+            if mensagem["type"] == "http.response.start":
+                estado = mensagem["status"]
+            elif mensagem["type"] == "http.response.body":
+                medicao.bytes += len(mensagem.get("body", b""))
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracao = time.perf_counter() - inicio
+            pedido_atual.reset(token)
+            # O roteamento guarda a rota encontrada no 'scope', que é partilhado com este middleware.
+            rota = getattr(scope.get("route"), "path", None) or ROTA_DESCONHECIDA
+            self.registo.registar(
+                scope["method"], rota, estado, duracao, medicao.consultas, medicao.tempo_db, medicao.bytes
+            )
@@ -0,0 +1,79 @@
+# --- Importações de Módulos ---
+import base64
+import json
+from datetime import datetime
+# 'tuple_' permite comparar várias colunas de uma só vez: (coluna, id) > (valor, id).
+from sqlalchemy import tuple_
+
+
+# --- Exceção de Cursor Inválido ---
+# Lançada quando o cursor recebido do cliente não pode ser descodificado
+# ou não corresponde à ordenação pedida. As rotas convertem-na num erro HTTP 400.
+class CursorInvalido(ValueError):
+    pass
+
+
+# --- Funções de Codificação do Cursor ---
+
+def codificar_cursor(ordenar_por, valor, ultimo_id):
+    """
+    Gera um cursor opaco a partir da posição do último item de uma página.
+    """
+    # As datas não são serializáveis em JSON, por isso guardamo-las em formato ISO
+    # e marcamos o tipo para as reconstruir na descodificação.
+    if isinstance(valor, datetime):
+        valor = {"dt": valor.isoformat()}
+    dados = {"s": ordenar_por, "v": valor, "id": ultimo_id}
+    texto = json.dumps(dados, separators=(",", ":")).encode("utf-8")
+    # O base64 "urlsafe" permite que o cursor seja enviado diretamente na query string.
+    return base64.urlsafe_b64encode(texto).decode("ascii").rstrip("=")
+
+
+def descodificar_cursor(cursor, ordenar_por):
+    """
+    Recupera a posição (valor da coluna de ordenação, id) guardada num cursor.
+    """
+    try:
+        # Repõe o "padding" retirado na codificação antes de descodificar.
+        texto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        dados = json.loads(texto)
+        valor = dados["v"]
+        if isinstance(valor, dict):
+            valor = datetime.fromisoformat(valor["dt"])
+        ultimo_id = int(dados["id"])
+        cursor_ordenacao = dados["s"]
+    except (ValueError, KeyError, TypeError):
+        raise CursorInvalido("Cursor inválido.")
+
+    # Um cursor só é válido para a ordenação com que foi gerado.
+    if cursor_ordenacao != ordenar_por:
+        raise CursorInvalido("O cursor não corresponde à ordenação pedida.")
+
+    return valor, ultimo_id
+
+
+# --- Paginação por Chave (Keyset) ---
+
+def paginar(query, coluna_ordem, coluna_id, descendente, posicao, limit):
+    """
+    Aplica paginação por chave (keyset) a uma consulta.
+    Em vez de OFFSET, filtra pelas linhas posteriores à última posição vista,
+    o que permite à base de dados usar o índice composto (coluna_ordem, id)
+    e manter a mesma latência em qualquer página.
+    Devolve os itens da página e um indicador de existência de mais páginas.
+    """
+    # A chave de ordenação é sempre composta pelo id, para desempatar valores repetidos.
+    chave = [coluna_id] if coluna_ordem is None else [coluna_ordem, coluna_id]
+
+    if posicao is not None:
+        valores = [posicao[1]] if coluna_ordem is None else list(posicao)
+        if descendente:
+            query = query.filter(tuple_(*chave) < tuple_(*valores))
+        else:
+            query = query.filter(tuple_(*chave) > tuple_(*valores))
+
+    ordem = [coluna.desc() if descendente else coluna.asc() for coluna in chave]
+    # Pede um item a mais para saber se existe uma página seguinte sem precisar de um COUNT.
+    itens = query.order_by(*ordem).limit(limit + 1).all()
+
+    return itens[:limit], len(itens) > limit
@@ -0,0 +1,158 @@
+# Esse arquivo contém a cache dos administradores autenticados ("principais"), usada por 'deps.get_current_admin'.
+# Sem a cache, cada pedido autenticado descodifica o token JWT e consulta a tabela de administradores.
+# Com a cache, um token já visto é resolvido em memória, sem nenhuma consulta à base de dados.
+
+# --- Importações de Módulos ---
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+# 'event' permite reagir às alterações feitas aos administradores através do ORM.
+from sqlalchemy import event, inspect
+
+from ..models.administrador import Administrador
+
+# --- Configurações da Cache ---
+# Tempo máximo (em segundos) que um principal fica em cache. Com 0, a cache fica desativada.
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+# Número máximo de tokens guardados; acima disso, os menos usados recentemente são descartados (LRU).
+PRINCIPAL_CACHE_MAX = int(os.getenv("PRINCIPAL_CACHE_MAX", 1024))
+
+
+# --- Principal ---
+# O administrador autenticado, tal como é devolvido por 'get_current_admin' e guardado em cache.
+# É um valor imutável, e não o objeto do ORM: é partilhado pelos pedidos seguintes, por isso não pode ficar
+# ligado à sessão do pedido que o carregou (cujo commit o expiraria) nem ser alterado por uma rota.
+Principal = namedtuple("Principal", ["id", "username"])
+
+
+def principal(admin):
+    """
+    Converte um 'Administrador' do ORM no principal guardado em cache.
+    """
+    return Principal(admin.id, admin.username)
+
+
+# --- Cache de Principais ---
+# Cada entrada é indexada pelo token e guarda o principal, o seu username e o instante de expiração,
+# que nunca ultrapassa a expiração ('exp') do próprio token.
+class CachePrincipais:
+    def __init__(self, ttl, tamanho_maximo):
+        self.ttl = ttl
+        self.tamanho_maximo = tamanho_maximo
+        self._lock = threading.Lock()
+        # token -> (principal, username, instante de expiração)
+        self._entradas = OrderedDict()
+        # username -> tokens em cache desse administrador (para a invalidação por username).
+        self._tokens_por_username = {}
+        # Contadores para acompanhar a eficácia da cache.
+        self.acertos = 0
+        self.falhas = 0
+        self.expulsoes = 0
+        self.invalidacoes = 0
+
+    def _retirar(self, token):
+        _, username, _ = self._entradas.pop(token)
+        tokens = self._tokens_por_username.get(username)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_por_username[username]
+
+    def obter(self, token):
+        """
+        Devolve o principal associado ao token, ou None se não estiver em cache (ou tiver expirado).
+        """
+        agora = time.time()
+        with self._lock:
+            entrada = self._entradas.get(token)
+            if entrada is None:
+                self.falhas += 1
+                return None
+            if entrada[2] <= agora:
+                self._retirar(token)
+                self.falhas += 1
+                return None
+            # Marca a entrada como usada recentemente.
+            self._entradas.move_to_end(token)
+            self.acertos += 1
+            return entrada[0]
+
+    def username(self, token):
+        """
+        Devolve o username associado ao token, se estiver em cache, sem contar um acerto nem alterar a ordem LRU.
+        Usada pelo controlo de admissão ('admissao_service'), antes da autenticação do pedido.
+        """
+        entrada = self._entradas.get(token)
+        if entrada is None or entrada[2] <= time.time():
+            return None
+        return entrada[1]
+
+    def guardar(self, token, admin, expiracao_token):
+        """
+        Guarda o principal ('Principal') associado ao token, até ao TTL ou à expiração do token (o que ocorrer primeiro).
+        """
+        if self.ttl <= 0:
+            return
+        expira_em = time.time() + self.ttl
+        if expiracao_token is not None:
+            expira_em = min(expira_em, float(expiracao_token))
+        with self._lock:
+            if token in self._entradas:
+                self._retirar(token)
+            self._entradas[token] = (admin, admin.username, expira_em)
+            self._tokens_por_username.setdefault(admin.username, set()).add(token)
+            # Descarta as entradas menos usadas recentemente quando a cache está cheia.
+            while len(self._entradas) > self.tamanho_maximo:
+                self._retirar(next(iter(self._entradas)))
+                self.expulsoes += 1
+
+    def invalidar(self, username):
+        """
+        Descarta todas as entradas de um administrador. Deve ser chamada quando ele é alterado ou apagado.
+        """
+        with self._lock:
+            for token in list(self._tokens_por_username.get(username, ())):
+                self._retirar(token)
+                self.invalidacoes += 1
+
+    def limpar(self):
+        """
+        Descarta todas as entradas da cache.
+        """
+        with self._lock:
+            self.invalidacoes += len(self._entradas)
+            self._entradas.clear()
+            self._tokens_por_username.clear()
+
+    def estatisticas(self):
+        """
+        Devolve os contadores da cache.
+        """
+        with self._lock:
+            return {
+                "entradas": len(self._entradas),
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "expulsoes": self.expulsoes,
+                "invalidacoes": self.invalidacoes,
+            }
+
+
+# Instância única da cache, partilhada por todos os pedidos deste processo.
+cache = CachePrincipais(PRINCIPAL_CACHE_TTL, PRINCIPAL_CACHE_MAX)
+
+
+# --- Invalidação Automática ---
+# Sempre que um administrador é alterado ou apagado através do ORM, as suas entradas são descartadas.
+# Se o username mudar, são descartadas as entradas do username antigo e do novo.
+@event.listens_for(Administrador, "after_update")
+def _invalidar_apos_alteracao(mapper, connection, target):
+    historico = inspect(target).attrs.username.history
+    for username in set(historico.deleted or ()) | {target.username}:
+        cache.invalidar(username)
+
+
+@event.listens_for(Administrador, "after_delete")
+def _invalidar_apos_exclusao(mapper, connection, target):
+    cache.invalidar(target.username)
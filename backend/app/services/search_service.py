@@ -0,0 +1,379 @@
+# Esse arquivo contém o motor de pesquisa textual das empresas (nome, cidade e ramo de atuação).
+#
+# - O nome é pesquisado na tabela de empresas:
+#   - Em PostgreSQL, a pesquisa usa índices de trigramas (extensão pg_trgm, índices GIN),
+#     que aceleram o 'ILIKE %termo%' e permitem ordenar por semelhança ('similarity').
+#   - Nas outras bases de dados (por exemplo, SQLite nos testes), a pesquisa usa um índice
+#     invertido de trigramas mantido em memória por cada processo (e atualizado com as escritas de todos eles).
+# - A cidade e o ramo de atuação são pesquisados nos catálogos ('catalogo_service'), sem acentos nem distinção
+#   de maiúsculas. O termo é convertido nos IDs das entradas correspondentes e o filtro das empresas é
+#   uma igualdade (valor exato) ou um 'IN' (parte do texto) sobre a coluna do ID, em qualquer base de dados.
+
+# --- Importações de Módulos ---
+import threading
+from sqlalchemy import case, func, literal
+
+from ..models.empresa import Empresa
+from ..models.empresa_removida import EmpresaRemovida
+from . import catalogo_service, pagination_service
+
+# Campos de texto da empresa pesquisados na própria tabela.
+CAMPOS_PESQUISA = ("nome",)
+
+# A partir deste número de resultados, o índice em memória filtra com ILIKE em vez de
+# enviar a lista de IDs para a base de dados (o SQLite limita o número de parâmetros).
+LIMITE_IDS_FILTRO = 10000
+
+
+# --- Funções Auxiliares ---
+
+def normalizar(texto):
+    """
+    Normaliza um texto para pesquisa, sem diferenciar maiúsculas de minúsculas.
+    """
+    return " ".join(texto.casefold().split())
+
+
+def trigramas(texto):
+    """
+    Gera os trigramas contíguos de um texto já normalizado (usados para encontrar candidatos).
+    """
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def trigramas_palavras(texto):
+    """
+    Gera os trigramas de cada palavra, com o mesmo preenchimento usado pelo pg_trgm
+    (dois espaços antes e um depois), para calcular a semelhança entre textos.
+    """
+    resultado = set()
+    for palavra in texto.split():
+        resultado |= trigramas(f"  {palavra} ")
+    return resultado
+
+
+def semelhanca(termo, texto):
+    """
+    Calcula a semelhança entre dois textos, tal como a função 'similarity' do pg_trgm:
+    trigramas em comum a dividir pelo total de trigramas distintos.
+    """
+    a, b = trigramas_palavras(termo), trigramas_palavras(texto)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def escapar_like(termo):
+    """
+    Escapa os caracteres especiais do LIKE ('%' e '_'), para que sejam pesquisados literalmente.
+    """
+    return termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def filtrar_ilike(query, filtros):
+    """
+    Aplica os filtros de pesquisa como 'ILIKE %termo%' (servido pelos índices de trigramas em PostgreSQL).
+    """
+    for campo, termo in filtros.items():
+        query = query.filter(getattr(Empresa, campo).ilike(f"%{escapar_like(termo)}%", escape="\\"))
+    return query
+
+
+# --- Filtros pelos Catálogos ---
+# Cada filtro por cidade ou ramo de atuação é uma "restrição": a coluna do ID na tabela de empresas
+# e as entradas do catálogo aceites, com a respetiva relevância ({ID: relevância}).
+
+def restricoes_catalogo(db, filtros):
+    """
+    Procura os termos da cidade e do ramo de atuação nos catálogos. Devolve a lista de restrições.
+    """
+    restricoes = []
+    for campo, catalogo in catalogo_service.CATALOGOS.items():
+        termo = filtros.get(campo)
+        if termo:
+            k = catalogo_service.chave(termo)
+            entradas = catalogo.procurar(db, termo)
+            restricoes.append((catalogo.coluna, {i: semelhanca(k, c) for i, c in entradas.items()}))
+    return restricoes
+
+
+def filtrar_catalogos(query, restricoes):
+    """
+    Aplica as restrições: uma igualdade com o ID, quando o termo corresponde a uma única entrada
+    (servida pelo índice composto da coluna do ID), ou 'IN' com os IDs das entradas que contêm o termo.
+    """
+    for coluna, relevancias in restricoes:
+        ids = sorted(relevancias)
+        query = query.filter(coluna == ids[0] if len(ids) == 1 else coluna.in_(ids))
+    return query
+
+
+def relevancia_catalogos(restricoes):
+    """
+    Devolve as expressões SQL da relevância das restrições (uma por restrição): a relevância da entrada de cada empresa.
+    """
+    termos = []
+    for coluna, relevancias in restricoes:
+        valores = set(relevancias.values())
+        if len(valores) > 1:
+            termos.append(case(relevancias, value=coluna, else_=0.0))
+        else:
+            # Todas as empresas aceites têm a mesma relevância (por exemplo, com um valor exato).
+            termos.append(literal(valores.pop() if valores else 0.0))
+    return termos
+
+
+# --- Índice Invertido em Memória ---
+# Usado quando a base de dados não suporta índices de trigramas.
+# O índice é carregado da base de dados na primeira pesquisa. As escritas deste processo são aplicadas de imediato
+# (pelas rotas de criação, atualização e exclusão de empresas), e as dos outros processos (outros workers da API
+# ou tarefas em segundo plano) antes de cada pesquisa: o índice guarda a maior versão que já viu e lê as alterações
+# posteriores, tal como 'GET /empresas/changes' (as empresas com uma versão maior e as exclusões em 'empresas_removidas').
+# Como as versões vêm de um contador crescente ('Empresa.versao'), a leitura usa o índice da versão
+# e, sem alterações, não devolve nenhuma linha.
+# Além dos trigramas do nome, guarda os IDs da cidade e do ramo de atuação de cada empresa,
+# para combinar a pesquisa pelo nome com os filtros dos catálogos (e a respetiva relevância) sem consultar a base de dados.
+class IndiceTrigramas:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._carregado = False
+        # Maior versão (de uma empresa ou de uma exclusão) já aplicada ao índice.
+        self._versao = 0
+        # Para cada campo: trigrama -> conjunto de IDs de empresas que o contêm.
+        self._postings = {campo: {} for campo in CAMPOS_PESQUISA}
+        # Para cada campo: ID da empresa -> texto normalizado (usado para confirmar as correspondências).
+        self._textos = {campo: {} for campo in CAMPOS_PESQUISA}
+        # Para cada coluna dos catálogos (ex: "cidade_id"): ID da empresa -> ID da entrada do catálogo.
+        self._catalogos = {catalogo.coluna.key: {} for catalogo in catalogo_service.CATALOGOS.values()}
+
+    def _adicionar(self, empresa_id, valores):
+        for campo in CAMPOS_PESQUISA:
+            texto = normalizar(valores[campo])
+            self._textos[campo][empresa_id] = texto
+            postings = self._postings[campo]
+            for trigrama in trigramas(texto):
+                postings.setdefault(trigrama, set()).add(empresa_id)
+        for coluna, ids in self._catalogos.items():
+            ids[empresa_id] = valores[coluna]
+
+    def _retirar(self, empresa_id):
+        for campo in CAMPOS_PESQUISA:
+            texto = self._textos[campo].pop(empresa_id, None)
+            if texto is None:
+                continue
+            postings = self._postings[campo]
+            for trigrama in trigramas(texto):
+                ids = postings.get(trigrama)
+                if ids is not None:
+                    ids.discard(empresa_id)
+                    if not ids:
+                        del postings[trigrama]
+        for ids in self._catalogos.values():
+            ids.pop(empresa_id, None)
+
+    def _colunas(self):
+        return [getattr(Empresa, campo) for campo in CAMPOS_PESQUISA] + [
+            getattr(Empresa, coluna) for coluna in self._catalogos
+        ]
+
+    def carregar(self, db):
+        """
+        Constrói o índice a partir da tabela de empresas, se ainda não tiver sido construído.
+        """
+        with self._lock:
+            if self._carregado:
+                return
+            # A versão é lida antes das empresas: uma escrita feita durante a leitura é aplicada de novo
+            # na próxima sincronização, o que não altera o resultado.
+            self._versao = max(
+                db.query(func.max(Empresa.versao)).scalar() or 0,
+                db.query(func.max(EmpresaRemovida.versao)).scalar() or 0,
+            )
+            linhas = db.query(Empresa.id, *self._colunas())
+            for linha in linhas.yield_per(1000):
+                self._adicionar(linha.id, linha._mapping)
+            self._carregado = True
+
+    def sincronizar(self, db):
+        """
+        Aplica ao índice as alterações posteriores à última versão vista, feitas por qualquer processo.
+        """
+        with self._lock:
+            if not self._carregado:
+                return
+            alteradas = db.query(Empresa.versao, Empresa.id, *self._colunas()).filter(Empresa.versao > self._versao)
+            removidas = db.query(EmpresaRemovida.versao, EmpresaRemovida.empresa_id).filter(
+                EmpresaRemovida.versao > self._versao
+            )
+            # (versão, ID, valores), com None nas exclusões. As alterações são aplicadas pela ordem das versões
+            # (um ID excluído pode ser reutilizado por outra empresa).
+            alteracoes = [(linha.versao, linha.id, linha._mapping) for linha in alteradas]
+            alteracoes += [(linha.versao, linha.empresa_id, None) for linha in removidas]
+            for versao, empresa_id, valores in sorted(alteracoes, key=lambda alteracao: alteracao[0]):
+                self._retirar(empresa_id)
+                if valores is not None:
+                    self._adicionar(empresa_id, valores)
+                self._versao = versao
+
+    def indexar(self, empresa):
+        """
+        Adiciona (ou substitui) uma empresa no índice. Chamada após criar ou atualizar uma empresa.
+        """
+        with self._lock:
+            if not self._carregado:
+                return
+            self._retirar(empresa.id)
+            self._adicionar(empresa.id, {
+                campo: getattr(empresa, campo) for campo in (*CAMPOS_PESQUISA, *self._catalogos)
+            })
+
+    def remover(self, empresa_id):
+        """
+        Retira uma empresa do índice. Chamada após excluir uma empresa.
+        """
+        with self._lock:
+            if self._carregado:
+                self._retirar(empresa_id)
+
+    def limpar(self):
+        """
+        Descarta o índice; será reconstruído na próxima pesquisa.
+        """
+        with self._lock:
+            self._postings = {campo: {} for campo in CAMPOS_PESQUISA}
+            self._textos = {campo: {} for campo in CAMPOS_PESQUISA}
+            self._catalogos = {coluna: {} for coluna in self._catalogos}
+            self._versao = 0
+            self._carregado = False
+
+    def pesquisar(self, db, filtros, restricoes=()):
+        """
+        Devolve um dicionário {ID da empresa: relevância} com as empresas que contêm
+        todos os termos pesquisados nos respetivos campos e que respeitam as restrições dos catálogos.
+        """
+        self.carregar(db)
+        with self._lock:
+            self.sincronizar(db)
+            resultado = None
+            for campo, termo in filtros.items():
+                termo = normalizar(termo)
+                textos = self._textos[campo]
+                postings = self._postings[campo]
+
+                # Candidatos: empresas que contêm todos os trigramas do termo.
+                # Termos com menos de 3 caracteres não têm trigramas; nesse caso, verificamos todos os textos.
+                candidatos = None
+                for trigrama in sorted(trigramas(termo), key=lambda t: len(postings.get(t, ()))):
+                    ids = postings.get(trigrama, set())
+                    candidatos = set(ids) if candidatos is None else candidatos & ids
+                    if not candidatos:
+                        break
+                if candidatos is None:
+                    candidatos = textos.keys()
+                if resultado is not None:
+                    candidatos = [i for i in candidatos if i in resultado]
+
+                # Confirma que o termo aparece de facto no texto e calcula a relevância.
+                parcial = {}
+                for empresa_id in candidatos:
+                    texto = textos[empresa_id]
+                    if termo in texto:
+                        anterior = resultado[empresa_id] if resultado is not None else 0.0
+                        parcial[empresa_id] = anterior + semelhanca(termo, texto)
+                resultado = parcial
+                if not resultado:
+                    break
+
+            # Mantém apenas as empresas cuja cidade (ou ramo) está entre as entradas aceites, somando a sua relevância.
+            for coluna, relevancias in restricoes:
+                if not resultado:
+                    break
+                ids = self._catalogos[coluna.key]
+                resultado = {
+                    empresa_id: relevancia + relevancias[ids[empresa_id]]
+                    for empresa_id, relevancia in resultado.items()
+                    if ids.get(empresa_id) in relevancias
+                }
+            return resultado or {}
+
+
+# Instância única do índice, partilhada por todos os pedidos deste processo.
+indice = IndiceTrigramas()
+
+
+# --- Estratégias de Pesquisa ---
+
+class PesquisaBaseDados:
+    """
+    Pesquisa servida pela base de dados: em PostgreSQL (com pg_trgm), ou em qualquer base de dados
+    quando só há filtros pelos catálogos (que não precisam dos trigramas).
+    """
+    def __init__(self, filtros, restricoes):
+        self.filtros = filtros
+        self.restricoes = restricoes
+
+    def filtrar(self, query):
+        return filtrar_catalogos(filtrar_ilike(query, self.filtros), self.restricoes)
+
+    def paginar_por_relevancia(self, query, posicao, limit):
+        # Sem termos de texto e com uma única relevância por catálogo (por exemplo, com valores exatos),
+        # todas as empresas têm a mesma relevância: a ordem é a do ID, servida pelo índice (cidade_id, id).
+        if not self.filtros and all(len(set(relevancias.values())) <= 1 for _, relevancias in self.restricoes):
+            relevancia = sum(next(iter(relevancias.values()), 0.0) for _, relevancias in self.restricoes)
+            linhas, tem_mais = pagination_service.paginar(self.filtrar(query), None, Empresa.id, True, posicao, limit)
+            return [(linha, relevancia) for linha in linhas], tem_mais
+
+        # A relevância é a soma da semelhança de cada campo pesquisado com o respetivo termo.
+        termos = [func.similarity(getattr(Empresa, campo), termo) for campo, termo in self.filtros.items()]
+        relevancia = sum(termos + relevancia_catalogos(self.restricoes))
+        query = self.filtrar(query).add_columns(relevancia.label("relevancia"))
+        linhas, tem_mais = pagination_service.paginar(query, relevancia, Empresa.id, True, posicao, limit)
+        # Cada linha mantém as colunas da consulta (a relevância fica como coluna extra, no fim).
+        return [(linha, float(linha.relevancia)) for linha in linhas], tem_mais
+
+
+class PesquisaIndice:
+    """
+    Pesquisa servida pelo índice invertido em memória.
+    """
+    def __init__(self, resultados, filtros, restricoes):
+        self.resultados = resultados
+        self.filtros = filtros
+        self.restricoes = restricoes
+
+    def filtrar(self, query):
+        # Com muitos resultados, a lista de IDs deixa de compensar; o ILIKE devolve as mesmas linhas.
+        if len(self.resultados) > LIMITE_IDS_FILTRO:
+            return filtrar_catalogos(filtrar_ilike(query, self.filtros), self.restricoes)
+        return query.filter(Empresa.id.in_(list(self.resultados)))
+
+    def paginar_por_relevancia(self, query, posicao, limit):
+        # Ordena por (relevância, ID) descendente, tal como a ordenação feita pela base de dados.
+        ordenados = sorted(((relevancia, empresa_id) for empresa_id, relevancia in self.resultados.items()), reverse=True)
+        if posicao is not None:
+            ordenados = [chave for chave in ordenados if chave < tuple(posicao)]
+        pagina = ordenados[:limit]
+        empresas = {e.id: e for e in query.filter(Empresa.id.in_([empresa_id for _, empresa_id in pagina]))}
+        itens = [(empresas[empresa_id], relevancia) for relevancia, empresa_id in pagina if empresa_id in empresas]
+        return itens, len(ordenados) > limit
+
+
+def usa_trigramas(db):
+    """
+    Indica se a base de dados da sessão suporta os índices de trigramas (PostgreSQL).
+    """
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def criar_pesquisa(db, filtros):
+    """
+    Cria a estratégia de pesquisa adequada à base de dados, ou None se não houver termos a pesquisar.
+    """
+    filtros = {campo: termo for campo, termo in filtros.items() if termo}
+    if not filtros:
+        return None
+    restricoes = restricoes_catalogo(db, filtros)
+    filtros = {campo: termo for campo, termo in filtros.items() if campo in CAMPOS_PESQUISA}
+    if usa_trigramas(db) or not filtros:
+        return PesquisaBaseDados(filtros, restricoes)
+    return PesquisaIndice(indice.pesquisar(db, filtros, restricoes), filtros, restricoes)
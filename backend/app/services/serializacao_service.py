@@ -0,0 +1,147 @@
+# Esse arquivo contém a serialização rápida das respostas de empresas em JSON.
+# As consultas devolvem tuplos com as colunas da resposta ('empresa_service.COLUNAS_RESPOSTA'), que são
+# codificados diretamente com o orjson, sem criar nem validar um modelo Pydantic por empresa
+# (os dados vêm da base de dados e já foram validados na escrita).
+# O resultado é igual ao JSON que o FastAPI produz a partir do 'response_model' ('EmpresaResponse'),
+# que continua declarado nas rotas e descreve a resposta na documentação (OpenAPI). Isso inclui as datas:
+# o orjson escreve as datas em UTC com "+00:00", e o Pydantic com "Z", por isso é usada a opção 'OPT_UTC_Z'.
+#
+# A listagem também pode ser pedida noutros formatos, com o cabeçalho 'Accept' ('negociar'):
+# - "application/msgpack": a mesma estrutura do JSON, em MessagePack (binário; requer o pacote 'msgpack').
+# - "application/vnd.empresas.colunas+json" (ou "+msgpack"): formato em colunas, para consumidores em lote:
+#   um array por campo, e a cidade e o ramo de atuação (que se repetem muito) como um dicionário de valores
+#   distintos mais os índices de cada empresa nesse dicionário.
+# Cada formato é gerado diretamente a partir das linhas da consulta, numa única passagem.
+
+# --- Importações de Módulos ---
+from operator import attrgetter
+import orjson
+
+# O MessagePack é opcional: sem o pacote 'msgpack', os formatos binários não são oferecidos.
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Campos da resposta, pela mesma ordem do JSON gerado a partir do schema 'EmpresaResponse'
+# (primeiro os campos herdados de 'EmpresaBase' e depois os de 'EmpresaResponse').
+CAMPOS_RESPOSTA = ("nome", "cidade", "ramo_atuacao", "telefone", "id", "cnpj", "email_contato", "data_cadastro")
+
+# Lê os campos de uma linha (tuplo da consulta ou objeto do ORM) de uma só vez.
+_ler_campos = attrgetter(*CAMPOS_RESPOSTA)
+
+
+# Opções do orjson em todas as respostas com empresas ('para_json').
+OPCOES_ORJSON = orjson.OPT_UTC_Z
+
+
+def para_json(dados):
+    """
+    Serializa os dados em bytes JSON, com as datas no mesmo formato do Pydantic (UTC com "Z").
+    """
+    return orjson.dumps(dados, option=OPCOES_ORJSON)
+
+
+def formatar_data(valor):
+    """
+    Converte uma data em texto ISO 8601, no mesmo formato do JSON (UTC com "Z"), para os formatos
+    que não são gerados pelo orjson (MessagePack e exportação).
+    """
+    texto = valor.isoformat()
+    return texto[:-6] + "Z" if texto.endswith("+00:00") else texto
+
+
+def para_dicionario(linha):
+    """
+    Converte uma linha no dicionário da resposta (as datas continuam como 'datetime').
+    """
+    return dict(zip(CAMPOS_RESPOSTA, _ler_campos(linha)))
+
+
+def codificar(dados):
+    """
+    Serializa uma empresa (ou uma lista de empresas) em bytes JSON.
+    O orjson codifica as datas no formato ISO 8601, como o Pydantic ('OPCOES_ORJSON').
+    """
+    if isinstance(dados, list):
+        return para_json([dict(zip(CAMPOS_RESPOSTA, _ler_campos(linha))) for linha in dados])
+    return para_json(para_dicionario(dados))
+
+
+# --- Outros Formatos da Listagem ---
+
+TIPO_JSON = "application/json"
+TIPO_MSGPACK = "application/msgpack"
+TIPO_COLUNAS_JSON = "application/vnd.empresas.colunas+json"
+TIPO_COLUNAS_MSGPACK = "application/vnd.empresas.colunas+msgpack"
+
+# Nomes alternativos aceites no cabeçalho 'Accept'.
+SINONIMOS = {"application/x-msgpack": TIPO_MSGPACK}
+
+# Campos codificados como dicionário no formato em colunas.
+CAMPOS_DICIONARIO = ("cidade", "ramo_atuacao")
+
+
+def _padrao_msgpack(valor):
+    # O MessagePack não tem um tipo para as datas: são enviadas em ISO 8601, como no JSON.
+    if hasattr(valor, "isoformat"):
+        return formatar_data(valor)
+    raise TypeError(f"Tipo não suportado: {type(valor).__name__}")
+
+
+def _empacotar(dados):
+    return msgpack.packb(dados, default=_padrao_msgpack)
+
+
+def para_colunas(linhas):
+    """
+    Converte uma lista de linhas no formato em colunas:
+    {"total": n, "colunas": {"nome": [...], "cidade": {"valores": [...], "indices": [...]}, ...}}.
+    """
+    colunas = {}
+    valores = list(zip(*map(_ler_campos, linhas))) if linhas else [()] * len(CAMPOS_RESPOSTA)
+    for campo, coluna in zip(CAMPOS_RESPOSTA, valores):
+        if campo in CAMPOS_DICIONARIO:
+            dicionario = {}
+            indices = [dicionario.setdefault(valor, len(dicionario)) for valor in coluna]
+            colunas[campo] = {"valores": list(dicionario), "indices": indices}
+        else:
+            colunas[campo] = list(coluna)
+    return {"total": len(linhas), "colunas": colunas}
+
+
+# Função que serializa uma lista de linhas em cada formato, pela ordem de preferência em caso de empate no 'Accept'.
+FORMATOS = {TIPO_JSON: codificar, TIPO_COLUNAS_JSON: lambda linhas: para_json(para_colunas(linhas))}
+if msgpack is not None:
+    FORMATOS[TIPO_MSGPACK] = lambda linhas: _empacotar([para_dicionario(linha) for linha in linhas])
+    FORMATOS[TIPO_COLUNAS_MSGPACK] = lambda linhas: _empacotar(para_colunas(linhas))
+
+
+def negociar(accept):
+    """
+    Escolhe o formato da resposta a partir do cabeçalho 'Accept' (com os pesos 'q').
+    Sem cabeçalho, ou se nenhum formato disponível for aceite, a resposta é JSON.
+    """
+    if not accept:
+        return TIPO_JSON
+    pesos = {}
+    for parte in accept.split(","):
+        tipo, *opcoes = [elemento.strip() for elemento in parte.split(";")]
+        tipo = SINONIMOS.get(tipo.lower(), tipo.lower())
+        peso = 1.0
+        for opcao in opcoes:
+            nome, _, valor = opcao.partition("=")
+            if nome.strip() == "q":
+                try:
+                    peso = float(valor)
+                except ValueError:
+                    peso = 0.0
+        pesos[tipo] = peso
+
+    melhor, melhor_peso = TIPO_JSON, 0.0
+    for tipo in FORMATOS:
+        # O tipo exato tem precedência sobre 'application/*', que tem precedência sobre '*/*'.
+        peso = pesos.get(tipo, pesos.get(tipo.split("/")[0] + "/*", pesos.get("*/*", 0.0)))
+        if peso > melhor_peso:
+            melhor, melhor_peso = tipo, peso
+    return melhor
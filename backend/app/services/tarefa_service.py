@@ -0,0 +1,636 @@
+# Esse arquivo contém o motor das tarefas em segundo plano ('POST /jobs'): as importações e exportações grandes
+# e a reconstrução das facetas são executadas fora dos pedidos HTTP, sem ocupar um worker do uvicorn.
+# - As tarefas ficam na tabela 'tarefas': a própria base de dados faz de fila, sem nenhum "broker" externo.
+# - Cada processo da API tem um conjunto de threads ('JOBS_WORKERS', o limite de tarefas em simultâneo nesse
+#   processo) que reservam a próxima tarefa pendente (a de maior prioridade e, entre essas, a mais antiga)
+#   com uma atualização condicional, segura com vários processos a partilhar a mesma tabela.
+# - A tarefa avança por blocos. Depois de cada bloco, grava o progresso e o ponto de retoma (na mesma transação
+#   do trabalho, sempre que possível) e verifica se foi pedido o cancelamento.
+# - Uma tarefa interrompida (reinício da aplicação ou falha do processo) volta a ficar pendente e é retomada
+#   a partir do último ponto gravado, quando o processo que a executava já não existe ou deixou de dar sinal de vida.
+# - Os ficheiros recebidos (importações) e produzidos (exportações e relatórios de erros) ficam na pasta 'JOBS_DIR'.
+
+# --- Importações de Módulos ---
+import asyncio
+import glob
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+from starlette.concurrency import run_in_threadpool
+
+from ..db.database import ReadSessionLocal, SessionLocal
+from ..models.empresa import Empresa
+from ..models.tarefa import Tarefa
+from . import cache_service, eventos_service, export_service, faceta_service, import_service
+
+# --- Configurações das Tarefas ---
+# Número de tarefas executadas em simultâneo por cada processo (0 desativa a execução neste processo:
+# as tarefas criadas aqui são executadas pelos outros processos).
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", 2))
+# Pasta dos ficheiros das tarefas. Tem de ser partilhada por todos os processos da máquina.
+JOBS_DIR = os.getenv("JOBS_DIR", "dados_tarefas")
+# Intervalo (em segundos) entre as procuras de tarefas pendentes e entre os sinais de vida das tarefas em execução.
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", 2))
+# Tempo (em segundos) sem sinal de vida ao fim do qual uma tarefa em execução é considerada abandonada.
+JOBS_HEARTBEAT_TIMEOUT = float(os.getenv("JOBS_HEARTBEAT_TIMEOUT", 60))
+# Tempo máximo (em segundos) de espera, ao parar a aplicação, para que as tarefas em execução gravem o progresso.
+JOBS_SHUTDOWN_TIMEOUT = float(os.getenv("JOBS_SHUTDOWN_TIMEOUT", 10))
+
+# Estados em que a tarefa já terminou.
+ESTADOS_FINAIS = ("concluida", "falhada", "cancelada")
+
+# Identificação deste processo nas tarefas que executa: a máquina, o PID e um código gerado no arranque
+# (num contentor, o mesmo PID repete-se em cada reinício).
+MAQUINA = socket.gethostname()
+INSTANCIA = uuid.uuid4().hex[:8]
+
+logger = logging.getLogger(__name__)
+
+
+def identificador():
+    return f"{MAQUINA}:{os.getpid()}:{INSTANCIA}"
+
+
+def agora():
+    return datetime.now(timezone.utc)
+
+
+def _utc(data):
+    # O SQLite devolve as datas sem fuso horário (guardadas em UTC).
+    if data is not None and data.tzinfo is None:
+        return data.replace(tzinfo=timezone.utc)
+    return data
+
+
+def caminho(nome):
+    """
+    Caminho de um ficheiro das tarefas, a partir do nome guardado na tabela.
+    """
+    return os.path.join(JOBS_DIR, nome)
+
+
+# --- Interrupções ---
+
+class Cancelada(Exception):
+    """
+    O cancelamento da tarefa foi pedido.
+    """
+
+
+class Interrompida(Exception):
+    """
+    A tarefa tem de parar sem terminar: o processo está a terminar ou a tarefa deixou de lhe pertencer.
+    A tarefa volta a ficar pendente e é retomada a partir do último ponto gravado.
+    """
+
+
+# --- Contexto de Execução ---
+
+class Contexto:
+    """
+    A tarefa em execução, tal como é vista pela função que a executa: os parâmetros, o ponto de retoma
+    e a gravação do progresso.
+    """
+    def __init__(self, tarefa, gestor):
+        self.id = tarefa.id
+        self.parametros = tarefa.parametros
+        self.ponto_retoma = tarefa.ponto_retoma
+        self.processados = tarefa.processados
+        self.total = tarefa.total
+        self._gestor = gestor
+
+    def registar(self, db, processados, ponto_retoma, total=None):
+        """
+        Grava o progresso e o ponto de retoma na transação da sessão 'db' (sem fazer o commit).
+        Lança Cancelada, se o cancelamento tiver sido pedido, ou Interrompida: nesses casos,
+        a transação não deve ser confirmada (o bloco é descartado e repetido na retoma).
+        """
+        if self._gestor.a_parar():
+            raise Interrompida()
+        valores = {"processados": processados, "ponto_retoma": ponto_retoma}
+        if total is not None:
+            valores["total"] = total
+        cancelar = db.execute(
+            update(Tarefa)
+            .where(Tarefa.id == self.id, Tarefa.estado == "em_execucao", Tarefa.trabalhador == identificador())
+            .values(**valores)
+            .returning(Tarefa.cancelar)
+        ).scalar()
+        if cancelar is None:
+            raise Interrompida()
+        if cancelar:
+            raise Cancelada()
+        self.processados, self.ponto_retoma = processados, ponto_retoma
+        if total is not None:
+            self.total = total
+
+    def avancar(self, processados, ponto_retoma, total=None):
+        """
+        Igual a 'registar', numa transação própria (para as tarefas que não escrevem na base de dados).
+        """
+        with SessionLocal() as db:
+            self.registar(db, processados, ponto_retoma, total)
+            db.commit()
+
+    def notificar(self, tipo=None, dados=None):
+        """
+        Invalida as consultas em cache e, se 'tipo' for indicado, publica o evento da alteração no stream.
+        """
+        self._gestor.notificar(tipo, dados)
+
+
+# --- Execução de Cada Tipo de Tarefa ---
+# Cada função recebe o contexto e devolve (resumo do resultado, nome do ficheiro produzido ou None).
+
+def _exportar(contexto):
+    """
+    Exporta as empresas (com os filtros da listagem) para um ficheiro, em blocos de 'EXPORT_CHUNK_SIZE' empresas.
+    Cada bloco é uma consulta paginada pelo ID, por isso nenhuma transação de leitura fica aberta durante
+    a exportação inteira. O ponto de retoma é o último ID exportado e o tamanho do ficheiro nesse momento:
+    na retoma, o que foi escrito depois é descartado. As empresas criadas durante a exportação podem ser incluídas.
+    """
+    formato = contexto.parametros["formato"]
+    nome = f"tarefa-{contexto.id}.{formato}"
+    ponto = contexto.ponto_retoma or {"ultimo_id": 0, "posicao": 0}
+    processados = contexto.processados
+
+    with ReadSessionLocal() as leitura:
+        consulta = export_service.preparar_consulta(leitura, contexto.parametros["filtros"])
+        if contexto.total is None:
+            total = leitura.execute(select(func.count()).select_from(consulta.order_by(None).subquery())).scalar()
+            contexto.avancar(processados, ponto, total)
+        leitura.commit()
+
+        with open(caminho(nome), "r+b" if ponto["posicao"] else "wb") as ficheiro:
+            ficheiro.seek(ponto["posicao"])
+            ficheiro.truncate()
+            if not ponto["posicao"]:
+                ficheiro.write(export_service.cabecalho(formato).encode())
+            while True:
+                linhas = leitura.execute(
+                    consulta.where(Empresa.id > ponto["ultimo_id"]).limit(export_service.EXPORT_CHUNK_SIZE)
+                ).all()
+                leitura.commit()
+                if not linhas:
+                    break
+                ficheiro.write(export_service.codificar_lote(formato, linhas).encode())
+                ficheiro.flush()
+                processados += len(linhas)
+                ponto = {"ultimo_id": linhas[-1].id, "posicao": ficheiro.tell()}
+                contexto.avancar(processados, ponto)
+
+    return {"empresas": processados}, nome
+
+
+async def _ler_ficheiro(caminho_ficheiro, tamanho=64 * 1024):
+    # Lê o ficheiro recebido em pedaços, como o corpo de um pedido ('import_service.ler_linhas').
+    with open(caminho_ficheiro, "rb") as ficheiro:
+        while True:
+            bloco = ficheiro.read(tamanho)
+            if not bloco:
+                return
+            yield bloco
+
+
+def _contar_linhas(caminho_ficheiro):
+    linhas, ultimo = 0, b"\n"
+    with open(caminho_ficheiro, "rb") as ficheiro:
+        while True:
+            bloco = ficheiro.read(1024 * 1024)
+            if not bloco:
+                break
+            linhas += bloco.count(b"\n")
+            ultimo = bloco[-1:]
+    return linhas + (ultimo != b"\n")
+
+
+async def _importar_ficheiro(contexto, entrada, ficheiro_erros, ponto):
+    if contexto.parametros["formato"] == "csv":
+        registos = import_service.ler_registos_csv(import_service.ler_linhas(_ler_ficheiro(entrada)))
+    else:
+        registos = import_service.ler_registos_ndjson(import_service.ler_linhas(_ler_ficheiro(entrada)))
+    vistos = {campo: set() for campo in import_service.CAMPOS_UNICOS}
+
+    with SessionLocal() as db:
+        async for bloco in import_service.ler_blocos(registos):
+            # Os registos já processados antes de uma interrupção são saltados (mas contam para os duplicados).
+            feitos = [registo for registo in bloco if registo[0] <= ponto["linha"]]
+            if feitos:
+                import_service.marcar_vistos(feitos, vistos)
+                bloco = bloco[len(feitos):]
+                if not bloco:
+                    continue
+
+            novo = {}
+
+            def confirmar(db, inseridas, erros):
+                # Os erros do bloco são escritos no relatório antes do commit; o tamanho do relatório é gravado
+                # na mesma transação. Se o commit não chegar a ser feito, a retoma descarta o que foi escrito.
+                ficheiro_erros.seek(ponto["posicao"])
+                ficheiro_erros.truncate()
+                ficheiro_erros.write(b"".join(orjson.dumps(erro) + b"\n" for erro in sorted(erros, key=lambda e: e["linha"])))
+                ficheiro_erros.flush()
+                novo.update(
+                    linha=bloco[-1][0],
+                    posicao=ficheiro_erros.tell(),
+                    registos=ponto["registos"] + len(bloco),
+                    inseridas=ponto["inseridas"] + inseridas,
+                )
+                contexto.registar(db, novo["linha"], novo)
+
+            inseridas, erros = import_service.importar_lote(db, bloco, vistos, confirmar)
+            if not novo:
+                # O bloco foi rejeitado sem commit (conflito com escritas em simultâneo): grava só os erros.
+                confirmar(db, 0, erros)
+                db.commit()
+            ponto = novo
+            # Como na rota de importação: um evento por bloco inserido.
+            if inseridas:
+                contexto.notificar("importacao", {"inseridas": inseridas})
+    return ponto
+
+
+def _importar(contexto):
+    """
+    Importa um ficheiro CSV ou NDJSON recebido por 'POST /jobs', bloco a bloco, com 'import_service.importar_lote'.
+    O progresso é medido em linhas do ficheiro. Os erros são escritos num relatório NDJSON (o resultado da tarefa).
+    O ponto de retoma (a última linha processada e o tamanho do relatório) é gravado na transação de cada bloco,
+    por isso cada linha é importada exatamente uma vez, mesmo que a tarefa seja interrompida.
+    """
+    entrada = caminho(contexto.parametros["entrada"])
+    nome = f"tarefa-{contexto.id}.erros.ndjson"
+    ponto = contexto.ponto_retoma or {"linha": 0, "posicao": 0, "registos": 0, "inseridas": 0}
+    if contexto.total is None:
+        contexto.avancar(0, ponto, _contar_linhas(entrada))
+
+    with open(caminho(nome), "r+b" if ponto["posicao"] else "wb") as ficheiro_erros:
+        ponto = asyncio.run(_importar_ficheiro(contexto, entrada, ficheiro_erros, ponto))
+    contexto.processados = contexto.total
+    return {
+        "total_linhas": ponto["registos"],
+        "inseridas": ponto["inseridas"],
+        "rejeitadas": ponto["registos"] - ponto["inseridas"],
+    }, nome
+
+
+def _reconstruir_facetas(contexto):
+    """
+    Recalcula os contadores das facetas ('faceta_service.reconstruir', numa única transação).
+    Não tem pontos intermédios: se for interrompida, é repetida desde o início.
+    """
+    contexto.avancar(0, None, 1)
+    with SessionLocal() as db:
+        valores = faceta_service.reconstruir(db)
+    contexto.processados = 1
+    contexto.notificar()
+    return {"valores": valores}, None
+
+
+# Função que executa cada tipo de tarefa.
+EXECUTORES = {
+    "importacao": _importar,
+    "exportacao": _exportar,
+    "facetas": _reconstruir_facetas,
+}
+
+
+def remover_ficheiros(tarefa_id, parametros):
+    """
+    Apaga os ficheiros de uma tarefa (o ficheiro recebido e os ficheiros produzidos).
+    """
+    nomes = glob.glob(caminho(f"tarefa-{tarefa_id}.*"))
+    if parametros.get("entrada"):
+        nomes.append(caminho(parametros["entrada"]))
+    for nome in nomes:
+        try:
+            os.remove(nome)
+        except FileNotFoundError:
+            pass
+
+
+# --- Gestor dos Workers ---
+
+def recuperar_abandonadas(db):
+    """
+    Devolve ao estado pendente as tarefas em execução cujo processo já não as está a executar:
+    sem sinal de vida há mais de 'JOBS_HEARTBEAT_TIMEOUT' segundos, ou de um processo desta máquina
+    que já terminou (por exemplo, antes de um reinício). Devolve o número de tarefas recuperadas.
+    """
+    limite = agora() - timedelta(seconds=JOBS_HEARTBEAT_TIMEOUT)
+    proprio = identificador()
+    recuperadas = 0
+    linhas = db.execute(
+        select(Tarefa.id, Tarefa.trabalhador, Tarefa.data_sinal).where(Tarefa.estado == "em_execucao")
+    ).all()
+    for tarefa_id, trabalhador, sinal in linhas:
+        if trabalhador == proprio:
+            continue
+        if sinal is not None and _utc(sinal) >= limite and not _processo_terminado(trabalhador):
+            continue
+        recuperadas += db.execute(
+            update(Tarefa)
+            .where(Tarefa.id == tarefa_id, Tarefa.estado == "em_execucao", Tarefa.trabalhador == trabalhador)
+            .values(estado="pendente", trabalhador=None)
+        ).rowcount
+    db.commit()
+    return recuperadas
+
+
+def _processo_terminado(trabalhador):
+    maquina, _, resto = (trabalhador or "").partition(":")
+    pid, _, instancia = resto.partition(":")
+    if maquina != MAQUINA or not pid.isdigit():
+        # Só é possível verificar os processos desta máquina; os outros dependem do sinal de vida.
+        return False
+    if int(pid) == os.getpid():
+        # O mesmo PID com outro código de arranque: um processo anterior (reiniciado).
+        return instancia != INSTANCIA
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+class GestorTarefas:
+    """
+    Os workers deste processo: 'workers' threads que executam as tarefas e uma thread de vigia,
+    que envia os sinais de vida das tarefas em execução e recupera as tarefas abandonadas.
+    """
+    def __init__(self, workers):
+        self.workers = workers
+        self._condicao = threading.Condition()
+        self._parar = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        # IDs das tarefas em execução neste processo.
+        self._em_execucao = set()
+        # O event loop da aplicação, onde são invalidadas as consultas em cache e publicados os eventos.
+        self._loop = None
+
+    def iniciar(self):
+        """
+        Inicia os workers. Chamada no arranque da aplicação, no event loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        if self._threads or self.workers <= 0:
+            return
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        self._parar.clear()
+        self._threads = [
+            threading.Thread(target=self._trabalhar, name=f"tarefas-{numero}", daemon=True)
+            for numero in range(self.workers)
+        ]
+        self._threads.append(threading.Thread(target=self._vigiar, name="tarefas-vigia", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def parar(self, espera=JOBS_SHUTDOWN_TIMEOUT):
+        """
+        Pede aos workers que parem e espera por eles. As tarefas em execução param no ponto de progresso
+        seguinte e voltam a ficar pendentes; as que não chegarem lá a tempo são recuperadas no próximo arranque.
+        """
+        self._parar.set()
+        self.acordar()
+        limite = agora() + timedelta(seconds=espera)
+        for thread in self._threads:
+            thread.join(max(0.0, (limite - agora()).total_seconds()))
+        self._threads = []
+
+    def a_parar(self):
+        return self._parar.is_set()
+
+    def acordar(self):
+        """
+        Avisa os workers de que há uma tarefa nova, sem esperar pela próxima procura.
+        """
+        with self._condicao:
+            self._condicao.notify_all()
+
+    def notificar(self, tipo=None, dados=None):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(_registar_escrita(tipo, dados), self._loop)
+
+    def _trabalhar(self):
+        while not self._parar.is_set():
+            try:
+                tarefa_id = self._reservar()
+            except Exception:
+                logger.exception("Falha ao procurar tarefas pendentes.")
+                tarefa_id = None
+            if tarefa_id is None:
+                with self._condicao:
+                    self._condicao.wait(JOBS_POLL_INTERVAL)
+                continue
+            self._executar(tarefa_id)
+
+    def _reservar(self):
+        """
+        Reserva a próxima tarefa pendente para este processo. A atualização só é feita se a tarefa ainda estiver
+        pendente, por isso, com vários workers (ou processos) a tentar reservá-la, só um consegue.
+        """
+        with SessionLocal() as db:
+            while True:
+                tarefa_id = db.execute(
+                    select(Tarefa.id)
+                    .where(Tarefa.estado == "pendente")
+                    .order_by(Tarefa.prioridade.desc(), Tarefa.id)
+                    .limit(1)
+                ).scalar()
+                if tarefa_id is None:
+                    return None
+                reservada = db.execute(
+                    update(Tarefa)
+                    .where(Tarefa.id == tarefa_id, Tarefa.estado == "pendente")
+                    .values(
+                        estado="em_execucao",
+                        trabalhador=identificador(),
+                        tentativas=Tarefa.tentativas + 1,
+                        processados_inicio=Tarefa.processados,
+                        data_inicio=agora(),
+                        data_sinal=agora(),
+                    )
+                ).rowcount
+                db.commit()
+                if reservada:
+                    with self._lock:
+                        self._em_execucao.add(tarefa_id)
+                    return tarefa_id
+
+    def _executar(self, tarefa_id):
+        try:
+            with SessionLocal() as db:
+                tarefa = db.get(Tarefa, tarefa_id)
+                contexto = Contexto(tarefa, self)
+                executor = EXECUTORES[tarefa.tipo]
+            try:
+                resultado, ficheiro = executor(contexto)
+                valores = {
+                    "estado": "concluida", "resultado": resultado, "ficheiro": ficheiro,
+                    "processados": contexto.processados, "data_fim": agora(),
+                }
+                if contexto.parametros.get("entrada"):
+                    os.remove(caminho(contexto.parametros["entrada"]))
+            except Cancelada:
+                valores = {"estado": "cancelada", "data_fim": agora()}
+                remover_ficheiros(tarefa_id, contexto.parametros)
+            except Interrompida:
+                valores = {"estado": "pendente", "trabalhador": None}
+            except Exception as erro:
+                logger.exception("A tarefa %s falhou.", tarefa_id)
+                valores = {"estado": "falhada", "erro": str(erro) or type(erro).__name__, "data_fim": agora()}
+                remover_ficheiros(tarefa_id, contexto.parametros)
+            # O estado final só é gravado se a tarefa ainda pertencer a este processo.
+            with SessionLocal() as db:
+                db.execute(
+                    update(Tarefa)
+                    .where(Tarefa.id == tarefa_id, Tarefa.estado == "em_execucao", Tarefa.trabalhador == identificador())
+                    .values(**valores)
+                )
+                db.commit()
+        except Exception:
+            logger.exception("Falha ao executar a tarefa %s.", tarefa_id)
+        finally:
+            with self._lock:
+                self._em_execucao.discard(tarefa_id)
+
+    def _vigiar(self):
+        while True:
+            try:
+                with SessionLocal() as db:
+                    with self._lock:
+                        ids = list(self._em_execucao)
+                    if ids:
+                        db.execute(
+                            update(Tarefa)
+                            .where(Tarefa.id.in_(ids), Tarefa.trabalhador == identificador())
+                            .values(data_sinal=agora())
+                        )
+                        db.commit()
+                    if recuperar_abandonadas(db):
+                        self.acordar()
+            except Exception:
+                logger.exception("Falha ao vigiar as tarefas em execução.")
+            if self._parar.wait(JOBS_POLL_INTERVAL):
+                return
+
+
+async def _registar_escrita(tipo, dados):
+    # O equivalente, para as tarefas, a 'registar_escrita' das rotas das empresas.
+    await cache_service.cache.invalidar()
+    if tipo is not None:
+        await eventos_service.publicar(tipo, dados=dados)
+
+
+# Instância única do gestor, partilhada por todo o processo.
+gestor = GestorTarefas(JOBS_WORKERS)
+
+
+# --- Operações Usadas pelas Rotas ---
+
+async def guardar_entrada(fluxo, formato):
+    """
+    Guarda o ficheiro enviado no corpo do pedido na pasta das tarefas, à medida que chega. Devolve o nome do ficheiro.
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    nome = f"entrada-{uuid.uuid4().hex}.{formato}"
+    try:
+        with open(caminho(nome), "wb") as ficheiro:
+            async for bloco in fluxo:
+                await run_in_threadpool(ficheiro.write, bloco)
+    except BaseException:
+        os.remove(caminho(nome))
+        raise
+    return nome
+
+
+def criar_tarefa(db, tipo, parametros, prioridade, administrador):
+    tarefa = Tarefa(tipo=tipo, parametros=parametros, prioridade=prioridade, administrador=administrador)
+    db.add(tarefa)
+    db.commit()
+    db.refresh(tarefa)
+    return tarefa
+
+
+def obter_tarefa(db, tarefa_id):
+    tarefa = db.get(Tarefa, tarefa_id)
+    if tarefa is None:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada.")
+    return tarefa
+
+
+def listar_tarefas(db, estado, limit):
+    consulta = select(Tarefa).order_by(Tarefa.id.desc()).limit(limit)
+    if estado is not None:
+        consulta = consulta.where(Tarefa.estado == estado)
+    return db.execute(consulta).scalars().all()
+
+
+def cancelar_tarefa(db, tarefa_id):
+    """
+    Cancela uma tarefa: uma tarefa pendente é cancelada de imediato; uma tarefa em execução
+    para no ponto de progresso seguinte (o estado passa a "cancelada" nesse momento).
+    """
+    tarefa = obter_tarefa(db, tarefa_id)
+    if tarefa.estado in ESTADOS_FINAIS:
+        raise HTTPException(status_code=409, detail=f"A tarefa já terminou (estado: {tarefa.estado}).")
+    cancelada = db.execute(
+        update(Tarefa)
+        .where(Tarefa.id == tarefa_id, Tarefa.estado == "pendente")
+        .values(estado="cancelada", cancelar=True, data_fim=agora())
+    ).rowcount
+    if not cancelada:
+        db.execute(
+            update(Tarefa).where(Tarefa.id == tarefa_id, Tarefa.estado.notin_(ESTADOS_FINAIS)).values(cancelar=True)
+        )
+    db.commit()
+    if cancelada:
+        remover_ficheiros(tarefa_id, tarefa.parametros)
+    db.refresh(tarefa)
+    return tarefa
+
+
+def descrever(tarefa):
+    """
+    Converte uma tarefa na resposta da API, com o progresso (fração do total), o ritmo da execução atual
+    (unidades por segundo) e o tempo estimado até ao fim.
+    """
+    inicio, fim = _utc(tarefa.data_inicio), _utc(tarefa.data_fim)
+    progresso = ritmo = restante = None
+    if tarefa.total:
+        progresso = min(1.0, tarefa.processados / tarefa.total)
+    if inicio is not None and tarefa.estado in ("em_execucao", "concluida"):
+        duracao = ((fim or agora()) - inicio).total_seconds()
+        if duracao > 0:
+            ritmo = (tarefa.processados - tarefa.processados_inicio) / duracao
+        if ritmo and tarefa.total and tarefa.estado == "em_execucao":
+            restante = max(0.0, (tarefa.total - tarefa.processados) / ritmo)
+    return {
+        "id": tarefa.id,
+        "tipo": tarefa.tipo,
+        "estado": tarefa.estado,
+        "prioridade": tarefa.prioridade,
+        "parametros": {chave: valor for chave, valor in tarefa.parametros.items() if chave != "entrada"},
+        "processados": tarefa.processados,
+        "total": tarefa.total,
+        "progresso": progresso,
+        "unidades_por_segundo": ritmo,
+        "segundos_restantes": restante,
+        "resultado": tarefa.resultado,
+        "url_resultado": f"/jobs/{tarefa.id}/result" if tarefa.estado == "concluida" and tarefa.ficheiro else None,
+        "erro": tarefa.erro,
+        "cancelamento_pedido": tarefa.cancelar,
+        "tentativas": tarefa.tentativas,
+        "administrador": tarefa.administrador,
+        "data_criacao": _utc(tarefa.data_criacao),
+        "data_inicio": inicio,
+        "data_fim": fim,
+    }
@@ -0,0 +1,192 @@
+# Esse arquivo contém o lançador da API com vários workers, executado a partir da pasta 'backend':
+#   python -m app.servidor --workers 4 --port 8000
+#
+# O processo principal carrega a aplicação uma única vez (importações, rotas, mapeamentos do ORM e o esquema
+# OpenAPI), abre o socket e cria os workers com 'fork': cada worker começa já com a aplicação carregada
+# (partilhando a memória com o processo principal até a alterar) e serve pedidos do mesmo socket.
+# Com '--init-db', o esquema da base de dados é criado uma vez, pelo processo principal, antes de criar os workers.
+# O processo principal vigia os workers: um worker que termine inesperadamente é substituído,
+# e um SIGTERM (ou Ctrl+C) encerra todos de forma ordenada (cada worker executa o seu 'lifespan').
+#
+# Por omissão, o número de workers é o número de núcleos disponíveis para o processo ('WEB_CONCURRENCY' substitui-o).
+# Com mais de um worker, a cache de consultas tem de ser partilhada (CACHE_URL=redis://...): a cache em memória
+# ('CACHE_URL=memory') é desativada, porque as escritas de um worker não a invalidariam nos outros.
+# Sem 'fork' (Windows), os workers são criados pelo próprio uvicorn, que importa a aplicação em cada um.
+
+# --- Importações de Módulos ---
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from dotenv import load_dotenv
+
+import uvicorn
+
+# Carrega as variáveis do ficheiro '.env' (como a DATABASE_URL e a WEB_CONCURRENCY) antes de ler as configurações.
+load_dotenv()
+
+logger = logging.getLogger("uvicorn.error")
+
+# Tempo mínimo (em segundos) entre a substituição de dois workers, para não criar workers em ciclo
+# quando todos falham no arranque (por exemplo, com a base de dados inacessível).
+INTERVALO_SUBSTITUICAO = 1.0
+
+
+def numero_nucleos():
+    """
+    Devolve o número de núcleos que este processo pode usar (num contentor, pode ser inferior ao da máquina).
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def criar_socket(host, porta, backlog):
+    """
+    Abre o socket partilhado por todos os workers.
+    """
+    familia = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(familia, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, porta))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+# --- Carregamento da Aplicação ---
+
+def carregar(init_db):
+    """
+    Carrega a aplicação no processo principal e deixa prontas as partes que, de outro modo, seriam preparadas
+    no primeiro pedido de cada worker. Não deixa nenhuma conexão aberta para os workers herdarem.
+    """
+    from sqlalchemy.orm import configure_mappers
+
+    from .db import database
+    from .main import app
+    from .services import esquema_service
+
+    if init_db:
+        esquema_service.inicializar()
+        database.engine.dispose()
+    # Os mapeamentos do ORM e o esquema OpenAPI (servido em '/openapi.json') são preparados uma única vez.
+    configure_mappers()
+    app.openapi()
+    # Os objetos já carregados passam para uma geração que a recolha de lixo não percorre: assim, os workers
+    # não copiam as páginas de memória partilhadas só por a recolha de lixo lhes tocar.
+    gc.freeze()
+    return app
+
+
+# --- Workers ---
+
+class Supervisor:
+    def __init__(self, config, sock, workers):
+        self.config = config
+        self.sock = sock
+        self.workers = workers
+        self.processos = set()
+        self.a_parar = False
+
+    def _criar_worker(self):
+        pid = os.fork()
+        if pid:
+            self.processos.add(pid)
+            return
+        # --- No worker ---
+        codigo = 1
+        try:
+            from .db import database
+
+            # Os sinais voltam ao comportamento por omissão: o uvicorn instala os seus ao arrancar.
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            database.reiniciar_pools()
+            uvicorn.Server(self.config).run(sockets=[self.sock])
+            codigo = 0
+        finally:
+            # '_exit' termina o worker sem executar o código de saída herdado do processo principal.
+            os._exit(codigo)
+
+    def _parar(self, sinal, frame):
+        if self.a_parar:
+            return
+        self.a_parar = True
+        logger.info("A encerrar %d workers.", len(self.processos))
+        for pid in self.processos:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def executar(self):
+        signal.signal(signal.SIGTERM, self._parar)
+        signal.signal(signal.SIGINT, self._parar)
+        for _ in range(self.workers):
+            self._criar_worker()
+        logger.info("Processo principal [%d]: %d workers em http://%s:%d", os.getpid(), self.workers,
+                    self.config.host, self.config.port)
+
+        ultima_substituicao = 0.0
+        while self.processos:
+            try:
+                pid, estado = os.wait()
+            except ChildProcessError:
+                break
+            self.processos.discard(pid)
+            if self.a_parar:
+                continue
+            # Um worker terminou sem ser pedido: é substituído.
+            logger.warning("O worker [%d] terminou (estado %d); a criar outro.", pid, estado)
+            espera = ultima_substituicao + INTERVALO_SUBSTITUICAO - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            ultima_substituicao = time.monotonic()
+            if not self.a_parar:
+                self._criar_worker()
+        self.sock.close()
+
+
+# --- Ponto de Entrada ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.servidor", description="Arranca a API com vários workers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", 0)) or numero_nucleos(),
+        help="Número de workers (por omissão, WEB_CONCURRENCY ou o número de núcleos)",
+    )
+    parser.add_argument("--backlog", type=int, default=2048, help="Ligações à espera de serem aceites")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--init-db", action="store_true", help="Cria o esquema da base de dados antes de arrancar")
+    args = parser.parse_args(argv)
+
+    # A configuração lida pela aplicação (como o número de processos do bcrypt de cada worker, em 'auth_service',
+    # e a cache de consultas, desativada em memória com vários workers) tem de refletir o número de workers escolhido.
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+
+    if not hasattr(os, "fork"):
+        # Sem 'fork', cada worker importa a aplicação (o esquema é criado antes, uma única vez).
+        if args.init_db:
+            from .services import esquema_service
+            esquema_service.inicializar()
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers,
+                    backlog=args.backlog, log_level=args.log_level)
+        return 0
+
+    app = carregar(args.init_db)
+    config = uvicorn.Config(app, host=args.host, port=args.port, backlog=args.backlog, log_level=args.log_level)
+    sock = criar_socket(args.host, args.port, args.backlog)
+    Supervisor(config, sock, args.workers).executar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+# Benchmark do controlo de admissão ('admissao_service.MiddlewareAdmissao'):
+# - o custo do middleware por pedido, com uma aplicação ASGI mínima chamada diretamente;
+# - o comportamento em sobrecarga: os clientes enviam pedidos a um ritmo acima da capacidade de uma aplicação
+#   que demora 'duracao' ms por pedido (com no máximo 'capacidade' pedidos em simultâneo). Sem o controlo,
+#   todos os pedidos esperam e a latência cresce enquanto durar a sobrecarga; com ele, os pedidos em excesso
+#   são rejeitados (503) e os admitidos mantêm uma latência próxima da duração do pedido.
+#
+# Uso (a partir da pasta 'backend'):
+#   python -m benchmarks.bench_admissao --pedidos 100000 --sobrecarga 2.0 --segundos 3
+#
+# Usa uma base de dados SQLite temporária, por isso não precisa de nenhuma configuração.
+
+# --- Importações de Módulos ---
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+# A base de dados e os limites do benchmark têm de ser configurados antes de importar a aplicação.
+_pasta = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_pasta, 'bench.db')}"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("RATE_LIMIT_IP_RATE", "0")
+os.environ.setdefault("RATE_LIMIT_ADMIN_RATE", "0")
+
+from app.services import admissao_service
+
+
+async def aplicacao(scope, receive, send):
+    """
+    Aplicação ASGI mínima: devolve um corpo fixo.
+    """
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b'{"id": 1}'})
+
+
+async def _receber():
+    return {"type": "http.request", "body": b""}
+
+
+def _scope():
+    return {"type": "http", "method": "GET", "path": "/empresas/1", "headers": [], "client": ("127.0.0.1", 1)}
+
+
+async def medir(app, pedidos):
+    """
+    Devolve o tempo médio (em microssegundos) de cada pedido.
+    """
+    async def enviar(mensagem):
+        pass
+
+    inicio = time.perf_counter()
+    for _ in range(pedidos):
+        await app(_scope(), _receber, enviar)
+    return (time.perf_counter() - inicio) / pedidos * 1e6
+
+
+def aplicacao_lenta(capacidade, duracao):
+    """
+    Aplicação que demora 'duracao' segundos por pedido e executa no máximo 'capacidade' pedidos em simultâneo
+    (como uma API limitada pelo pool de conexões ou pelos núcleos).
+    """
+    semaforo = asyncio.Semaphore(capacidade)
+
+    async def app(scope, receive, send):
+        async with semaforo:
+            await asyncio.sleep(duracao)
+        await aplicacao(scope, receive, send)
+
+    return app
+
+
+async def simular(app, ritmo, segundos):
+    """
+    Envia 'ritmo' pedidos por segundo durante 'segundos' e devolve (latências dos admitidos, número de rejeitados).
+    """
+    latencias = []
+    rejeitados = 0
+
+    async def pedido():
+        nonlocal rejeitados
+        estado = []
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                estado.append(mensagem["status"])
+
+        inicio = time.perf_counter()
+        await app(_scope(), _receber, enviar)
+        if estado[0] == 200:
+            latencias.append(time.perf_counter() - inicio)
+        else:
+            rejeitados += 1
+
+    tarefas = []
+    inicio = time.perf_counter()
+    for i in range(int(ritmo * segundos)):
+        espera = inicio + i / ritmo - time.perf_counter()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        tarefas.append(asyncio.create_task(pedido()))
+    await asyncio.gather(*tarefas)
+    return latencias, rejeitados
+
+
+def resumir(nome, latencias, rejeitados):
+    latencias = sorted(latencias)
+    p99 = latencias[int(len(latencias) * 0.99) - 1] if latencias else 0
+    print(
+        f"{nome:<18} admitidos {len(latencias):6d}   rejeitados {rejeitados:6d}   "
+        f"mediana {statistics.median(latencias or [0]) * 1000:8.1f} ms   p99 {p99 * 1000:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do controlo de admissão.")
+    parser.add_argument("--pedidos", type=int, default=100000, help="Número de pedidos na medição do custo")
+    parser.add_argument("--capacidade", type=int, default=10, help="Pedidos em simultâneo que a aplicação executa")
+    parser.add_argument("--duracao", type=float, default=10, help="Duração de cada pedido, em milissegundos")
+    parser.add_argument("--sobrecarga", type=float, default=2.0, help="Ritmo dos pedidos, em múltiplos da capacidade")
+    parser.add_argument("--segundos", type=float, default=3, help="Duração da sobrecarga, em segundos")
+    args = parser.parse_args()
+
+    com_admissao = admissao_service.MiddlewareAdmissao(aplicacao)
+    # Uma primeira passagem curta aquece ambos os caminhos.
+    asyncio.run(medir(aplicacao, 1000))
+    asyncio.run(medir(com_admissao, 1000))
+    sem = asyncio.run(medir(aplicacao, args.pedidos))
+    com = asyncio.run(medir(com_admissao, args.pedidos))
+    print(f"Sem controlo de admissão: {sem:8.2f} µs/pedido")
+    print(f"Com controlo de admissão: {com:8.2f} µs/pedido")
+    print(f"Custo:                    {com - sem:8.2f} µs/pedido")
+    print()
+
+    duracao = args.duracao / 1000
+    ritmo = args.capacidade / duracao * args.sobrecarga
+    print(f"Sobrecarga: {ritmo:.0f} pedidos/s durante {args.segundos:g} s (capacidade: {args.capacidade / duracao:.0f} pedidos/s)")
+
+    async def sem_controlo():
+        return await simular(aplicacao_lenta(args.capacidade, duracao), ritmo, args.segundos)
+
+    async def com_controlo():
+        # A carga em curso é limitada à capacidade da aplicação (todos os pedidos custam 1).
+        middleware = admissao_service.MiddlewareAdmissao(aplicacao_lenta(args.capacidade, duracao))
+        middleware.admissao.capacidade = args.capacidade
+        return await simular(middleware, ritmo, args.segundos)
+
+    resumir("sem controlo", *asyncio.run(sem_controlo()))
+    resumir("com controlo", *asyncio.run(com_controlo()))
+
+
+if __name__ == "__main__":
+    main()
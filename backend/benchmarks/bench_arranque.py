@@ -0,0 +1,105 @@
+# Benchmark do arranque da API: mede, em processos novos,
+# - o tempo de importação da aplicação ('import app.main');
+# - o tempo desde o lançamento do servidor até à primeira resposta (GET /openapi.json),
+#   com o uvicorn e com o lançador 'app.servidor', com e sem a criação do esquema em cada worker ('DB_INIT_SCHEMA').
+#
+# Uso (a partir da pasta 'backend'):
+#   python -m benchmarks.bench_arranque --repeticoes 5 --workers 2
+#
+# Usa uma base de dados SQLite temporária (com o esquema criado uma vez, por 'python -m app.cli init-db').
+
+# --- Importações de Módulos ---
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+# Pasta 'backend', onde os comandos são executados.
+PASTA = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def medir_importacao(ambiente):
+    """
+    Devolve o tempo (em segundos) de 'import app.main' num interpretador novo.
+    """
+    codigo = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    saida = subprocess.run([sys.executable, "-c", codigo], cwd=PASTA, env=ambiente, capture_output=True, text=True, check=True)
+    return float(saida.stdout.strip().splitlines()[-1])
+
+
+def medir_primeiro_pedido(comando, ambiente, porta):
+    """
+    Lança o servidor e devolve o tempo (em segundos) até à primeira resposta de 'GET /openapi.json'.
+    """
+    url = f"http://127.0.0.1:{porta}/openapi.json"
+    inicio = time.perf_counter()
+    servidor = subprocess.Popen(comando, cwd=PASTA, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(url, timeout=5) as resposta:
+                    resposta.read()
+                return time.perf_counter() - inicio
+            except (urllib.error.URLError, ConnectionError):
+                if servidor.poll() is not None:
+                    raise RuntimeError(f"O servidor terminou durante o arranque: {' '.join(comando)}")
+                if time.perf_counter() - inicio > 60:
+                    raise RuntimeError("O servidor não respondeu em 60 segundos.")
+                time.sleep(0.005)
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+
+def resumir(tempos):
+    return f"mediana {statistics.median(tempos) * 1000:8.1f} ms   mínimo {min(tempos) * 1000:8.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do arranque da API.")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=2, help="Número de workers dos servidores com vários processos")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    ambiente = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(pasta, 'bench.db')}",
+        "SECRET_KEY": os.environ.get("SECRET_KEY", "benchmark"),
+        "JOBS_DIR": os.path.join(pasta, "tarefas"),
+    }
+    subprocess.run([sys.executable, "-m", "app.cli", "init-db"], cwd=PASTA, env=ambiente, check=True, capture_output=True)
+
+    tempos = [medir_importacao(ambiente) for _ in range(args.repeticoes)]
+    print(f"{'import app.main':<56} {resumir(tempos)}")
+
+    uvicorn = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--log-level", "warning"]
+    servidor = [sys.executable, "-m", "app.servidor", "--host", "127.0.0.1", "--log-level", "warning"]
+    cenarios = [
+        ("uvicorn, 1 worker", uvicorn, {}),
+        ("uvicorn, 1 worker, esquema no arranque", uvicorn, {"DB_INIT_SCHEMA": "true"}),
+        (f"uvicorn, {args.workers} workers", uvicorn + ["--workers", str(args.workers)], {}),
+        (f"app.servidor, {args.workers} workers", servidor + ["--workers", str(args.workers)], {}),
+    ]
+    for nome, comando, extra in cenarios:
+        tempos = []
+        for _ in range(args.repeticoes):
+            porta = _porta_livre()
+            tempos.append(medir_primeiro_pedido(comando + ["--port", str(porta)], {**ambiente, **extra}, porta))
+        print(f"{'primeiro pedido: ' + nome:<56} {resumir(tempos)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Benchmark dos formatos e da compressão da listagem de empresas: para cada formato da resposta
+# (JSON, MessagePack e os formatos em colunas) e cada codificação (sem compressão, gzip e brotli),
+# mede os bytes enviados e o tempo de CPU por pedido (serialização + compressão), em páginas de vários tamanhos.
+#
+# Uso (a partir da pasta 'backend'):
+#   python -m benchmarks.bench_compressao --paginas 100 1000 --repeticoes 20
+#
+# Usa uma base de dados SQLite temporária, por isso não precisa de nenhuma configuração.
+
+# --- Importações de Módulos ---
+import argparse
+import os
+import tempfile
+import time
+
+# A base de dados do benchmark tem de ser configurada antes de importar a aplicação.
+_pasta = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_pasta, 'bench.db')}"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from sqlalchemy import insert
+
+from app.db.database import Base, SessionLocal, engine
+from app.models.empresa import Empresa
+from app.services import catalogo_service, compressao_service, empresa_service, serializacao_service
+
+
+def preparar(linhas):
+    """
+    Cria a tabela e insere 'linhas' empresas.
+    """
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.execute(insert(Empresa), catalogo_service.para_colunas(db, [
+            {
+                "nome": f"Empresa {i}", "cnpj": f"{i:014d}", "cidade": f"Cidade {i % 50}",
+                "ramo_atuacao": f"Ramo {i % 20}", "telefone": "(75) 99999-9999",
+                "email_contato": f"contato{i}@empresa.com", "versao": i + 1,
+            }
+            for i in range(linhas)
+        ]))
+        db.commit()
+
+
+def medir(funcao, repeticoes):
+    """
+    Devolve o melhor tempo de CPU (em segundos) de 'repeticoes' execuções e o resultado da última.
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.process_time()
+        resultado = funcao()
+        tempos.append(time.process_time() - inicio)
+    return min(tempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos formatos e da compressão da listagem de empresas.")
+    parser.add_argument("--paginas", type=int, nargs="+", default=[100, 1000], help="Tamanhos de página a medir")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    preparar(max(args.paginas))
+    # "identity" é a resposta sem compressão.
+    codificacoes = {"identity": None, **compressao_service.criar_codificacoes()}
+
+    for pagina in args.paginas:
+        with SessionLocal() as db:
+            empresas = db.query(*empresa_service.COLUNAS_RESPOSTA).order_by(Empresa.id).limit(pagina).all()
+
+        print(f"\npágina de {pagina} empresas")
+        print(f"{'formato':<42} {'codificação':<10} {'bytes':>10} {'CPU/pedido':>12}")
+        for tipo, serializar in serializacao_service.FORMATOS.items():
+            tempo_serializacao, corpo = medir(lambda: serializar(empresas), args.repeticoes)
+            for nome, codificacao in codificacoes.items():
+                if codificacao is None:
+                    tempo, enviado = tempo_serializacao, corpo
+                else:
+                    tempo_compressao, enviado = medir(lambda: codificacao.comprimir(corpo), args.repeticoes)
+                    tempo = tempo_serializacao + tempo_compressao
+                print(f"{tipo:<42} {nome:<10} {len(enviado):>10,} {tempo * 1000:>10.3f}ms")
+
+    # Em produção, a página comprimida fica na cache pela ETag: os pedidos repetidos só pagam a serialização
+    # (e nem isso, quando a página está na cache de consultas).
+    print("\nCPU/pedido = serialização + compressão (sem cache); o melhor de", args.repeticoes, "execuções.")
+
+
+if __name__ == "__main__":
+    main()
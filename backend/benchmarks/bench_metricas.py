@@ -0,0 +1,98 @@
+# Benchmark do custo do middleware de métricas ('metricas_service.MiddlewareMetricas') por pedido:
+# compara uma aplicação ASGI mínima, chamada diretamente, com a mesma aplicação atrás do middleware.
+# Verifica também que o registo não perde amostras com várias threads a registar em simultâneo.
+#
+# Uso (a partir da pasta 'backend'):
+#   python -m benchmarks.bench_metricas --pedidos 100000 --threads 8
+#
+# Usa uma base de dados SQLite temporária, por isso não precisa de nenhuma configuração.
+
+# --- Importações de Módulos ---
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+# A base de dados do benchmark tem de ser configurada antes de importar a aplicação.
+_pasta = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_pasta, 'bench.db')}"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.services import metricas_service
+
+
+class Rota:
+    # Imita a rota que o roteamento do Starlette guarda no 'scope'.
+    path = "/empresas/{empresa_id}"
+
+
+async def aplicacao(scope, receive, send):
+    """
+    Aplicação ASGI mínima: encontra a rota e devolve um corpo fixo.
+    """
+    scope["route"] = Rota
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b'{"id": 1}'})
+
+
+async def _receber():
+    return {"type": "http.request", "body": b""}
+
+
+async def _enviar(mensagem):
+    pass
+
+
+async def medir(app, pedidos):
+    """
+    Devolve o tempo médio (em microssegundos) de cada pedido.
+    """
+    inicio = time.perf_counter()
+    for _ in range(pedidos):
+        await app({"type": "http", "method": "GET", "path": "/empresas/1"}, _receber, _enviar)
+    return (time.perf_counter() - inicio) / pedidos * 1e6
+
+
+def verificar_threads(threads, pedidos):
+    """
+    Regista 'pedidos' amostras em cada thread e devolve o número de amostras registadas.
+    """
+    registo = metricas_service.RegistoMetricas()
+
+    def trabalhar():
+        for _ in range(pedidos):
+            registo.registar("GET", "/empresas/", 200, 0.001, 2, 0.0005, 100)
+
+    lista = [threading.Thread(target=trabalhar) for _ in range(threads)]
+    for thread in lista:
+        thread.start()
+    for thread in lista:
+        thread.join()
+    return registo._rotas[("GET", "/empresas/")].latencia.total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do middleware de métricas.")
+    parser.add_argument("--pedidos", type=int, default=100000, help="Número de pedidos medidos")
+    parser.add_argument("--threads", type=int, default=8, help="Número de threads na verificação de amostras")
+    args = parser.parse_args()
+
+    com_metricas = metricas_service.MiddlewareMetricas(aplicacao, metricas_service.RegistoMetricas())
+    # Uma primeira passagem curta aquece ambos os caminhos.
+    asyncio.run(medir(aplicacao, 1000))
+    asyncio.run(medir(com_metricas, 1000))
+    sem = asyncio.run(medir(aplicacao, args.pedidos))
+    com = asyncio.run(medir(com_metricas, args.pedidos))
+    print(f"Sem métricas: {sem:8.2f} µs/pedido")
+    print(f"Com métricas: {com:8.2f} µs/pedido")
+    print(f"Custo:        {com - sem:8.2f} µs/pedido")
+
+    esperadas = args.threads * (args.pedidos // args.threads)
+    registadas = verificar_threads(args.threads, args.pedidos // args.threads)
+    print(f"Amostras registadas por {args.threads} threads: {registadas}/{esperadas}")
+
+
+if __name__ == "__main__":
+    main()
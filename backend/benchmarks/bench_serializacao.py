@@ -0,0 +1,92 @@
+# Benchmark da serialização da listagem de empresas: compara o caminho antigo (objetos do ORM validados
+# com o 'response_model' e codificados com o 'jsonable_encoder') com o caminho rápido
+# (tuplos de colunas codificados com o orjson por 'serializacao_service').
+#
+# Uso (a partir da pasta 'backend'):
+#   python -m benchmarks.bench_serializacao --linhas 10000 --repeticoes 5
+#
+# Usa uma base de dados SQLite temporária, por isso não precisa de nenhuma configuração.
+
+# --- Importações de Módulos ---
+import argparse
+import json
+import os
+import tempfile
+import time
+
+# A base de dados do benchmark tem de ser configurada antes de importar a aplicação.
+_pasta = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_pasta, 'bench.db')}"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import insert
+
+from app.db.database import Base, SessionLocal, engine
+from app.models.empresa import Empresa
+from app.schemas.empresa import EmpresaResponse
+from app.services import catalogo_service, empresa_service, serializacao_service
+
+
+def preparar(linhas):
+    """
+    Cria a tabela e insere 'linhas' empresas.
+    """
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.execute(insert(Empresa), catalogo_service.para_colunas(db, [
+            {
+                "nome": f"Empresa {i}", "cnpj": f"{i:014d}", "cidade": f"Cidade {i % 50}",
+                "ramo_atuacao": f"Ramo {i % 20}", "telefone": "(75) 99999-9999",
+                "email_contato": f"contato{i}@empresa.com", "versao": i + 1,
+            }
+            for i in range(linhas)
+        ]))
+        db.commit()
+
+
+def caminho_antigo(db):
+    empresas = db.query(Empresa).order_by(Empresa.id).all()
+    conteudo = [EmpresaResponse.from_orm(empresa) for empresa in empresas]
+    return json.dumps(jsonable_encoder(conteudo), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def caminho_rapido(db):
+    empresas = db.query(*empresa_service.COLUNAS_RESPOSTA).order_by(Empresa.id).all()
+    return serializacao_service.codificar(empresas)
+
+
+def medir(funcao, repeticoes):
+    """
+    Devolve o melhor tempo (em segundos) de 'repeticoes' execuções, cada uma com uma sessão nova.
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        with SessionLocal() as db:
+            inicio = time.perf_counter()
+            corpo = funcao(db)
+            tempos.append(time.perf_counter() - inicio)
+    return min(tempos), corpo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da serialização da listagem de empresas.")
+    parser.add_argument("--linhas", type=int, default=10000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    preparar(args.linhas)
+    antigo, corpo_antigo = medir(caminho_antigo, args.repeticoes)
+    rapido, corpo_rapido = medir(caminho_rapido, args.repeticoes)
+
+    # Os dois caminhos têm de produzir exatamente o mesmo JSON.
+    assert json.loads(corpo_antigo) == json.loads(corpo_rapido), "Os dois caminhos produzem respostas diferentes."
+
+    print(f"linhas: {args.linhas}")
+    print(f"antes  (ORM + Pydantic + jsonable_encoder): {args.linhas / antigo:12,.0f} linhas/s")
+    print(f"depois (tuplos + orjson):                   {args.linhas / rapido:12,.0f} linhas/s")
+    print(f"ganho: {antigo / rapido:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Compara dois ficheiros de resultados de 'benchmarks/carga.py' (por exemplo, de dois commits) e assinala
+# as regressões: cenários em que a latência (p50, p95 ou p99) aumentou, ou o débito diminuiu, mais do que o limite,
+# ou em que houve mais pedidos com erro.
+# Termina com o código 1 se houver regressões, para poder ser usado num pipeline de integração contínua.
+#
+# Uso (a partir da pasta 'backend'):
+#   python -m benchmarks.comparar benchmarks/resultados/abc1234_10000.json benchmarks/resultados/def5678_10000.json
+
+# --- Importações de Módulos ---
+import argparse
+import json
+import sys
+
+# Métricas comparadas e se um valor maior é melhor.
+METRICAS = (
+    ("p50_ms", False),
+    ("p95_ms", False),
+    ("p99_ms", False),
+    ("pedidos_por_segundo", True),
+)
+
+
+def carregar(caminho):
+    with open(caminho, encoding="utf-8") as ficheiro:
+        return json.load(ficheiro)
+
+
+def variacao(antes, depois):
+    return (depois - antes) / antes * 100 if antes else 0.0
+
+
+def comparar(base, novo, limite, minimo_ms):
+    """
+    Devolve as linhas da comparação (cenário, métrica, antes, depois, variação %, regressão?).
+    Uma diferença de latência abaixo de 'minimo_ms' nunca é uma regressão (é ruído da medição).
+    """
+    linhas = []
+    for cenario, antes in base["cenarios"].items():
+        depois = novo["cenarios"].get(cenario)
+        if depois is None:
+            continue
+        for metrica, maior_melhor in METRICAS:
+            delta = variacao(antes[metrica], depois[metrica])
+            pior = -delta if maior_melhor else delta
+            regressao = pior > limite
+            if not maior_melhor and abs(depois[metrica] - antes[metrica]) < minimo_ms:
+                regressao = False
+            linhas.append((cenario, metrica, antes[metrica], depois[metrica], delta, regressao))
+        # Mais pedidos com erro é sempre uma regressão.
+        linhas.append((
+            cenario, "erros", antes["erros"], depois["erros"], variacao(antes["erros"], depois["erros"]),
+            depois["erros"] > antes["erros"],
+        ))
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dois resultados do teste de carga.")
+    parser.add_argument("base", help="Resultados de referência (ex: do commit anterior)")
+    parser.add_argument("novo", help="Resultados a comparar")
+    parser.add_argument("--limite", type=float, default=10.0, help="Piora máxima aceite, em percentagem")
+    parser.add_argument("--minimo-ms", type=float, default=1.0, help="Diferença mínima de latência considerada")
+    args = parser.parse_args()
+
+    base, novo = carregar(args.base), carregar(args.novo)
+    for campo in ("linhas", "base_de_dados", "modo", "concorrencia"):
+        if base["meta"].get(campo) != novo["meta"].get(campo):
+            print(f"Aviso: '{campo}' é diferente ({base['meta'].get(campo)} -> {novo['meta'].get(campo)}).")
+    print(f"{base['meta'].get('commit')} -> {novo['meta'].get('commit')}\n")
+
+    linhas = comparar(base, novo, args.limite, args.minimo_ms)
+    for cenario, metrica, antes, depois, delta, regressao in linhas:
+        marca = "  REGRESSÃO" if regressao else ""
+        print(f"{cenario:16} {metrica:20} {antes:10.2f} -> {depois:10.2f}  {delta:+7.1f}%{marca}")
+
+    regressoes = sum(1 for linha in linhas if linha[-1])
+    print(f"\n{regressoes} regressões (limite {args.limite:.0f}%).")
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# Gerador de dados sintéticos para os benchmarks: povoa a tabela 'empresas' com empresas realistas,
+# com CNPJs válidos (dígitos verificadores corretos) e emails únicos, em blocos inseridos com uma única instrução.
+# Os mesmos parâmetros geram sempre os mesmos dados, por isso os resultados de execuções diferentes são comparáveis.
+#
+# Uso (a partir da pasta 'backend'):
+#   python -m benchmarks.gerador --linhas 100000 --database-url sqlite:////tmp/empresas_bench.db
+#
+# Sem '--database-url', usa a DATABASE_URL do ambiente (ou do ficheiro '.env').
+
+# --- Importações de Módulos ---
+import argparse
+import os
+import time
+
+# Valores usados nas empresas geradas.
+CIDADES = (
+    "Feira de Santana", "Salvador", "Vitória da Conquista", "Camaçari", "Itabuna", "Juazeiro", "Lauro de Freitas",
+    "Ilhéus", "Jequié", "Teixeira de Freitas", "Alagoinhas", "Barreiras", "Porto Seguro", "Simões Filho",
+    "Paulo Afonso", "Eunápolis", "Santo Antônio de Jesus", "Valença", "Candeias", "Guanambi", "Jacobina",
+    "Serrinha", "Senhor do Bonfim", "Dias d'Ávila", "Luís Eduardo Magalhães", "Itapetinga", "Irecê",
+    "Campo Formoso", "Casa Nova", "Cruz das Almas", "São Paulo", "Rio de Janeiro", "Belo Horizonte", "Recife",
+    "Fortaleza", "Aracaju", "Maceió", "Natal", "João Pessoa", "Teresina",
+)
+RAMOS = (
+    "Tecnologia", "Comércio", "Indústria", "Saúde", "Educação", "Construção Civil", "Agronegócio", "Logística",
+    "Alimentação", "Consultoria", "Turismo", "Energia", "Telecomunicações", "Finanças", "Imobiliário",
+    "Marketing", "Vestuário", "Automotivo", "Serviços Jurídicos", "Entretenimento",
+)
+PREFIXOS = ("Grupo", "Companhia", "Empresa", "Estúdio", "Oficina", "Casa", "Rede", "Instituto", "Central", "Agência")
+NUCLEOS = (
+    "Aurora", "Horizonte", "Sertão", "Atlântico", "Baobá", "Cajueiro", "Mandacaru", "Jequitibá", "Ipê", "Coqueiral",
+    "Recôncavo", "Chapada", "Paraguaçu", "Itapuã", "Abaeté", "Pelourinho", "Barra", "Ondina", "Caatinga", "Cerrado",
+)
+SUFIXOS = ("Ltda", "S.A.", "ME", "EPP", "Soluções", "Serviços", "Digital", "Brasil", "Nordeste", "Bahia")
+
+# Pesos dos dígitos verificadores do CNPJ.
+_PESOS_DV1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+_PESOS_DV2 = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+
+
+def _digito_verificador(digitos, pesos):
+    resto = sum(d * p for d, p in zip(digitos, pesos)) % 11
+    return 0 if resto < 2 else 11 - resto
+
+
+def cnpj(numero):
+    """
+    Devolve um CNPJ válido e único para cada número (até 10^8 empresas, todas com a filial '0001').
+    """
+    base = [int(c) for c in f"{numero:08d}0001"]
+    dv1 = _digito_verificador(base, _PESOS_DV1)
+    dv2 = _digito_verificador(base + [dv1], _PESOS_DV2)
+    return "".join(map(str, base)) + f"{dv1}{dv2}"
+
+
+def cnpj_valido(valor):
+    """
+    Verifica os dígitos verificadores de um CNPJ (14 algarismos).
+    """
+    if len(valor) != 14 or not valor.isdigit():
+        return False
+    digitos = [int(c) for c in valor]
+    return (
+        digitos[12] == _digito_verificador(digitos[:12], _PESOS_DV1)
+        and digitos[13] == _digito_verificador(digitos[:13], _PESOS_DV2)
+    )
+
+
+def empresa(numero):
+    """
+    Gera os dados da empresa número 'numero' (sempre os mesmos para o mesmo número).
+    """
+    return {
+        "nome": f"{PREFIXOS[numero % 10]} {NUCLEOS[numero // 10 % 20]} {SUFIXOS[numero // 200 % 10]} {numero}",
+        "cnpj": cnpj(numero),
+        "cidade": CIDADES[numero * 7 % len(CIDADES)],
+        "ramo_atuacao": RAMOS[numero * 13 % len(RAMOS)],
+        "telefone": f"(75) 9{numero % 10000:04d}-{numero // 10000 % 10000:04d}",
+        "email_contato": f"contato{numero}@empresa{numero % 97}.com.br",
+    }
+
+
+def gerar(inicio, quantidade):
+    """
+    Gera 'quantidade' empresas, a partir do número 'inicio'.
+    """
+    return (empresa(numero) for numero in range(inicio, inicio + quantidade))
+
+
+# --- Povoamento da Base de Dados ---
+
+def povoar(linhas, bloco=10000, progresso=True):
+    """
+    Garante que a tabela 'empresas' tem 'linhas' empresas geradas: se já tiver exatamente esse número,
+    não faz nada; caso contrário, esvazia as tabelas de empresas e insere-as de novo.
+    Deve ser chamada depois de configurar a DATABASE_URL (a aplicação lê-a ao ser importada).
+    """
+    from sqlalchemy import delete, func, insert, select
+
+    from app.db.database import SessionLocal
+    from app.models.empresa import Empresa
+    from app.models.empresa_removida import EmpresaRemovida
+    from app.services import catalogo_service, empresa_service, esquema_service, faceta_service
+
+    # Cria o esquema (a aplicação já não o cria ao ser importada).
+    esquema_service.inicializar()
+    with SessionLocal() as db:
+        if db.execute(select(func.count()).select_from(Empresa)).scalar() == linhas:
+            return False
+
+        inicio = time.perf_counter()
+        db.execute(delete(EmpresaRemovida))
+        db.execute(delete(Empresa))
+        db.commit()
+        for deslocamento in range(0, linhas, bloco):
+            quantidade = min(bloco, linhas - deslocamento)
+            versoes = empresa_service.reservar_versoes(db, quantidade)
+            # A cidade e o ramo de atuação são convertidos nos IDs dos catálogos (criados no primeiro bloco).
+            db.execute(insert(Empresa), catalogo_service.para_colunas(db, [
+                {**dados, "versao": versao} for dados, versao in zip(gerar(deslocamento, quantidade), versoes)
+            ]))
+            db.commit()
+            if progresso:
+                print(f"\r{deslocamento + quantidade}/{linhas} empresas inseridas", end="", flush=True)
+        faceta_service.reconstruir(db)
+        if progresso:
+            print(f"\n{linhas} empresas geradas em {time.perf_counter() - inicio:.1f} s")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Povoa a tabela de empresas com dados sintéticos.")
+    parser.add_argument("--linhas", type=int, default=10000, help="Número de empresas (ex: 10000, 100000, 1000000)")
+    parser.add_argument("--database-url", help="URL da base de dados (por omissão, a DATABASE_URL do ambiente)")
+    parser.add_argument("--bloco", type=int, default=10000, help="Número de empresas inseridas por instrução")
+    args = parser.parse_args()
+
+    # Sem '--database-url', usa a DATABASE_URL do ambiente ou do ficheiro '.env'.
+    from dotenv import load_dotenv
+    load_dotenv()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    if not povoar(args.linhas, args.bloco):
+        print(f"A tabela já tem {args.linhas} empresas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# Configuração comum dos testes da API: uma base de dados SQLite temporária, criada com o esquema atual,
+# a cache "local" (o substituto do Redis, para testar o armazenamento partilhado) e um administrador autenticado.
+# A configuração da aplicação é lida na importação dos módulos, por isso as variáveis de ambiente
+# são definidas aqui, antes de qualquer teste importar a aplicação.
+#
+# Uso (a partir da pasta 'backend'):
+#   python -m pytest
+
+# --- Importações de Módulos ---
+import itertools
+import os
+import tempfile
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+PASTA_TESTES = tempfile.mkdtemp(prefix="testes_api_")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(PASTA_TESTES, 'principal.db')}",
+    "SECRET_KEY": "testes",
+    "CACHE_URL": "local",
+    # O bcrypt corre no próprio processo, e os limites de pedidos não interferem com os testes.
+    "PASSWORD_WORKERS": "0",
+    "RATE_LIMIT_IP_RATE": "0",
+    "RATE_LIMIT_ADMIN_RATE": "0",
+    "JOBS_WORKERS": "0",
+    "JOBS_DIR": os.path.join(PASTA_TESTES, "tarefas"),
+})
+os.environ.pop("DATABASE_READ_URL", None)
+
+ADMINISTRADOR = {"username": "admin", "password": "segredo-dos-testes"}
+
+# Numeração das empresas criadas, para que o CNPJ e o email sejam únicos em todos os testes.
+_numeros = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def cliente():
+    """
+    Cliente da API (com o 'lifespan' da aplicação), já autenticado como administrador.
+    """
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services import esquema_service
+
+    esquema_service.inicializar()
+    with TestClient(app) as cliente:
+        cliente.post("/auth/register", json=ADMINISTRADOR)
+        token = cliente.post("/auth/login", data=ADMINISTRADOR).json()["access_token"]
+        cliente.headers["Authorization"] = f"Bearer {token}"
+        yield cliente
+
+
+@pytest.fixture
+def cidade(request):
+    """
+    Uma cidade usada apenas pelo teste atual: filtrar por ela devolve só as empresas que o teste criou.
+    """
+    return f"Cidade {request.node.name}"
+
+
+@pytest.fixture
+def dados_empresa(cidade):
+    """
+    Gera os dados de uma empresa nova (válida e sem duplicados), com os campos indicados substituídos.
+    """
+    def gerar(**campos):
+        numero = next(_numeros)
+        return {
+            "nome": f"Empresa {numero}",
+            "cnpj": f"{numero:014d}",
+            "cidade": cidade,
+            "ramo_atuacao": "Tecnologia",
+            "telefone": "(75) 99999-9999",
+            "email_contato": f"empresa{numero}@exemplo.com",
+            **campos,
+        }
+    return gerar
+
+
+@pytest.fixture
+def criar_empresa(cliente, dados_empresa):
+    """
+    Regista uma empresa pela API e devolve a resposta (com a ETag nos cabeçalhos).
+    """
+    def criar(**campos):
+        resposta = cliente.post("/empresas/", json=dados_empresa(**campos))
+        assert resposta.status_code == 201, resposta.text
+        return resposta
+    return criar
+
+
+@pytest.fixture
+def pool_pequeno(cliente, monkeypatch):
+    """
+    Liga todas as sessões da API (de escrita e de leitura) a um único pool com o número de conexões indicado,
+    sem overflow e com uma espera curta: um pedido que precise de uma conexão a mais falha com 500 em 1 segundo.
+    """
+    from app.db import database
+
+    engines = []
+
+    def configurar(tamanho):
+        monkeypatch.setattr(database, "DB_POOL_SIZE", tamanho)
+        monkeypatch.setattr(database, "DB_MAX_OVERFLOW", 0)
+        monkeypatch.setattr(database, "DB_POOL_TIMEOUT", 1)
+        if database.DB_ASYNC:
+            engine = database.criar_engine(database.ASYNC_DATABASE_URL, "pool_testes_async", assincrono=True)
+            fabrica = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+            monkeypatch.setattr(database, "AsyncSessionLocal", fabrica)
+            monkeypatch.setattr(database, "AsyncReadSessionLocal", fabrica)
+        else:
+            engine = database.criar_engine(database.DATABASE_URL, "pool_testes")
+            fabrica = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            monkeypatch.setattr(database, "SessionLocal", fabrica)
+            monkeypatch.setattr(database, "ReadSessionLocal", fabrica)
+        engines.append(engine)
+        return engine
+
+    yield configurar
+    for engine in engines:
+        if database.DB_ASYNC:
+            cliente.portal.call(engine.dispose)
+        else:
+            engine.dispose()
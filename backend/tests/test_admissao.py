@@ -0,0 +1,111 @@
+# Testes do controlo de admissão ('admissao_service.MiddlewareAdmissao'): o limite de ritmo (429), o limite
+# de carga em curso (503), ambos com 'Retry-After', o limite próprio das transferências longas e o estado
+# de cada aplicação. Os limites são passados ao middleware de uma aplicação mínima (em 'conftest.py',
+# os limites da configuração estão desativados).
+
+# --- Importações de Módulos ---
+import asyncio
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+from app.services import admissao_service
+
+
+def aplicacao(**limites):
+    """
+    Uma aplicação com o middleware de admissão e três rotas: uma rápida, uma que só responde quando 'libertar'
+    é assinalado e uma transferência longa (no caminho da exportação), que só termina com 'libertar'.
+    """
+    app = FastAPI()
+    libertar = asyncio.Event()
+
+    @app.get("/rapida")
+    async def rapida():
+        return {"ok": True}
+
+    @app.get("/lenta")
+    async def lenta():
+        await libertar.wait()
+        return {"ok": True}
+
+    @app.get("/empresas/export")
+    async def exportar():
+        async def gerar():
+            yield b"nome\n"
+            await libertar.wait()
+            yield b"fim\n"
+        return StreamingResponse(gerar(), media_type="text/csv")
+
+    limites = {"taxa_ip": 0, "taxa_admin": 0, "capacidade": 0, "downloads": 0, **limites}
+    app.add_middleware(admissao_service.MiddlewareAdmissao, estado=app.state, **limites)
+    return app, libertar
+
+
+async def em_paralelo(app, libertar, lentos, pedidos):
+    """
+    Inicia os pedidos 'lentos' (que ficam em curso), faz os 'pedidos' e só depois liberta os lentos.
+    Devolve as respostas dos lentos e dos restantes pedidos.
+    """
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://teste") as http:
+        tarefas = [asyncio.create_task(http.get(caminho)) for caminho in lentos]
+        # Dá tempo aos pedidos lentos para serem admitidos.
+        await asyncio.sleep(0.05)
+        respostas = [await http.get(caminho) for caminho in pedidos]
+        libertar.set()
+        return [await tarefa for tarefa in tarefas], respostas
+
+
+def test_limite_de_ritmo_429_com_retry_after():
+    app, _ = aplicacao(taxa_ip=0.5, rajada_ip=2)
+    with TestClient(app) as cliente:
+        assert [cliente.get("/rapida").status_code for _ in range(2)] == [200, 200]
+        resposta = cliente.get("/rapida")
+
+    assert resposta.status_code == 429
+    assert resposta.json() == {"detail": "Demasiados pedidos deste endereço."}
+    # Com 0,5 unidades por segundo, falta 2 segundos para haver saldo para um pedido.
+    assert resposta.headers["Retry-After"] == "2"
+    assert app.state.admissao.contadores.rejeitados["ritmo_ip"] == 1
+
+
+def test_sobrecarga_503_com_retry_after():
+    app, libertar = aplicacao(capacidade=1, fila_max=0)
+    lentos, (resposta,) = asyncio.run(em_paralelo(app, libertar, ["/lenta"], ["/rapida"]))
+
+    assert [r.status_code for r in lentos] == [200]
+    assert resposta.status_code == 503
+    assert resposta.headers["Retry-After"] == "1"
+    assert app.state.admissao.contadores.rejeitados["fila_cheia"] == 1
+    assert app.state.admissao.admissao.em_curso == 0
+
+
+def test_transferencias_tem_limite_proprio():
+    # Uma exportação em curso não ocupa a capacidade dos outros pedidos, mas conta no limite das transferências.
+    app, libertar = aplicacao(capacidade=1, fila_max=0, downloads=1)
+    lentos, (rapida, exportacao) = asyncio.run(
+        em_paralelo(app, libertar, ["/empresas/export"], ["/rapida", "/empresas/export"])
+    )
+
+    assert [r.status_code for r in lentos] == [200]
+    assert lentos[0].text == "nome\nfim\n"
+    assert rapida.status_code == 200
+    assert exportacao.status_code == 503
+    assert "Retry-After" in exportacao.headers
+    assert app.state.admissao.downloads.em_curso == 0
+
+
+def test_estado_de_cada_aplicacao():
+    # Sem o 'lifespan' (que fecharia os pools partilhados com os outros testes): as rotas usadas não leem a base de dados.
+    primeira, segunda = create_app(), create_app()
+    cliente = TestClient(primeira)
+    assert [cliente.get("/docs").status_code for _ in range(2)] == [200, 200]
+    metricas_primeira = cliente.get("/metrics").text
+    metricas_segunda = TestClient(segunda).get("/metrics").text
+
+    assert primeira.state.admissao is not segunda.state.admissao
+    assert "http_admitted_requests_total 2\n" in metricas_primeira
+    assert "http_admitted_requests_total 0\n" in metricas_segunda
@@ -0,0 +1,62 @@
+# Testes da sincronização incremental ('GET /empresas/changes'): as criações, as atualizações e as exclusões
+# ("tombstones") posteriores a uma versão, pela ordem das versões, e a paginação por 'limit'.
+
+
+def versao_de(resposta):
+    # A ETag do detalhe é "<id>.<versão>".
+    return int(resposta.headers["ETag"].strip('"').split(".")[1])
+
+
+def alteracoes(cliente, since, **parametros):
+    resposta = cliente.get("/empresas/changes", params={"since": since, **parametros})
+    assert resposta.status_code == 200, resposta.text
+    return resposta.json()
+
+
+def test_criacao_atualizacao_e_exclusao(cliente, criar_empresa):
+    resposta = criar_empresa()
+    inicio = versao_de(resposta) - 1
+    alfa = resposta.json()
+    beta = criar_empresa().json()
+
+    pagina = alteracoes(cliente, inicio)
+    assert [(item["tipo"], item["id"]) for item in pagina["alteracoes"]] == [("alterada", alfa["id"]), ("alterada", beta["id"])]
+    assert pagina["alteracoes"][0]["empresa"]["nome"] == alfa["nome"]
+    assert pagina["ultima_versao"] == pagina["alteracoes"][-1]["versao"]
+    assert pagina["tem_mais"] is False
+
+    # A atualização move a empresa para depois das outras alterações, com os dados novos.
+    dados = {campo: alfa[campo] for campo in ("cidade", "ramo_atuacao", "telefone")}
+    atualizada = cliente.put(f"/empresas/{alfa['id']}", json={**dados, "nome": "Nome Atualizado"})
+    # A exclusão deixa um registo ("tombstone"), com uma versão nova e sem os dados da empresa.
+    assert cliente.delete(f"/empresas/{beta['id']}").status_code == 204
+
+    pagina = alteracoes(cliente, inicio)
+    itens = pagina["alteracoes"]
+    assert [(item["tipo"], item["id"]) for item in itens] == [("alterada", alfa["id"]), ("removida", beta["id"])]
+    assert itens[0]["versao"] == versao_de(atualizada)
+    assert itens[0]["empresa"]["nome"] == "Nome Atualizado"
+    assert "empresa" not in itens[1]
+    assert itens[1]["versao"] > itens[0]["versao"]
+
+    # A partir da última versão, não há nada de novo.
+    assert alteracoes(cliente, pagina["ultima_versao"]) == {
+        "alteracoes": [], "ultima_versao": pagina["ultima_versao"], "tem_mais": False,
+    }
+
+
+def test_paginacao_por_limit(cliente, criar_empresa):
+    resposta = criar_empresa()
+    since = versao_de(resposta) - 1
+    ids = [resposta.json()["id"]] + [criar_empresa().json()["id"] for _ in range(4)]
+
+    recebidos = []
+    while True:
+        pagina = alteracoes(cliente, since, limit=2)
+        assert len(pagina["alteracoes"]) <= 2
+        recebidos += [item["id"] for item in pagina["alteracoes"]]
+        since = pagina["ultima_versao"]
+        if not pagina["tem_mais"]:
+            break
+
+    assert recebidos == ids
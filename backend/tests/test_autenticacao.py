@@ -0,0 +1,107 @@
+# Testes da autenticação das rotas ('deps.get_current_admin') e da cache de principais ('principal_service'):
+# um token já validado é resolvido em memória, a entrada nunca dura mais do que o próprio token,
+# e a alteração ou exclusão de um administrador descarta as suas entradas.
+
+# --- Importações de Módulos ---
+import itertools
+import time
+import pytest
+from jose import jwt
+
+from app.db import database
+from app.models.administrador import Administrador
+from app.services import auth_service, principal_service
+
+# Numeração dos administradores criados pelos testes, para que o username seja único.
+_numeros = itertools.count(1)
+
+
+@pytest.fixture
+def novo_admin(cliente):
+    """
+    Regista um administrador novo e devolve o seu username e os cabeçalhos com um token dele.
+    """
+    def criar():
+        dados = {"username": f"admin_teste_{next(_numeros)}", "password": "outra-senha"}
+        assert cliente.post("/auth/register", json=dados).status_code == 201
+        token = cliente.post("/auth/login", data=dados).json()["access_token"]
+        return dados["username"], {"Authorization": f"Bearer {token}"}
+    return criar
+
+
+def token_de(cabecalhos):
+    return cabecalhos["Authorization"].split(" ", 1)[1]
+
+
+def alterar_admin(atual, **campos):
+    """
+    Altera (ou, sem campos, apaga) um administrador através do ORM, como faria outro processo da aplicação.
+    """
+    with database.SessionLocal() as db:
+        admin = db.query(Administrador).filter(Administrador.username == atual).one()
+        if campos:
+            for campo, valor in campos.items():
+                setattr(admin, campo, valor)
+        else:
+            db.delete(admin)
+        db.commit()
+
+
+def test_acerto_e_falha_da_cache(cliente, novo_admin):
+    _, cabecalhos = novo_admin()
+    falhas = principal_service.cache.falhas
+
+    # O primeiro pedido com o token consulta a base de dados e guarda o principal.
+    assert cliente.get("/empresas/", params={"nome": "x"}, headers=cabecalhos).status_code == 200
+    assert principal_service.cache.falhas == falhas + 1
+    acertos = principal_service.cache.acertos
+
+    # Os pedidos seguintes são resolvidos pela cache.
+    assert cliente.get("/empresas/", params={"nome": "x"}, headers=cabecalhos).status_code == 200
+    assert principal_service.cache.acertos == acertos + 1
+    assert principal_service.cache.falhas == falhas + 1
+
+
+def test_falha_da_cache_usa_uma_so_conexao(cliente, novo_admin, pool_pequeno):
+    # A consulta do administrador é feita numa sessão própria, fechada antes da rota: com uma única conexão
+    # no pool, a rota (que também consulta a base de dados) ainda consegue obtê-la.
+    username, cabecalhos = novo_admin()
+    pool_pequeno(1)
+    # Um filtro ainda não usado, para que a listagem não venha da cache de consultas.
+    assert cliente.get("/empresas/", params={"nome": username}, headers=cabecalhos).status_code == 200
+
+
+def test_expiracao_limitada_ao_token(cliente, novo_admin):
+    username, _ = novo_admin()
+    # Um token que expira antes do TTL da cache.
+    expiracao = int(time.time()) + 5
+    token = jwt.encode({"sub": username, "exp": expiracao}, auth_service.SECRET_KEY, algorithm=auth_service.ALGORITHM)
+
+    assert cliente.get("/empresas/", params={"nome": "x"}, headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    assert principal_service.cache._entradas[token][2] == expiracao
+
+
+def test_token_invalido(cliente):
+    resposta = cliente.get("/empresas/", headers={"Authorization": "Bearer nao-e-um-token"})
+    assert resposta.status_code == 401
+    assert resposta.headers["WWW-Authenticate"] == "Bearer"
+
+
+def test_alteracao_do_admin_invalida_a_cache(cliente, novo_admin):
+    username, cabecalhos = novo_admin()
+    assert cliente.get("/empresas/", params={"nome": "x"}, headers=cabecalhos).status_code == 200
+    assert principal_service.cache.username(token_de(cabecalhos)) == username
+
+    # Com o username alterado, o token (emitido para o username antigo) deixa de ser válido.
+    alterar_admin(username, username=f"{username}_novo")
+    assert principal_service.cache.username(token_de(cabecalhos)) is None
+    assert cliente.get("/empresas/", params={"nome": "x"}, headers=cabecalhos).status_code == 401
+
+
+def test_exclusao_do_admin_invalida_a_cache(cliente, novo_admin):
+    username, cabecalhos = novo_admin()
+    assert cliente.get("/empresas/", params={"nome": "x"}, headers=cabecalhos).status_code == 200
+
+    alterar_admin(username)
+    assert principal_service.cache.username(token_de(cabecalhos)) is None
+    assert cliente.get("/empresas/", params={"nome": "x"}, headers=cabecalhos).status_code == 401
@@ -0,0 +1,90 @@
+# Testes da cache de consultas ('cache_service'): as respostas repetidas vêm da cache, e cada escrita
+# (criação, atualização, exclusão ou importação) invalida-as. Os testes usam o armazenamento "local"
+# (o substituto do Redis), configurado em 'conftest.py'.
+
+# --- Importações de Módulos ---
+import pytest
+
+from app.services import cache_service
+
+
+@pytest.fixture
+def listar(cliente, cidade):
+    """
+    Lista as empresas da cidade do teste e devolve os nomes.
+    """
+    def listar():
+        resposta = cliente.get("/empresas/", params={"cidade": cidade})
+        assert resposta.status_code == 200, resposta.text
+        return sorted(empresa["nome"] for empresa in resposta.json())
+    return listar
+
+
+def test_respostas_repetidas_vem_da_cache(criar_empresa, listar):
+    criar_empresa(nome="Alfa")
+    assert listar() == ["Alfa"]
+    acertos = cache_service.cache.acertos
+
+    assert listar() == ["Alfa"]
+    assert cache_service.cache.acertos > acertos
+
+
+def test_escritas_invalidam_a_cache(cliente, dados_empresa, criar_empresa, listar):
+    alfa = criar_empresa(nome="Alfa").json()
+    assert listar() == ["Alfa"]
+
+    # Criação.
+    beta = criar_empresa(nome="Beta").json()
+    assert listar() == ["Alfa", "Beta"]
+
+    # Atualização (a listagem e o detalhe, ambos já em cache).
+    assert cliente.get(f"/empresas/{alfa['id']}").json()["nome"] == "Alfa"
+    dados = {campo: alfa[campo] for campo in ("cidade", "ramo_atuacao", "telefone")}
+    assert cliente.put(f"/empresas/{alfa['id']}", json={**dados, "nome": "Gama"}).status_code == 200
+    assert listar() == ["Beta", "Gama"]
+    assert cliente.get(f"/empresas/{alfa['id']}").json()["nome"] == "Gama"
+
+    # Exclusão.
+    assert cliente.delete(f"/empresas/{beta['id']}").status_code == 204
+    assert listar() == ["Gama"]
+    assert cliente.get(f"/empresas/{beta['id']}").status_code == 404
+
+    # Importação em lote.
+    linha = dados_empresa(nome="Delta")
+    resposta = cliente.post(
+        "/empresas/import",
+        content=(",".join(linha) + "\n" + ",".join(linha.values()) + "\n").encode(),
+        headers={"Content-Type": "text/csv"},
+    )
+    assert resposta.json()["inseridas"] == 1
+    assert listar() == ["Delta", "Gama"]
+
+
+def test_total_atualizado_apos_escrita(cliente, cidade, criar_empresa):
+    criar_empresa()
+    resposta = cliente.get("/empresas/", params={"cidade": cidade})
+    assert resposta.headers["X-Total-Count"] == "1"
+
+    criar_empresa()
+    resposta = cliente.get("/empresas/", params={"cidade": cidade})
+    assert resposta.headers["X-Total-Count"] == "2"
+
+
+def test_cache_em_memoria_desativada_com_varios_workers():
+    # Com vários workers, cada processo teria a sua cache em memória, sem as invalidações dos outros.
+    assert isinstance(cache_service.criar_backend("memory", workers=1), cache_service.MemoriaBackend)
+    assert isinstance(cache_service.criar_backend("memory", workers=4), cache_service.SemCacheBackend)
+    # A cache partilhada continua ativa com qualquer número de workers.
+    assert isinstance(cache_service.criar_backend("local", workers=4), cache_service.RedisBackend)
+
+
+def test_cache_desativada_nunca_devolve_respostas(cliente):
+    cache = cache_service.CacheConsultas(cache_service.SemCacheBackend(), 30)
+
+    async def cenario():
+        chave = await cache.chave("listagem", {"nome": "x"})
+        await cache.guardar(chave, b"[]")
+        return await cache.obter(chave)
+
+    assert cliente.portal.call(cenario) is None
+    assert cache.acertos == 0
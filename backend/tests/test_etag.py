@@ -0,0 +1,109 @@
+# Testes dos pedidos condicionais: 'If-None-Match' (304 Not Modified) nas leituras
+# e 'If-Match' (412 Precondition Failed) nas escritas.
+
+# --- Importações de Módulos ---
+import pytest
+
+# Sem compressão, as ETags são fortes (com compressão, são enviadas como fracas, 'W/...').
+SEM_COMPRESSAO = {"Accept-Encoding": "identity"}
+
+
+@pytest.fixture
+def empresa(criar_empresa):
+    return criar_empresa().json()
+
+
+def atualizacao(empresa, **campos):
+    return {**{campo: empresa[campo] for campo in ("nome", "cidade", "ramo_atuacao", "telefone")}, **campos}
+
+
+def test_detalhe_304_enquanto_nao_muda(cliente, empresa):
+    resposta = cliente.get(f"/empresas/{empresa['id']}", headers=SEM_COMPRESSAO)
+    etag = resposta.headers["ETag"]
+
+    resposta = cliente.get(f"/empresas/{empresa['id']}", headers={**SEM_COMPRESSAO, "If-None-Match": etag})
+    assert resposta.status_code == 304
+    assert resposta.content == b""
+    assert resposta.headers["ETag"] == etag
+
+    cliente.put(f"/empresas/{empresa['id']}", json=atualizacao(empresa, nome="Outro Nome"))
+    resposta = cliente.get(f"/empresas/{empresa['id']}", headers={**SEM_COMPRESSAO, "If-None-Match": etag})
+    assert resposta.status_code == 200
+    assert resposta.json()["nome"] == "Outro Nome"
+    assert resposta.headers["ETag"] != etag
+
+
+def test_listagem_304_enquanto_nao_muda(cliente, cidade, criar_empresa, empresa):
+    parametros = {"cidade": cidade}
+    etag = cliente.get("/empresas/", params=parametros).headers["ETag"]
+
+    # A comparação do 'If-None-Match' é fraca: a ETag da resposta comprimida também serve.
+    resposta = cliente.get("/empresas/", params=parametros, headers={"If-None-Match": etag})
+    assert resposta.status_code == 304
+
+    criar_empresa()
+    resposta = cliente.get("/empresas/", params=parametros, headers={"If-None-Match": etag})
+    assert resposta.status_code == 200
+    assert len(resposta.json()) == 2
+
+
+def test_atualizacao_412_se_a_empresa_mudou(cliente, empresa):
+    etag = cliente.get(f"/empresas/{empresa['id']}", headers=SEM_COMPRESSAO).headers["ETag"]
+    # Outro cliente altera a empresa entretanto.
+    resposta = cliente.put(f"/empresas/{empresa['id']}", json=atualizacao(empresa, nome="Primeira"))
+    etag_atual = resposta.headers["ETag"]
+
+    resposta = cliente.put(
+        f"/empresas/{empresa['id']}", json=atualizacao(empresa, nome="Segunda"), headers={"If-Match": etag}
+    )
+    assert resposta.status_code == 412
+    assert cliente.get(f"/empresas/{empresa['id']}").json()["nome"] == "Primeira"
+
+    resposta = cliente.put(
+        f"/empresas/{empresa['id']}", json=atualizacao(empresa, nome="Segunda"), headers={"If-Match": etag_atual}
+    )
+    assert resposta.status_code == 200
+    assert resposta.json()["nome"] == "Segunda"
+
+
+def test_exclusao_412_se_a_empresa_mudou(cliente, empresa):
+    etag = cliente.get(f"/empresas/{empresa['id']}", headers=SEM_COMPRESSAO).headers["ETag"]
+    etag_atual = cliente.put(f"/empresas/{empresa['id']}", json=atualizacao(empresa, nome="Alterada")).headers["ETag"]
+
+    assert cliente.delete(f"/empresas/{empresa['id']}", headers={"If-Match": etag}).status_code == 412
+    assert cliente.get(f"/empresas/{empresa['id']}").status_code == 200
+
+    assert cliente.delete(f"/empresas/{empresa['id']}", headers={"If-Match": etag_atual}).status_code == 204
+    assert cliente.get(f"/empresas/{empresa['id']}").status_code == 404
+
+
+def test_if_match_de_outra_empresa_ou_fraco(cliente, criar_empresa, empresa):
+    outra = criar_empresa()
+    assert cliente.delete(f"/empresas/{empresa['id']}", headers={"If-Match": outra.headers["ETag"]}).status_code == 412
+    etag_fraca = "W/" + cliente.get(f"/empresas/{empresa['id']}", headers=SEM_COMPRESSAO).headers["ETag"]
+    assert cliente.delete(f"/empresas/{empresa['id']}", headers={"If-Match": etag_fraca}).status_code == 412
+
+
+def test_etag_da_listagem_muda_a_cada_escrita(cliente, cidade, criar_empresa, empresa):
+    # A ETag da listagem usa a última versão atribuída (incluindo as exclusões) e o número de empresas.
+    # Como as versões são confirmadas pela ordem em que são atribuídas, cada escrita produz uma ETag nova.
+    parametros = {"cidade": cidade}
+    outra = criar_empresa().json()
+    etags = [cliente.get("/empresas/", params=parametros).headers["ETag"]]
+
+    # Atualização da empresa mais antiga (que não tem a maior versão da tabela).
+    cliente.put(f"/empresas/{empresa['id']}", json=atualizacao(empresa, nome="Mais Antiga"))
+    etags.append(cliente.get("/empresas/", params=parametros).headers["ETag"])
+
+    # Uma exclusão seguida de uma criação deixa o número de empresas igual.
+    assert cliente.delete(f"/empresas/{outra['id']}").status_code == 204
+    criar_empresa()
+    resposta = cliente.get("/empresas/", params=parametros)
+    assert resposta.headers["X-Total-Count"] == "2"
+    etags.append(resposta.headers["ETag"])
+
+    # Uma exclusão isolada também muda a ETag.
+    assert cliente.delete(f"/empresas/{empresa['id']}").status_code == 204
+    etags.append(cliente.get("/empresas/", params=parametros).headers["ETag"])
+
+    assert len(set(etags)) == len(etags)
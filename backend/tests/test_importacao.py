@@ -0,0 +1,69 @@
+# Testes da importação em lote ('POST /empresas/import') e do relatório das linhas rejeitadas.
+
+# --- Importações de Módulos ---
+import csv
+import io
+import json
+
+CAMPOS = ["nome", "cnpj", "cidade", "ramo_atuacao", "telefone", "email_contato"]
+
+
+def ficheiro_csv(registos):
+    saida = io.StringIO()
+    escritor = csv.DictWriter(saida, fieldnames=CAMPOS)
+    escritor.writeheader()
+    escritor.writerows(registos)
+    return saida.getvalue().encode()
+
+
+def test_relatorio_das_linhas_rejeitadas_csv(cliente, cidade, dados_empresa, criar_empresa):
+    existente = criar_empresa().json()
+    valida, outra = dados_empresa(), dados_empresa()
+    # A linha 1 é o cabeçalho: as linhas 3 a 5 são rejeitadas (CNPJ repetido no ficheiro, email inválido
+    # e CNPJ de uma empresa já registada).
+    registos = [
+        valida,
+        dados_empresa(cnpj=valida["cnpj"]),
+        dados_empresa(email_contato="sem-arroba"),
+        dados_empresa(cnpj=existente["cnpj"]),
+        outra,
+    ]
+
+    resposta = cliente.post("/empresas/import", content=ficheiro_csv(registos), headers={"Content-Type": "text/csv"})
+
+    assert resposta.status_code == 200, resposta.text
+    resultado = resposta.json()
+    assert (resultado["total_linhas"], resultado["inseridas"], resultado["rejeitadas"]) == (5, 2, 3)
+    erros = {erro["linha"]: erro["erro"] for erro in resultado["erros"]}
+    assert erros[3] == "CNPJ já registado. (repetido no ficheiro)"
+    assert erros[4].startswith("email_contato:")
+    assert erros[5] == "CNPJ já registado."
+    assert set(erros) == {3, 4, 5}
+
+    # Só as linhas válidas foram inseridas.
+    nomes = {empresa["nome"] for empresa in cliente.get("/empresas/", params={"cidade": cidade}).json()}
+    assert nomes == {existente["nome"], valida["nome"], outra["nome"]}
+
+
+def test_relatorio_das_linhas_rejeitadas_ndjson(cliente, dados_empresa):
+    valida = dados_empresa()
+    linhas = [
+        json.dumps(valida),
+        "{isto não é JSON",
+        json.dumps({campo: valor for campo, valor in dados_empresa().items() if campo != "telefone"}),
+    ]
+
+    resposta = cliente.post(
+        "/empresas/import", content="\n".join(linhas).encode(), headers={"Content-Type": "application/x-ndjson"}
+    )
+
+    resultado = resposta.json()
+    assert (resultado["total_linhas"], resultado["inseridas"]) == (3, 1)
+    assert [erro["linha"] for erro in resultado["erros"]] == [2, 3]
+    assert resultado["erros"][0]["erro"] == "JSON inválido."
+    assert "telefone" in resultado["erros"][1]["erro"]
+
+
+def test_tipo_de_ficheiro_nao_suportado(cliente):
+    resposta = cliente.post("/empresas/import", content=b"nome\n", headers={"Content-Type": "application/pdf"})
+    assert resposta.status_code == 415
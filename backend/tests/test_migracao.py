@@ -0,0 +1,88 @@
+# Testes da atualização do esquema ('python -m app.cli atualizar-esquema') sobre uma base de dados criada
+# pelo modelo inicial da tabela 'empresas' (cidade e ramo de atuação em texto, com 'index=True',
+# e sem as colunas 'versao' e 'data_atualizacao').
+
+# --- Importações de Módulos ---
+import os
+import subprocess
+import sys
+from pathlib import Path
+from sqlalchemy import Column, DateTime, Integer, String, create_engine, insert, inspect, text
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.sql import func
+
+PASTA_BACKEND = Path(__file__).resolve().parents[1]
+
+BaseInicial = declarative_base()
+
+
+class EmpresaInicial(BaseInicial):
+    """
+    O modelo 'Empresa' da primeira versão da API.
+    """
+    __tablename__ = "empresas"
+    id = Column(Integer, primary_key=True, index=True)
+    nome = Column(String, index=True, nullable=False)
+    cnpj = Column(String, unique=True, index=True, nullable=False)
+    cidade = Column(String, index=True, nullable=False)
+    ramo_atuacao = Column(String, index=True, nullable=False)
+    telefone = Column(String, nullable=False)
+    email_contato = Column(String, unique=True, index=True, nullable=False)
+    data_cadastro = Column(DateTime(timezone=True), server_default=func.now())
+
+
+def criar_base_inicial(caminho):
+    engine = create_engine(f"sqlite:///{caminho}")
+    BaseInicial.metadata.create_all(engine)
+    cidades = ["Feira de Santana", "feira de santana", "Salvador", "São Paulo"]
+    with engine.begin() as conexao:
+        conexao.execute(insert(EmpresaInicial), [
+            {
+                "nome": f"Empresa {i}", "cnpj": f"{i:014d}", "cidade": cidades[i % 4],
+                "ramo_atuacao": ["Software", "Comércio"][i % 2], "telefone": "75999999999",
+                "email_contato": f"empresa{i}@exemplo.com",
+            }
+            for i in range(1, 13)
+        ])
+    return engine
+
+
+def executar(comando, caminho):
+    ambiente = {**os.environ, "DATABASE_URL": f"sqlite:///{caminho}", "SECRET_KEY": "testes"}
+    return subprocess.run(
+        [sys.executable, "-m", "app.cli", comando], cwd=PASTA_BACKEND, env=ambiente,
+        capture_output=True, text=True, check=True,
+    )
+
+
+def test_atualizar_base_inicial(tmp_path):
+    caminho = tmp_path / "inicial.db"
+    engine = criar_base_inicial(caminho)
+
+    executar("migrar-catalogos", caminho)
+
+    inspetor = inspect(engine)
+    colunas = {coluna["name"] for coluna in inspetor.get_columns("empresas")}
+    assert {"versao", "data_atualizacao", "cidade_id", "cidade_nome", "ramo_atuacao_id"} <= colunas
+    assert not {"cidade", "ramo_atuacao"} & colunas
+    indices = {indice["name"] for indice in inspetor.get_indexes("empresas")}
+    assert {
+        "ix_empresas_versao", "ix_empresas_cidade_id_id", "ix_empresas_cidade_nome_id", "ix_empresas_ramo_atuacao_id_id",
+    } <= indices
+    assert not {"ix_empresas_cidade", "ix_empresas_ramo_atuacao"} & indices
+    with engine.connect() as conexao:
+        # As grafias que só diferem nas maiúsculas ficam numa única entrada.
+        assert conexao.execute(text("SELECT COUNT(*) FROM cidades")).scalar() == 3
+        # Cada empresa fica com uma versão distinta (o seu ID) e com a data de atualização preenchida.
+        assert conexao.execute(text("SELECT COUNT(*) FROM empresas WHERE versao = id")).scalar() == 12
+        assert conexao.execute(text("SELECT COUNT(*) FROM empresas WHERE data_atualizacao IS NULL")).scalar() == 0
+        # A cópia do nome da cidade (ordenação) é a do catálogo.
+        assert conexao.execute(text(
+            "SELECT COUNT(*) FROM empresas JOIN cidades ON cidades.id = empresas.cidade_id WHERE cidade_nome = cidades.nome"
+        )).scalar() == 12
+        facetas = dict(conexao.execute(text("SELECT valor, total FROM facetas_empresas WHERE campo = 'cidade'")).all())
+    assert facetas == {"Feira de Santana": 6, "Salvador": 3, "São Paulo": 3}
+
+    # Repetir a atualização não altera nada.
+    saida = executar("atualizar-esquema", caminho).stdout
+    assert "Colunas acrescentadas" not in saida and "Catálogos preenchidos" not in saida
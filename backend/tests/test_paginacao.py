@@ -0,0 +1,67 @@
+# Testes da paginação por cursor (keyset) de 'GET /empresas/'.
+
+# --- Importações de Módulos ---
+from datetime import datetime
+import pytest
+
+
+def percorrer(cliente, parametros, depois_da_primeira=None):
+    """
+    Percorre todas as páginas da listagem e devolve os IDs, pela ordem recebida.
+    'depois_da_primeira' é chamada depois da primeira página (para alterar a tabela a meio da paginação).
+    """
+    ids, cursor = [], None
+    while True:
+        resposta = cliente.get("/empresas/", params={**parametros, **({"cursor": cursor} if cursor else {})})
+        assert resposta.status_code == 200, resposta.text
+        ids += [empresa["id"] for empresa in resposta.json()]
+        cursor = resposta.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids
+        if depois_da_primeira:
+            depois_da_primeira()
+            depois_da_primeira = None
+
+
+@pytest.mark.parametrize("ordenar_por", ["nome", "cidade", "data_cadastro"])
+@pytest.mark.parametrize("direcao", ["asc", "desc"])
+def test_paginas_sem_repetidos_nem_em_falta(cliente, cidade, criar_empresa, ordenar_por, direcao):
+    # Vários nomes repetidos (e a mesma cidade em todas): o ID desempata a ordem dentro de cada valor.
+    empresas = [criar_empresa(nome=f"Empresa {i % 3}").json() for i in range(8)]
+    parametros = {"cidade": cidade, "ordenar_por": ordenar_por, "direcao": direcao, "limit": 3}
+
+    ids = percorrer(cliente, parametros)
+
+    def chave(empresa):
+        valor = empresa[ordenar_por]
+        return (datetime.fromisoformat(valor) if ordenar_por == "data_cadastro" else valor), empresa["id"]
+
+    esperados = [e["id"] for e in sorted(empresas, key=chave, reverse=direcao == "desc")]
+    assert ids == esperados
+
+
+def test_cursor_estavel_com_insercoes_e_exclusoes(cliente, cidade, criar_empresa):
+    """
+    Ao contrário do OFFSET, o cursor guarda a posição (nome, ID) do último item: as empresas criadas ou excluídas
+    antes dessa posição não fazem repetir nem saltar as empresas das páginas seguintes.
+    """
+    empresas = [criar_empresa(nome=f"Empresa {letra}").json() for letra in "BCDEFGH"]
+    parametros = {"cidade": cidade, "ordenar_por": "nome", "limit": 3}
+
+    def alterar_tabela():
+        criar_empresa(nome="Empresa A")
+        assert cliente.delete(f"/empresas/{empresas[0]['id']}").status_code == 204
+
+    ids = percorrer(cliente, parametros, depois_da_primeira=alterar_tabela)
+
+    assert ids == [e["id"] for e in empresas]
+
+
+def test_cursor_de_outra_ordenacao(cliente, cidade, criar_empresa):
+    for _ in range(3):
+        criar_empresa()
+    resposta = cliente.get("/empresas/", params={"cidade": cidade, "ordenar_por": "nome", "limit": 1})
+    cursor = resposta.headers["X-Next-Cursor"]
+
+    resposta = cliente.get("/empresas/", params={"cidade": cidade, "ordenar_por": "cidade", "cursor": cursor})
+    assert resposta.status_code == 400
@@ -0,0 +1,86 @@
+# Testes da pesquisa textual pelo nome com o índice de trigramas em memória ('search_service.IndiceTrigramas'),
+# usado fora do PostgreSQL: a ordenação por relevância, o cursor da relevância, a sincronização com as escritas
+# de outros processos (pela versão) e o filtro por ILIKE quando há demasiados resultados para a lista de IDs.
+
+# --- Importações de Módulos ---
+from app.db import database
+from app.services import search_service
+
+
+def pesquisar(cliente, cidade, nome, **parametros):
+    resposta = cliente.get("/empresas/", params={"cidade": cidade, "nome": nome, **parametros})
+    assert resposta.status_code == 200, resposta.text
+    return resposta
+
+
+def nomes(resposta):
+    return [empresa["nome"] for empresa in resposta.json()]
+
+
+def test_ordenacao_por_relevancia(cliente, cidade, criar_empresa):
+    for nome in ("Kwyjibo Comércio de Alimentos", "Outra Empresa", "Kwyjibo", "Kwyjibo Lda"):
+        criar_empresa(nome=nome)
+
+    # Sem ordenação pedida, os resultados vêm da mais para a menos semelhante ao termo (sem distinguir maiúsculas).
+    assert nomes(pesquisar(cliente, cidade, "KWYJIBO")) == ["Kwyjibo", "Kwyjibo Lda", "Kwyjibo Comércio de Alimentos"]
+    # Com outra ordenação, a pesquisa só filtra.
+    assert nomes(pesquisar(cliente, cidade, "kwyjibo", ordenar_por="nome")) == [
+        "Kwyjibo", "Kwyjibo Comércio de Alimentos", "Kwyjibo Lda",
+    ]
+
+
+def test_cursor_da_relevancia(cliente, cidade, criar_empresa):
+    # Várias empresas com a mesma relevância (a segunda palavra tem sempre o mesmo número de trigramas):
+    # o desempate é pelo ID (descendente), também no cursor.
+    for nome in ("Xilofone Bolo", "Xilofone Cama", "Xilofone", "Xilofone Dedo", "Xilofone Faca"):
+        criar_empresa(nome=nome)
+    completa = nomes(pesquisar(cliente, cidade, "xilofone"))
+    assert completa[0] == "Xilofone"
+    assert completa[1:] == ["Xilofone Faca", "Xilofone Dedo", "Xilofone Cama", "Xilofone Bolo"]
+
+    paginas, cursor = [], None
+    while True:
+        resposta = pesquisar(cliente, cidade, "xilofone", limit=2, **({"cursor": cursor} if cursor else {}))
+        paginas += nomes(resposta)
+        cursor = resposta.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert paginas == completa
+
+
+def test_sincronizacao_com_outros_processos(cliente, criar_empresa):
+    # Um segundo índice faz de índice de outro worker: não recebe as escritas deste processo diretamente,
+    # e apanha-as pela versão antes de cada pesquisa.
+    outro = search_service.IndiceTrigramas()
+    with database.SessionLocal() as db:
+        assert outro.pesquisar(db, {"nome": "quasimodo"}) == {}
+
+    empresa = criar_empresa(nome="Quasimodo Sinos").json()
+    with database.SessionLocal() as db:
+        assert list(outro.pesquisar(db, {"nome": "quasimodo"})) == [empresa["id"]]
+
+    dados = {campo: empresa[campo] for campo in ("cidade", "ramo_atuacao", "telefone")}
+    assert cliente.put(f"/empresas/{empresa['id']}", json={**dados, "nome": "Esmeralda Sinos"}).status_code == 200
+    with database.SessionLocal() as db:
+        assert outro.pesquisar(db, {"nome": "quasimodo"}) == {}
+        assert list(outro.pesquisar(db, {"nome": "esmeralda"})) == [empresa["id"]]
+
+    assert cliente.delete(f"/empresas/{empresa['id']}").status_code == 204
+    with database.SessionLocal() as db:
+        assert outro.pesquisar(db, {"nome": "esmeralda"}) == {}
+
+
+def test_filtro_por_ilike_acima_do_limite(cliente, cidade, criar_empresa, monkeypatch):
+    for nome in ("Zarabatana Um", "Zarabatana Dois", "Zarabatana Três", "Outra"):
+        criar_empresa(nome=nome)
+    esperado = nomes(pesquisar(cliente, cidade, "zarabatana", ordenar_por="nome"))
+
+    # Acima do limite, a pesquisa filtra com ILIKE em vez de enviar a lista de IDs; o resultado é o mesmo.
+    usados = []
+    filtrar_ilike = search_service.filtrar_ilike
+    monkeypatch.setattr(search_service, "LIMITE_IDS_FILTRO", 2)
+    monkeypatch.setattr(search_service, "filtrar_ilike", lambda query, filtros: usados.append(filtros) or filtrar_ilike(query, filtros))
+
+    resposta = pesquisar(cliente, cidade, "ZARABATANA", ordenar_por="nome", direcao="desc")
+    assert usados == [{"nome": "ZARABATANA"}]
+    assert nomes(resposta) == esperado[::-1] == ["Zarabatana Um", "Zarabatana Três", "Zarabatana Dois"]
@@ -0,0 +1,79 @@
+# Testes do encaminhamento para a réplica de leitura ('DATABASE_READ_URL'): as rotas que só leem usam a réplica,
+# e as escritas (e '/changes') usam a base de dados principal. Uma segunda base de dados SQLite faz de réplica,
+# atualizada a partir da principal apenas quando o teste "replica" (como uma réplica atrasada).
+
+# --- Importações de Módulos ---
+import sqlite3
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.db import database
+
+
+@pytest.fixture
+def replicar(cliente, tmp_path, monkeypatch):
+    """
+    Liga as sessões de leitura a uma réplica (um ficheiro SQLite à parte) e devolve a função
+    que copia para ela o estado atual da base de dados principal.
+    """
+    caminho = tmp_path / "replica.db"
+    url = f"sqlite:///{caminho}"
+    engine_replica = database.criar_engine(url, "replica_testes")
+    monkeypatch.setattr(
+        database, "ReadSessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engine_replica)
+    )
+    engine_replica_async = None
+    if database.DB_ASYNC:
+        engine_replica_async = database.criar_engine(
+            database.converter_url_assincrona(url), "replica_testes_async", assincrono=True
+        )
+        monkeypatch.setattr(
+            database, "AsyncReadSessionLocal",
+            async_sessionmaker(engine_replica_async, expire_on_commit=False, autoflush=False),
+        )
+
+    def replicar():
+        # As conexões abertas da réplica são fechadas antes de o ficheiro ser substituído.
+        engine_replica.dispose()
+        if engine_replica_async is not None:
+            cliente.portal.call(engine_replica_async.dispose)
+        with sqlite3.connect(database.engine.url.database) as origem, sqlite3.connect(caminho) as destino:
+            origem.backup(destino)
+
+    replicar()
+    yield replicar
+    engine_replica.dispose()
+    if engine_replica_async is not None:
+        cliente.portal.call(engine_replica_async.dispose)
+
+
+def test_leituras_na_replica_e_escritas_na_principal(cliente, cidade, criar_empresa, replicar):
+    resposta = criar_empresa()
+    empresa = resposta.json()
+    # A ETag do detalhe é "<id>.<versão>".
+    versao = int(resposta.headers["ETag"].strip('"').split(".")[1])
+
+    # A réplica ainda não tem a empresa: a listagem e o detalhe (leituras) não a encontram.
+    assert cliente.get("/empresas/", params={"cidade": cidade}).json() == []
+    assert cliente.get(f"/empresas/{empresa['id']}").status_code == 404
+    # A sincronização incremental lê da principal, por isso inclui a empresa.
+    alteracoes = cliente.get("/empresas/changes", params={"since": versao - 1}).json()["alteracoes"]
+    assert [alteracao["id"] for alteracao in alteracoes] == [empresa["id"]]
+
+    # Depois de replicada, as leituras já a veem.
+    replicar()
+    resposta = cliente.get("/empresas/batch", params={"ids": str(empresa["id"])})
+    assert [e["id"] for e in resposta.json()["empresas"]] == [empresa["id"]]
+
+    # A escrita é feita na principal, mesmo com a réplica atrasada em relação a ela.
+    resposta = cliente.put(
+        f"/empresas/{empresa['id']}",
+        json={"nome": "Nome Novo", **{campo: empresa[campo] for campo in ("cidade", "ramo_atuacao", "telefone")}},
+    )
+    assert resposta.status_code == 200
+    assert cliente.get("/empresas/", params={"cidade": cidade}).json()[0]["nome"] == empresa["nome"]
+    # A listagem acima ficou em cache com o valor antigo (até 'CACHE_TTL' ou à próxima escrita);
+    # o detalhe ainda não foi pedido depois da escrita, por isso vem da réplica, já atualizada.
+    replicar()
+    assert cliente.get(f"/empresas/{empresa['id']}").json()["nome"] == "Nome Novo"
@@ -0,0 +1,69 @@
+# Testes do stream de alterações em tempo real ('GET /empresas/stream', Server-Sent Events).
+# O cliente de testes do Starlette só devolve a resposta quando ela termina, por isso os streams são abertos
+# chamando a aplicação ASGI diretamente, no event loop da aplicação ('cliente.portal').
+
+# --- Importações de Módulos ---
+import asyncio
+import httpx
+
+
+class Stream:
+    """
+    Um cliente ligado a 'GET /empresas/stream': guarda as mensagens recebidas e desliga-se com 'fechar'.
+    """
+    def __init__(self, app, autorizacao):
+        self.mensagens = asyncio.Queue()
+        self._desligar = asyncio.Event()
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": "/empresas/stream", "raw_path": b"/empresas/stream", "query_string": b"", "root_path": "",
+            "headers": [(b"host", b"teste"), (b"authorization", autorizacao.encode())],
+            "client": ("127.0.0.1", 1), "server": ("teste", 80),
+        }
+        self._tarefa = asyncio.create_task(app(scope, self._receber, self._enviar))
+
+    async def _receber(self):
+        await self._desligar.wait()
+        return {"type": "http.disconnect"}
+
+    async def _enviar(self, mensagem):
+        if mensagem["type"] == "http.response.body" and mensagem.get("body"):
+            await self.mensagens.put(mensagem["body"].decode())
+
+    async def proxima(self):
+        return await asyncio.wait_for(self.mensagens.get(), 5)
+
+    async def fechar(self):
+        self._desligar.set()
+        await asyncio.wait_for(self._tarefa, 5)
+
+
+def test_streams_abertos_nao_ocupam_conexoes(cliente, pool_pequeno):
+    """
+    Cada stream fica aberto enquanto o cliente estiver ligado: se guardasse a conexão usada para ler a versão
+    inicial, dois streams esgotariam um pool de duas conexões, e a listagem falharia por falta de conexões.
+    """
+    pool_pequeno(2)
+    autorizacao = cliente.headers["Authorization"]
+
+    async def cenario():
+        streams = [Stream(cliente.app, autorizacao) for _ in range(2)]
+        inicios = [await stream.proxima() for stream in streams]
+        transporte = httpx.ASGITransport(app=cliente.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://teste") as http:
+            resposta = await http.get("/empresas/", params={"cidade": "Cidade do Stream"}, headers={"Authorization": autorizacao})
+            criada = await http.post("/empresas/", json={
+                "nome": "Empresa do Stream", "cnpj": "98765432000198", "cidade": "Cidade do Stream",
+                "ramo_atuacao": "Tecnologia", "telefone": "1", "email_contato": "stream@exemplo.com",
+            }, headers={"Authorization": autorizacao})
+        eventos = [await stream.proxima() for stream in streams]
+        for stream in streams:
+            await stream.fechar()
+        return inicios, resposta.status_code, criada.status_code, eventos
+
+    inicios, estado_listagem, estado_criacao, eventos = cliente.portal.call(cenario)
+
+    assert all(inicio.startswith("event: inicio\n") for inicio in inicios)
+    assert estado_listagem == 200
+    assert estado_criacao == 201
+    assert all(evento.startswith("event: criada\n") and "Empresa do Stream" in evento for evento in eventos)
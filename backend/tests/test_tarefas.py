@@ -0,0 +1,202 @@
+# Testes do motor das tarefas em segundo plano ('tarefa_service'): a reserva pela prioridade, o cancelamento
+# de tarefas pendentes e em execução, a retoma de importações e exportações a partir do ponto gravado,
+# a recuperação das tarefas abandonadas e o resultado ('GET /jobs/{id}/result').
+# Em 'conftest.py', os workers estão desativados (JOBS_WORKERS=0): cada teste usa o seu próprio gestor
+# e executa as tarefas chamando '_reservar' e '_executar' diretamente, no próprio processo.
+
+# --- Importações de Módulos ---
+import functools
+import glob
+import itertools
+import json
+import os
+from datetime import timedelta
+import pytest
+from sqlalchemy import update
+
+from app.db import database
+from app.models.tarefa import Tarefa
+from app.services import export_service, import_service, tarefa_service
+
+
+@pytest.fixture
+def gestor():
+    """
+    Um gestor sem threads. A pasta das tarefas é criada como em 'iniciar'. No fim do teste, as tarefas
+    que não terminaram são canceladas, para que os outros testes não as reservem.
+    """
+    os.makedirs(tarefa_service.JOBS_DIR, exist_ok=True)
+    yield tarefa_service.GestorTarefas(0)
+    with database.SessionLocal() as db:
+        db.execute(
+            update(Tarefa)
+            .where(Tarefa.estado.notin_(tarefa_service.ESTADOS_FINAIS))
+            .values(estado="cancelada", cancelar=True)
+        )
+        db.commit()
+
+
+def interromper_apos(gestor, monkeypatch, pontos):
+    # O gestor passa a estar "a parar" depois de 'pontos' pontos de progresso gravados (como num reinício).
+    chamadas = itertools.count(1)
+    monkeypatch.setattr(gestor, "a_parar", lambda: next(chamadas) > pontos)
+
+
+def criar_tarefa(cliente, tipo, **parametros):
+    resposta = cliente.post("/jobs", params={"tipo": tipo, **parametros})
+    assert resposta.status_code == 202, resposta.text
+    assert resposta.headers["Location"] == f"/jobs/{resposta.json()['id']}"
+    return resposta.json()["id"]
+
+
+def obter(cliente, tarefa_id):
+    resposta = cliente.get(f"/jobs/{tarefa_id}")
+    assert resposta.status_code == 200, resposta.text
+    return resposta.json()
+
+
+def executar(gestor, tarefa_id):
+    assert gestor._reservar() == tarefa_id
+    gestor._executar(tarefa_id)
+
+
+def test_reserva_pela_prioridade(cliente, gestor):
+    # A de maior prioridade primeiro e, com a mesma prioridade, a mais antiga.
+    normal = criar_tarefa(cliente, "facetas")
+    urgente = criar_tarefa(cliente, "facetas", prioridade=5)
+    segunda_urgente = criar_tarefa(cliente, "facetas", prioridade=5)
+
+    for tarefa_id in (urgente, segunda_urgente, normal):
+        executar(gestor, tarefa_id)
+        tarefa = obter(cliente, tarefa_id)
+        assert tarefa["estado"] == "concluida"
+        assert tarefa["tentativas"] == 1
+        assert tarefa["progresso"] == 1.0
+        assert tarefa["resultado"]["valores"] >= 0
+    assert gestor._reservar() is None
+
+    # A reconstrução das facetas não produz nenhum ficheiro.
+    assert tarefa["url_resultado"] is None
+    assert cliente.get(f"/jobs/{normal}/result").status_code == 409
+
+
+def test_cancelamento_de_tarefa_pendente(cliente, gestor):
+    tarefa_id = criar_tarefa(cliente, "facetas")
+
+    resposta = cliente.post(f"/jobs/{tarefa_id}/cancel")
+    assert resposta.status_code == 200
+    assert (resposta.json()["estado"], resposta.json()["cancelamento_pedido"]) == ("cancelada", True)
+    assert gestor._reservar() is None
+    # Uma tarefa já terminada não pode ser cancelada.
+    assert cliente.post(f"/jobs/{tarefa_id}/cancel").status_code == 409
+    assert cliente.post("/jobs/999999/cancel").status_code == 404
+
+
+def test_cancelamento_de_tarefa_em_execucao(cliente, cidade, criar_empresa, gestor):
+    criar_empresa()
+    tarefa_id = criar_tarefa(cliente, "exportacao", cidade=cidade)
+    assert gestor._reservar() == tarefa_id
+
+    # Em execução, o cancelamento só é registado: a tarefa para no ponto de progresso seguinte.
+    resposta = cliente.post(f"/jobs/{tarefa_id}/cancel")
+    assert (resposta.json()["estado"], resposta.json()["cancelamento_pedido"]) == ("em_execucao", True)
+
+    gestor._executar(tarefa_id)
+    assert obter(cliente, tarefa_id)["estado"] == "cancelada"
+    # O ficheiro começado é apagado.
+    assert glob.glob(tarefa_service.caminho(f"tarefa-{tarefa_id}.*")) == []
+    assert cliente.get(f"/jobs/{tarefa_id}/result").status_code == 409
+
+
+def test_retoma_da_exportacao(cliente, cidade, criar_empresa, gestor, monkeypatch):
+    for _ in range(5):
+        criar_empresa()
+    monkeypatch.setattr(export_service, "EXPORT_CHUNK_SIZE", 2)
+    tarefa_id = criar_tarefa(cliente, "exportacao", cidade=cidade, formato="ndjson")
+
+    # Pontos gravados: o total e o primeiro bloco. O segundo bloco já foi escrito no ficheiro quando a tarefa
+    # é interrompida, mas não chegou a ser registado.
+    interromper_apos(gestor, monkeypatch, 2)
+    executar(gestor, tarefa_id)
+    tarefa = obter(cliente, tarefa_id)
+    assert (tarefa["estado"], tarefa["processados"], tarefa["total"]) == ("pendente", 2, 5)
+    assert tarefa["cancelamento_pedido"] is False
+
+    # A retoma (por outro gestor, como depois de um reinício) descarta o que foi escrito depois do ponto gravado.
+    executar(tarefa_service.GestorTarefas(0), tarefa_id)
+    tarefa = obter(cliente, tarefa_id)
+    assert (tarefa["estado"], tarefa["processados"], tarefa["tentativas"]) == ("concluida", 5, 2)
+    assert tarefa["resultado"] == {"empresas": 5}
+    assert tarefa["url_resultado"] == f"/jobs/{tarefa_id}/result"
+
+    resultado = cliente.get(tarefa["url_resultado"])
+    assert resultado.status_code == 200
+    assert resultado.headers["content-type"] == "application/x-ndjson"
+    # O ficheiro é igual ao da exportação direta: cada empresa exatamente uma vez, pela ordem do ID.
+    assert resultado.text == cliente.get("/empresas/export", params={"cidade": cidade, "formato": "ndjson"}).text
+
+    os.remove(tarefa_service.caminho(f"tarefa-{tarefa_id}.ndjson"))
+    assert cliente.get(tarefa["url_resultado"]).status_code == 410
+
+
+def test_retoma_da_importacao(cliente, cidade, dados_empresa, gestor, monkeypatch):
+    registos = [dados_empresa() for _ in range(5)]
+    registos[2]["email_contato"] = "sem-arroba"
+    monkeypatch.setattr(import_service, "ler_blocos", functools.partial(import_service.ler_blocos, tamanho=2))
+    resposta = cliente.post(
+        "/jobs", params={"tipo": "importacao"},
+        content="\n".join(json.dumps(registo) for registo in registos).encode(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert resposta.status_code == 202, resposta.text
+    tarefa_id = resposta.json()["id"]
+    assert "entrada" not in resposta.json()["parametros"]
+
+    # Pontos gravados: o total e o primeiro bloco (linhas 1 e 2). O segundo bloco é desfeito na interrupção.
+    interromper_apos(gestor, monkeypatch, 2)
+    executar(gestor, tarefa_id)
+    tarefa = obter(cliente, tarefa_id)
+    assert (tarefa["estado"], tarefa["processados"], tarefa["total"]) == ("pendente", 2, 5)
+
+    # Na retoma, as linhas já importadas são saltadas: cada linha é importada (ou rejeitada) uma única vez.
+    executar(tarefa_service.GestorTarefas(0), tarefa_id)
+    tarefa = obter(cliente, tarefa_id)
+    assert (tarefa["estado"], tarefa["processados"]) == ("concluida", 5)
+    assert tarefa["resultado"] == {"total_linhas": 5, "inseridas": 4, "rejeitadas": 1}
+
+    relatorio = cliente.get(f"/jobs/{tarefa_id}/result")
+    assert relatorio.status_code == 200
+    erros = [json.loads(linha) for linha in relatorio.text.splitlines()]
+    assert [erro["linha"] for erro in erros] == [3]
+    assert erros[0]["erro"].startswith("email_contato:")
+
+    nomes = sorted(empresa["nome"] for empresa in cliente.get("/empresas/", params={"cidade": cidade}).json())
+    assert nomes == sorted(registo["nome"] for indice, registo in enumerate(registos) if indice != 2)
+
+
+def test_recuperacao_das_tarefas_abandonadas(cliente, gestor):
+    ids = [criar_tarefa(cliente, "facetas") for _ in range(4)]
+    for tarefa_id in ids:
+        assert gestor._reservar() == tarefa_id
+
+    # Outra máquina sem sinal de vida recente, outra máquina com sinal recente, um processo anterior
+    # com o mesmo PID (reiniciado) e este processo.
+    antigo = tarefa_service.agora() - timedelta(seconds=2 * tarefa_service.JOBS_HEARTBEAT_TIMEOUT)
+    trabalhadores = [
+        ("outra-maquina:1:abcdef12", antigo),
+        ("outra-maquina:1:abcdef12", tarefa_service.agora()),
+        (f"{tarefa_service.MAQUINA}:{os.getpid()}:anterior", tarefa_service.agora()),
+        (tarefa_service.identificador(), antigo),
+    ]
+    with database.SessionLocal() as db:
+        for tarefa_id, (trabalhador, sinal) in zip(ids, trabalhadores):
+            db.execute(update(Tarefa).where(Tarefa.id == tarefa_id).values(trabalhador=trabalhador, data_sinal=sinal))
+        db.commit()
+        assert tarefa_service.recuperar_abandonadas(db) == 2
+
+    assert [obter(cliente, tarefa_id)["estado"] for tarefa_id in ids] == ["pendente", "em_execucao", "pendente", "em_execucao"]
+
+    # As tarefas recuperadas voltam a ser executadas.
+    for tarefa_id in (ids[0], ids[2]):
+        executar(gestor, tarefa_id)
+        assert (obter(cliente, tarefa_id)["estado"], obter(cliente, tarefa_id)["tentativas"]) == ("concluida", 2)
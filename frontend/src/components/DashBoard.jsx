@@ -1,8 +1,27 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import ListaEmpresas from './ListaEmpresas';
 import EmpresaModal from './EmpresaModal';
 import * as api from '../services/api';
 
+// Normaliza um texto como o servidor faz na pesquisa ('search_service.normalizar'):
+// sem distinguir maiúsculas de minúsculas e com os espaços normalizados.
+const normalizar = (texto) => String(texto).toLowerCase().split(/\s+/).filter(Boolean).join(' ');
+
+// Chave de comparação da cidade e do ramo de atuação, como no catálogo do servidor ('catalogo_service.chave'):
+// além da normalização, retira os acentos (decomposição NFKD, sem as marcas combinantes).
+const chave = (texto) => normalizar(String(texto).normalize('NFKD').replace(/\p{M}/gu, ''));
+
+// Campos comparados pela chave do catálogo (os restantes, como o nome, só pela normalização).
+const CAMPOS_CATALOGO = ['cidade', 'ramo_atuacao'];
+
+// Indica se uma empresa corresponde aos filtros ativos, com as mesmas regras de comparação do servidor.
+const correspondeFiltros = (empresa, filtros) =>
+  Object.entries(filtros).every(([campo, valor]) => {
+    if (valor.trim() === '') return true;
+    const comparar = CAMPOS_CATALOGO.includes(campo) ? chave : normalizar;
+    return comparar(empresa[campo]).includes(comparar(valor));
+  });
+
 function Dashboard({ token, onLogout }) {
   const [empresas, setEmpresas] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -12,26 +31,108 @@ function Dashboard({ token, onLogout }) {
   const [empresaAtual, setEmpresaAtual] = useState(null);
   const [filtros, setFiltros] = useState({ nome: '', cidade: '', ramo_atuacao: '' });
 
+  // Versão da última alteração aplicada à lista (null enquanto o stream não estiver ligado).
+  const versaoRef = useRef(null);
+  const carregadaRef = useRef(false);
+  const filtrosRef = useRef(filtros);
+  filtrosRef.current = filtros;
+
+  // Aplica uma alteração (criada, atualizada ou removida) à lista, sem voltar a pedir a lista inteira.
+  const aplicarAlteracao = useCallback((tipo, dados) => {
+    setEmpresas(prev => {
+      const restantes = prev.filter(e => e.id !== dados.id);
+      if (tipo === 'removida' || !correspondeFiltros(dados, filtrosRef.current)) {
+        return restantes;
+      }
+      return [...restantes, dados].sort((a, b) => a.id - b.id);
+    });
+  }, []);
+
+  // Obtém e aplica apenas as alterações posteriores a uma versão.
+  const sincronizar = useCallback(async (desde) => {
+    const { alteracoes, ultimaVersao } = await api.getAlteracoes(token, desde);
+    alteracoes.forEach(a => aplicarAlteracao(a.tipo, a.tipo === 'removida' ? { id: a.id } : a.empresa));
+    versaoRef.current = Math.max(versaoRef.current ?? 0, ultimaVersao);
+  }, [token, aplicarAlteracao]);
+
   const fetchEmpresas = useCallback(async () => {
     try {
       setLoading(true);
+      const versaoAntes = versaoRef.current;
       const filtrosAtivos = Object.fromEntries(
         Object.entries(filtros).filter(([, value]) => value !== '')
       );
       const data = await api.getEmpresas(token, filtrosAtivos);
       setEmpresas(data);
+      carregadaRef.current = true;
       setError(null);
+      // Reaplica as alterações feitas durante o pedido, que a lista recebida pode não incluir.
+      if (versaoAntes !== null) {
+        await sincronizar(versaoAntes);
+      }
     } catch (err) {
       setError(err.message);
     } finally {
       setLoading(false);
     }
-  }, [token, filtros]);
+  }, [token, filtros, sincronizar]);
+
+  const fetchRef = useRef(fetchEmpresas);
+  fetchRef.current = fetchEmpresas;
 
+  // Volta a carregar a lista quando os filtros mudam (a primeira carga é feita quando o stream se liga).
   useEffect(() => {
-    fetchEmpresas();
+    if (versaoRef.current !== null) {
+      fetchEmpresas();
+    }
   }, [fetchEmpresas]);
 
+  // Recebe as alterações feitas por qualquer administrador em tempo real e aplica-as à lista.
+  useEffect(() => {
+    const controller = new AbortController();
+    let ativo = true;
+
+    const onErro = (err) => setError(err.message);
+
+    const onEvento = (tipo, dados, versao) => {
+      if (tipo === 'inicio') {
+        if (versaoRef.current === null) {
+          // Primeira ligação: carrega a lista a partir da versão atual.
+          versaoRef.current = dados.versao;
+          fetchRef.current();
+        } else {
+          // Nova ligação: obtém as alterações feitas enquanto esteve desligado.
+          sincronizar(versaoRef.current).catch(onErro);
+        }
+      } else if (tipo === 'importacao' || tipo === 'resincronizar') {
+        sincronizar(versaoRef.current).catch(onErro);
+      } else {
+        aplicarAlteracao(tipo, dados);
+        versaoRef.current = Math.max(versaoRef.current, versao);
+      }
+    };
+
+    const ligar = async () => {
+      while (ativo) {
+        try {
+          await api.streamEmpresas(token, onEvento, controller.signal);
+        } catch {
+          if (!ativo) return;
+          // Sem stream, a lista é carregada na mesma (sem atualizações em tempo real).
+          if (!carregadaRef.current) fetchRef.current();
+        }
+        // Volta a ligar-se após uma pausa (o servidor fechou a ligação ou a rede falhou).
+        await new Promise(resolve => setTimeout(resolve, 3000));
+      }
+    };
+    ligar();
+
+    return () => {
+      ativo = false;
+      controller.abort();
+    };
+  }, [token, sincronizar, aplicarAlteracao]);
+
   const handleOpenModal = (empresa = null) => {
     setEmpresaAtual(empresa);
     setIsModalOpen(true);
@@ -44,13 +145,13 @@ function Dashboard({ token, onLogout }) {
 
   const handleSaveEmpresa = async (empresaData) => {
     try {
+      // A alteração é aplicada de imediato; o evento do stream (que chega depois) tem os mesmos dados.
       if (empresaAtual) {
-        await api.updateEmpresa(empresaAtual.id, empresaData, token);
+        aplicarAlteracao('atualizada', await api.updateEmpresa(empresaAtual.id, empresaData, token));
       } else {
-        await api.createEmpresa(empresaData, token);
+        aplicarAlteracao('criada', await api.createEmpresa(empresaData, token));
       }
       handleCloseModal();
-      fetchEmpresas();
     } catch (err) {
       alert(`Erro: ${err.message}`);
     }
@@ -60,7 +161,7 @@ function Dashboard({ token, onLogout }) {
     if (window.confirm('Tem a certeza de que deseja excluir esta empresa?')) {
         try {
             await api.deleteEmpresa(id, token);
-            fetchEmpresas();
+            aplicarAlteracao('removida', { id });
         } catch (err) {
             alert(`Erro: ${err.message}`);
         }
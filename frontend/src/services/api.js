@@ -27,22 +27,32 @@ export const login = async (username, password) => {
 
 /**
  * Função para buscar a lista de empresas, com filtros opcionais.
+ * A listagem é paginada por cursor: enquanto a resposta trouxer o cabeçalho 'X-Next-Cursor',
+ * pede a página seguinte, até obter todas as empresas.
  * @param {string} token - O token JWT de autenticação.
  * @param {object} filtros - Um objeto com os filtros (nome, cidade, ramo_atuacao).
  * @returns {Promise<Array>} A lista de empresas.
  */
 export const getEmpresas = async (token, filtros = {}) => {
-  const queryParams = new URLSearchParams(filtros).toString();
-  
-  const response = await fetch(`${API_URL}/empresas/?${queryParams}`, {
-    headers: { 'Authorization': `Bearer ${token}` },
-  });
+  let empresas = [];
+  let cursor = null;
+  do {
+    // Páginas do tamanho máximo aceite pela API, para percorrer a lista com o menor número de pedidos.
+    const queryParams = new URLSearchParams({ ...filtros, limit: 1000, ...(cursor ? { cursor } : {}) }).toString();
 
-  if (!response.ok) {
-    throw new Error('Falha ao buscar empresas. Verifique a sua sessão.');
-  }
+    const response = await fetch(`${API_URL}/empresas/?${queryParams}`, {
+      headers: { 'Authorization': `Bearer ${token}` },
+    });
+
+    if (!response.ok) {
+      throw new Error('Falha ao buscar empresas. Verifique a sua sessão.');
+    }
 
-  return response.json();
+    empresas = empresas.concat(await response.json());
+    cursor = response.headers.get('X-Next-Cursor');
+  } while (cursor);
+
+  return empresas;
 };
 
 /**
@@ -103,4 +113,76 @@ export const deleteEmpresa = async (id, token) => {
     if (!response.ok && response.status !== 204) { // 204 No Content é uma resposta de sucesso para DELETE
         throw new Error('Falha ao excluir empresa.');
     }
-};
\ No newline at end of file
+};
+/**
+ * Função para buscar as alterações das empresas posteriores a uma versão (sincronização incremental).
+ * Percorre todas as páginas de alterações.
+ * @param {string} token - O token JWT.
+ * @param {number} since - A última versão já conhecida.
+ * @returns {Promise<{alteracoes: Array, ultimaVersao: number}>} As alterações e a versão mais recente.
+ */
+export const getAlteracoes = async (token, since) => {
+    let alteracoes = [];
+    let ultimaVersao = since;
+    let temMais = true;
+    while (temMais) {
+        const response = await fetch(`${API_URL}/empresas/changes?since=${ultimaVersao}`, {
+            headers: { 'Authorization': `Bearer ${token}` },
+        });
+        if (!response.ok) {
+            throw new Error('Falha ao sincronizar empresas.');
+        }
+        const data = await response.json();
+        alteracoes = alteracoes.concat(data.alteracoes);
+        ultimaVersao = data.ultima_versao;
+        temMais = data.tem_mais;
+    }
+    return { alteracoes, ultimaVersao };
+};
+
+/**
+ * Função para receber as alterações das empresas em tempo real (Server-Sent Events).
+ * Usa o 'fetch' em vez do 'EventSource', que não permite enviar o cabeçalho de autenticação.
+ * Termina quando o servidor fecha a ligação ou quando o 'signal' é abortado.
+ * @param {string} token - O token JWT.
+ * @param {function} onEvento - Chamada com (tipo, dados, versao) para cada evento recebido.
+ * @param {AbortSignal} signal - Sinal para fechar a ligação.
+ * @returns {Promise<void>}
+ */
+export const streamEmpresas = async (token, onEvento, signal) => {
+    const response = await fetch(`${API_URL}/empresas/stream`, {
+        headers: { 'Authorization': `Bearer ${token}` },
+        signal,
+    });
+    if (!response.ok) {
+        throw new Error('Falha ao ligar ao stream de empresas.');
+    }
+
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    for (;;) {
+        const { value, done } = await reader.read();
+        if (done) {
+            return;
+        }
+        buffer += value;
+        // Cada evento termina com uma linha em branco.
+        let fim;
+        while ((fim = buffer.indexOf('\n\n')) !== -1) {
+            const bloco = buffer.slice(0, fim);
+            buffer = buffer.slice(fim + 2);
+            let tipo = 'message';
+            let dados = '';
+            let versao = null;
+            for (const linha of bloco.split('\n')) {
+                if (linha.startsWith('event: ')) tipo = linha.slice(7);
+                else if (linha.startsWith('data: ')) dados += linha.slice(6);
+                else if (linha.startsWith('id: ')) versao = Number(linha.slice(4));
+            }
+            // As linhas começadas por ':' (mensagens de manutenção da ligação) não têm dados.
+            if (dados) {
+                onEvento(tipo, JSON.parse(dados), versao);
+            }
+        }
+    }
+};